@@ -0,0 +1,360 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+import uuid
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Deque, Dict, List, Optional, Set, Tuple
+
+from app import metrics
+from app.alerting import SeriesKey, confirm_failure, wants_confirmation
+from app.models import Host, Outcome, classify_outcome
+from app.ping import CANCELLED, PingResult, ping_once, tcp_check
+from app.plan import Check, CheckPlan, PlanHost, compile_plan
+from app.ratelimit import Pacer, ProbeLimiter, spread_order
+from app.resolver import Resolver
+from app.topology import blocked_by, depth_levels
+from app.wire import PROTOCOL_VERSION, read_msg, send_msg
+
+log = logging.getLogger(__name__)
+
+# (host_id, check_type, target, ok, rtt_ms, ts_ms, message, samples)
+Row = List[Any]
+
+
+def plan_from_wire(msg: Dict[str, Any]) -> CheckPlan:
+    """Compile the shard the collector sent into the same CheckPlan the local monitor uses."""
+    hosts = [
+        Host(
+            id=int(d["id"]),
+            name=d.get("name") or "",
+            address=d.get("address") or "",
+            tags=d.get("tags") or "",
+            tcp_ports=d.get("tcp_ports") or "",
+            parent_id=d.get("parent_id"),
+            enabled=True,
+        )
+        for d in msg.get("hosts", [])
+    ]
+    return compile_plan(hosts, int(msg.get("interval_s") or 10), version=int(msg.get("version") or 0))
+
+
+class Agent:
+    """
+    Headless probe runner for one shard of the check plan.
+
+    Probes run on a thread pool (ping level by level so parents are known
+    before children, then all TCP checks), results are buffered and sealed
+    into numbered batches every `flush_s` or `batch_max` rows, and batches
+    stay buffered until the collector acknowledges their commit. Probing
+    continues while disconnected; unacknowledged batches are resent after
+    reconnecting, oldest dropped beyond `max_buffered` rows.
+
+    A failure on a healthy series is confirmed with re-probes before it is
+    reported, as the local monitor does; the collector then applies the
+    monitor's alert policy to what agents report.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        host: str = "127.0.0.1",
+        port: int = 9470,
+        token: str = "",
+        timeout_ms: int = 1000,
+        concurrency: int = 64,
+        batch_max: int = 500,
+        flush_s: float = 1.0,
+        max_buffered: int = 100_000,
+        limiter: Optional[ProbeLimiter] = None,
+        spread_fraction: float = 0.5,
+    ):
+        self.name = name
+        self.host = host
+        self.port = int(port)
+        self.token = token
+        self.timeout_ms = max(100, int(timeout_ms))
+        self.batch_max = max(1, int(batch_max))
+        self.flush_s = max(0.05, float(flush_s))
+        self.max_buffered = max(self.batch_max, int(max_buffered))
+        # Sends are paced over the first spread_fraction of each cycle and
+        # capped by the limiter, so a pool of `concurrency` threads never
+        # bursts a whole shard at the network in one go
+        self.limiter = limiter or ProbeLimiter()
+        self.spread_fraction = min(1.0, max(0.0, float(spread_fraction)))
+        self._pacer: Optional[Pacer] = None
+
+        self.confirm_retries = 2
+        self.confirm_spacing_ms = 250
+        self._streaks: Dict[SeriesKey, int] = {}  # consecutive failed probes reported per series
+
+        # A new id per process lets the collector tell a restart from a resend
+        self.boot = uuid.uuid4().hex[:12]
+        self._seq = 0
+        self._buffer: List[Row] = []
+        self._unacked: Deque[Tuple[int, List[Row]]] = deque()
+        self._buffered = 0
+
+        self._plan: Optional[CheckPlan] = None
+        self._levels: List[List[PlanHost]] = []
+        self._pool = ThreadPoolExecutor(max_workers=max(1, int(concurrency)), thread_name_prefix="agent-probe")
+        self.resolver = Resolver()
+
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._stop: Optional[asyncio.Event] = None
+        self._wake: Optional[asyncio.Event] = None
+
+    # ---- results buffer ----
+
+    def _emit(self, host_id: int, check_type: str, target: str, ok: bool, rtt_ms, message: str, samples: int = 1) -> None:
+        key = (host_id, check_type, target or "")
+        if ok or classify_outcome(ok, message) != Outcome.UNREACHABLE:  # not probed: the streak stands still
+            self._streaks[key] = 0 if ok else self._streaks.get(key, 0) + samples
+        self._buffer.append([host_id, check_type, target or "", bool(ok), rtt_ms, int(time.time() * 1000), message, samples])
+        if len(self._buffer) >= self.batch_max:
+            self._seal()
+
+    def _seal(self) -> None:
+        if not self._buffer:
+            return
+        self._seq += 1
+        self._unacked.append((self._seq, self._buffer))
+        self._buffered += len(self._buffer)
+        self._buffer = []
+        while self._buffered > self.max_buffered and len(self._unacked) > 1:
+            _, dropped = self._unacked.popleft()
+            self._buffered -= len(dropped)
+            metrics.AGENT_ROWS_DROPPED.inc(len(dropped))
+        metrics.AGENT_BUFFERED.set(self._buffered)
+        if self._wake is not None:
+            self._wake.set()
+
+    def _acked(self, seq: int) -> None:
+        while self._unacked and self._unacked[0][0] <= seq:
+            _, rows = self._unacked.popleft()
+            self._buffered -= len(rows)
+        metrics.AGENT_BUFFERED.set(self._buffered)
+
+    # ---- probing (pool threads) ----
+
+    def _probe(self, check_type: str, fn, *args, paced: bool = True, **kwargs) -> PingResult:
+        if paced and self._pacer is not None:
+            self._pacer.wait()
+        if not self.limiter.acquire(args[0], deadline=kwargs.get("deadline")):
+            return PingResult(ok=False, rtt_ms=None, message=CANCELLED, cancelled=True)
+        t0 = time.perf_counter()
+        r = fn(*args, **kwargs)
+        metrics.PROBE_SECONDS.observe(time.perf_counter() - t0, check_type=check_type)
+        metrics.PROBES.inc(check_type=check_type, outcome="ok" if r.ok else "fail")
+        return r
+
+    def _confirmed(self, key: SeriesKey, r: PingResult, deadline: float, reprobe) -> Tuple[PingResult, int]:
+        """The result and how many failed probes it stands for, re-probing a fresh failure."""
+        if (
+            self.confirm_retries <= 0
+            or not wants_confirmation(r, self._streaks.get(key, 0))
+            or time.monotonic() >= deadline
+        ):
+            return r, 1
+        stop = self._stop
+        return confirm_failure(
+            key[1], r, reprobe, self.confirm_retries, self.confirm_spacing_ms,
+            keep_going=lambda: stop is None or not stop.is_set(),
+        )
+
+    def _ping_host(self, h: PlanHost, deadline: float) -> Tuple[Optional[str], List[Tuple]]:
+        """(ip if the host answered, results to emit); no results if the deadline cancelled it."""
+        res = self.resolver.resolve(h.address)
+        if not res.ok:
+            return None, [(h.id, "dns", "", False, None, res.message)]
+        # Close a failing (or, after a restart, unknown) dns series with one OK
+        # row, so the collector's streak for it starts over
+        rows: List[Tuple] = []
+        if self._streaks.get((h.id, "dns", "")) != 0:
+            rows.append((h.id, "dns", "", True, None, f"Resolved to {res.address}"))
+        pr = self._probe("ping", ping_once, res.address, timeout_ms=self.timeout_ms, deadline=deadline)
+        if pr.cancelled:
+            return None, []
+        pr, probes = self._confirmed(
+            (h.id, "ping", ""), pr, deadline,
+            lambda: self._probe("ping", ping_once, res.address, paced=False, timeout_ms=self.timeout_ms, deadline=deadline),
+        )
+        rows.append((h.id, "ping", "", pr.ok, pr.rtt_ms, pr.message, probes))
+        return (res.address if pr.ok else None), rows
+
+    def _tcp(self, check: Check, ip: str, deadline: float) -> Optional[Tuple]:
+        timeout_ms = min(1200, self.timeout_ms)
+        tr = self._probe("tcp", tcp_check, ip, int(check.target), timeout_ms=timeout_ms, deadline=deadline)
+        if tr.cancelled:
+            return None
+        tr, probes = self._confirmed(
+            (check.host_id, "tcp", check.target), tr, deadline,
+            lambda: self._probe("tcp", tcp_check, ip, int(check.target), paced=False, timeout_ms=timeout_ms, deadline=deadline),
+        )
+        return (check.host_id, "tcp", check.target, tr.ok, tr.rtt_ms, tr.message, probes)
+
+    async def _cycle(self, plan: CheckPlan) -> None:
+        loop = asyncio.get_running_loop()
+        # Probes still running at the next cycle are cut short and dropped, not reported as failures
+        deadline = time.monotonic() + plan.interval_s
+        self._pacer = Pacer(len(plan), self.spread_fraction * plan.interval_s) if self.spread_fraction > 0 else None
+        await loop.run_in_executor(
+            self._pool,
+            lambda: self.resolver.prefetch((h.address for h in plan.hosts.values()), timeout_s=self.timeout_ms / 1000),
+        )
+
+        down: Set[int] = set()
+        unreachable: Set[int] = set()
+        tcp_jobs = []
+        for level in self._levels:
+            jobs = []
+            for h in level:
+                blocker = blocked_by(h.id, plan.parents, down | unreachable)
+                if blocker is not None:
+                    unreachable.add(h.id)
+                    metrics.PROBES_SUPPRESSED.inc()
+                    parent = plan.hosts.get(blocker)
+                    self._emit(h.id, "ping", "", False, None, f"Unreachable ({parent.name if parent else 'parent'} down)")
+                    continue
+                jobs.append((h, loop.run_in_executor(self._pool, self._ping_host, h, deadline)))
+
+            for h, fut in jobs:
+                ip, rows = await fut
+                for r in rows:
+                    self._emit(*r)
+                if ip is None:
+                    if rows:
+                        down.add(h.id)
+                    else:
+                        metrics.CHECKS_SHED.inc(1 + len(plan.tcp_by_host.get(h.id, ())), reason="cancelled")
+                    continue
+                for tc in plan.tcp_by_host.get(h.id, ()):
+                    tcp_jobs.append(loop.run_in_executor(self._pool, self._tcp, tc, ip, deadline))
+
+        for r in await asyncio.gather(*tcp_jobs):
+            if r is None:
+                metrics.CHECKS_SHED.inc(reason="cancelled")
+                continue
+            self._emit(*r)
+
+    async def _probe_loop(self) -> None:
+        assert self._stop is not None
+        next_due = time.monotonic()
+        while not self._stop.is_set():
+            plan = self._plan
+            interval = plan.interval_s if plan else 1
+            t0 = time.monotonic()
+            if plan is not None and plan.checks:
+                await self._cycle(plan)
+                metrics.CYCLE_SECONDS.observe(time.monotonic() - t0)
+
+            now = time.monotonic()
+            next_due += interval
+            if now > next_due:
+                missed = int((now - next_due) // interval) + 1
+                metrics.CYCLES_SKIPPED.inc(missed)
+                next_due += missed * interval
+            try:
+                await asyncio.wait_for(self._stop.wait(), timeout=max(0.05, next_due - now))
+            except asyncio.TimeoutError:
+                pass
+
+    async def _flush_loop(self) -> None:
+        assert self._stop is not None
+        while not self._stop.is_set():
+            try:
+                await asyncio.wait_for(self._stop.wait(), timeout=self.flush_s)
+            except asyncio.TimeoutError:
+                pass
+            self._seal()
+
+    # ---- collector connection ----
+
+    def _apply_plan(self, msg: Dict[str, Any]) -> None:
+        plan = plan_from_wire(msg)
+        if "timeout_ms" in msg:
+            self.timeout_ms = max(100, int(msg["timeout_ms"]))
+        self._levels = [spread_order(level, key=lambda h: h.address) for level in depth_levels(list(plan.hosts.values()))]
+        self._plan = plan
+        metrics.HOSTS.set(len(plan.hosts))
+        log.info("agent %s: plan v%d: %d hosts, %d checks", self.name, plan.version, len(plan.hosts), len(plan))
+
+    async def _session(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        assert self._wake is not None
+        await send_msg(
+            writer,
+            {"type": "hello", "agent": self.name, "boot": self.boot, "token": self.token, "protocol": PROTOCOL_VERSION},
+        )
+        reply = await read_msg(reader)
+        if reply["type"] == "error":
+            raise PermissionError(reply.get("message", "rejected by collector"))
+
+        async def receive() -> None:
+            while True:
+                msg = await read_msg(reader)
+                if msg["type"] == "ack":
+                    self._acked(int(msg["seq"]))
+                elif msg["type"] == "plan":
+                    self._apply_plan(msg)
+
+        async def send() -> None:
+            sent = 0
+            while True:
+                for seq, rows in list(self._unacked):
+                    if seq > sent:
+                        await send_msg(writer, {"type": "results", "boot": self.boot, "seq": seq, "rows": rows})
+                        sent = seq
+                self._wake.clear()
+                await self._wake.wait()
+
+        tasks = [asyncio.ensure_future(receive()), asyncio.ensure_future(send())]
+        stop = asyncio.ensure_future(self._stop.wait())
+        try:
+            done, _ = await asyncio.wait(tasks + [stop], return_when=asyncio.FIRST_COMPLETED)
+            for t in done:
+                if t is not stop:
+                    t.result()  # surface the disconnect
+        finally:
+            for t in tasks + [stop]:
+                t.cancel()
+
+    async def _connection_loop(self) -> None:
+        assert self._stop is not None
+        backoff = 1.0
+        while not self._stop.is_set():
+            writer = None
+            try:
+                reader, writer = await asyncio.open_connection(self.host, self.port)
+                log.info("agent %s: connected to %s:%d", self.name, self.host, self.port)
+                backoff = 1.0
+                await self._session(reader, writer)
+            except PermissionError as e:
+                log.error("agent %s: %s", self.name, e)
+                self._stop.set()
+            except (OSError, asyncio.IncompleteReadError, ValueError) as e:
+                log.warning("agent %s: collector unavailable (%s); retry in %.0fs", self.name, type(e).__name__, backoff)
+            finally:
+                if writer is not None:
+                    writer.close()
+            try:
+                await asyncio.wait_for(self._stop.wait(), timeout=backoff)
+            except asyncio.TimeoutError:
+                pass
+            backoff = min(30.0, backoff * 2)
+
+    async def run(self) -> None:
+        self._loop = asyncio.get_running_loop()
+        self._stop = asyncio.Event()
+        self._wake = asyncio.Event()
+        try:
+            await asyncio.gather(self._probe_loop(), self._flush_loop(), self._connection_loop())
+        finally:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self.resolver.close()
+
+    def stop(self) -> None:
+        """Thread-safe."""
+        if self._loop is not None and self._stop is not None:
+            self._loop.call_soon_threadsafe(self._stop.set)
@@ -0,0 +1,145 @@
+from __future__ import annotations
+
+import time
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+from sqlmodel import desc, select
+
+from app import metrics
+from app.db import get_session
+from app.models import AlertEvent, CheckKind, CheckResult, KIND_BY_NAME, Outcome, classify_outcome
+from app.ping import PingResult
+
+SeriesKey = Tuple[int, str, str]  # (host_id, check_type, target)
+
+
+class AlertPolicy:
+    """
+    Streak alerting shared by the local monitor and the agent collector: a
+    series alerts once its consecutive failed probes reach the threshold of
+    its check type, then at most once per cooldown. Streaks are seeded from
+    the newest stored rows the first time a series is seen, so a restart
+    neither forgets an ongoing outage nor re-alerts a healed one.
+    """
+
+    def __init__(self, ping_fail_threshold: int = 3, tcp_fail_threshold: int = 3, cooldown_seconds: int = 300):
+        self.ping_fail_threshold = ping_fail_threshold
+        self.tcp_fail_threshold = tcp_fail_threshold
+        self.cooldown_seconds = cooldown_seconds
+        self._streaks: Dict[SeriesKey, int] = {}
+        self._last_alert_at: Dict[SeriesKey, datetime] = {}
+
+    def threshold(self, check_type: str) -> int:
+        return self.tcp_fail_threshold if check_type == "tcp" else self.ping_fail_threshold
+
+    def streak(self, key: SeriesKey) -> int:
+        """Consecutive failed probes for a series; seeded from the DB once, then kept in memory."""
+        streak = self._streaks.get(key)
+        if streak is None:
+            try:
+                streak = fail_streak(*key)
+            except Exception:
+                streak = 0
+            self._streaks[key] = streak
+        return streak
+
+    def record(self, key: SeriesKey, ok: bool, samples: int = 1) -> int:
+        self._streaks[key] = 0 if ok else self.streak(key) + samples
+        return self._streaks[key]
+
+    def forget(self, keys: Iterable[SeriesKey]) -> None:
+        """Drop streaks so they are seeded from the DB again (e.g. after a failed write)."""
+        for key in keys:
+            self._streaks.pop(key, None)
+
+    def due(self, key: SeriesKey, now: datetime) -> Optional[int]:
+        """The streak if the series should alert now (and mark it alerted), else None."""
+        streak = self.streak(key)
+        if streak < self.threshold(key[1]):
+            return None
+        last = self._last_alert_at.get(key)
+        if last and (now - last) < timedelta(seconds=self.cooldown_seconds):
+            return None
+        self._last_alert_at[key] = now
+        metrics.ALERTS.inc(check_type=key[1])
+        return streak
+
+
+def fail_streak(host_id: int, check_type: str, target: str, limit: int = 50) -> int:
+    """
+    Failed probes since the newest OK row of a series, counting the probes
+    each row stands for. Unreachable rows (parent down) were never probed.
+    """
+    with get_session() as session:
+        recent = list(
+            session.exec(
+                select(CheckResult.outcome, CheckResult.samples)
+                .where(
+                    CheckResult.host_id == host_id,
+                    CheckResult.kind == KIND_BY_NAME.get(check_type, CheckKind.PING),
+                    CheckResult.port == (int(target) if target else 0),
+                )
+                .order_by(desc(CheckResult.ts_ms))
+                .limit(limit)
+            )
+        )
+    streak = 0
+    for outcome, samples in recent:
+        if outcome == Outcome.OK:
+            break
+        if outcome != Outcome.UNREACHABLE:
+            streak += samples
+    return streak
+
+
+def alert_message(name: str, address: str, check_type: str, target: str, streak: int) -> str:
+    return f"{name} ({address}) {check_type.upper()} {target or ''} failing: streak={streak}".strip()
+
+
+def store_alert(ts: datetime, host_id: int, check_type: str, target: str, message: str, severity: str = "CRIT") -> None:
+    with metrics.DB_COMMIT_SECONDS.time(op="alert"), get_session() as session:
+        session.add(
+            AlertEvent(ts=ts, host_id=host_id, check_type=check_type, target=target or "", severity=severity, message=message)
+        )
+        session.commit()
+
+
+def wants_confirmation(r: PingResult, streak: int) -> bool:
+    """
+    Only the healthy -> failing edge is confirmed: a series that is already
+    failing gains nothing from re-probing, and it would slow every cycle
+    during an outage. Local probe errors are not confirmed either.
+    """
+    return not r.ok and not r.cancelled and streak <= 0 and classify_outcome(False, r.message) != Outcome.ERROR
+
+
+def confirm_failure(
+    check_type: str,
+    failed: PingResult,
+    reprobe: Callable[[], PingResult],
+    retries: int,
+    spacing_ms: int,
+    keep_going: Callable[[], bool] = lambda: True,
+) -> Tuple[PingResult, int]:
+    """
+    Re-probe a failure `retries` times, `spacing_ms` apart. One success means
+    transient loss and is returned as a single OK probe; all failing is a
+    confirmed failure returned with the number of failed probes it stands for.
+    """
+    r = failed
+    probes = 1
+    for _ in range(retries):
+        if not keep_going():
+            break
+        time.sleep(spacing_ms / 1000)
+        retry = reprobe()
+        if retry.ok:
+            metrics.PROBES_CONFIRM.inc(check_type=check_type, verdict="transient")
+            return retry, 1
+        if retry.cancelled:
+            break  # out of cycle budget; the failures seen so far stand
+        r = retry
+        probes += 1
+    metrics.PROBES_CONFIRM.inc(check_type=check_type, verdict="confirmed")
+    return r, probes
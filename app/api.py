@@ -0,0 +1,333 @@
+from __future__ import annotations
+
+import asyncio
+import gzip
+import json
+import socket
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+from app import metrics
+from app.rollup import fast_version, fast_windows, rollup_stats, rollup_version, update_rollups
+from app.status import STATUS, StatusStore
+
+API_PREFIX = "/api/v1"
+WINDOWS_S = {"1h": 3600, "24h": 86400, "7d": 7 * 86400, "30d": 30 * 86400}
+IDLE_TIMEOUT_S = 15.0
+GZIP_MIN_BYTES = 1024
+
+# (etag, json body, gzipped body or None)
+_Cached = Tuple[str, bytes, Optional[bytes]]
+
+
+class _HttpError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+_REASONS = {200: "OK", 304: "Not Modified", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed", 500: "Internal Server Error"}
+
+
+def _int_arg(q: Dict[str, list], name: str, default: int, lo: int = 0, hi: int = 10**12) -> int:
+    try:
+        v = int(q.get(name, [default])[0])
+    except ValueError:
+        raise _HttpError(400, f"{name} must be an integer")
+    return max(lo, min(hi, v))
+
+
+class ApiServer:
+    """
+    Read-only JSON API over the in-memory StatusStore and the rollup tables,
+    served by an asyncio loop on a daemon thread.
+
+    Every route derives its ETag from a cheap version number (status version,
+    newest result/alert seq, rollup watermark) before building anything, so
+    a matching If-None-Match costs no serialization at all, and rendered
+    bodies (plain and gzipped) are cached per route+query until their ETag
+    moves. Requests never touch SQLite except stats cache misses, which read
+    the pre-aggregated ResultRollup table; cache misses are rendered on the
+    default executor so neither that read nor serialization stalls the loop.
+
+        GET /api/v1/status                  every host with its per-check state
+        GET /api/v1/hosts/<id>              one host
+        GET /api/v1/results?after=&limit=   recent results, newest first
+        GET /api/v1/alerts?after=&limit=    recent alerts, newest first
+        GET /api/v1/stats?window=24h&host=  availability/RTT per check from rollups
+        GET /api/v1/fast?window=1h&host=    fast-tier flush windows (loss runs, RTT percentiles)
+        GET /api/v1/hosts/<id>/samples?check=ping&target=
+                                            live fast-tier ring buffer (GUI process only, uncached)
+        GET /healthz
+    """
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 9465,
+        store: StatusStore = STATUS,
+        sync_s: float = 2.0,
+        rollup_s: float = 60.0,
+        cache_entries: int = 256,
+        fast_samples: Optional[Callable[[int, str, str], List[Any]]] = None,
+    ):
+        self.store = store
+        self.fast_samples = fast_samples  # FastProber.samples when a fast tier runs in this process
+        self.sync_s = max(0.2, float(sync_s))
+        self.rollup_s = max(5.0, float(rollup_s))
+        self.cache_entries = cache_entries
+        self._cache: "OrderedDict[str, _Cached]" = OrderedDict()
+        self._rollup_version = 0
+        self._fast_version = 0
+
+        # Bind now so a busy port surfaces as OSError to the caller, like MetricsServer
+        self._sock = socket.create_server((host, port))
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._stop: Optional[asyncio.Event] = None
+        self._thread = threading.Thread(target=self._run, name="api-http", daemon=True)
+
+        self._routes: Dict[str, Callable[[Dict[str, list]], Tuple[str, Callable[[], Any]]]] = {
+            "status": self._status,
+            "results": self._results,
+            "alerts": self._alerts,
+            "stats": self._stats,
+            "fast": self._fast,
+        }
+
+    @property
+    def address(self) -> Tuple[str, int]:
+        return self._sock.getsockname()[:2]
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        if self._loop is not None and self._stop is not None:
+            self._loop.call_soon_threadsafe(self._stop.set)
+        self._thread.join(timeout=3)
+
+    # ---- routes: each returns (etag, body factory) ----
+
+    def _status(self, q: Dict[str, list]):
+        return f"s{self.store.version}", lambda: {
+            "version": self.store.version,
+            "generated_ms": int(time.time() * 1000),
+            "hosts": self.store.fleet(),
+        }
+
+    def _host(self, host_id: int):
+        def body():
+            h = self.store.host_status(host_id)
+            if h is None:
+                raise _HttpError(404, f"no host {host_id}")
+            return h
+
+        return f"s{self.store.version}-h{host_id}", body
+
+    def _results(self, q: Dict[str, list]):
+        after = _int_arg(q, "after", 0)
+        limit = _int_arg(q, "limit", 200, 1, 1000)
+        seq = self.store.latest_result_seq()
+        return f"r{seq}-{after}-{limit}", lambda: {
+            "seq": seq,
+            "results": self.store.recent_results(after, limit),
+        }
+
+    def _alerts(self, q: Dict[str, list]):
+        after = _int_arg(q, "after", 0)
+        limit = _int_arg(q, "limit", 100, 1, 300)
+        seq = self.store.latest_alert_seq()
+        return f"a{seq}-{after}-{limit}", lambda: {"seq": seq, "alerts": self.store.recent_alerts(after, limit)}
+
+    def _stats(self, q: Dict[str, list]):
+        window = q.get("window", ["24h"])[0]
+        if window not in WINDOWS_S:
+            raise _HttpError(400, f"window must be one of {', '.join(WINDOWS_S)}")
+        host_id = _int_arg(q, "host", 0) or None
+        # Windows slide with the clock; re-render at most once per minute bucket
+        now_ms = int(time.time() * 1000)
+        minute = now_ms // 60_000
+        since_ms = now_ms - WINDOWS_S[window] * 1000
+        return f"t{self._rollup_version}-{minute}-{window}-{host_id or 0}", lambda: {
+            "window": window,
+            "since_ms": since_ms,
+            "until_ms": now_ms,
+            "checks": rollup_stats(since_ms, now_ms, host_id),
+        }
+
+    def _fast(self, q: Dict[str, list]):
+        window = q.get("window", ["1h"])[0]
+        if window not in WINDOWS_S:
+            raise _HttpError(400, f"window must be one of {', '.join(WINDOWS_S)}")
+        host_id = _int_arg(q, "host", 0) or None
+        now_ms = int(time.time() * 1000)
+        since_ms = now_ms - WINDOWS_S[window] * 1000
+        return f"f{self._fast_version}-{now_ms // 60_000}-{window}-{host_id or 0}", lambda: {
+            "window": window,
+            "since_ms": since_ms,
+            "until_ms": now_ms,
+            "windows": fast_windows(since_ms, now_ms, host_id),
+        }
+
+    def _samples(self, host_id: int, q: Dict[str, list]):
+        if self.fast_samples is None:
+            raise _HttpError(404, "no fast tier in this process")
+        check = q.get("check", ["ping"])[0]
+        target = q.get("target", [""])[0]
+        samples = self.fast_samples(host_id, check, target)
+        if not samples:
+            raise _HttpError(404, f"no fast-tier samples for host {host_id} {check} {target}".strip())
+        # A new sample lands every period; the ring is cheap to copy, so it is never cached
+        return "", lambda: {
+            "host_id": host_id,
+            "check_type": check,
+            "target": target,
+            "samples": [[s.ts_ms, s.ok, s.rtt_ms] for s in samples],
+        }
+
+    # ---- HTTP ----
+
+    def _route(self, path: str, query: Dict[str, list]):
+        if path == "/healthz":
+            return "", lambda: {"ok": True, "status_version": self.store.version}
+        if not path.startswith(API_PREFIX + "/"):
+            raise _HttpError(404, "not found")
+        parts = path[len(API_PREFIX) + 1:].strip("/").split("/")
+        if len(parts) in (2, 3) and parts[0] == "hosts":
+            try:
+                host_id = int(parts[1])
+            except ValueError:
+                raise _HttpError(404, "not found")
+            if len(parts) == 2:
+                return self._host(host_id)
+            if parts[2] == "samples":
+                return self._samples(host_id, query)
+            raise _HttpError(404, "not found")
+        handler = self._routes.get(parts[0]) if len(parts) == 1 else None
+        if handler is None:
+            raise _HttpError(404, "not found")
+        return handler(query)
+
+    @staticmethod
+    def _render(etag: str, build: Callable[[], Any]) -> _Cached:
+        body = json.dumps(build(), separators=(",", ":")).encode("utf-8")
+        gz = gzip.compress(body, 5) if len(body) >= GZIP_MIN_BYTES else None
+        return (etag, body, gz)
+
+    async def _respond(self, method: str, target: str, headers: Dict[str, str]) -> Tuple[int, Dict[str, str], bytes]:
+        url = urlsplit(target)
+        route = url.path.rstrip("/") or "/"
+        if method not in ("GET", "HEAD"):
+            raise _HttpError(405, "read-only API")
+        query = parse_qs(url.query)
+        etag_key, build = self._route(route, query)
+
+        hdrs = {"Content-Type": "application/json", "Cache-Control": "no-cache", "Vary": "Accept-Encoding"}
+        if not etag_key:  # uncached routes (health, live samples)
+            return 200, hdrs, json.dumps(build()).encode("utf-8")
+
+        etag = f'"{etag_key}"'
+        hdrs["ETag"] = etag
+        if etag in [t.strip() for t in headers.get("if-none-match", "").split(",")]:
+            metrics.API_CACHE.inc(result="not_modified")
+            return 304, hdrs, b""
+
+        cache_key = f"{route}?{url.query}"
+        cached = self._cache.get(cache_key)
+        if cached is not None and cached[0] == etag:
+            metrics.API_CACHE.inc(result="hit")
+            self._cache.move_to_end(cache_key)
+        else:
+            metrics.API_CACHE.inc(result="miss")
+            assert self._loop is not None
+            cached = await self._loop.run_in_executor(None, self._render, etag, build)
+            self._cache[cache_key] = cached
+            self._cache.move_to_end(cache_key)
+            while len(self._cache) > self.cache_entries:
+                self._cache.popitem(last=False)
+
+        _, body, gz = cached
+        if gz is not None and "gzip" in headers.get("accept-encoding", ""):
+            hdrs["Content-Encoding"] = "gzip"
+            return 200, hdrs, gz
+        return 200, hdrs, body
+
+    async def _client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                try:
+                    head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), timeout=IDLE_TIMEOUT_S)
+                except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, asyncio.TimeoutError, ConnectionError):
+                    return
+                lines = head.decode("latin-1").split("\r\n")
+                try:
+                    method, target, version = lines[0].split(" ", 2)
+                except ValueError:
+                    return
+                headers: Dict[str, str] = {}
+                for line in lines[1:]:
+                    k, sep, v = line.partition(":")
+                    if sep:
+                        headers[k.strip().lower()] = v.strip()
+                length = int(headers.get("content-length") or 0)
+                if length:
+                    await reader.readexactly(min(length, 65536))  # GET bodies are ignored
+
+                route = urlsplit(target).path
+                try:
+                    status, hdrs, body = await self._respond(method, target, headers)
+                except _HttpError as e:
+                    status, hdrs, body = e.status, {"Content-Type": "application/json"}, json.dumps({"error": str(e)}).encode()
+                except Exception as e:
+                    status, hdrs, body = 500, {"Content-Type": "application/json"}, json.dumps({"error": type(e).__name__}).encode()
+                metrics.API_REQUESTS.inc(route=route.split("/")[3] if route.startswith(API_PREFIX + "/") else route, status=str(status))
+
+                keep = version.strip() == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+                hdrs["Content-Length"] = str(len(body))
+                hdrs["Access-Control-Allow-Origin"] = "*"
+                hdrs["Connection"] = "keep-alive" if keep else "close"
+                out = [f"HTTP/1.1 {status} {_REASONS.get(status, '')}"]
+                out += [f"{k}: {v}" for k, v in hdrs.items()]
+                writer.write(("\r\n".join(out) + "\r\n\r\n").encode("latin-1"))
+                if method != "HEAD" and status != 304:
+                    writer.write(body)
+                await writer.drain()
+                if not keep:
+                    return
+        finally:
+            writer.close()
+
+    # ---- background refresh ----
+
+    async def _refresh_loop(self) -> None:
+        assert self._loop is not None and self._stop is not None
+        last_rollup = 0.0
+        while not self._stop.is_set():
+            try:
+                await self._loop.run_in_executor(None, self.store.sync)
+                if time.monotonic() - last_rollup >= self.rollup_s:
+                    last_rollup = time.monotonic()
+                    await self._loop.run_in_executor(None, update_rollups)
+                    self._rollup_version = await self._loop.run_in_executor(None, rollup_version)
+                self._fast_version = await self._loop.run_in_executor(None, fast_version)
+            except Exception:
+                metrics.DB_ERRORS.inc(op="api")
+            try:
+                await asyncio.wait_for(self._stop.wait(), timeout=self.sync_s)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _main(self) -> None:
+        self._loop = asyncio.get_running_loop()
+        self._stop = asyncio.Event()
+        server = await asyncio.start_server(self._client, sock=self._sock)
+        try:
+            await self._refresh_loop()
+        finally:
+            server.close()
+
+    def _run(self) -> None:
+        asyncio.run(self._main())
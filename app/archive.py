@@ -0,0 +1,344 @@
+from __future__ import annotations
+
+import array
+import heapq
+import math
+import mmap
+import os
+import shutil
+import struct
+import tempfile
+import time
+from bisect import bisect_left, bisect_right
+from dataclasses import dataclass
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+from sqlmodel import delete, func, select
+
+from app.db import data_dir, engine, get_session
+from app.models import CheckResult, Outcome
+
+DAY_MS = 86400 * 1000
+CHUNK_ROWS = 5000  # rows read, and spooled per column, at a time
+DELETE_BATCH = 5000  # archived rows deleted per transaction
+DELETE_PAUSE_S = 0.01  # between delete batches, so the monitor's writes get in
+
+# File layout (.sdc, little-endian):
+#   header:    magic "SDC1", u32 column count, u64 row count
+#   directory: per column 16-byte name, 1-byte array typecode, 7 pad, u64 offset, u64 byte length
+#   columns:   raw arrays, each 8-byte aligned, rows sorted by (host_id, ts_ms)
+# Fixed-width narrow columns keep the files memory-mappable: readers cast the
+# mapped pages straight to typed memoryviews without copying or decoding.
+_MAGIC = b"SDC1"
+_HEADER = struct.Struct("<4sIQ")
+_DIRENT = struct.Struct("<16sc7xQQ")
+
+COLUMNS: Tuple[Tuple[str, str], ...] = (
+    ("host_id", "i"),
+    ("ts_ms", "q"),
+    ("id", "q"),
+    ("kind", "b"),
+    ("port", "H"),
+    ("outcome", "b"),
+    ("rtt_ms", "f"),  # NaN = no RTT
+    ("msg_id", "i"),
+    ("samples", "i"),
+    ("flags", "b"),
+)
+
+
+class ArchivedRow(NamedTuple):
+    id: int
+    host_id: int
+    ts_ms: int
+    kind: int
+    port: int
+    outcome: int
+    rtt_ms: Optional[float]
+    msg_id: int
+    samples: int
+    flags: int
+
+    @property
+    def ok(self) -> bool:
+        return self.outcome == Outcome.OK
+
+
+def day_start_ms(ts_ms: int) -> int:
+    return ts_ms - ts_ms % DAY_MS
+
+
+def day_path(day_ms: int, archive_dir: Optional[str] = None) -> str:
+    stamp = time.strftime("%Y%m%d", time.gmtime(day_ms // 1000))
+    return os.path.join(archive_dir or data_dir("archive"), f"checkresult-{stamp}.sdc")
+
+
+class _DayWriter:
+    """
+    Builds a day file from rows added in (host_id, ts_ms, id) order. Each
+    column is spooled to its own temp file CHUNK_ROWS at a time and only
+    stitched into the final layout by seal(), so memory stays at one chunk
+    however large the day is.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.rows = 0
+        self._spools = [tempfile.TemporaryFile(dir=os.path.dirname(path)) for _ in COLUMNS]
+        self._chunk = [array.array(code) for _, code in COLUMNS]
+
+    def add(self, r: ArchivedRow) -> None:
+        for (name, _), col in zip(COLUMNS, self._chunk):
+            v = getattr(r, name)
+            col.append(math.nan if v is None else v)  # only rtt_ms is nullable
+        self.rows += 1
+        if self.rows % CHUNK_ROWS == 0:
+            self._flush()
+
+    def _flush(self) -> None:
+        for col, spool in zip(self._chunk, self._spools):
+            col.tofile(spool)
+            del col[:]
+
+    def seal(self) -> None:
+        """Write everything added so far to <path>.tmp; commit() then moves it into place."""
+        self._flush()
+        offset = _HEADER.size + _DIRENT.size * len(COLUMNS)
+        dirents: List[bytes] = []
+        for (name, code), spool in zip(COLUMNS, self._spools):
+            offset = (offset + 7) & ~7
+            length = spool.tell()
+            dirents.append(_DIRENT.pack(name.encode("ascii"), code.encode("ascii"), offset, length))
+            offset += length
+
+        tmp = self.path + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(_HEADER.pack(_MAGIC, len(COLUMNS), self.rows))
+            for d in dirents:
+                f.write(d)
+            for spool in self._spools:
+                f.write(b"\0" * ((-f.tell()) % 8))
+                spool.seek(0)
+                shutil.copyfileobj(spool, f, 1024 * 1024)
+            f.flush()
+            os.fsync(f.fileno())
+
+    def commit(self) -> None:
+        os.replace(self.path + ".tmp", self.path)
+
+    def close(self) -> None:
+        for spool in self._spools:
+            spool.close()
+
+
+class ArchiveDay:
+    """One memory-mapped day file; columns are zero-copy typed memoryviews."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._f = open(path, "rb")
+        size = os.fstat(self._f.fileno()).st_size
+        self._mm = mmap.mmap(self._f.fileno(), 0, access=mmap.ACCESS_READ) if size else None
+        self.columns: Dict[str, memoryview] = {}
+        self.rows = 0
+        self._buf: Optional[memoryview] = None
+        if self._mm is None:
+            return
+
+        magic, ncols, nrows = _HEADER.unpack_from(self._mm, 0)
+        if magic != _MAGIC:
+            raise ValueError(f"{path}: not a SentinelDesk archive")
+        self.rows = nrows
+        self._buf = memoryview(self._mm)
+        for i in range(ncols):
+            raw_name, code, off, length = _DIRENT.unpack_from(self._mm, _HEADER.size + i * _DIRENT.size)
+            name = raw_name.rstrip(b"\0").decode("ascii")
+            self.columns[name] = self._buf[off:off + length].cast(code.decode("ascii"))
+
+    def host_range(self, host_id: int) -> Tuple[int, int]:
+        col = self.columns.get("host_id")
+        if col is None:
+            return (0, 0)
+        return (bisect_left(col, host_id), bisect_right(col, host_id))
+
+    def ts_range(self, lo: int, hi: int, since_ms: int, until_ms: int) -> Tuple[int, int]:
+        """Narrow a host's row range [lo, hi) to timestamps in [since_ms, until_ms)."""
+        if hi <= lo:
+            return (lo, lo)
+        with self.columns["ts_ms"][lo:hi] as ts:
+            return (lo + bisect_left(ts, since_ms), lo + bisect_left(ts, until_ms))
+
+    def row(self, i: int) -> ArchivedRow:
+        c = self.columns
+        rtt = c["rtt_ms"][i]
+        return ArchivedRow(
+            id=c["id"][i],
+            host_id=c["host_id"][i],
+            ts_ms=c["ts_ms"][i],
+            kind=c["kind"][i],
+            port=c["port"][i],
+            outcome=c["outcome"][i],
+            rtt_ms=None if math.isnan(rtt) else rtt,
+            msg_id=c["msg_id"][i],
+            samples=c["samples"][i],
+            flags=c["flags"][i],
+        )
+
+    def all_rows(self) -> List[ArchivedRow]:
+        return [self.row(i) for i in range(self.rows)]
+
+    def close(self) -> None:
+        for mv in self.columns.values():
+            mv.release()
+        self.columns = {}
+        if self._buf is not None:
+            self._buf.release()
+            self._buf = None
+        if self._mm is not None:
+            self._mm.close()
+        self._f.close()
+
+    def __enter__(self) -> "ArchiveDay":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+@dataclass
+class ArchiveStats:
+    days: int = 0
+    rows: int = 0
+
+
+def _row_key(r: ArchivedRow) -> Tuple[int, int, int]:
+    return (r.host_id, r.ts_ms, r.id)
+
+
+def _merged(live: Iterable[ArchivedRow], existing: Optional[ArchiveDay]) -> Iterator[ArchivedRow]:
+    """Live rows merged into an existing day file's, both sorted; a row in both (same id) comes out once."""
+    older = (existing.row(i) for i in range(existing.rows)) if existing is not None else iter(())
+    last = None
+    for r in heapq.merge(live, older, key=_row_key):
+        if r.id != last:
+            yield r
+        last = r.id
+
+
+def _live_day(day: int, ceiling: int) -> Iterator[ArchivedRow]:
+    q = (
+        select(CheckResult)
+        .where(CheckResult.ts_ms >= day, CheckResult.ts_ms < day + DAY_MS, CheckResult.id <= ceiling)
+        .order_by(CheckResult.host_id, CheckResult.ts_ms, CheckResult.id)
+    )
+    # Server-side cursor: the day is pulled CHUNK_ROWS at a time, never materialized
+    with engine.connect() as conn:
+        result = conn.execution_options(stream_results=True, yield_per=CHUNK_ROWS).execute(q)
+        for part in result.partitions():
+            for r in part:
+                yield ArchivedRow(
+                    id=int(r.id),
+                    host_id=r.host_id,
+                    ts_ms=r.ts_ms,
+                    kind=r.kind,
+                    port=r.port,
+                    outcome=r.outcome,
+                    rtt_ms=r.rtt_ms,
+                    msg_id=r.msg_id,
+                    samples=r.samples,
+                    flags=r.flags,
+                )
+
+
+def _delete_day(day: int, ceiling: int) -> None:
+    """Delete the archived rows DELETE_BATCH at a time, so the write lock is never held for long."""
+    while True:
+        batch = (
+            select(CheckResult.id)
+            .where(CheckResult.ts_ms >= day, CheckResult.ts_ms < day + DAY_MS, CheckResult.id <= ceiling)
+            .limit(DELETE_BATCH)
+        )
+        with get_session() as session:
+            n = session.exec(delete(CheckResult).where(CheckResult.id.in_(batch.scalar_subquery()))).rowcount
+            session.commit()
+        if n < DELETE_BATCH:
+            return
+        time.sleep(DELETE_PAUSE_S)
+
+
+def archive_older_than(days: int = 30, archive_dir: Optional[str] = None, now_ms: Optional[int] = None) -> ArchiveStats:
+    """
+    Move CheckResult rows from whole UTC days older than `days` into per-day
+    archive files. Each day is streamed into its file (merged with any
+    existing one, de-duplicated by row id) before its rows are deleted in
+    small batches, so an interruption at worst leaves rows in both places
+    for the next run. Rows inserted after the run started (ids above the
+    ceiling) are left for the next run as well.
+    """
+    archive_dir = archive_dir or data_dir("archive")
+    os.makedirs(archive_dir, exist_ok=True)
+    now_ms = int(time.time() * 1000) if now_ms is None else now_ms
+    cutoff = day_start_ms(now_ms - days * DAY_MS)
+    stats = ArchiveStats()
+
+    with get_session() as session:
+        oldest = session.exec(select(func.min(CheckResult.ts_ms))).one()
+        ceiling = session.exec(select(func.max(CheckResult.id))).one()
+    if oldest is None or oldest >= cutoff:
+        return stats
+
+    day = day_start_ms(int(oldest))
+    while day < cutoff:
+        with get_session() as session:
+            any_live = session.exec(
+                select(CheckResult.id)
+                .where(CheckResult.ts_ms >= day, CheckResult.ts_ms < day + DAY_MS, CheckResult.id <= ceiling)
+                .limit(1)
+            ).first()
+        if any_live is not None:
+            path = day_path(day, archive_dir)
+            w = _DayWriter(path)
+            try:
+                existing = ArchiveDay(path) if os.path.exists(path) else None
+                try:
+                    for r in _merged(_live_day(day, ceiling), existing):
+                        w.add(r)
+                    w.seal()
+                finally:
+                    if existing is not None:
+                        existing.close()  # before the replace: an open mapping pins the file on Windows
+                w.commit()
+            finally:
+                w.close()
+            _delete_day(day, ceiling)
+            stats.days += 1
+            stats.rows += w.rows
+        day += DAY_MS
+    return stats
+
+
+class ArchiveReader:
+    def __init__(self, archive_dir: Optional[str] = None):
+        self.archive_dir = archive_dir or data_dir("archive")
+
+    def day_files(self, since_ms: int, until_ms: int) -> List[str]:
+        out: List[str] = []
+        day = day_start_ms(since_ms)
+        while day < until_ms:
+            p = day_path(day, self.archive_dir)
+            if os.path.exists(p):
+                out.append(p)
+            day += DAY_MS
+        return out
+
+    def scan(
+        self, host_id: int, since_ms: int, until_ms: int, kind: Optional[int] = None
+    ) -> Iterator[ArchivedRow]:
+        """Archived rows of one host in [since_ms, until_ms), ascending by ts."""
+        for path in self.day_files(since_ms, until_ms):
+            with ArchiveDay(path) as day:
+                a, b = day.ts_range(*day.host_range(host_id), since_ms, until_ms)
+                kinds = day.columns.get("kind")
+                for i in range(a, b):
+                    if kind is None or kinds[i] == kind:
+                        yield day.row(i)
@@ -0,0 +1,237 @@
+from __future__ import annotations
+
+import gzip
+import os
+import shutil
+import sqlite3
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import List, Optional
+
+from app import metrics
+from app.db import DB_PATH, data_dir
+
+KEEP = 14
+PAGES_PER_STEP = 512  # 2 MB at the default page size
+STEP_PAUSE_S = 0.002  # between steps, so the copy never monopolises the disk
+COMPRESS_LEVEL = 6
+REQUIRED_TABLES = ("host", "checkresult")
+
+_PREFIX = "sentineldesk-"
+_SUFFIX = ".db.gz"
+_STAMP = "%Y%m%dT%H%M%SZ"
+
+
+@dataclass
+class BackupInfo:
+    path: str
+    taken_ms: int
+    bytes: int
+
+    @property
+    def name(self) -> str:
+        return os.path.basename(self.path)
+
+
+def _stamp_of(name: str) -> Optional[int]:
+    if not (name.startswith(_PREFIX) and name.endswith(_SUFFIX)):
+        return None
+    try:
+        dt = datetime.strptime(name[len(_PREFIX):-len(_SUFFIX)], _STAMP).replace(tzinfo=timezone.utc)
+    except ValueError:
+        return None
+    return int(dt.timestamp() * 1000)
+
+
+def list_backups(backup_dir: Optional[str] = None) -> List[BackupInfo]:
+    """Snapshots in backup_dir, oldest first."""
+    backup_dir = backup_dir or data_dir("backups")
+    if not os.path.isdir(backup_dir):
+        return []
+    out: List[BackupInfo] = []
+    for name in os.listdir(backup_dir):
+        ts = _stamp_of(name)
+        if ts is not None:
+            path = os.path.join(backup_dir, name)
+            out.append(BackupInfo(path=path, taken_ms=ts, bytes=os.path.getsize(path)))
+    return sorted(out, key=lambda b: b.taken_ms)
+
+
+def _copy_pages(src_path: str, dest_path: str, compact: bool) -> None:
+    """
+    Consistent copy of src_path into a fresh dest_path without blocking writers.
+
+    Stepped: the online backup API copies PAGES_PER_STEP pages at a time.
+    A read transaction is held open on the source for the whole copy. In WAL
+    mode that pins one snapshot, so commits made meanwhile by the monitor
+    neither wait for the copy nor force it to start over, as they would
+    between unpinned steps.
+
+    compact: a single VACUUM INTO, which is also just a reader in WAL mode
+    and writes a defragmented file without the free pages, at the cost of
+    rebuilding every b-tree.
+    """
+    src = sqlite3.connect(src_path, isolation_level=None)
+    try:
+        if compact:
+            src.execute("VACUUM INTO ?", (dest_path,))
+            return
+        dest = sqlite3.connect(dest_path)
+        try:
+            src.execute("BEGIN")
+            src.execute("SELECT count(*) FROM sqlite_master").fetchone()  # takes the read snapshot
+            src.backup(dest, pages=PAGES_PER_STEP, progress=lambda *_: time.sleep(STEP_PAUSE_S))
+            src.execute("COMMIT")
+            # A standalone file: no -wal sidecar expected next to the snapshot
+            dest.execute("PRAGMA journal_mode=DELETE")
+        finally:
+            dest.close()
+    finally:
+        src.close()
+
+
+def _check(path: str) -> str:
+    """'ok', or what is wrong with the uncompressed database at path."""
+    con = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        problems = [r[0] for r in con.execute("PRAGMA integrity_check(10)")]
+        if problems != ["ok"]:
+            return "; ".join(problems)
+        tables = {r[0] for r in con.execute("SELECT name FROM sqlite_master WHERE type='table'")}
+        missing = [t for t in REQUIRED_TABLES if t not in tables]
+        return f"missing tables: {', '.join(missing)}" if missing else "ok"
+    except sqlite3.DatabaseError as e:
+        return str(e)
+    finally:
+        con.close()
+
+
+def _gzip(src: str, dest: str) -> None:
+    with open(src, "rb") as f, gzip.open(dest, "wb", compresslevel=COMPRESS_LEVEL) as g:
+        shutil.copyfileobj(f, g, 1024 * 1024)
+
+
+def _gunzip(src: str, dest: str) -> None:
+    with gzip.open(src, "rb") as g, open(dest, "wb") as f:
+        shutil.copyfileobj(g, f, 1024 * 1024)
+
+
+def create_backup(
+    db_path: str = DB_PATH,
+    backup_dir: Optional[str] = None,
+    keep: Optional[int] = KEEP,
+    compact: bool = False,
+) -> BackupInfo:
+    """
+    Take a snapshot, check it, gzip it into backup_dir as
+    sentineldesk-<UTC time>.db.gz and prune all but the newest `keep`.
+    Only the page copy touches the live database; checking and compressing
+    work on the private copy. The .gz appears atomically, so a crash
+    mid-backup leaves at most a *.tmp file behind.
+    """
+    backup_dir = backup_dir or data_dir("backups")
+    os.makedirs(backup_dir, exist_ok=True)
+    now = datetime.now(timezone.utc)
+    final = os.path.join(backup_dir, f"{_PREFIX}{now.strftime(_STAMP)}{_SUFFIX}")
+    raw = final[: -len(".gz")] + ".tmp"
+    packed = final + ".tmp"
+    try:
+        for p in (raw, packed):
+            if os.path.exists(p):
+                os.remove(p)
+        with metrics.BACKUP_SECONDS.time(stage="copy"):
+            _copy_pages(db_path, raw, compact)
+        with metrics.BACKUP_SECONDS.time(stage="verify"):
+            verdict = _check(raw)
+        if verdict != "ok":
+            raise RuntimeError(f"snapshot failed its integrity check: {verdict}")
+        with metrics.BACKUP_SECONDS.time(stage="compress"):
+            _gzip(raw, packed)
+        os.replace(packed, final)
+    except Exception:
+        metrics.BACKUP_FAILURES.inc()
+        if os.path.exists(packed):
+            os.remove(packed)
+        raise
+    finally:
+        if os.path.exists(raw):
+            os.remove(raw)
+
+    info = BackupInfo(path=final, taken_ms=int(now.timestamp() * 1000), bytes=os.path.getsize(final))
+    metrics.BACKUP_BYTES.set(info.bytes)
+    if keep:
+        rotate(backup_dir, keep)
+    return info
+
+
+def rotate(backup_dir: Optional[str] = None, keep: int = KEEP) -> List[str]:
+    """Delete all but the newest `keep` snapshots; returns the removed paths."""
+    old = list_backups(backup_dir)[:-keep] if keep > 0 else []
+    for b in old:
+        os.remove(b.path)
+    return [b.path for b in old]
+
+
+def verify_backup(path: str) -> str:
+    """
+    Decompress to a scratch file (which also checks the gzip CRC), then run
+    integrity_check and make sure the core tables are there. Returns 'ok'
+    or the problem.
+    """
+    scratch = path + ".verify.tmp"
+    try:
+        _gunzip(path, scratch)
+        return _check(scratch)
+    except (OSError, EOFError) as e:
+        return f"unreadable archive: {e}"
+    finally:
+        if os.path.exists(scratch):
+            os.remove(scratch)
+
+
+def restore_backup(path: str, db_path: str = DB_PATH) -> str:
+    """
+    Replace db_path with a verified snapshot. The current file and its
+    -wal/-shm are moved aside as *.pre-restore first; leaving the old WAL
+    next to the restored file would replay foreign pages into it. Nothing
+    else may have the database open: stop the GUI, collector and agents.
+    Returns the path the previous database was moved to ('' if none).
+    """
+    verdict = verify_backup(path)
+    if verdict != "ok":
+        raise RuntimeError(f"{os.path.basename(path)} is not restorable: {verdict}")
+
+    staged = db_path + ".restore.tmp"
+    _gunzip(path, staged)
+
+    # Pooled connections would keep the replaced inode open
+    from app.db import engine
+
+    engine.dispose()
+
+    moved = ""
+    if os.path.exists(db_path):
+        try:
+            con = sqlite3.connect(db_path, timeout=1)
+            try:
+                con.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            finally:
+                con.close()
+        except sqlite3.Error:
+            pass  # the WAL moves along with the file below, so nothing is lost either way
+        moved = db_path + ".pre-restore"
+        # <db>-wal becomes <moved>-wal, the name SQLite looks for when opening the moved file
+        for suffix in ("-wal", ""):
+            if os.path.exists(db_path + suffix):
+                os.replace(db_path + suffix, moved + suffix)
+        if os.path.exists(db_path + "-shm"):
+            os.remove(db_path + "-shm")
+    os.replace(staged, db_path)
+
+    con = sqlite3.connect(db_path)
+    try:
+        con.execute("PRAGMA journal_mode=WAL")
+    finally:
+        con.close()
+    return moved
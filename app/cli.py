@@ -0,0 +1,316 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+import logging
+import os
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+from typing import List, Optional
+
+from app import models  # noqa: F401  (registers tables before init_db)
+from app.backup import KEEP
+from app.db import init_db
+from app.ratelimit import GLOBAL_RATE, SUBNET_RATE, TARGET_RATE, ProbeLimiter
+
+
+def _utc_ms(text: str) -> int:
+    """ISO date or datetime (UTC) -> epoch ms."""
+    try:
+        dt = datetime.fromisoformat(text)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"not an ISO date/time: {text!r}")
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return int(dt.timestamp() * 1000)
+
+
+def _cmd_export(args: argparse.Namespace) -> int:
+    from app.export import ExportFilter, export
+
+    flt = ExportFilter(
+        hosts=args.host or (),
+        tag=args.tag or "",
+        check_type=args.type or "",
+        since_ms=args.since,
+        until_ms=args.until,
+    )
+
+    def progress(n: int) -> None:
+        if args.out != "-":
+            print(f"\r{n} rows...", end="", file=sys.stderr, flush=True)
+
+    n = export(args.what, args.format, args.out, flt, on_progress=progress)
+    if args.out != "-":
+        print(f"\rExported {n} rows to {args.out}", file=sys.stderr)
+    return 0
+
+
+def _serve_metrics(port: Optional[int]) -> None:
+    if port:
+        from app.metrics import MetricsServer
+
+        MetricsServer(port=port).start()
+
+
+def _cmd_collector(args: argparse.Namespace) -> int:
+    from app.collector import Collector
+    from app.wire import parse_endpoint
+
+    host, port = parse_endpoint(args.listen)
+    collector = Collector(
+        host=host,
+        port=port,
+        token=args.token or "",
+        interval_s=args.interval,
+        timeout_ms=args.timeout_ms,
+        reload_s=args.reload,
+    )
+    _serve_metrics(args.metrics_port)
+    try:
+        asyncio.run(collector.serve())
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+def _cmd_agent(args: argparse.Namespace) -> int:
+    from app.agent import Agent
+    from app.wire import parse_endpoint
+
+    host, port = parse_endpoint(args.collector)
+    _serve_metrics(args.metrics_port)
+    agent = Agent(
+        name=args.name,
+        host=host,
+        port=port,
+        token=args.token or "",
+        concurrency=args.concurrency,
+        batch_max=args.batch,
+        flush_s=args.flush,
+        limiter=ProbeLimiter(args.rate, args.subnet_rate, args.target_rate),
+        spread_fraction=args.spread,
+    )
+    try:
+        asyncio.run(agent.run())
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+def _cmd_heartbeat(args: argparse.Namespace) -> int:
+    from app.heartbeat import HEARTBEAT_PORT, HeartbeatListener
+    from app.wire import parse_endpoint
+
+    host, port = parse_endpoint(args.listen, default_port=HEARTBEAT_PORT)
+    listener = HeartbeatListener(host=host, port=port, token=args.token or "", grace=args.grace, reload_s=args.reload)
+    _serve_metrics(args.metrics_port)
+    try:
+        asyncio.run(listener.serve())
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+def _cmd_api(args: argparse.Namespace) -> int:
+    from app.api import ApiServer
+    from app.wire import parse_endpoint
+
+    host, port = parse_endpoint(args.listen, default_port=9465)
+    server = ApiServer(host=host, port=port)
+    server.start()
+    print(f"API on http://{host}:{server.address[1]}/api/v1/status", file=sys.stderr)
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        server.stop()
+    return 0
+
+
+def _cmd_maintenance(args: argparse.Namespace) -> int:
+    from app.maintenance import run_all
+
+    t0 = time.monotonic()
+    rep = run_all(migrate=args.migrate)
+    print(f"{rep.summary()} ({time.monotonic() - t0:.1f} s)", file=sys.stderr)
+    return 0
+
+
+def _cmd_backup(args: argparse.Namespace) -> int:
+    from app import backup
+
+    if args.action == "create":
+        t0 = time.monotonic()
+        info = backup.create_backup(backup_dir=args.dir, keep=args.keep, compact=args.compact)
+        print(f"{info.path} ({info.bytes / 1048576:.1f} MB, {time.monotonic() - t0:.1f} s)", file=sys.stderr)
+        return 0
+    if args.action == "list":
+        for b in backup.list_backups(args.dir):
+            taken = datetime.fromtimestamp(b.taken_ms / 1000, tz=timezone.utc).isoformat()
+            print(f"{taken}  {b.bytes / 1048576:8.1f} MB  {b.path}")
+        return 0
+    if not args.file:
+        raise ValueError(f"backup {args.action} needs a backup file")
+    if args.action == "verify":
+        verdict = backup.verify_backup(args.file)
+        print(f"{args.file}: {verdict}", file=sys.stderr)
+        return 0 if verdict == "ok" else 1
+    moved = backup.restore_backup(args.file)
+    print(f"Restored {args.file}" + (f"; previous database kept as {moved}" if moved else ""), file=sys.stderr)
+    return 0
+
+
+def _record_live(args: argparse.Namespace) -> int:
+    """Run the monitor headless and capture every result it publishes until Ctrl+C or --duration."""
+    from app.monitor import MonitorThread
+    from app.simulator import Recorder
+
+    rec = Recorder(args.file)
+    mon = MonitorThread(interval_s=args.interval, timeout_ms=args.timeout_ms)
+    mon.result.connect(rec.on_result)
+    mon.status.connect(lambda msg: print(msg, file=sys.stderr))
+    timer = threading.Timer(args.duration, mon.stop) if args.duration else None
+    if timer is not None:
+        timer.daemon = True
+        timer.start()
+    try:
+        mon.run()
+    except KeyboardInterrupt:
+        mon.stop()
+    finally:
+        if timer is not None:
+            timer.cancel()
+        rec.close()
+    print(f"Recorded {rec.rows} live results to {args.file}", file=sys.stderr)
+    return 0
+
+
+def _cmd_simulate(args: argparse.Namespace) -> int:
+    from app import simulator
+
+    if args.action == "populate":
+        fleet = simulator.VirtualFleet(seed=args.seed)
+        t0 = time.monotonic()
+        n = simulator.populate(fleet, args.hosts)
+        print(f"Added {n} virtual hosts in {time.monotonic() - t0:.1f} s", file=sys.stderr)
+        return 0
+    if not args.file:
+        raise ValueError(f"simulate {args.action} needs a capture file")
+    if args.action == "record" and args.live:
+        return _record_live(args)
+    if args.action == "record":
+        now_ms = int(time.time() * 1000)
+        since = args.since if args.since is not None else now_ms - 3600 * 1000
+        n = simulator.record_history(args.file, since, args.until if args.until is not None else now_ms)
+        print(f"Recorded {n} results to {args.file}", file=sys.stderr)
+        return 0
+
+    # Headless replay: the monitor's publish path without the UI
+    mon = simulator.ReplayMonitor(args.file, speed=args.speed)
+    mon.status.connect(lambda msg: print(msg, file=sys.stderr))
+    try:
+        mon.run()
+    except KeyboardInterrupt:
+        mon.stop()
+    return 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    p = argparse.ArgumentParser(prog="sentineldesk-cli", description="SentinelDesk command line tools")
+    sub = p.add_subparsers(dest="command", required=True)
+
+    ex = sub.add_parser("export", help="stream results or alerts to CSV, JSON Lines or Parquet")
+    ex.add_argument("what", choices=("results", "alerts"))
+    ex.add_argument("--format", "-f", choices=("csv", "jsonl", "parquet"), default="csv")
+    ex.add_argument("--out", "-o", default="-", help="output file, '-' for stdout (csv/jsonl)")
+    ex.add_argument("--host", action="append", help="host name or address (repeatable)")
+    ex.add_argument("--tag", help="only hosts carrying this tag")
+    ex.add_argument("--type", choices=("ping", "tcp", "dns", "push"), help="check type")
+    ex.add_argument("--since", type=_utc_ms, help="start, ISO date/time in UTC (inclusive)")
+    ex.add_argument("--until", type=_utc_ms, help="end, ISO date/time in UTC (exclusive)")
+    ex.set_defaults(func=_cmd_export)
+
+    co = sub.add_parser("collector", help="accept probe agents and store the results they stream")
+    co.add_argument("--listen", default="127.0.0.1:9470", help="host:port to listen on")
+    co.add_argument("--token", help="shared secret agents must present; required beyond loopback")
+    co.add_argument("--interval", type=int, default=10, help="probe interval handed to agents (s)")
+    co.add_argument("--timeout-ms", type=int, default=1000, help="probe timeout handed to agents")
+    co.add_argument("--reload", type=float, default=10.0, help="host table re-read period (s)")
+    co.add_argument("--metrics-port", type=int, help="serve Prometheus metrics on this port")
+    co.set_defaults(func=_cmd_collector)
+
+    ag = sub.add_parser("agent", help="run the checks of hosts tagged agent:<name> or agent:*")
+    ag.add_argument("--name", required=True, help="agent name, matched against agent:<name> host tags")
+    ag.add_argument("--collector", default="127.0.0.1:9470", help="collector host:port")
+    ag.add_argument("--token", help="shared secret expected by the collector")
+    ag.add_argument("--concurrency", type=int, default=64, help="probes in flight")
+    ag.add_argument("--batch", type=int, default=500, help="max results per batch")
+    ag.add_argument("--flush", type=float, default=1.0, help="max seconds a result waits before sending")
+    ag.add_argument("--rate", type=float, default=GLOBAL_RATE, help="max probes/s overall (0 = unlimited)")
+    ag.add_argument("--subnet-rate", type=float, default=SUBNET_RATE, help="max probes/s per /24 (0 = unlimited)")
+    ag.add_argument("--target-rate", type=float, default=TARGET_RATE, help="max probes/s per address (0 = unlimited)")
+    ag.add_argument("--spread", type=float, default=0.5, help="fraction of the interval to spread each cycle's sends over")
+    ag.add_argument("--metrics-port", type=int, help="serve Prometheus metrics on this port")
+    ag.set_defaults(func=_cmd_agent, needs_db=False)  # runs on remote boxes without a database
+
+    hb = sub.add_parser("heartbeat", help="accept UDP/TCP heartbeats from hosts tagged push or push:<seconds>")
+    hb.add_argument("--listen", default="127.0.0.1:9466", help="host:port to listen on (UDP and TCP)")
+    hb.add_argument("--token", help="shared secret heartbeats must carry as token=; required beyond loopback")
+    hb.add_argument("--grace", type=float, default=2.5, help="missed heartbeat periods before a host is down")
+    hb.add_argument("--reload", type=float, default=10.0, help="host table re-read period (s)")
+    hb.add_argument("--metrics-port", type=int, help="serve Prometheus metrics on this port")
+    hb.set_defaults(func=_cmd_heartbeat)
+
+    api = sub.add_parser("api", help="serve the read-only JSON API without the GUI")
+    api.add_argument("--listen", default="127.0.0.1:9465", help="host:port to listen on")
+    api.set_defaults(func=_cmd_api)
+
+    mt = sub.add_parser("maintenance", help="checkpoint, vacuum and ANALYZE the database in one pass")
+    mt.add_argument("--migrate", action="store_true", help="switch an older file to incremental auto-vacuum (full VACUUM; stop the app first)")
+    mt.set_defaults(func=_cmd_maintenance)
+
+    bk = sub.add_parser("backup", help="take, list, verify or restore compressed database snapshots")
+    bk.add_argument("action", choices=("create", "list", "verify", "restore"))
+    bk.add_argument("file", nargs="?", help="backup file (verify/restore)")
+    bk.add_argument("--dir", default=None, help="backup directory (default: backups/ next to the database)")
+    bk.add_argument("--keep", type=int, default=KEEP, help="snapshots to keep after create (0 = all)")
+    bk.add_argument("--compact", action="store_true", help="VACUUM INTO instead of the stepped page copy")
+    bk.set_defaults(func=_cmd_backup, needs_db=False)  # works on files; must not create one
+
+    sm = sub.add_parser("simulate", help="virtual fleet and record/replay of result streams for load testing")
+    sm.add_argument("action", choices=("populate", "record", "replay"))
+    sm.add_argument("file", nargs="?", help="capture file (.jsonl.gz) to write (record) or read (replay)")
+    sm.add_argument("--hosts", type=int, default=1000, help="virtual hosts to add (populate)")
+    sm.add_argument("--seed", type=int, default=1, help="fleet seed (populate)")
+    sm.add_argument("--since", type=_utc_ms, help="record from, ISO date/time in UTC (default: an hour ago)")
+    sm.add_argument("--until", type=_utc_ms, help="record until, ISO date/time in UTC (default: now)")
+    sm.add_argument("--speed", type=float, default=1.0, help="replay speed multiple (0 = as fast as possible)")
+    sm.add_argument("--live", action="store_true", help="record: probe the hosts now and capture the live results instead of stored history")
+    sm.add_argument("--duration", type=float, default=0, help="record --live: stop after this many seconds (default: until Ctrl+C)")
+    sm.add_argument("--interval", type=int, default=10, help="record --live: probe cycle in seconds")
+    sm.add_argument("--timeout-ms", type=int, default=1000, help="record --live: probe timeout")
+    sm.set_defaults(func=_cmd_simulate)
+    return p
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = build_parser().parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s", stream=sys.stderr)
+    if getattr(args, "needs_db", True):
+        init_db()
+    try:
+        return args.func(args)
+    except BrokenPipeError:
+        # Output piped into `head` & co.; keep the interpreter from complaining at exit
+        sys.stdout = open(os.devnull, "w")
+        return 0
+    except (RuntimeError, ValueError) as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 2
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,297 @@
+from __future__ import annotations
+
+import asyncio
+import hmac
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from sqlmodel import select
+
+from app import metrics
+from app.alerting import AlertPolicy, alert_message, store_alert
+from app.db import get_session
+from app.models import Host, Outcome, classify_outcome
+from app.plan import ANY_AGENT, agent_of
+from app.store import write_results
+from app.wire import PROTOCOL_VERSION, is_loopback, read_msg, send_msg
+
+log = logging.getLogger(__name__)
+
+HostRow = Tuple[int, str, str, str, str, Optional[int]]  # id, name, address, tags, tcp_ports, parent_id
+
+
+def shard_hosts(hosts: Sequence[HostRow], agents: Sequence[str]) -> Dict[str, List[HostRow]]:
+    """
+    Split agent-tagged hosts across connected agents. "agent:<name>" pins a
+    host to that agent (it waits, unprobed, while the agent is offline);
+    "agent:*" spreads hosts over all connected agents by host id.
+    """
+    names = sorted(agents)
+    out: Dict[str, List[HostRow]] = {a: [] for a in names}
+    for h in hosts:
+        a = agent_of(h[3])
+        if a is None:
+            continue
+        if a == ANY_AGENT:
+            if names:
+                out[names[h[0] % len(names)]].append(h)
+        elif a in out:
+            out[a].append(h)
+    return out
+
+
+def _row_tuple(row: List[Any]) -> Tuple[Any, ...]:
+    """Wire row -> store.ResultTuple plus (samples, flags)."""
+    host_id, check_type, target, ok, rtt_ms, ts_ms, message, samples = row
+    return (
+        int(host_id),
+        str(check_type),
+        str(target or ""),
+        bool(ok),
+        None if rtt_ms is None else float(rtt_ms),
+        datetime.utcfromtimestamp(int(ts_ms) / 1000),
+        str(message or ""),
+        max(1, int(samples or 1)),
+        0,
+    )
+
+
+@dataclass
+class _AgentConn:
+    name: str
+    boot: str
+    writer: asyncio.StreamWriter
+    shard: Optional[List[HostRow]] = None
+    rows: int = 0
+    batches: int = 0
+    connected_at: datetime = field(default_factory=datetime.utcnow)
+
+
+class Collector:
+    """
+    Accepts probe agents over persistent TCP connections, hands each one its
+    shard of the agent-tagged hosts, and bulk-writes the result batches they
+    stream into CheckResult.
+
+    Each batch is committed in one transaction on a single writer thread and
+    only then acknowledged, so an agent resends anything in flight when a
+    connection drops. The highest committed sequence number per agent boot is
+    remembered, which makes those resends idempotent. The host table is
+    re-read every `reload_s`; agents are re-sharded when it or the set of
+    connected agents changes.
+
+    Committed rows go through the local monitor's alert policy (streak
+    threshold per check type, cooldown), so agent-probed hosts alert like
+    any other; agents confirm failures by re-probing before reporting them.
+    """
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 9470,
+        token: str = "",
+        interval_s: int = 10,
+        timeout_ms: int = 1000,
+        reload_s: float = 10.0,
+    ):
+        if not token and not is_loopback(host):
+            raise ValueError(f"refusing to accept agents on {host or 'all interfaces'} without a token")
+        self.host = host
+        self.port = int(port)
+        self.token = token
+        self.interval_s = max(1, int(interval_s))
+        self.timeout_ms = max(100, int(timeout_ms))
+        self.reload_s = max(1.0, float(reload_s))
+
+        self.agents: Dict[str, _AgentConn] = {}
+        self.alerting = AlertPolicy()
+        self._hosts: List[HostRow] = []
+        self._labels: Dict[int, Tuple[str, str]] = {}  # host id -> (name, address), for alert messages
+        self._plan_version = 0
+        self._committed: Dict[Tuple[str, str], int] = {}  # (agent, boot) -> last committed seq
+        self._db = ThreadPoolExecutor(max_workers=1, thread_name_prefix="collector-db")
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._stop: Optional[asyncio.Event] = None
+        self._reshard: Optional[asyncio.Lock] = None
+
+    @property
+    def address(self) -> Tuple[str, int]:
+        if self._server is not None and self._server.sockets:
+            return self._server.sockets[0].getsockname()[:2]
+        return (self.host, self.port)
+
+    # ---- hosts / sharding ----
+
+    @staticmethod
+    def _load_hosts() -> List[HostRow]:
+        with get_session() as session:
+            hosts = list(session.exec(select(Host).where(Host.enabled == True)))  # noqa: E712
+        return sorted(
+            (int(h.id), h.name, (h.address or "").strip(), h.tags or "", h.tcp_ports or "", h.parent_id)
+            for h in hosts
+            if h.id is not None and agent_of(h.tags) is not None
+        )
+
+    async def _push_plans(self) -> None:
+        assert self._reshard is not None
+        async with self._reshard:
+            shards = shard_hosts(self._hosts, list(self.agents))
+            changed = [c for c in self.agents.values() if c.shard != shards[c.name]]
+            if not changed:
+                return
+            self._plan_version += 1
+            for conn in changed:
+                conn.shard = shards[conn.name]
+                msg = {
+                    "type": "plan",
+                    "version": self._plan_version,
+                    "interval_s": self.interval_s,
+                    "timeout_ms": self.timeout_ms,
+                    "hosts": [
+                        {"id": h[0], "name": h[1], "address": h[2], "tags": h[3], "tcp_ports": h[4], "parent_id": h[5]}
+                        for h in conn.shard
+                    ],
+                }
+                try:
+                    await send_msg(conn.writer, msg)
+                except (OSError, ConnectionError):
+                    conn.writer.close()
+
+    async def _reload_loop(self) -> None:
+        assert self._stop is not None and self._loop is not None
+        while not self._stop.is_set():
+            try:
+                hosts = await self._loop.run_in_executor(self._db, self._load_hosts)
+            except Exception as e:
+                metrics.DB_ERRORS.inc(op="hosts")
+                log.error("collector: host reload failed: %s", e)
+            else:
+                if hosts != self._hosts:
+                    self._hosts = hosts
+                    self._labels = {h[0]: (h[1], h[2]) for h in hosts}
+                    await self._push_plans()
+            try:
+                await asyncio.wait_for(self._stop.wait(), timeout=self.reload_s)
+            except asyncio.TimeoutError:
+                pass
+
+    # ---- agent connections ----
+
+    def _write_batch(self, rows: List[Tuple[Any, ...]]) -> int:
+        """Commit a batch, then run it through the alert policy (DB writer thread only)."""
+        keys = {(r[0], r[1], r[2]) for r in rows}
+        for key in keys:
+            self.alerting.streak(key)  # seeded from the rows before this batch
+        with metrics.DB_COMMIT_SECONDS.time(op="collector"):
+            n = write_results(rows)
+        for host_id, check_type, target, ok, _, _, message, samples, _ in rows:
+            key = (host_id, check_type, target)
+            # Like the monitor: children of a down parent neither count nor alert
+            if ok or classify_outcome(ok, message) != Outcome.UNREACHABLE:
+                self.alerting.record(key, ok, samples)
+                if not ok:
+                    self._maybe_alert(key)
+        return n
+
+    def _maybe_alert(self, key: Tuple[int, str, str]) -> None:
+        host_id, check_type, target = key
+        with metrics.ALERT_EVAL_SECONDS.time(check_type=check_type):
+            now = datetime.utcnow()
+            streak = self.alerting.due(key, now)
+            if streak is None:
+                return
+            name, address = self._labels.get(host_id, (f"#{host_id}", "?"))
+            msg = alert_message(name, address, check_type, target, streak)
+            try:
+                store_alert(now, host_id, check_type, target, msg)
+            except Exception as e:
+                metrics.DB_ERRORS.inc(op="alert")
+                log.error("collector: alert write failed: %s", e)
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        assert self._loop is not None
+        peer = writer.get_extra_info("peername")
+        conn: Optional[_AgentConn] = None
+        try:
+            hello = await asyncio.wait_for(read_msg(reader), timeout=10)
+            name = str(hello.get("agent") or "").strip()
+            if hello["type"] != "hello" or not name:
+                raise ValueError("expected hello")
+            if int(hello.get("protocol") or 0) != PROTOCOL_VERSION:
+                await send_msg(writer, {"type": "error", "message": f"protocol {PROTOCOL_VERSION} required"})
+                return
+            if self.token and not hmac.compare_digest(str(hello.get("token") or ""), self.token):
+                await send_msg(writer, {"type": "error", "message": "bad token"})
+                return
+
+            old = self.agents.get(name)
+            if old is not None:
+                old.writer.close()  # same agent reconnecting; the newest connection wins
+            conn = _AgentConn(name=name, boot=str(hello.get("boot") or ""), writer=writer)
+            self.agents[name] = conn
+            metrics.AGENTS_CONNECTED.set(len(self.agents))
+            log.info("collector: agent %s connected from %s", name, peer)
+            await send_msg(writer, {"type": "welcome"})
+            await self._push_plans()
+
+            while True:
+                msg = await read_msg(reader)
+                if msg["type"] != "results":
+                    continue
+                seq = int(msg["seq"])
+                key = (name, str(msg.get("boot") or conn.boot))
+                if seq > self._committed.get(key, 0):
+                    # Only hosts handed to this agent; anything else is stale or forged
+                    mine = {h[0] for h in conn.shard or ()}
+                    rows = [t for t in map(_row_tuple, msg.get("rows", [])) if t[0] in mine]
+                    if len(rows) < len(msg.get("rows", [])):
+                        log.warning(
+                            "collector: agent %s sent %d rows for hosts outside its shard",
+                            name, len(msg.get("rows", [])) - len(rows),
+                        )
+                    n = await self._loop.run_in_executor(self._db, self._write_batch, rows)
+                    self._committed[key] = seq
+                    conn.rows += n
+                    conn.batches += 1
+                    metrics.COLLECTOR_ROWS.inc(n, agent=name)
+                await send_msg(writer, {"type": "ack", "seq": seq})
+        except (asyncio.IncompleteReadError, ConnectionError, asyncio.TimeoutError):
+            pass
+        except ValueError as e:
+            log.warning("collector: protocol error from %s: %s", peer, e)
+        except Exception as e:
+            # Unacked batches are resent by the agent after it reconnects
+            metrics.DB_ERRORS.inc(op="collector")
+            log.error("collector: dropping %s: %s: %s", peer, type(e).__name__, e)
+        finally:
+            writer.close()
+            if conn is not None and self.agents.get(conn.name) is conn:
+                del self.agents[conn.name]
+                metrics.AGENTS_CONNECTED.set(len(self.agents))
+                log.info("collector: agent %s disconnected (%d rows in %d batches)", conn.name, conn.rows, conn.batches)
+                await self._push_plans()
+
+    async def serve(self) -> None:
+        self._loop = asyncio.get_running_loop()
+        self._stop = asyncio.Event()
+        self._reshard = asyncio.Lock()
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        host, port = self.address
+        log.info("collector: listening on %s:%d", host, port)
+        try:
+            await self._reload_loop()
+        finally:
+            self._server.close()
+            for conn in list(self.agents.values()):
+                conn.writer.close()
+            await self._server.wait_closed()
+            self._db.shutdown(wait=True)
+
+    def stop(self) -> None:
+        """Thread-safe."""
+        if self._loop is not None and self._stop is not None:
+            self._loop.call_soon_threadsafe(self._stop.set)
@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import os
 from contextlib import contextmanager
 from sqlmodel import SQLModel, Session, create_engine
 import sqlite3
@@ -8,6 +9,26 @@ DB_PATH = "sentineldesk.db"
 engine = create_engine(f"sqlite:///{DB_PATH}", echo=False)
 
 
+def data_dir(name: str) -> str:
+    """A directory kept next to the database file, resolved at call time."""
+    return os.path.join(os.path.dirname(os.path.abspath(DB_PATH)), name)
+
+
+def _configure_file() -> None:
+    """
+    WAL lets the UI read while the monitor writes; both settings persist in
+    the file. auto_vacuum can only be set before the first table exists, so
+    older files keep theirs until app.maintenance migrates them.
+    """
+    con = sqlite3.connect(DB_PATH)
+    try:
+        if con.execute("SELECT count(*) FROM sqlite_master").fetchone()[0] == 0:
+            con.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        con.execute("PRAGMA journal_mode=WAL")
+    finally:
+        con.close()
+
+
 def _col_exists(cur: sqlite3.Cursor, table: str, col: str) -> bool:
     cur.execute(f"PRAGMA table_info({table})")
     cols = [row[1] for row in cur.fetchall()]
@@ -24,23 +45,140 @@ def _ensure_columns() -> None:
         if cur.fetchone():
             if not _col_exists(cur, "host", "tcp_ports"):
                 cur.execute("ALTER TABLE host ADD COLUMN tcp_ports TEXT DEFAULT ''")
+            if not _col_exists(cur, "host", "parent_id"):
+                cur.execute("ALTER TABLE host ADD COLUMN parent_id INTEGER")
+                cur.execute("CREATE INDEX IF NOT EXISTS ix_host_parent_id ON host (parent_id)")
 
-        # CheckResult
+        # CheckResult (legacy text-ts schema only; the compact schema is migrated below)
         cur.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='checkresult'")
-        if cur.fetchone():
+        if cur.fetchone() and _col_exists(cur, "checkresult", "ts"):
             if not _col_exists(cur, "checkresult", "check_type"):
                 cur.execute("ALTER TABLE checkresult ADD COLUMN check_type TEXT DEFAULT 'ping'")
             if not _col_exists(cur, "checkresult", "target"):
                 cur.execute("ALTER TABLE checkresult ADD COLUMN target TEXT DEFAULT ''")
+        elif _col_exists(cur, "checkresult", "ts_ms"):
+            if not _col_exists(cur, "checkresult", "samples"):
+                cur.execute("ALTER TABLE checkresult ADD COLUMN samples INTEGER NOT NULL DEFAULT 1")
+            if not _col_exists(cur, "checkresult", "flags"):
+                cur.execute("ALTER TABLE checkresult ADD COLUMN flags INTEGER NOT NULL DEFAULT 0")
+
+        con.commit()
+    finally:
+        con.close()
+
 
+# One-row table bumped by triggers on every host insert, update and delete.
+# Writers in other processes (a headless API, the collector, "cli simulate
+# populate", a plain sqlite3 shell) move it too; readers compare it against
+# what they last loaded instead of re-reading the host table every cycle.
+_HOSTS_VERSION_DDL = (
+    "CREATE TABLE IF NOT EXISTS hostsversion (id INTEGER PRIMARY KEY CHECK (id = 1), version INTEGER NOT NULL)",
+    "INSERT OR IGNORE INTO hostsversion (id, version) VALUES (1, 0)",
+) + tuple(
+    f"CREATE TRIGGER IF NOT EXISTS host_version_{op.lower()} AFTER {op} ON host "
+    "BEGIN UPDATE hostsversion SET version = version + 1 WHERE id = 1; END"
+    for op in ("INSERT", "UPDATE", "DELETE")
+)
+
+
+def _ensure_hosts_version() -> None:
+    con = sqlite3.connect(DB_PATH)
+    try:
+        for ddl in _HOSTS_VERSION_DDL:
+            con.execute(ddl)
+        con.commit()
+    finally:
+        con.close()
+
+
+def hosts_version() -> int:
+    """Changes whenever any process writes the host table."""
+    with engine.connect() as con:
+        return int(con.exec_driver_sql("SELECT version FROM hostsversion WHERE id = 1").scalar() or 0)
+
+
+_LEGACY_RESULTS = "checkresult_legacy"
+
+
+def _stash_legacy_results() -> bool:
+    """
+    If checkresult still has the text-ts/string schema, rename it out of the
+    way (dropping its indexes, whose names the new table reuses) so
+    create_all can build the compact table. Returns True if rows need copying.
+    """
+    con = sqlite3.connect(DB_PATH)
+    try:
+        cur = con.cursor()
+        cur.execute("SELECT name FROM sqlite_master WHERE type='table' AND name=?", (_LEGACY_RESULTS,))
+        if cur.fetchone():
+            return True  # interrupted earlier migration: resume the copy
+        cur.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='checkresult'")
+        if not cur.fetchone() or _col_exists(cur, "checkresult", "ts_ms"):
+            return False
+
+        cur.execute("SELECT name FROM sqlite_master WHERE type='index' AND tbl_name='checkresult' AND sql IS NOT NULL")
+        for (name,) in cur.fetchall():
+            cur.execute(f'DROP INDEX IF EXISTS "{name}"')
+        cur.execute(f"ALTER TABLE checkresult RENAME TO {_LEGACY_RESULTS}")
+        con.commit()
+        return True
+    finally:
+        con.close()
+
+
+def _copy_legacy_results() -> None:
+    """
+    Convert legacy rows into the compact schema in one transaction:
+    datetime text -> epoch ms, check_type/target strings -> kind/port ints,
+    ok + message -> outcome enum, message text -> messagecode dictionary.
+    The CASE expressions mirror CheckKind and models.classify_outcome.
+    """
+    con = sqlite3.connect(DB_PATH)
+    try:
+        cur = con.cursor()
+        cur.execute(
+            f"""
+            INSERT OR IGNORE INTO messagecode (text)
+            SELECT DISTINCT message FROM {_LEGACY_RESULTS} WHERE message IS NOT NULL AND message != ''
+            """
+        )
+        cur.execute(
+            f"""
+            INSERT INTO checkresult (id, host_id, ts_ms, kind, port, outcome, rtt_ms, msg_id)
+            SELECT
+                r.id,
+                r.host_id,
+                CAST(ROUND((julianday(r.ts) - 2440587.5) * 86400000.0) AS INTEGER),
+                CASE r.check_type WHEN 'tcp' THEN 1 WHEN 'dns' THEN 2 ELSE 0 END,
+                CAST(COALESCE(NULLIF(r.target, ''), '0') AS INTEGER),
+                CASE
+                    WHEN r.ok THEN 0
+                    WHEN lower(r.message) LIKE 'unreachable%' THEN 3
+                    WHEN lower(r.message) LIKE 'dns fail%' THEN 4
+                    WHEN lower(r.message) LIKE '%timeout%' THEN 2
+                    WHEN lower(r.message) LIKE '%error:%' THEN 5
+                    ELSE 1
+                END,
+                r.rtt_ms,
+                COALESCE(m.id, 0)
+            FROM {_LEGACY_RESULTS} r
+            LEFT JOIN messagecode m ON m.text = r.message
+            """
+        )
+        cur.execute(f"DROP TABLE {_LEGACY_RESULTS}")
         con.commit()
     finally:
         con.close()
 
 
 def init_db() -> None:
-    SQLModel.metadata.create_all(engine)
+    _configure_file()
     _ensure_columns()
+    legacy = _stash_legacy_results()
+    SQLModel.metadata.create_all(engine)
+    _ensure_hosts_version()
+    if legacy:
+        _copy_legacy_results()
 
 
 @contextmanager
@@ -0,0 +1,142 @@
+from __future__ import annotations
+
+import ipaddress
+import threading
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import Callable, Iterable, Iterator, List, Optional, Set
+
+from sqlmodel import select
+
+from app.db import get_session
+from app.models import Host
+from app.ping import ping_once, tcp_check
+from app.ratelimit import LIMITER, ProbeLimiter, spread_order
+
+
+@dataclass
+class DiscoveredHost:
+    address: str
+    ping_ok: bool
+    rtt_ms: Optional[float]
+    open_ports: List[int] = field(default_factory=list)
+
+
+def expand_targets(cidr: str) -> List[str]:
+    net = ipaddress.ip_network(cidr.strip(), strict=False)
+    if net.num_addresses > 65536:
+        raise ValueError(f"{cidr} is larger than a /16; split the sweep")
+    hosts = list(net.hosts()) or [net.network_address]
+    return [str(a) for a in hosts]
+
+
+def _probe_address(
+    address: str,
+    ports: List[int],
+    timeout_ms: int,
+    budget: ProbeLimiter,
+    limiter: ProbeLimiter,
+    stop: threading.Event,
+) -> Optional[DiscoveredHost]:
+    def slot() -> bool:
+        return budget.acquire(address, stop=stop) and limiter.acquire(address, stop=stop)
+
+    if not slot() or stop.is_set():
+        return None
+    pr = ping_once(address, timeout_ms=timeout_ms)
+
+    open_ports: List[int] = []
+    for p in ports:
+        if stop.is_set():
+            break
+        if not slot():
+            break
+        if tcp_check(address, p, timeout_ms=timeout_ms).ok:
+            open_ports.append(p)
+
+    if not pr.ok and not open_ports:
+        return None
+    return DiscoveredHost(address=address, ping_ok=pr.ok, rtt_ms=pr.rtt_ms, open_ports=open_ports)
+
+
+def sweep(
+    cidr: str,
+    ports: Iterable[int] = (),
+    concurrency: int = 256,
+    rate_per_s: float = 500.0,
+    limiter: Optional[ProbeLimiter] = None,
+    timeout_ms: int = 500,
+    stop: Optional[threading.Event] = None,
+    on_progress: Optional[Callable[[int, int], None]] = None,
+) -> Iterator[DiscoveredHost]:
+    """
+    Sweep a CIDR range with ICMP plus a TCP port list and yield live hosts as
+    soon as they answer. At most `concurrency` addresses are in flight and the
+    sweep's probe rate (ping + each port) is capped at `rate_per_s`. Every
+    probe also takes a slot from `limiter` (default: the LIMITER the monitor
+    uses), so a sweep and the monitor together stay within the per-/24 and
+    per-address caps. Addresses are swept round-robin across /24s so no
+    single subnet takes the full rate.
+    """
+    targets = spread_order(expand_targets(cidr))
+    port_list = [int(p) for p in ports]
+    stop = stop or threading.Event()
+    limiter = limiter or LIMITER
+    budget = ProbeLimiter(rate_per_s, None, None, global_burst=rate_per_s)
+    total = len(targets)
+    done = 0
+
+    with ThreadPoolExecutor(max_workers=max(1, int(concurrency)), thread_name_prefix="discovery") as pool:
+        it = iter(targets)
+        inflight: Set[Future] = set()
+
+        def _fill() -> None:
+            # Bounded window: never materialize 65k futures at once
+            while len(inflight) < concurrency * 2 and not stop.is_set():
+                addr = next(it, None)
+                if addr is None:
+                    return
+                inflight.add(pool.submit(_probe_address, addr, port_list, timeout_ms, budget, limiter, stop))
+
+        _fill()
+        while inflight:
+            finished, _ = wait(inflight, return_when=FIRST_COMPLETED)
+            for fut in finished:
+                inflight.discard(fut)
+                done += 1
+                found = fut.result()
+                if found is not None:
+                    yield found
+            if on_progress:
+                on_progress(done, total)
+            if stop.is_set():
+                for fut in inflight:
+                    fut.cancel()
+                break
+            _fill()
+
+
+def bulk_insert_hosts(found: Iterable[DiscoveredHost], tags: str = "discovered") -> int:
+    """
+    Insert discovered hosts in one transaction, skipping addresses already known.
+    Returns the number of hosts added.
+    """
+    with get_session() as session:
+        known = {a for a in session.exec(select(Host.address))}
+        added = 0
+        for d in found:
+            if d.address in known:
+                continue
+            known.add(d.address)
+            session.add(
+                Host(
+                    name=d.address,
+                    address=d.address,
+                    tags=tags,
+                    tcp_ports=",".join(str(p) for p in d.open_ports),
+                    enabled=True,
+                )
+            )
+            added += 1
+        session.commit()
+    return added
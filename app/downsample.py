@@ -0,0 +1,49 @@
+from __future__ import annotations
+
+from typing import List, Sequence, Tuple
+
+Point = Tuple[float, float]  # (x, y), x ascending
+
+
+def lttb(points: Sequence[Point], threshold: int) -> List[Point]:
+    """
+    Largest-Triangle-Three-Buckets: keep `threshold` points that preserve the
+    visual shape of the line. The first and last points are always kept;
+    each bucket in between contributes the point forming the largest
+    triangle with the previous pick and the next bucket's average, so
+    spikes survive where plain decimation would drop them.
+    """
+    n = len(points)
+    if threshold >= n or threshold < 3:
+        return list(points)
+
+    out: List[Point] = [points[0]]
+    every = (n - 2) / (threshold - 2)
+    a = 0
+    for i in range(threshold - 2):
+        # Average of the next bucket is the third vertex
+        nxt_lo = int((i + 1) * every) + 1
+        nxt_hi = min(int((i + 2) * every) + 1, n)
+        span = nxt_hi - nxt_lo
+        if span > 0:
+            avg_x = sum(p[0] for p in points[nxt_lo:nxt_hi]) / span
+            avg_y = sum(p[1] for p in points[nxt_lo:nxt_hi]) / span
+        else:
+            avg_x, avg_y = points[-1]
+
+        lo = int(i * every) + 1
+        hi = int((i + 1) * every) + 1
+        ax, ay = points[a]
+        best = lo
+        best_area = -1.0
+        for j in range(lo, hi):
+            x, y = points[j]
+            area = abs((ax - avg_x) * (y - ay) - (ax - x) * (avg_y - ay))
+            if area > best_area:
+                best_area = area
+                best = j
+        out.append(points[best])
+        a = best
+    out.append(points[-1])
+    return out
+
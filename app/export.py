@@ -0,0 +1,263 @@
+from __future__ import annotations
+
+import csv
+import json
+import os
+import sys
+from datetime import datetime
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, TextIO, Tuple
+
+from sqlmodel import select
+
+from app.archive import ArchiveDay, ArchiveReader
+from app.db import engine, get_session
+from app.models import AlertEvent, CheckResult, Host, KIND_BY_NAME, Outcome, fmt_ts_ms, kind_name, ts_to_ms
+from app.store import CATALOG
+
+FORMATS = ("csv", "jsonl", "parquet")
+CHUNK_ROWS = 5000
+
+RESULT_COLUMNS = (
+    "ts", "ts_ms", "host_id", "host", "address", "check_type", "target",
+    "ok", "outcome", "rtt_ms", "message", "samples",
+)
+ALERT_COLUMNS = ("ts", "host_id", "host", "check_type", "target", "severity", "message")
+
+
+@dataclass
+class ExportFilter:
+    hosts: Sequence[str] = ()  # host names or addresses
+    tag: str = ""
+    check_type: str = ""  # "", "ping", "tcp", "dns", "push"
+    since_ms: Optional[int] = None
+    until_ms: Optional[int] = None
+
+
+def _host_map(flt: ExportFilter) -> Tuple[Dict[int, Host], Optional[set]]:
+    """All hosts by id, plus the id set the filter selects (None = no host filter)."""
+    with get_session() as session:
+        hosts = {int(h.id): h for h in session.exec(select(Host))}
+    if not flt.hosts and not flt.tag:
+        return hosts, None
+
+    wanted = {h.strip() for h in flt.hosts if h.strip()}
+    tag = flt.tag.strip().lower()
+    ids = set()
+    for hid, h in hosts.items():
+        if wanted and h.name not in wanted and h.address not in wanted:
+            continue
+        if tag and tag not in [t.strip().lower() for t in (h.tags or "").split(",")]:
+            continue
+        ids.add(hid)
+    return hosts, ids
+
+
+def _outcome_name(v: int) -> str:
+    try:
+        return Outcome(v).name.lower()
+    except ValueError:
+        return str(v)
+
+
+def _archived_rows(
+    flt: ExportFilter, ids: Optional[set], kind: Optional[int], archive_dir: Optional[str] = None
+) -> Iterator[Any]:
+    reader = ArchiveReader(archive_dir)
+    if not os.path.isdir(reader.archive_dir):
+        return
+    since = flt.since_ms if flt.since_ms is not None else 0
+    until = flt.until_ms if flt.until_ms is not None else ts_to_ms(datetime.utcnow()) + 1
+    if flt.since_ms is not None:
+        paths = reader.day_files(since, until)
+    else:
+        paths = sorted(
+            os.path.join(reader.archive_dir, n)
+            for n in os.listdir(reader.archive_dir)
+            if n.startswith("checkresult-") and n.endswith(".sdc")
+        )
+    for path in paths:
+        with ArchiveDay(path) as day:
+            for i in range(day.rows):
+                r = day.row(i)
+                if ids is not None and r.host_id not in ids:
+                    continue
+                if kind is not None and r.kind != kind:
+                    continue
+                if not (since <= r.ts_ms < until):
+                    continue
+                yield r
+
+
+def _live_rows(flt: ExportFilter, ids: Optional[set], kind: Optional[int]) -> Iterator[Any]:
+    q = select(CheckResult)
+    if ids is not None:
+        q = q.where(CheckResult.host_id.in_(ids))  # type: ignore[attr-defined]
+    if kind is not None:
+        q = q.where(CheckResult.kind == kind)
+    if flt.since_ms is not None:
+        q = q.where(CheckResult.ts_ms >= flt.since_ms)
+    if flt.until_ms is not None:
+        q = q.where(CheckResult.ts_ms < flt.until_ms)
+    q = q.order_by(CheckResult.ts_ms, CheckResult.id)
+
+    # Server-side cursor: rows are pulled CHUNK_ROWS at a time, never materialized
+    with engine.connect() as conn:
+        result = conn.execution_options(stream_results=True, yield_per=CHUNK_ROWS).execute(q)
+        for part in result.partitions():
+            for r in part:
+                yield r
+
+
+def iter_results(flt: ExportFilter, archive_dir: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+    hosts, ids = _host_map(flt)
+    kind = int(KIND_BY_NAME[flt.check_type]) if flt.check_type else None
+    if ids is not None and not ids:
+        return
+
+    for source in (_archived_rows(flt, ids, kind, archive_dir), _live_rows(flt, ids, kind)):
+        for r in source:
+            h = hosts.get(r.host_id)
+            yield {
+                "ts": fmt_ts_ms(r.ts_ms),
+                "ts_ms": r.ts_ms,
+                "host_id": r.host_id,
+                "host": h.name if h else f"#{r.host_id}",
+                "address": h.address if h else "",
+                "check_type": kind_name(r.kind),
+                "target": str(r.port) if r.port else "",
+                "ok": r.outcome == Outcome.OK,
+                "outcome": _outcome_name(r.outcome),
+                "rtt_ms": r.rtt_ms,
+                "message": CATALOG.text(r.msg_id),
+                "samples": r.samples,
+            }
+
+
+def iter_alerts(flt: ExportFilter) -> Iterator[Dict[str, Any]]:
+    hosts, ids = _host_map(flt)
+    if ids is not None and not ids:
+        return
+    q = select(AlertEvent)
+    if ids is not None:
+        q = q.where(AlertEvent.host_id.in_(ids))  # type: ignore[attr-defined]
+    if flt.check_type:
+        q = q.where(AlertEvent.check_type == flt.check_type)
+    if flt.since_ms is not None:
+        q = q.where(AlertEvent.ts >= datetime.utcfromtimestamp(flt.since_ms / 1000))
+    if flt.until_ms is not None:
+        q = q.where(AlertEvent.ts < datetime.utcfromtimestamp(flt.until_ms / 1000))
+    q = q.order_by(AlertEvent.ts, AlertEvent.id)
+
+    with engine.connect() as conn:
+        result = conn.execution_options(stream_results=True, yield_per=CHUNK_ROWS).execute(q)
+        for part in result.partitions():
+            for e in part:
+                h = hosts.get(e.host_id)
+                yield {
+                    "ts": e.ts.strftime("%Y-%m-%d %H:%M:%S"),
+                    "host_id": e.host_id,
+                    "host": h.name if h else f"#{e.host_id}",
+                    "check_type": e.check_type,
+                    "target": e.target or "",
+                    "severity": e.severity,
+                    "message": e.message,
+                }
+
+
+def _write_csv(rows: Iterator[Dict[str, Any]], columns: Sequence[str], out: TextIO) -> int:
+    w = csv.DictWriter(out, fieldnames=list(columns))
+    w.writeheader()
+    n = 0
+    for r in rows:
+        w.writerow(r)
+        n += 1
+    return n
+
+
+def _write_jsonl(rows: Iterator[Dict[str, Any]], out: TextIO) -> int:
+    n = 0
+    for r in rows:
+        out.write(json.dumps(r, separators=(",", ":")))
+        out.write("\n")
+        n += 1
+    return n
+
+
+def _write_parquet(rows: Iterator[Dict[str, Any]], columns: Sequence[str], path: str) -> int:
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError as e:
+        raise RuntimeError("Parquet export needs pyarrow: pip install 'sentineldesk[parquet]'") from e
+
+    # Explicit schema: a first chunk with only NULL RTTs must not pin the column to null
+    types = {"ts_ms": pa.int64(), "host_id": pa.int64(), "samples": pa.int64(), "ok": pa.bool_(), "rtt_ms": pa.float64()}
+    schema = pa.schema([(c, types.get(c, pa.string())) for c in columns])
+    writer = None
+    n = 0
+    batch: List[Dict[str, Any]] = []
+
+    def flush() -> None:
+        nonlocal writer
+        if not batch:
+            return
+        if writer is None:
+            writer = pq.ParquetWriter(path, schema, compression="zstd")
+        writer.write_table(pa.Table.from_pylist(batch, schema=schema))
+        batch.clear()
+
+    try:
+        for r in rows:
+            batch.append({c: r[c] for c in columns})
+            n += 1
+            if len(batch) >= CHUNK_ROWS:
+                flush()  # one row group per chunk keeps memory flat
+        flush()
+    finally:
+        if writer is not None:
+            writer.close()
+    return n
+
+
+def export(
+    what: str,
+    fmt: str,
+    path: str,
+    flt: Optional[ExportFilter] = None,
+    on_progress: Optional[Callable[[int], None]] = None,
+    archive_dir: Optional[str] = None,
+) -> int:
+    """
+    Stream results or alerts matching `flt` to `path` ("-" = stdout for csv/jsonl).
+    Returns the number of rows written.
+    """
+    flt = flt or ExportFilter()
+    if what == "results":
+        rows, columns = iter_results(flt, archive_dir), RESULT_COLUMNS
+    elif what == "alerts":
+        rows, columns = iter_alerts(flt), ALERT_COLUMNS
+    else:
+        raise ValueError(f"unknown export source: {what}")
+    if fmt not in FORMATS:
+        raise ValueError(f"unknown format: {fmt}")
+
+    if on_progress:
+        rows = _counting(rows, on_progress)
+
+    if fmt == "parquet":
+        if path == "-":
+            raise ValueError("parquet export needs a file path")
+        return _write_parquet(rows, columns, path)
+
+    if path == "-":
+        return _write_csv(rows, columns, sys.stdout) if fmt == "csv" else _write_jsonl(rows, sys.stdout)
+    with open(path, "w", newline="", encoding="utf-8") as out:
+        return _write_csv(rows, columns, out) if fmt == "csv" else _write_jsonl(rows, out)
+
+
+def _counting(rows: Iterator[Dict[str, Any]], cb: Callable[[int], None]) -> Iterator[Dict[str, Any]]:
+    for n, r in enumerate(rows, 1):
+        if n % CHUNK_ROWS == 0:
+            cb(n)
+        yield r
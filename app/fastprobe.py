@@ -0,0 +1,403 @@
+from __future__ import annotations
+
+import asyncio
+import math
+import platform
+import re
+import socket
+import threading
+import time
+from collections import deque
+from datetime import datetime, timedelta
+from typing import Deque, Dict, List, NamedTuple, Optional, Tuple
+
+from PySide6.QtCore import QThread, Signal
+from sqlmodel import select
+
+from app import metrics
+from app.db import get_session, hosts_version
+from app.models import AlertEvent, FastWindow, Host, KIND_BY_NAME
+from app.ping import ping_once
+from app.plan import PlanHost, parse_ports
+
+# Hosts carrying this tag are probed by the high-frequency tier, in addition to the monitor
+FAST_TAG = "fast"
+
+SeriesKey = Tuple[int, str, str]  # (host_id, check_type, target)
+
+_TIME_RE = re.compile(r"time[=<]\s*(\d+(?:\.\d+)?)\s*ms", re.IGNORECASE)
+
+
+class Sample(NamedTuple):
+    ts_ms: int
+    ok: bool
+    rtt_ms: Optional[float]
+
+
+class FastSeries:
+    """Ring buffer of recent samples plus the running aggregate of the current flush window."""
+
+    def __init__(self, key: SeriesKey, ring_size: int, down_after: int):
+        self.key = key
+        self.ring: Deque[Sample] = deque(maxlen=ring_size)
+        self.down_after = down_after
+        self.up: Optional[bool] = None
+        self.loss_run = 0
+        self._reset(int(time.time() * 1000))
+
+    def _reset(self, start_ms: int) -> None:
+        self.start_ms = start_ms
+        self.probes = 0
+        self.ok_probes = 0
+        self.max_loss_run = 0
+        self._window_loss_run = 0  # loss_run counted from the window start
+        self.rtts: List[float] = []
+
+    def add(self, s: Sample) -> Optional[bool]:
+        """Record a sample; returns the new state when the series flips up/down."""
+        self.ring.append(s)
+        self.probes += 1
+        if s.ok:
+            self.ok_probes += 1
+            self.loss_run = 0
+            self._window_loss_run = 0
+            if s.rtt_ms is not None:
+                self.rtts.append(s.rtt_ms)
+            if self.up is not True:
+                self.up = True
+                return True
+            return None
+        self.loss_run += 1
+        self._window_loss_run += 1
+        self.max_loss_run = max(self.max_loss_run, self._window_loss_run)
+        if self.loss_run >= self.down_after and self.up is not False:
+            self.up = False
+            return False
+        return None
+
+    def drain(self, now_ms: int) -> Optional[FastWindow]:
+        """Close the current window; None if it saw no probes."""
+        if not self.probes:
+            self._reset(now_ms)
+            return None
+        rtts = sorted(self.rtts)
+        host_id, check_type, target = self.key
+        w = FastWindow(
+            host_id=host_id,
+            kind=int(KIND_BY_NAME[check_type]),
+            port=int(target) if target else 0,
+            start_ms=self.start_ms,
+            end_ms=now_ms,
+            probes=self.probes,
+            ok_probes=self.ok_probes,
+            max_loss_run=self.max_loss_run,
+            rtt_min=rtts[0] if rtts else None,
+            rtt_avg=sum(rtts) / len(rtts) if rtts else None,
+            rtt_p95=rtts[min(len(rtts) - 1, math.ceil(0.95 * len(rtts)) - 1)] if rtts else None,
+            rtt_max=rtts[-1] if rtts else None,
+        )
+        self._reset(now_ms)
+        return w
+
+
+class FastProber(QThread):
+    """
+    High-frequency probing tier for hosts tagged "fast": ICMP and TCP every
+    `period_ms` on a dedicated asyncio loop, independent of the monitor cycle.
+
+    Samples stay in per-series ring buffers (`ring_s` seconds, served live by
+    the API); only one FastWindow aggregate per series is written every
+    `flush_s` (GET /api/v1/fast). A series is declared down after
+    `down_after` consecutive losses, which raises the same alert signal as
+    the monitor and flips the host's state in the hosts view, so failover is
+    seen within about down_after * period_ms.
+
+    ICMP uses one long-running `ping -O -i` per host on Linux (a process per
+    probe cannot sustain sub-second rates); elsewhere it falls back to
+    ping_once per tick. TCP probes are non-blocking connects on the loop.
+    """
+
+    # (ts, severity, host_id, check_type, target, message) — same as MonitorThread.alert
+    alert = Signal(object, str, int, str, str, str)
+
+    # (host_id, check_type, target, up)
+    state_changed = Signal(int, str, str, bool)
+
+    status = Signal(str)
+
+    def __init__(
+        self,
+        period_ms: int = 200,
+        timeout_ms: int = 500,
+        down_after: int = 3,
+        flush_s: float = 10.0,
+        ring_s: int = 300,
+        parent=None,
+    ):
+        super().__init__(parent)
+        self.period_ms = max(50, int(period_ms))
+        self.timeout_ms = max(50, int(timeout_ms))
+        self.down_after = max(1, int(down_after))
+        self.flush_s = max(1.0, float(flush_s))
+        self.ring_size = max(10, int(ring_s * 1000 / self.period_ms))
+        self.cooldown_seconds = 300
+        self.track_backlog = False  # as MonitorThread.track_backlog
+
+        self.series: Dict[SeriesKey, FastSeries] = {}
+        self._lock = threading.Lock()
+        self._tasks: Dict[SeriesKey, Tuple[str, asyncio.Task]] = {}  # key -> (address, task)
+        self._hosts: Dict[int, PlanHost] = {}
+        self._last_alert_at: Dict[SeriesKey, datetime] = {}
+        self._hosts_version = -1
+        self._dirty = True
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._stop: Optional[asyncio.Event] = None
+        self._running = True
+
+    def stop(self) -> None:
+        self._running = False
+        if self._loop is not None and self._stop is not None:
+            self._loop.call_soon_threadsafe(self._stop.set)
+
+    def invalidate(self) -> None:
+        """Slot for HostsWidget.hosts_changed."""
+        self._dirty = True
+
+    def samples(self, host_id: int, check_type: str = "ping", target: str = "") -> List[Sample]:
+        """Copy of a series' ring buffer, oldest first (any thread)."""
+        with self._lock:
+            s = self.series.get((host_id, check_type, target))
+            return list(s.ring) if s else []
+
+    # ---- samples / state ----
+
+    def _record(self, key: SeriesKey, ok: bool, rtt_ms: Optional[float], message: str) -> None:
+        with self._lock:
+            series = self.series.get(key)
+            if series is None:
+                return  # task outlived a reconcile
+            change = series.add(Sample(int(time.time() * 1000), ok, rtt_ms))
+            loss_run = series.loss_run
+        metrics.FAST_PROBES.inc(check_type=key[1], outcome="ok" if ok else "fail")
+        if change is None:
+            return
+        self.state_changed.emit(key[0], key[1], key[2], change)
+        if change is False:
+            self._alert(key, f"{message} ({loss_run} lost in {loss_run * self.period_ms} ms)")
+
+    def _alert(self, key: SeriesKey, detail: str) -> None:
+        now = datetime.utcnow()
+        last = self._last_alert_at.get(key)
+        if last and now - last < timedelta(seconds=self.cooldown_seconds):
+            return
+        self._last_alert_at[key] = now
+
+        host_id, check_type, target = key
+        h = self._hosts.get(host_id)
+        label = f"{h.name} ({h.address})" if h else f"#{host_id}"
+        msg = f"{label} {check_type.upper()} {target} down (fast tier): {detail}".replace("  ", " ")
+
+        def write() -> None:
+            try:
+                with metrics.DB_COMMIT_SECONDS.time(op="alert"), get_session() as session:
+                    session.add(AlertEvent(ts=now, host_id=host_id, check_type=check_type, target=target, severity="CRIT", message=msg))
+                    session.commit()
+            except Exception as e:
+                metrics.DB_ERRORS.inc(op="alert")
+                self.status.emit(f"DB alert write error: {e}")
+
+        assert self._loop is not None
+        self._loop.run_in_executor(None, write)
+        metrics.ALERTS.inc(check_type=check_type)
+        if self.track_backlog:
+            metrics.SIGNAL_BACKLOG.inc()
+        self.alert.emit(now, "CRIT", host_id, check_type, target, msg)
+
+    # ---- probe tasks ----
+
+    async def _resolve(self, key: SeriesKey, address: str) -> str:
+        """IPv4 for address; records a loss and retries until it resolves."""
+        assert self._loop is not None
+        while True:
+            try:
+                infos = await self._loop.getaddrinfo(address, None, family=socket.AF_INET, type=socket.SOCK_STREAM)
+                return infos[0][4][0]
+            except OSError as e:
+                self._record(key, False, None, f"DNS fail: {type(e).__name__}")
+                await asyncio.sleep(5)
+
+    async def _tick(self, next_t: float) -> float:
+        """Sleep until the next slot, skipping missed ones so a stall never causes a burst."""
+        assert self._loop is not None
+        next_t += self.period_ms / 1000
+        now = self._loop.time()
+        if next_t < now:
+            next_t = now
+        await asyncio.sleep(next_t - now)
+        return next_t
+
+    async def _tcp_task(self, key: SeriesKey, address: str) -> None:
+        assert self._loop is not None
+        ip = await self._resolve(key, address)
+        port = int(key[2])
+        next_t = self._loop.time()
+        while True:
+            t0 = time.perf_counter()
+            try:
+                _, writer = await asyncio.wait_for(asyncio.open_connection(ip, port), timeout=self.timeout_ms / 1000)
+                rtt = (time.perf_counter() - t0) * 1000.0
+                writer.close()
+                self._record(key, True, rtt, "TCP open")
+            except asyncio.TimeoutError:
+                self._record(key, False, None, "TCP fail: timeout")
+            except OSError as e:
+                self._record(key, False, None, f"TCP fail: {type(e).__name__}")
+            next_t = await self._tick(next_t)
+
+    async def _icmp_fallback(self, key: SeriesKey, ip: str) -> None:
+        assert self._loop is not None
+        next_t = self._loop.time()
+        while True:
+            r = await self._loop.run_in_executor(None, ping_once, ip, self.timeout_ms)
+            self._record(key, r.ok, r.rtt_ms, r.message)
+            next_t = await self._tick(next_t)
+
+    async def _icmp_task(self, key: SeriesKey, address: str) -> None:
+        ip = await self._resolve(key, address)
+        if platform.system().lower() != "linux":
+            await self._icmp_fallback(key, ip)
+            return
+
+        # -O prints "no answer yet for icmp_seq=N" when the next request goes
+        # out unanswered, so each period yields exactly one reply-or-loss line
+        cmd = [
+            "ping", "-n", "-O",
+            "-i", f"{self.period_ms / 1000:.3f}",
+            "-W", str(max(1, math.ceil(self.timeout_ms / 1000))),
+            ip,
+        ]
+        backoff = 1.0
+        while True:
+            try:
+                proc = await asyncio.create_subprocess_exec(
+                    *cmd, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.DEVNULL
+                )
+            except FileNotFoundError:
+                self.status.emit("Fast tier: 'ping' not found, ICMP disabled")
+                return
+            try:
+                assert proc.stdout is not None
+                async for raw in proc.stdout:
+                    line = raw.decode("utf-8", "replace")
+                    if "icmp_seq" not in line or "DUP!" in line:
+                        continue
+                    if "no answer" in line:
+                        self._record(key, False, None, "No reply")
+                        continue
+                    m = _TIME_RE.search(line)
+                    rtt = float(m.group(1)) if m else None
+                    if rtt is not None and rtt > self.timeout_ms:
+                        self._record(key, False, None, "Timeout")  # answered, but too late to count
+                    else:
+                        self._record(key, True, rtt, "OK")
+                        backoff = 1.0
+            finally:
+                if proc.returncode is None:
+                    proc.kill()
+                await proc.wait()
+            # ping exited (interval refused, interface gone, ...): count a loss and restart
+            self._record(key, False, None, f"Ping error: exited with {proc.returncode}")
+            await asyncio.sleep(backoff)
+            backoff = min(10.0, backoff * 2)
+
+    # ---- host set / persistence ----
+
+    def _load_hosts(self) -> List[Host]:
+        with get_session() as session:
+            hosts = list(session.exec(select(Host).where(Host.enabled == True)))  # noqa: E712
+        return [h for h in hosts if h.id is not None and FAST_TAG in [t.strip().lower() for t in (h.tags or "").split(",")]]
+
+    async def _reconcile(self) -> None:
+        assert self._loop is not None
+        try:
+            version = await self._loop.run_in_executor(None, hosts_version)
+            if not self._dirty and version == self._hosts_version:
+                return
+            self._dirty = False
+            self._hosts_version = version
+            hosts = await self._loop.run_in_executor(None, self._load_hosts)
+        except Exception as e:
+            metrics.DB_ERRORS.inc(op="hosts")
+            self.status.emit(f"Fast tier: DB read error: {e}")
+            self._dirty = True
+            return
+
+        self._hosts = {
+            int(h.id): PlanHost(id=int(h.id), name=h.name, address=(h.address or "").strip(), tags=h.tags or "")
+            for h in hosts
+        }
+        wanted: Dict[SeriesKey, str] = {}
+        for h in hosts:
+            address = (h.address or "").strip()
+            wanted[(int(h.id), "ping", "")] = address
+            for p in parse_ports(h.tcp_ports or ""):
+                wanted[(int(h.id), "tcp", str(p))] = address
+
+        for key, (address, task) in list(self._tasks.items()):
+            if wanted.get(key) != address:
+                task.cancel()
+                del self._tasks[key]
+                with self._lock:
+                    self.series.pop(key, None)
+        for key, address in wanted.items():
+            if key in self._tasks:
+                continue
+            with self._lock:
+                self.series[key] = FastSeries(key, self.ring_size, self.down_after)
+            coro = self._icmp_task(key, address) if key[1] == "ping" else self._tcp_task(key, address)
+            self._tasks[key] = (address, asyncio.ensure_future(coro))
+
+        metrics.FAST_SERIES.set(len(self._tasks))
+        if wanted:
+            self.status.emit(f"Fast tier: {len(self._hosts)} hosts, {len(wanted)} series every {self.period_ms} ms")
+
+    def _write_windows(self, windows: List[FastWindow]) -> None:
+        try:
+            with metrics.DB_COMMIT_SECONDS.time(op="fast"), get_session() as session:
+                session.add_all(windows)
+                session.commit()
+        except Exception as e:
+            metrics.DB_ERRORS.inc(op="fast")
+            self.status.emit(f"Fast tier: DB write error: {e}")
+
+    async def _flush(self) -> None:
+        assert self._loop is not None
+        now_ms = int(time.time() * 1000)
+        with self._lock:
+            windows = [w for w in (s.drain(now_ms) for s in self.series.values()) if w is not None]
+        if windows:
+            await self._loop.run_in_executor(None, self._write_windows, windows)
+
+    async def _main(self) -> None:
+        self._loop = asyncio.get_running_loop()
+        self._stop = asyncio.Event()
+        last_flush = time.monotonic()
+        try:
+            while self._running and not self._stop.is_set():
+                await self._reconcile()
+                if time.monotonic() - last_flush >= self.flush_s:
+                    last_flush = time.monotonic()
+                    await self._flush()
+                try:
+                    await asyncio.wait_for(self._stop.wait(), timeout=1.0)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            for _, task in self._tasks.values():
+                task.cancel()
+            await asyncio.gather(*(t for _, t in self._tasks.values()), return_exceptions=True)
+            self._tasks.clear()
+            await self._flush()
+
+    def run(self) -> None:
+        asyncio.run(self._main())
@@ -0,0 +1,438 @@
+from __future__ import annotations
+
+import asyncio
+import hmac
+import logging
+import math
+import socket
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Callable, Dict, Hashable, List, Optional, Set, Tuple
+
+from PySide6.QtCore import QThread, Signal
+from sqlmodel import select
+
+from app import metrics
+from app.db import get_session
+from app.models import AlertEvent, Host
+from app.plan import push_interval_of
+from app.store import ResultTuple, write_results
+from app.wire import is_loopback
+
+log = logging.getLogger(__name__)
+
+HEARTBEAT_PORT = 9466
+GRACE = 2.5  # heartbeat periods without a beat before a host is declared down
+TICK_S = 1.0  # expiry resolution and DB flush period
+WHEEL_SLOTS = 4096  # one revolution = 68 min at TICK_S; longer deadlines go round again
+MAX_LINE = 512
+TCP_IDLE_S = 900.0
+
+# Heartbeat wire format, UDP datagram or TCP line (several lines per datagram are fine):
+#   host=<name | address | #id> token=<secret>
+# Both fields are optional: without host= the sender's IP is matched against
+# Host.address, and token= is only checked when the listener has one. E.g.
+#   echo "host=web-01" | nc -u -w0 monitor.example 9466
+
+
+class TimerWheel:
+    """
+    Hashed timer wheel: deadlines fall into one of `slots` buckets of
+    `tick_s` each, so scheduling, rescheduling and cancelling are O(1) and
+    advance() only visits the buckets whose ticks have passed. A key whose
+    deadline is more than one revolution out shares a bucket with nearer
+    ones and is skipped until its own round comes up.
+    """
+
+    def __init__(self, tick_s: float = TICK_S, slots: int = WHEEL_SLOTS, now: Optional[float] = None):
+        self.tick_s = float(tick_s)
+        self._slots: List[Set[Hashable]] = [set() for _ in range(int(slots))]
+        self._due: Dict[Hashable, int] = {}  # key -> absolute tick
+        self._tick = self._tick_of(time.monotonic() if now is None else now)
+
+    def _tick_of(self, t: float) -> int:
+        return int(math.floor(t / self.tick_s))
+
+    def __len__(self) -> int:
+        return len(self._due)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._due
+
+    def schedule(self, key: Hashable, deadline: float) -> None:
+        """Expire `key` at `deadline` (monotonic s), replacing any earlier schedule."""
+        tick = max(int(math.ceil(deadline / self.tick_s)), self._tick + 1)
+        old = self._due.get(key)
+        if old == tick:
+            return
+        if old is not None:
+            self._slots[old % len(self._slots)].discard(key)
+        self._due[key] = tick
+        self._slots[tick % len(self._slots)].add(key)
+
+    def cancel(self, key: Hashable) -> None:
+        old = self._due.pop(key, None)
+        if old is not None:
+            self._slots[old % len(self._slots)].discard(key)
+
+    def advance(self, now: float) -> List[Hashable]:
+        """Keys whose deadline is at or before `now`, removed from the wheel."""
+        target = self._tick_of(now)
+        if target <= self._tick:
+            return []
+        n = len(self._slots)
+        expired: List[Hashable] = []
+        if target - self._tick >= n:
+            visit = range(n)  # slept through a whole revolution: every bucket is due
+        else:
+            visit = (t % n for t in range(self._tick + 1, target + 1))
+        for i in visit:
+            slot = self._slots[i]
+            due = [k for k in slot if self._due[k] <= target]
+            for k in due:
+                slot.discard(k)
+                del self._due[k]
+            expired.extend(due)
+        self._tick = target
+        return expired
+
+
+def parse_heartbeat(line: str) -> Dict[str, str]:
+    """'host=web-01 token=s3cret' -> {'host': 'web-01', 'token': 's3cret'}; ValueError if malformed."""
+    out: Dict[str, str] = {}
+    for part in line.split():
+        key, sep, value = part.partition("=")
+        if not sep or not key:
+            raise ValueError(f"expected key=value, got {part!r}")
+        out[key.lower()] = value
+    return out
+
+
+@dataclass
+class _Liveness:
+    host_id: int
+    name: str
+    address: str
+    interval_s: float
+    up: Optional[bool] = None  # None until the first beat or the first expiry
+    last_seen: float = 0.0  # wall clock, 0 = never
+    beats: int = 0
+
+
+HostRow = Tuple[int, str, str, float]  # id, name, address, interval_s
+
+
+class HeartbeatListener:
+    """
+    Accepts push heartbeats over UDP and TCP from hosts tagged "push" or
+    "push:<seconds>" and tracks their liveness without probing them.
+
+    Each beat pushes the host's deadline out to GRACE heartbeat periods on
+    a TimerWheel; a tick every TICK_S expires the overdue hosts. Only
+    transitions are recorded: the first beat or a recovery as an OK "push"
+    result, an expiry as a failed one plus a CRIT alert. They are written
+    in one transaction per tick on a single DB thread, so a steady fleet
+    costs no writes at all and a mass expiry is one batch.
+
+    on_result / on_alert get the same arguments as MonitorThread.result and
+    MonitorThread.alert.
+
+    Anyone who can reach the port can keep a host "up", so listening beyond
+    loopback requires a token (ValueError otherwise).
+    """
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = HEARTBEAT_PORT,
+        token: str = "",
+        grace: float = GRACE,
+        reload_s: float = 10.0,
+        on_result: Optional[Callable[..., None]] = None,
+        on_alert: Optional[Callable[..., None]] = None,
+    ):
+        if not token and not is_loopback(host):
+            raise ValueError(f"refusing to accept heartbeats on {host or 'all interfaces'} without a token")
+        self.host = host
+        self.port = int(port)
+        self.token = token
+        self.grace = max(1.0, float(grace))
+        self.reload_s = max(1.0, float(reload_s))
+        self.on_result = on_result
+        self.on_alert = on_alert
+
+        self.wheel = TimerWheel()
+        self._live: Dict[int, _Liveness] = {}
+        self._by_key: Dict[str, int] = {}  # "#id", lower-cased name, address -> host id
+        self._hosts: List[HostRow] = []
+        self._results: List[ResultTuple] = []
+        self._alerts: List[AlertEvent] = []
+        self._db = ThreadPoolExecutor(max_workers=1, thread_name_prefix="heartbeat-db")
+        self._udp: Optional[asyncio.DatagramTransport] = None
+        self._tcp: Optional[asyncio.AbstractServer] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._stop: Optional[asyncio.Event] = None
+        self._stop_requested = False
+
+    @property
+    def address(self) -> Tuple[str, int]:
+        if self._tcp is not None and self._tcp.sockets:
+            return self._tcp.sockets[0].getsockname()[:2]
+        return (self.host, self.port)
+
+    # ---- hosts ----
+
+    @staticmethod
+    def _load_hosts() -> List[HostRow]:
+        with get_session() as session:
+            hosts = list(session.exec(select(Host).where(Host.enabled == True)))  # noqa: E712
+        rows = []
+        for h in hosts:
+            interval = push_interval_of(h.tags)
+            if h.id is not None and interval is not None:
+                rows.append((int(h.id), h.name, (h.address or "").strip(), interval))
+        return sorted(rows)
+
+    def _apply_hosts(self, rows: List[HostRow]) -> None:
+        now = time.monotonic()
+        keep: Set[int] = set()
+        by_key: Dict[str, int] = {}
+        for hid, name, address, interval in rows:
+            keep.add(hid)
+            lv = self._live.get(hid)
+            if lv is None:
+                # A silent host is declared down after one grace window from now
+                lv = self._live[hid] = _Liveness(hid, name, address, interval)
+                self.wheel.schedule(hid, now + interval * self.grace)
+            else:
+                lv.name, lv.address, lv.interval_s = name, address, interval
+            by_key[f"#{hid}"] = hid
+            by_key[name.lower()] = hid
+            if address:
+                by_key[address.lower()] = hid
+        for hid in [h for h in self._live if h not in keep]:
+            del self._live[hid]
+            self.wheel.cancel(hid)
+        self._by_key = by_key
+        self._hosts = rows
+        metrics.PUSH_HOSTS.set(len(self._live))
+
+    # ---- heartbeats ----
+
+    def beat(self, line: str, peer_ip: str = "") -> bool:
+        """Handle one heartbeat line; False if it was rejected."""
+        try:
+            fields = parse_heartbeat(line)
+        except ValueError:
+            metrics.HEARTBEATS.inc(outcome="malformed")
+            return False
+        if self.token and not hmac.compare_digest(fields.get("token", ""), self.token):
+            metrics.HEARTBEATS.inc(outcome="bad_token")
+            return False
+        key = fields.get("host", "") or peer_ip
+        hid = self._by_key.get(key.lower())
+        lv = self._live.get(hid) if hid is not None else None
+        if lv is None:
+            metrics.HEARTBEATS.inc(outcome="unknown_host")
+            return False
+
+        metrics.HEARTBEATS.inc(outcome="ok")
+        lv.last_seen = time.time()
+        lv.beats += 1
+        self.wheel.schedule(hid, time.monotonic() + lv.interval_s * self.grace)
+        if lv.up is not True:
+            self._transition(lv, True, "Heartbeat")
+        return True
+
+    def _transition(self, lv: _Liveness, up: bool, message: str) -> None:
+        lv.up = up
+        now = datetime.utcnow()
+        metrics.PUSH_TRANSITIONS.inc(state="up" if up else "down")
+        self._results.append((lv.host_id, "push", "", up, None, now, message))
+        if self.on_result is not None:
+            self.on_result(lv.host_id, "push", "", up, None, now, message)
+        if up:
+            return
+        msg = f"{lv.name} ({lv.address}) PUSH failing: {message.lower()}"
+        self._alerts.append(AlertEvent(ts=now, host_id=lv.host_id, check_type="push", target="", severity="CRIT", message=msg))
+        metrics.ALERTS.inc(check_type="push")
+        if self.on_alert is not None:
+            self.on_alert(now, "CRIT", lv.host_id, "push", "", msg)
+
+    def expire(self, now: Optional[float] = None) -> int:
+        """Declare overdue hosts down; returns how many went down."""
+        down = 0
+        for hid in self.wheel.advance(time.monotonic() if now is None else now):
+            lv = self._live.get(hid)
+            if lv is None or lv.up is False:
+                continue
+            if lv.last_seen:
+                reason = f"No heartbeat for {time.time() - lv.last_seen:.0f}s (every {lv.interval_s:g}s expected)"
+            else:
+                reason = f"No heartbeat since the listener started (every {lv.interval_s:g}s expected)"
+            self._transition(lv, False, reason)
+            down += 1
+        return down
+
+    def counts(self) -> Dict[str, int]:
+        out = {"up": 0, "down": 0, "pending": 0}
+        for lv in self._live.values():
+            out["pending" if lv.up is None else "up" if lv.up else "down"] += 1
+        return out
+
+    # ---- storage ----
+
+    def _write(self, results: List[ResultTuple], alerts: List[AlertEvent]) -> None:
+        with metrics.DB_COMMIT_SECONDS.time(op="heartbeat"):
+            if results:
+                write_results(results)
+            if alerts:
+                with get_session() as session:
+                    session.add_all(alerts)
+                    session.commit()
+
+    async def _flush(self) -> None:
+        assert self._loop is not None
+        results, self._results = self._results, []
+        alerts, self._alerts = self._alerts, []
+        if not results and not alerts:
+            return
+        try:
+            await self._loop.run_in_executor(self._db, self._write, results, alerts)
+        except Exception as e:
+            metrics.DB_ERRORS.inc(op="heartbeat")
+            log.error("heartbeat: dropping %d results: %s", len(results), e)
+
+    # ---- network ----
+
+    async def _handle_tcp(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        peer = writer.get_extra_info("peername") or ("",)
+        try:
+            while True:
+                line = await asyncio.wait_for(reader.readline(), timeout=TCP_IDLE_S)
+                if not line:
+                    break
+                self.beat(line.decode("ascii", "replace").strip(), peer[0])
+        except (asyncio.TimeoutError, asyncio.LimitOverrunError, ValueError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def _tick_loop(self) -> None:
+        assert self._stop is not None and self._loop is not None
+        next_reload = 0.0
+        while not self._stop.is_set():
+            now = time.monotonic()
+            if now >= next_reload:
+                next_reload = now + self.reload_s
+                try:
+                    rows = await self._loop.run_in_executor(self._db, self._load_hosts)
+                except Exception as e:
+                    metrics.DB_ERRORS.inc(op="hosts")
+                    log.error("heartbeat: host reload failed: %s", e)
+                else:
+                    if rows != self._hosts:
+                        self._apply_hosts(rows)
+            self.expire()
+            await self._flush()
+            for state, n in self.counts().items():
+                metrics.PUSH_STATE.set(n, state=state)
+            try:
+                await asyncio.wait_for(self._stop.wait(), timeout=TICK_S)
+            except asyncio.TimeoutError:
+                pass
+
+    async def serve(self) -> None:
+        self._loop = asyncio.get_running_loop()
+        self._stop = asyncio.Event()
+        if self._stop_requested:
+            return  # stopped before the loop existed
+        listener = self
+
+        class _Udp(asyncio.DatagramProtocol):
+            def datagram_received(self, data: bytes, addr) -> None:
+                for line in data[: 64 * MAX_LINE].decode("ascii", "replace").splitlines():
+                    if line.strip():
+                        listener.beat(line.strip(), addr[0])
+
+        self._tcp = await asyncio.start_server(self._handle_tcp, self.host, self.port, limit=MAX_LINE)
+        try:
+            self._udp, _ = await self._loop.create_datagram_endpoint(_Udp, local_addr=(self.host, self.address[1]))
+        except OSError:
+            self._tcp.close()
+            raise
+        host, port = self.address
+        log.info("heartbeat: listening on %s:%d (udp+tcp)", host, port)
+        try:
+            await self._tick_loop()
+        finally:
+            self._udp.close()
+            self._tcp.close()
+            await self._tcp.wait_closed()
+            await self._flush()
+            self._db.shutdown(wait=True)
+
+    def stop(self) -> None:
+        """Thread-safe."""
+        self._stop_requested = True
+        if self._loop is not None and self._stop is not None:
+            self._loop.call_soon_threadsafe(self._stop.set)
+
+
+def send_heartbeat(server: Tuple[str, int], host: str = "", token: str = "", tcp: bool = False) -> None:
+    """Send one heartbeat (for scripts and tests; any UDP/TCP client will do)."""
+    fields = [f"host={host}"] if host else []
+    if token:
+        fields.append(f"token={token}")
+    line = (" ".join(fields) + "\n").encode("ascii")
+    if tcp:
+        with socket.create_connection(server, timeout=5) as s:
+            s.sendall(line)
+    else:
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as s:
+            s.sendto(line, server)
+
+
+class HeartbeatThread(QThread):
+    """Runs a HeartbeatListener on its own event loop for the GUI; signals match MonitorThread's."""
+
+    result = Signal(int, str, str, bool, object, object, str)
+    alert = Signal(object, str, int, str, str, str)
+    status = Signal(str)
+
+    def __init__(self, host: str = "127.0.0.1", port: int = HEARTBEAT_PORT, token: str = "", parent=None):
+        super().__init__(parent)
+        self.track_backlog = False  # as MonitorThread.track_backlog
+        self.listener: Optional[HeartbeatListener] = None
+        self._refused = ""
+        try:
+            self.listener = HeartbeatListener(
+                host=host, port=port, token=token, on_result=self._emit_result, on_alert=self._emit_alert
+            )
+        except ValueError as e:
+            self._refused = str(e)  # reported from run(), once the status bar is connected
+
+    def _emit_result(self, *args) -> None:
+        if self.track_backlog:
+            metrics.SIGNAL_BACKLOG.inc()
+        self.result.emit(*args)
+
+    def _emit_alert(self, *args) -> None:
+        if self.track_backlog:
+            metrics.SIGNAL_BACKLOG.inc()
+        self.alert.emit(*args)
+
+    def run(self) -> None:
+        if self.listener is None:
+            self.status.emit(f"Heartbeat listener disabled: {self._refused}")
+            return
+        try:
+            asyncio.run(self.listener.serve())
+        except OSError as e:
+            self.status.emit(f"Heartbeat listener disabled: {e}")
+
+    def stop(self) -> None:
+        if self.listener is not None:
+            self.listener.stop()
@@ -0,0 +1,208 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple, Union
+
+from sqlmodel import Session, desc, select
+
+from app.archive import ArchivedRow, ArchiveReader
+from app.downsample import Point, lttb
+from app.models import CheckResult, Outcome
+from app.rollup import PERIODS_S, period_for, rollup_series
+from app.transitions import ok_samples
+
+SeriesKey = Tuple[int, int]  # (kind, port)
+ResultRow = Union[CheckResult, ArchivedRow]
+
+RAW_SPAN_MS = 6 * 3600 * 1000  # longer ranges read rollups instead of rows
+AVAILABILITY_BUCKETS = 120
+
+
+@dataclass
+class Segment:
+    """A span during which one check series held the same outcome."""
+
+    start_ms: int
+    end_ms: int
+    kind: int
+    port: int
+    outcome: int
+    rtt_ms: Optional[float]
+    msg_id: int
+    samples: int
+
+    @property
+    def ok(self) -> bool:
+        return self.outcome == Outcome.OK
+
+    @property
+    def duration_ms(self) -> int:
+        return max(0, self.end_ms - self.start_ms)
+
+
+def load_rows(
+    session: Session,
+    host_id: int,
+    since_ms: int,
+    until_ms: int,
+    kind: Optional[int] = None,
+) -> List[ResultRow]:
+    """
+    Rows of a host in [since_ms, until_ms), ascending, from the live table and
+    the archive, plus the last live row before since_ms for each series so the
+    state at the window start is known.
+    """
+    q = select(CheckResult).where(
+        CheckResult.host_id == host_id,
+        CheckResult.ts_ms >= since_ms,
+        CheckResult.ts_ms < until_ms,
+    )
+    if kind is not None:
+        q = q.where(CheckResult.kind == kind)
+    rows = list(session.exec(q.order_by(CheckResult.ts_ms)))
+
+    series_q = select(CheckResult.kind, CheckResult.port).where(CheckResult.host_id == host_id).distinct()
+    if kind is not None:
+        series_q = series_q.where(CheckResult.kind == kind)
+    anchors: List[CheckResult] = []
+    for k, port in session.exec(series_q):
+        prev = session.exec(
+            select(CheckResult)
+            .where(
+                CheckResult.host_id == host_id,
+                CheckResult.kind == k,
+                CheckResult.port == port,
+                CheckResult.ts_ms < since_ms,
+            )
+            .order_by(desc(CheckResult.ts_ms))
+            .limit(1)
+        ).first()
+        if prev is not None:
+            anchors.append(prev)
+
+    # Cold days live in the archive; an interrupted archive run can leave a row in both
+    hot_ids = {r.id for r in rows}
+    archived = [r for r in ArchiveReader().scan(host_id, since_ms, until_ms, kind=kind) if r.id not in hot_ids]
+    if archived:
+        rows = sorted(archived + rows, key=lambda r: r.ts_ms)
+
+    return sorted(anchors, key=lambda r: r.ts_ms) + rows
+
+
+def timeline(rows: List[ResultRow], now_ms: int) -> List[Segment]:
+    """
+    Rebuild per-series state segments from ascending rows. Works for both
+    storage modes: in "all" mode every row opens a segment that lasts until
+    the next probe; in "transitions" mode a row's state holds until the next
+    row, and heartbeat rows with an unchanged outcome extend the open segment.
+    A row's samples all belong to its own outcome (transitions.ok_samples).
+    """
+    open_seg: Dict[SeriesKey, Segment] = {}
+    out: List[Segment] = []
+    for r in rows:
+        key = (r.kind, r.port)
+        cur = open_seg.get(key)
+        if cur is not None:
+            cur.end_ms = r.ts_ms
+            if cur.outcome == r.outcome and cur.msg_id == r.msg_id:
+                cur.samples += r.samples
+                cur.rtt_ms = r.rtt_ms if r.rtt_ms is not None else cur.rtt_ms
+                continue
+        seg = Segment(
+            start_ms=r.ts_ms,
+            end_ms=now_ms,
+            kind=r.kind,
+            port=r.port,
+            outcome=r.outcome,
+            rtt_ms=r.rtt_ms,
+            msg_id=r.msg_id,
+            samples=r.samples,
+        )
+        open_seg[key] = seg
+        out.append(seg)
+    # The newest segment of each series is still ongoing
+    for seg in open_seg.values():
+        seg.end_ms = max(seg.start_ms, now_ms)
+    return out
+
+
+def availability(segments: List[Segment], since_ms: int, until_ms: int) -> Optional[float]:
+    """Time-weighted share (0..100) of [since_ms, until_ms) spent OK, across all series."""
+    up = 0
+    total = 0
+    for s in segments:
+        a = max(s.start_ms, since_ms)
+        b = min(s.end_ms, until_ms)
+        if b <= a:
+            continue
+        total += b - a
+        if s.ok:
+            up += b - a
+    if not total:
+        return None
+    return up / total * 100.0
+
+
+def current_fail_streak(rows_desc: List[ResultRow]) -> int:
+    """Failed probes since the last OK, counting the probes each row stands for."""
+    streak = 0
+    for r in rows_desc:
+        if r.ok:
+            break
+        streak += r.samples
+    return streak
+
+
+@dataclass
+class RttHistory:
+    """Chart-ready history of one check series."""
+
+    tier: str  # "raw", "1m" or "1h"
+    rtt: List[Point]  # (ts_ms, rtt_ms), downsampled
+    availability: List[Point]  # (bucket start ms, % of probes OK)
+    source_points: int  # rows or buckets read before downsampling
+
+
+def _availability(buckets: List[Tuple[int, int, int]], since_ms: int, until_ms: int) -> List[Point]:
+    """(ts_ms, probes, ok_probes) -> share OK per one of AVAILABILITY_BUCKETS equal time slices."""
+    width = max(1, (until_ms - since_ms) // AVAILABILITY_BUCKETS)
+    probes: Dict[int, int] = {}
+    ok: Dict[int, int] = {}
+    for ts, n, n_ok in buckets:
+        slot = since_ms + max(0, ts - since_ms) // width * width
+        probes[slot] = probes.get(slot, 0) + n
+        ok[slot] = ok.get(slot, 0) + n_ok
+    return [(float(slot), 100.0 * ok[slot] / n) for slot, n in sorted(probes.items()) if n]
+
+
+def rtt_history(
+    session: Session,
+    host_id: int,
+    kind: int,
+    port: int,
+    since_ms: int,
+    until_ms: int,
+    max_points: int = 1500,
+    now_ms: Optional[int] = None,
+) -> RttHistory:
+    """
+    RTT and availability of one series over [since_ms, until_ms), read from
+    the cheapest tier that still has the detail: raw rows (live table plus
+    archive) up to RAW_SPAN_MS, minute rollups while they are retained, hour
+    rollups beyond. The RTT line is LTTB-downsampled to max_points.
+    """
+    if until_ms - since_ms <= RAW_SPAN_MS:
+        rows = [
+            r
+            for r in load_rows(session, host_id, since_ms, until_ms, kind=kind)
+            if r.port == port and r.ts_ms >= since_ms
+        ]
+        points = [(float(r.ts_ms), float(r.rtt_ms)) for r in rows if r.rtt_ms is not None]
+        avail = _availability([(r.ts_ms, r.samples, ok_samples(r.outcome, r.samples)) for r in rows], since_ms, until_ms)
+        return RttHistory("raw", lttb(points, max_points), avail, len(rows))
+
+    period = period_for(since_ms, now_ms)
+    buckets = rollup_series(host_id, kind, port, period, since_ms, until_ms)
+    points = [(float(b.bucket_ms), b.rtt_sum / b.rtt_n) for b in buckets if b.rtt_n]
+    avail = _availability([(b.bucket_ms, b.probes, b.ok_probes) for b in buckets], since_ms, until_ms)
+    return RttHistory("1m" if period == PERIODS_S[0] else "1h", lttb(points, max_points), avail, len(buckets))
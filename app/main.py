@@ -1,5 +1,7 @@
 from __future__ import annotations
 
+import argparse
+import os
 import sys
 from PySide6.QtWidgets import QApplication
 
@@ -8,17 +10,78 @@ from app.ui.main_window import MainWindow
 from app.ui.theme import apply_dark_theme
 
 
+def _parse_args(argv):
+    p = argparse.ArgumentParser(prog="sentineldesk")
+    p.add_argument("--simulate", action="store_true", help="probe a virtual fleet instead of the network")
+    p.add_argument("--sim-seed", type=int, default=1, help="virtual fleet seed")
+    p.add_argument("--sim-time-scale", type=float, default=1.0, help="simulated latency multiple (0 = instant)")
+    p.add_argument("--replay", metavar="CAPTURE", help="feed a recorded result stream instead of probing")
+    p.add_argument("--speed", type=float, default=1.0, help="replay speed multiple (0 = as fast as possible)")
+    p.add_argument("--record", metavar="CAPTURE", help="also write every monitor result to a capture file (.jsonl.gz)")
+    p.add_argument(
+        "--storage",
+        choices=("all", "transitions"),
+        default="all",
+        help="write every probe, or only state changes plus a periodic heartbeat row",
+    )
+    p.add_argument("--storage-heartbeat", type=int, default=300, help="heartbeat row period in transitions mode (s)")
+    p.add_argument("--spread", type=float, default=0.5, help="fraction of the interval to spread each cycle's probes over")
+    p.add_argument("--heartbeat-listen", default="127.0.0.1:9466", help="host:port for push heartbeats (UDP and TCP)")
+    p.add_argument(
+        "--heartbeat-token",
+        default=os.environ.get("SENTINELDESK_HEARTBEAT_TOKEN", ""),
+        help="shared secret heartbeats must carry as token=; required to listen beyond loopback "
+        "(default: $SENTINELDESK_HEARTBEAT_TOKEN)",
+    )
+    # Qt consumes its own options (-style, -platform, ...)
+    return p.parse_known_args(argv)[0]
+
+
 def main() -> int:
+    args = _parse_args(sys.argv[1:])
     init_db()
 
+    monitor = None
+    if args.simulate:
+        from app import ping
+        from app.simulator import SimBackend, VirtualFleet
+
+        ping.set_backend(SimBackend(VirtualFleet(seed=args.sim_seed), time_scale=args.sim_time_scale))
+    if args.replay:
+        from app.simulator import ReplayMonitor
+
+        monitor = ReplayMonitor(args.replay, speed=args.speed)
+
     app = QApplication(sys.argv)
     apply_dark_theme(app)
 
-    w = MainWindow()
+    if monitor is None:
+        from app.monitor import MonitorThread
+
+        monitor = MonitorThread(
+            interval_s=10,
+            timeout_ms=1000,
+            storage_mode=args.storage,
+            heartbeat_s=args.storage_heartbeat,
+            spread_fraction=args.spread,
+        )
+
+    recorder = None
+    if args.record:
+        from app.simulator import Recorder
+
+        # Connected before MainWindow starts the monitor, so the first cycle is captured too
+        recorder = Recorder(args.record)
+        monitor.result.connect(recorder.on_result)
+
+    w = MainWindow(monitor=monitor, heartbeat_listen=args.heartbeat_listen, heartbeat_token=args.heartbeat_token)
     w.show()
-    return app.exec()
+    try:
+        return app.exec()
+    finally:
+        if recorder is not None:
+            recorder.close()
 
 
 if __name__ == "__main__":
     raise SystemExit(main())
-
@@ -0,0 +1,274 @@
+from __future__ import annotations
+
+import os
+import sqlite3
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+from PySide6.QtCore import QThread, Signal
+
+from app import metrics
+from app.db import DB_PATH
+
+AUTO_VACUUM_INCREMENTAL = 2
+
+SLICE_S = 0.05  # longest the maintenance connection holds the write lock in one go
+VACUUM_PAGES_PER_STEP = 256
+FREELIST_MIN_PAGES = 1024  # ~4 MB; below that, reclaiming is not worth a write
+WAL_TRUNCATE_BYTES = 64 * 1024 * 1024
+
+IDLE_S = 2.0  # no commit by anyone for this long = idle
+POLL_S = 1.0
+CHECKPOINT_EVERY_S = 30.0
+VACUUM_EVERY_S = 300.0
+OPTIMIZE_EVERY_S = 3600.0
+
+
+@dataclass
+class MaintenanceReport:
+    checkpointed_pages: int = 0
+    wal_truncated: bool = False
+    freed_pages: int = 0
+    page_size: int = 4096
+    optimized: bool = False
+    migrated: bool = False
+
+    @property
+    def empty(self) -> bool:
+        return not (self.checkpointed_pages or self.wal_truncated or self.freed_pages or self.optimized or self.migrated)
+
+    def summary(self) -> str:
+        parts: List[str] = []
+        if self.migrated:
+            parts.append("switched to incremental auto-vacuum")
+        if self.freed_pages:
+            parts.append(f"freed {self.freed_pages * self.page_size / 1048576:.1f} MB")
+        if self.checkpointed_pages:
+            parts.append(f"checkpointed {self.checkpointed_pages} WAL pages")
+        if self.wal_truncated:
+            parts.append("truncated WAL")
+        if self.optimized:
+            parts.append("refreshed query planner stats")
+        return "DB maintenance: " + (", ".join(parts) if parts else "nothing to do")
+
+
+def connect(path: str = DB_PATH, busy_ms: int = 100) -> sqlite3.Connection:
+    """
+    Autocommit connection for maintenance. The short busy timeout makes
+    every step give way to the monitor and collector instead of queueing
+    behind them.
+    """
+    return sqlite3.connect(path, timeout=busy_ms / 1000, isolation_level=None, check_same_thread=False)
+
+
+def _pragma(con: sqlite3.Connection, name: str) -> int:
+    return int(con.execute(f"PRAGMA {name}").fetchone()[0])
+
+
+def db_stats(con: sqlite3.Connection, path: str = DB_PATH) -> Dict[str, int]:
+    wal = path + "-wal"
+    return {
+        "page_size": _pragma(con, "page_size"),
+        "page_count": _pragma(con, "page_count"),
+        "freelist_count": _pragma(con, "freelist_count"),
+        "auto_vacuum": _pragma(con, "auto_vacuum"),
+        "wal_bytes": os.path.getsize(wal) if os.path.exists(wal) else 0,
+    }
+
+
+def checkpoint(con: sqlite3.Connection, path: str = DB_PATH) -> Tuple[int, bool]:
+    """
+    PASSIVE checkpoint: copies what it can without waiting on readers or
+    writers. If that got the whole log and the -wal file has grown past
+    WAL_TRUNCATE_BYTES, a TRUNCATE checkpoint then resets it; that one
+    only succeeds when nobody is mid-transaction, and is skipped otherwise.
+    Returns (pages checkpointed, truncated).
+    """
+    with metrics.DB_MAINTENANCE_SECONDS.time(op="checkpoint"):
+        busy, log, done = con.execute("PRAGMA wal_checkpoint(PASSIVE)").fetchone()
+        truncated = False
+        wal = path + "-wal"
+        if not busy and log == done and os.path.exists(wal) and os.path.getsize(wal) > WAL_TRUNCATE_BYTES:
+            try:
+                truncated = con.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchone()[0] == 0
+            except sqlite3.OperationalError:
+                truncated = False
+    return max(0, int(done)), truncated
+
+
+def incremental_vacuum(con: sqlite3.Connection, budget_s: float = SLICE_S) -> int:
+    """
+    Return free pages to the OS in VACUUM_PAGES_PER_STEP steps until the
+    freelist is small or budget_s is spent. Each step is its own short
+    write transaction. Returns pages freed.
+    """
+    if _pragma(con, "auto_vacuum") != AUTO_VACUUM_INCREMENTAL:
+        return 0
+    freed = 0
+    deadline = time.monotonic() + budget_s
+    with metrics.DB_MAINTENANCE_SECONDS.time(op="vacuum"):
+        while time.monotonic() < deadline:
+            before = _pragma(con, "freelist_count")
+            if before < FREELIST_MIN_PAGES and not freed:
+                break
+            if before == 0:
+                break
+            try:
+                # executescript steps the pragma to completion; execute() frees one page
+                con.executescript(f"PRAGMA incremental_vacuum({VACUUM_PAGES_PER_STEP})")
+            except sqlite3.OperationalError:
+                break  # locked: someone is writing, try again next idle period
+            step = before - _pragma(con, "freelist_count")
+            if step <= 0:
+                break
+            freed += step
+    metrics.DB_FREELIST_PAGES.set(_pragma(con, "freelist_count"))
+    return freed
+
+
+def optimize(con: sqlite3.Connection) -> None:
+    """
+    PRAGMA optimize re-ANALYZEs only tables whose stats have drifted;
+    analysis_limit keeps each ANALYZE to a sample rather than a full scan.
+    """
+    with metrics.DB_MAINTENANCE_SECONDS.time(op="optimize"):
+        con.execute("PRAGMA analysis_limit=1000")
+        if not con.execute("SELECT name FROM sqlite_master WHERE name='sqlite_stat1'").fetchone():
+            con.execute("ANALYZE")  # first run: optimize only refreshes existing stats
+        con.execute("PRAGMA optimize")
+
+
+def migrate_auto_vacuum(con: sqlite3.Connection) -> bool:
+    """
+    Switch an existing file to incremental auto-vacuum. This needs one full
+    VACUUM (a complete rewrite under an exclusive lock), so it is a
+    one-time cost. Returns True if the file was migrated.
+    """
+    if _pragma(con, "auto_vacuum") == AUTO_VACUUM_INCREMENTAL:
+        return False
+    with metrics.DB_MAINTENANCE_SECONDS.time(op="migrate"):
+        con.execute(f"PRAGMA auto_vacuum={AUTO_VACUUM_INCREMENTAL}")
+        con.execute("VACUUM")
+    return _pragma(con, "auto_vacuum") == AUTO_VACUUM_INCREMENTAL
+
+
+def run_all(path: str = DB_PATH, migrate: bool = False) -> MaintenanceReport:
+    """Every task once, without time slicing (CLI / scheduled downtime)."""
+    con = connect(path, busy_ms=5000)
+    try:
+        rep = MaintenanceReport(page_size=_pragma(con, "page_size"))
+        if migrate:
+            rep.migrated = migrate_auto_vacuum(con)
+        rep.freed_pages = incremental_vacuum(con, budget_s=3600.0)
+        optimize(con)
+        rep.optimized = True
+        rep.checkpointed_pages, rep.wal_truncated = checkpoint(con, path)
+        return rep
+    finally:
+        con.close()
+
+
+class MaintenanceThread(QThread):
+    """
+    Runs database upkeep in the gaps between writes. Every POLL_S it reads
+    PRAGMA data_version, which changes whenever another connection commits;
+    only once it has held still for IDLE_S does any task run, each bounded
+    to one SLICE_S step before the idle check is repeated:
+
+    - passive WAL checkpoint every CHECKPOINT_EVERY_S (truncating an
+      oversized -wal file when possible);
+    - incremental vacuum every VACUUM_EVERY_S while the freelist is large;
+    - PRAGMA optimize every OPTIMIZE_EVERY_S, and once at start.
+
+    Files created before incremental auto-vacuum only get a hint: switching
+    them is a full VACUUM under an exclusive lock, which stalls every writer
+    for as long as the rewrite takes, so it is left to `maintenance
+    --migrate` from the CLI during downtime.
+    """
+
+    status = Signal(str)
+
+    def __init__(self, path: str = DB_PATH, parent=None):
+        super().__init__(parent)
+        self.path = path
+        self._running = True
+        self._last: Dict[str, float] = {}
+        self._data_version: Optional[int] = None
+        self._changed_at = 0.0
+        self._migrate_checked = False
+
+    def stop(self) -> None:
+        self._running = False
+
+    def _idle(self, con: sqlite3.Connection) -> bool:
+        now = time.monotonic()
+        v = _pragma(con, "data_version")
+        if v != self._data_version:
+            self._data_version = v
+            self._changed_at = now
+        return now - self._changed_at >= IDLE_S
+
+    def _due(self, task: str, every_s: float) -> bool:
+        return time.monotonic() - self._last.get(task, float("-inf")) >= every_s
+
+    def _done(self, task: str) -> None:
+        self._last[task] = time.monotonic()
+
+    def _tick(self, con: sqlite3.Connection, rep: MaintenanceReport) -> bool:
+        """
+        Run at most one bounded task. Returns True while a vacuum pass is
+        unfinished, so the next slice follows after SLICE_S, not POLL_S.
+        """
+        if not self._migrate_checked:
+            self._migrate_checked = True
+            if _pragma(con, "auto_vacuum") != AUTO_VACUUM_INCREMENTAL:
+                self.status.emit(
+                    "DB maintenance: free pages are not returned to the OS for this database; "
+                    "run `maintenance --migrate` from the CLI during downtime"
+                )
+            return False
+        if self._due("checkpoint", CHECKPOINT_EVERY_S):
+            self._done("checkpoint")
+            pages, truncated = checkpoint(con, self.path)
+            rep.checkpointed_pages += pages
+            rep.wal_truncated |= truncated
+            metrics.DB_WAL_BYTES.set(db_stats(con, self.path)["wal_bytes"])
+            return False
+        if self._due("vacuum", VACUUM_EVERY_S):
+            freed = incremental_vacuum(con)
+            rep.freed_pages += freed
+            if freed:
+                return True
+            self._done("vacuum")  # freelist drained (or small): wait for the next period
+            return False
+        if self._due("optimize", OPTIMIZE_EVERY_S):
+            self._done("optimize")
+            optimize(con)
+            rep.optimized = True
+        return False
+
+    def run(self) -> None:
+        try:
+            con = connect(self.path)
+        except sqlite3.Error as e:
+            self.status.emit(f"DB maintenance disabled: {e}")
+            return
+        try:
+            rep = MaintenanceReport(page_size=_pragma(con, "page_size"))
+            while self._running:
+                more = False
+                try:
+                    if self._idle(con):
+                        more = self._tick(con, rep)
+                    elif not rep.empty:
+                        # Activity resumed: report what the last idle period achieved
+                        self.status.emit(rep.summary())
+                        rep = MaintenanceReport(page_size=rep.page_size)
+                except sqlite3.Error:
+                    metrics.DB_ERRORS.inc(op="maintenance")
+                time.sleep(SLICE_S if more else POLL_S)
+            if not rep.empty:
+                self.status.emit(rep.summary())
+        finally:
+            con.close()
@@ -0,0 +1,310 @@
+from __future__ import annotations
+
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+
+# Seconds, Prometheus-style. Covers sub-ms DB commits up to multi-second cycles.
+DEFAULT_BUCKETS: Tuple[float, ...] = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0,
+)
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+def _label_key(labels: Dict[str, str]) -> LabelKey:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _fmt_labels(key: LabelKey, extra: Optional[Tuple[str, str]] = None) -> str:
+    items = list(key)
+    if extra:
+        items.append(extra)
+    if not items:
+        return ""
+    body = ",".join(f'{k}="{v}"' for k, v in items)
+    return "{" + body + "}"
+
+
+def _fmt_value(v: float) -> str:
+    if v == float("inf"):
+        return "+Inf"
+    if float(v).is_integer():
+        return str(int(v))
+    return repr(float(v))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help_text: str = ""):
+        self.name = name
+        self.help = help_text
+        self._lock = threading.Lock()
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str = ""):
+        super().__init__(name, help_text)
+        self._values: Dict[LabelKey, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: str) -> float:
+        with self._lock:
+            return self._values.get(_label_key(labels), 0.0)
+
+    def samples(self) -> List[Tuple[str, LabelKey, float]]:
+        with self._lock:
+            return [(self.name, k, v) for k, v in self._values.items()]
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(self, name: str, help_text: str = ""):
+        super().__init__(name, help_text)
+        self._values: Dict[LabelKey, float] = {}
+
+    def set(self, value: float, **labels: str) -> None:
+        with self._lock:
+            self._values[_label_key(labels)] = float(value)
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels: str) -> None:
+        self.inc(-amount, **labels)
+
+    def value(self, **labels: str) -> float:
+        with self._lock:
+            return self._values.get(_label_key(labels), 0.0)
+
+    def samples(self) -> List[Tuple[str, LabelKey, float]]:
+        with self._lock:
+            return [(self.name, k, v) for k, v in self._values.items()]
+
+
+class _HistState:
+    __slots__ = ("counts", "sum", "count")
+
+    def __init__(self, n: int):
+        self.counts = [0] * n
+        self.sum = 0.0
+        self.count = 0
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str = "", buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, help_text)
+        self.buckets: Tuple[float, ...] = tuple(sorted(buckets))
+        self._states: Dict[LabelKey, _HistState] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = _label_key(labels)
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            st = self._states.get(key)
+            if st is None:
+                st = _HistState(len(self.buckets) + 1)
+                self._states[key] = st
+            st.counts[i] += 1
+            st.sum += value
+            st.count += 1
+
+    @contextmanager
+    def time(self, **labels: str) -> Iterator[None]:
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - t0, **labels)
+
+    def snapshot(self, **labels: str) -> Tuple[int, float]:
+        """(count, sum) for one label set."""
+        with self._lock:
+            st = self._states.get(_label_key(labels))
+            return (st.count, st.sum) if st else (0, 0.0)
+
+    def quantile(self, q: float, **labels: str) -> Optional[float]:
+        """
+        Bucket-resolution quantile estimate (upper bound of the bucket holding q).
+        """
+        with self._lock:
+            st = self._states.get(_label_key(labels))
+            if not st or not st.count:
+                return None
+            rank = q * st.count
+            acc = 0
+            for i, c in enumerate(st.counts):
+                acc += c
+                if acc >= rank:
+                    return self.buckets[i] if i < len(self.buckets) else float("inf")
+        return None
+
+    def samples(self) -> List[Tuple[str, LabelKey, float]]:
+        out: List[Tuple[str, LabelKey, float]] = []
+        with self._lock:
+            for key, st in self._states.items():
+                acc = 0
+                for i, b in enumerate(self.buckets + (float("inf"),)):
+                    acc += st.counts[i]
+                    out.append((f"{self.name}_bucket", key + (("le", _fmt_value(b)),), float(acc)))
+                out.append((f"{self.name}_sum", key, st.sum))
+                out.append((f"{self.name}_count", key, float(st.count)))
+        return out
+
+    def label_sets(self) -> List[LabelKey]:
+        with self._lock:
+            return list(self._states.keys())
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, cls, name: str, help_text: str, **kw):
+        with self._lock:
+            m = self._metrics.get(name)
+            if m is None:
+                m = cls(name, help_text, **kw)
+                self._metrics[name] = m
+            elif not isinstance(m, cls):
+                raise ValueError(f"metric {name} already registered as {m.kind}")
+            return m
+
+    def counter(self, name: str, help_text: str = "") -> Counter:
+        return self._get_or_create(Counter, name, help_text)
+
+    def gauge(self, name: str, help_text: str = "") -> Gauge:
+        return self._get_or_create(Gauge, name, help_text)
+
+    def histogram(self, name: str, help_text: str = "", buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._get_or_create(Histogram, name, help_text, buckets=buckets)
+
+    def metrics(self) -> List[_Metric]:
+        with self._lock:
+            return sorted(self._metrics.values(), key=lambda m: m.name)
+
+    def render_prometheus(self) -> str:
+        lines: List[str] = []
+        for m in self.metrics():
+            if m.help:
+                lines.append(f"# HELP {m.name} {m.help}")
+            lines.append(f"# TYPE {m.name} {m.kind}")
+            for name, key, value in m.samples():  # type: ignore[attr-defined]
+                lines.append(f"{name}{_fmt_labels(key)} {_fmt_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+
+# Monitor
+CYCLE_SECONDS = REGISTRY.histogram("sentinel_cycle_seconds", "Wall time of one monitor cycle")
+CYCLE_OVERRUN = REGISTRY.counter("sentinel_cycle_overruns_total", "Cycles that took longer than interval_s")
+CYCLE_LAG = REGISTRY.gauge("sentinel_cycle_lag_seconds", "How far the last cycle ran past its interval")
+PROBE_SECONDS = REGISTRY.histogram("sentinel_probe_seconds", "Probe latency by check type")
+PROBES = REGISTRY.counter("sentinel_probes_total", "Probes run by check type and outcome")
+DB_COMMIT_SECONDS = REGISTRY.histogram("sentinel_db_commit_seconds", "Time spent writing to the DB by operation")
+RESULTS_SKIPPED = REGISTRY.counter("sentinel_results_skipped_total", "Unchanged results not written in transitions mode")
+DB_ERRORS = REGISTRY.counter("sentinel_db_errors_total", "DB errors by operation")
+ALERTS = REGISTRY.counter("sentinel_alerts_total", "Alerts raised by check type")
+ALERT_EVAL_SECONDS = REGISTRY.histogram("sentinel_alert_eval_seconds", "Time spent evaluating alert policy")
+CYCLES_SKIPPED = REGISTRY.counter("sentinel_cycles_skipped_total", "Cycle slots skipped to restore cadence")
+CHECK_LATENESS = REGISTRY.histogram("sentinel_check_lateness_seconds", "How far past its due time a check ran")
+CHECKS_SHED = REGISTRY.counter("sentinel_checks_shed_total", "Low-priority checks shed or deferred, by reason")
+CHECK_BACKLOG = REGISTRY.gauge("sentinel_check_backlog", "Checks shed or deferred in the last cycle")
+PROBES_CONFIRM = REGISTRY.counter("sentinel_probe_confirmations_total", "Failed probes re-probed, by check type and verdict (confirmed/transient)")
+PROBES_HEDGED = REGISTRY.counter("sentinel_probes_hedged_total", "Extra parallel probes sent for critical hosts")
+PROBES_RATE_LIMITED = REGISTRY.counter("sentinel_probes_rate_limited_total", "Probes delayed or refused by a send rate limit, by scope (global/subnet/target)")
+RATE_LIMIT_WAIT_SECONDS = REGISTRY.histogram("sentinel_rate_limit_wait_seconds", "Time probes waited for a send slot")
+PROBES_SUPPRESSED = REGISTRY.counter("sentinel_probes_suppressed_total", "Hosts skipped because an upstream parent is down")
+DNS_LOOKUPS = REGISTRY.counter("sentinel_dns_lookups_total", "Resolver lookups by outcome")
+DNS_CACHE = REGISTRY.counter("sentinel_dns_cache_total", "Resolver cache hits/misses/stale serves")
+DNS_SECONDS = REGISTRY.histogram("sentinel_dns_seconds", "Resolver lookup latency")
+PLAN_COMPILE_SECONDS = REGISTRY.histogram("sentinel_plan_compile_seconds", "Time to reload hosts and compile the check plan")
+AGENTS_CONNECTED = REGISTRY.gauge("sentinel_collector_agents", "Probe agents connected to the collector")
+COLLECTOR_ROWS = REGISTRY.counter("sentinel_collector_rows_total", "Results received from probe agents, by agent")
+AGENT_BUFFERED = REGISTRY.gauge("sentinel_agent_buffered_rows", "Results an agent holds that the collector has not acknowledged")
+AGENT_ROWS_DROPPED = REGISTRY.counter("sentinel_agent_rows_dropped_total", "Oldest buffered results an agent dropped while disconnected")
+DB_MAINTENANCE_SECONDS = REGISTRY.histogram("sentinel_db_maintenance_seconds", "Time spent in background DB maintenance by operation")
+DB_FREELIST_PAGES = REGISTRY.gauge("sentinel_db_freelist_pages", "Unused pages in the DB file after the last incremental vacuum")
+DB_WAL_BYTES = REGISTRY.gauge("sentinel_db_wal_bytes", "Size of the -wal file after the last checkpoint")
+BACKUP_SECONDS = REGISTRY.histogram("sentinel_backup_seconds", "Time spent taking a backup, by stage (copy/verify/compress)")
+BACKUP_BYTES = REGISTRY.gauge("sentinel_backup_bytes", "Compressed size of the newest backup")
+BACKUP_FAILURES = REGISTRY.counter("sentinel_backup_failures_total", "Backups that failed or did not pass verification")
+ROLLUP_ROWS = REGISTRY.counter("sentinel_rollup_rows_total", "Results folded into the rollup tables")
+API_REQUESTS = REGISTRY.counter("sentinel_api_requests_total", "HTTP API requests by route and status")
+API_CACHE = REGISTRY.counter("sentinel_api_cache_total", "HTTP API responses by cache result (hit/miss/not_modified)")
+FAST_PROBES = REGISTRY.counter("sentinel_fast_probes_total", "High-frequency tier probes by check type and outcome")
+FAST_SERIES = REGISTRY.gauge("sentinel_fast_series", "Series probed by the high-frequency tier")
+REPLAY_ROWS = REGISTRY.counter("sentinel_replay_rows_total", "Captured results fed through the pipeline by a replay")
+REPLAY_LAG = REGISTRY.gauge("sentinel_replay_lag_seconds", "How far a replay runs behind its capture clock")
+HEARTBEATS = REGISTRY.counter("sentinel_heartbeats_total", "Push heartbeats received, by outcome (ok/unknown_host/bad_token/malformed)")
+PUSH_TRANSITIONS = REGISTRY.counter("sentinel_push_transitions_total", "Push hosts going up or down")
+PUSH_HOSTS = REGISTRY.gauge("sentinel_push_hosts", "Hosts tracked by the heartbeat listener")
+PUSH_STATE = REGISTRY.gauge("sentinel_push_hosts_by_state", "Push hosts by liveness state (up/down/pending)")
+HOSTS = REGISTRY.gauge("sentinel_hosts", "Enabled hosts in the last cycle")
+
+# Qt signals emitted by the monitor thread but not yet handled on the UI thread
+SIGNAL_BACKLOG = REGISTRY.gauge("sentinel_signal_backlog", "Queued monitor signals awaiting the UI thread")
+
+# UI
+SLOW_QUERIES = REGISTRY.counter("sentinel_slow_queries_total", "SQL statements over the slow threshold while profiling")
+UI_REFRESH_SECONDS = REGISTRY.histogram("sentinel_ui_refresh_seconds", "Widget refresh time by widget")
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    registry: MetricsRegistry = REGISTRY
+
+    def do_GET(self) -> None:  # noqa: N802
+        if self.path.split("?", 1)[0] not in ("/metrics", "/"):
+            self.send_error(404)
+            return
+        body = self.registry.render_prometheus().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args) -> None:  # silence stderr access log
+        return
+
+
+class MetricsServer:
+    """
+    Serves REGISTRY as Prometheus text on http://host:port/metrics from a daemon thread.
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 9464, registry: MetricsRegistry = REGISTRY):
+        handler = type("Handler", (_MetricsHandler,), {"registry": registry})
+        self._httpd = ThreadingHTTPServer((host, port), handler)
+        self._httpd.daemon_threads = True
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name="metrics-http", daemon=True)
+
+    @property
+    def address(self) -> Tuple[str, int]:
+        return self._httpd.server_address[:2]  # type: ignore[return-value]
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._httpd.shutdown()
+        self._httpd.server_close()
@@ -1,8 +1,11 @@
 from __future__ import annotations
 
-from datetime import datetime
+import time
+from datetime import datetime, timezone
+from enum import IntEnum, IntFlag
 from typing import Optional
 
+from sqlalchemy import Index, text
 from sqlmodel import SQLModel, Field
 
 
@@ -17,19 +20,112 @@ class Host(SQLModel, table=True):
     # IMPORTANT: default empty to avoid false TCP failures on endpoints
     tcp_ports: str = ""  # comma-separated, e.g. "22,80,443"
 
+    # Upstream gateway/switch; when it is down this host is marked unreachable, not probed
+    parent_id: Optional[int] = Field(default=None, index=True)
+
+
+class CheckKind(IntEnum):
+    PING = 0
+    TCP = 1
+    DNS = 2
+    PUSH = 3  # heartbeat pushed by the host (app/heartbeat.py)
+
+
+class Outcome(IntEnum):
+    OK = 0
+    FAIL = 1
+    TIMEOUT = 2
+    UNREACHABLE = 3
+    DNS_FAIL = 4
+    ERROR = 5
+
+
+class ResultFlag(IntFlag):
+    HEARTBEAT = 1  # transitions mode: state unchanged since the previous row (periodic, or closing a state)
+
+
+KIND_BY_NAME = {k.name.lower(): k for k in CheckKind}
+
+
+class MessageCode(SQLModel, table=True):
+    # Dictionary for CheckResult.msg_id; 0 means "no message"
+    id: Optional[int] = Field(default=None, primary_key=True)
+    text: str = Field(index=True, unique=True)
+
 
 class CheckResult(SQLModel, table=True):
+    """
+    Compact result row: integer epoch-ms timestamp, small-int enums, integer
+    port and a message code. The properties below give readers the old
+    string/datetime view without storing it.
+    """
+
+    __table_args__ = (Index("ix_checkresult_series", "host_id", "kind", "port", "ts_ms"),)
+
     id: Optional[int] = Field(default=None, primary_key=True)
 
     host_id: int = Field(index=True)
-    ts: datetime = Field(default_factory=datetime.utcnow, index=True)
+    ts_ms: int = Field(index=True)  # UTC epoch milliseconds
 
-    check_type: str = Field(default="ping", index=True)  # "ping" or "tcp"
-    target: str = Field(default="", index=True)          # e.g. "443" for tcp
+    kind: int = Field(default=CheckKind.PING)  # CheckKind
+    port: int = 0  # tcp port, 0 for ping/dns
+    outcome: int = Field(default=Outcome.OK)  # Outcome
 
-    ok: bool
     rtt_ms: Optional[float] = None
-    message: str = ""
+    msg_id: int = 0  # MessageCode.id
+
+    # Probes this row stands for, all of which had its outcome (several for a
+    # confirmed failure, or skipped probes in "transitions" storage mode), and
+    # ResultFlag bits.
+    samples: int = Field(default=1, sa_column_kwargs={"server_default": text("1")})
+    flags: int = Field(default=0, sa_column_kwargs={"server_default": text("0")})
+
+    @property
+    def ok(self) -> bool:
+        return self.outcome == Outcome.OK
+
+    @property
+    def ts(self) -> datetime:
+        return datetime.utcfromtimestamp(self.ts_ms / 1000.0)
+
+    @property
+    def check_type(self) -> str:
+        return kind_name(self.kind)
+
+    @property
+    def target(self) -> str:
+        return str(self.port) if self.port else ""
+
+
+def kind_name(kind: int) -> str:
+    try:
+        return CheckKind(kind).name.lower()
+    except ValueError:
+        return str(kind)
+
+
+def ts_to_ms(ts: datetime) -> int:
+    # Naive datetimes in this app are UTC
+    return int(ts.replace(tzinfo=timezone.utc).timestamp() * 1000)
+
+
+def fmt_ts_ms(ts_ms: int) -> str:
+    return time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime(ts_ms // 1000))
+
+
+def classify_outcome(ok: bool, message: str) -> Outcome:
+    if ok:
+        return Outcome.OK
+    m = (message or "").lower()
+    if m.startswith("unreachable"):
+        return Outcome.UNREACHABLE
+    if m.startswith("dns fail"):
+        return Outcome.DNS_FAIL
+    if "timeout" in m:
+        return Outcome.TIMEOUT
+    if "error:" in m:
+        return Outcome.ERROR
+    return Outcome.FAIL
 
 
 class AlertEvent(SQLModel, table=True):
@@ -44,3 +140,52 @@ class AlertEvent(SQLModel, table=True):
     severity: str = "CRIT"  # MVP
     message: str = ""
 
+
+class ResultRollup(SQLModel, table=True):
+    """
+    Pre-aggregated CheckResult counts per series and time bucket, maintained
+    incrementally by app.rollup so stats never scan raw results.
+    """
+
+    host_id: int = Field(primary_key=True)
+    kind: int = Field(primary_key=True)
+    port: int = Field(primary_key=True)
+    period_s: int = Field(primary_key=True)  # bucket width: 60 or 3600
+    bucket_ms: int = Field(primary_key=True)  # bucket start, UTC epoch ms
+
+    probes: int = 0  # sum of samples
+    ok_probes: int = 0
+    rtt_n: int = 0
+    rtt_sum: float = 0.0
+    rtt_min: Optional[float] = None
+    rtt_max: Optional[float] = None
+
+
+class RollupWatermark(SQLModel, table=True):
+    # Highest CheckResult.id already folded into ResultRollup
+    name: str = Field(primary_key=True)
+    last_id: int = 0
+
+
+class FastWindow(SQLModel, table=True):
+    """
+    Aggregate of one flush window of the high-frequency tier (app.fastprobe).
+    Individual sub-second probes live only in memory.
+    """
+
+    __table_args__ = (Index("ix_fastwindow_series", "host_id", "kind", "port", "start_ms"),)
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    host_id: int
+    kind: int  # CheckKind.PING / CheckKind.TCP
+    port: int = 0
+    start_ms: int
+    end_ms: int
+
+    probes: int = 0
+    ok_probes: int = 0
+    max_loss_run: int = 0  # longest run of consecutive lost probes
+    rtt_min: Optional[float] = None
+    rtt_avg: Optional[float] = None
+    rtt_p95: Optional[float] = None
+    rtt_max: Optional[float] = None
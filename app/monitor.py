@@ -1,36 +1,27 @@
 from __future__ import annotations
 
 import time
-from datetime import datetime, timedelta
-from typing import List, Dict, Tuple
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import datetime
+from typing import List, Dict, Optional, Set, Tuple
 
 from PySide6.QtCore import QThread, Signal
-from sqlmodel import select, desc
+from sqlmodel import select
 
-from app.db import get_session
-from app.models import Host, CheckResult, AlertEvent
-from app.ping import ping_once, tcp_check
+from app import metrics
+from app.alerting import AlertPolicy, alert_message, confirm_failure, store_alert, wants_confirmation
+from app.db import get_session, hosts_version
+from app.models import Host, Outcome, classify_outcome, ts_to_ms
+from app.ping import CANCELLED, PingResult, ping_once, tcp_check
+from app.ratelimit import LIMITER, Pacer, ProbeLimiter
+from app.resolver import Resolver
+from app.store import ResultTuple, write_results
+from app.transitions import TransitionFilter
+from app.plan import Check, CheckPlan, PlanHost, agent_of, compile_plan, push_interval_of
+from app.profiling import PROFILER
+from app.topology import blocked_by
 
-
-def _parse_ports(s: str) -> List[int]:
-    out: List[int] = []
-    for part in (s or "").split(","):
-        part = part.strip()
-        if not part:
-            continue
-        try:
-            p = int(part)
-            if 1 <= p <= 65535:
-                out.append(p)
-        except ValueError:
-            continue
-    seen = set()
-    uniq = []
-    for p in out:
-        if p not in seen:
-            uniq.append(p)
-            seen.add(p)
-    return uniq
+STORAGE_MODES = ("all", "transitions")
 
 
 class MonitorThread(QThread):
@@ -42,149 +33,429 @@ class MonitorThread(QThread):
 
     status = Signal(str)
 
-    def __init__(self, interval_s: int = 10, timeout_ms: int = 1000, parent=None):
+    def __init__(
+        self,
+        interval_s: int = 10,
+        timeout_ms: int = 1000,
+        storage_mode: str = "all",
+        heartbeat_s: int = 300,
+        spread_fraction: float = 0.5,
+        parent=None,
+    ):
         super().__init__(parent)
+        if storage_mode not in STORAGE_MODES:
+            raise ValueError(f"unknown storage mode {storage_mode!r}")
         self.interval_s = max(1, int(interval_s))
         self.timeout_ms = max(100, int(timeout_ms))
         self._running = True
 
-        # Automatic alert policy (MVP defaults)
-        self.ping_fail_threshold = 3
-        self.tcp_fail_threshold = 3
-        self.cooldown_seconds = 300  # 5 minutes
-
-        # In-memory cooldown tracker to avoid DB-heavy lookups
-        self._last_alert_at: Dict[Tuple[int, str, str], datetime] = {}
+        # Automatic alert policy (MVP defaults: 3 failed probes, 5 minute cooldown);
+        # the agent collector applies the same policy to remote results
+        self.alerting = AlertPolicy()
+
+        # Failure confirmation: a failed probe on a healthy series is re-probed
+        # confirm_retries times, confirm_spacing_ms apart. One success means
+        # transient loss (reported OK); all failing is a confirmed failure that
+        # counts every probe toward the thresholds above, so a real outage
+        # alerts within one cycle instead of after threshold * interval_s.
+        self.confirm_retries = 2
+        self.confirm_spacing_ms = 250
+
+        # Hosts tagged hedge_tag get hedge_probes parallel probes per attempt;
+        # the first success wins, so one lost packet never fails a critical host
+        self.hedge_tag = "critical"
+        self.hedge_probes = 2
+        self._hedge_pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix="hedge")
+        self._deadline = 0.0
+        self._starved: Set[int] = set()  # hosts whose ping the cycle deadline cancelled
+
+        # Every probe (hedges and confirmations included) takes a send slot from
+        # the shared global / per-subnet / per-target token buckets. With
+        # spread_fraction > 0, a cycle's checks are also paced evenly over that
+        # fraction of the interval instead of going out back to back.
+        self.limiter: ProbeLimiter = LIMITER
+        self.spread_fraction = min(1.0, max(0.0, float(spread_fraction)))
+        self._pacer: Optional[Pacer] = None
+
+        # "all" writes every probe; "transitions" writes only state changes plus
+        # a heartbeat row every heartbeat_s (see app/transitions.py)
+        self.storage_mode = storage_mode
+        self.heartbeat_s = max(1, int(heartbeat_s))
+        self._transitions = TransitionFilter(heartbeat_s=self.heartbeat_s)
+
+        # Deadline-aware scheduling: keep a fixed cadence and shed low-priority
+        # checks (TCP on hosts whose ping is down, then overdue TCP) on overrun
+        self.deadline_mode = True
+        self._last_run: Dict[Tuple[int, str, str], float] = {}
+
+        # Hostnames are resolved once per TTL, not by every ping/connect
+        self.resolver = Resolver()
+
+        # Set by a UI whose result/alert slots decrement SIGNAL_BACKLOG on delivery;
+        # headless runs (CLI, recorder, replay) have no such receiver to drain it
+        self.track_backlog = False
+
+        # Compiled once, rebuilt only when the host table changes
+        self._plan: Optional[CheckPlan] = None
+        self._plan_dirty = True
 
     def stop(self) -> None:
         self._running = False
 
-    def _store_result(self, host_id: int, check_type: str, target: str, ok: bool, rtt_ms, ts, message: str) -> None:
+    def invalidate_plan(self) -> None:
+        """Slot for HostsWidget.hosts_changed; the plan is recompiled next cycle."""
+        self._plan_dirty = True
+
+    def _current_plan(self) -> CheckPlan:
         try:
-            with get_session() as session:
-                session.add(
-                    CheckResult(
-                        host_id=host_id,
-                        ts=ts,
-                        check_type=check_type,
-                        target=target or "",
-                        ok=ok,
-                        rtt_ms=rtt_ms,
-                        message=message,
-                    )
-                )
-                session.commit()
+            version = hosts_version()
+            if self._plan is not None and not self._plan_dirty and self._plan.version == version:
+                return self._plan
+
+            # Clear first: an invalidation arriving during the read forces another rebuild
+            self._plan_dirty = False
+            with metrics.PLAN_COMPILE_SECONDS.time(), get_session() as session:
+                hosts: List[Host] = list(session.exec(select(Host).where(Host.enabled == True)))  # noqa: E712
+                # Hosts tagged for a remote agent are probed there (see app/collector.py);
+                # push hosts send heartbeats instead (see app/heartbeat.py)
+                hosts = [h for h in hosts if agent_of(h.tags) is None and push_interval_of(h.tags) is None]
+                self._plan = compile_plan(hosts, self.interval_s, version=version)
+            # Deleted/disabled hosts: a re-enabled one must not close a stale state
+            self._transitions.retain(self._plan.hosts)
+        except Exception as e:
+            metrics.DB_ERRORS.inc(op="hosts")
+            self.status.emit(f"DB read error: {e}")
+            self._plan_dirty = True
+            if self._plan is None:
+                return CheckPlan(version=-1, interval_s=self.interval_s)
+            return self._plan
+        self.status.emit(f"Check plan compiled: {len(self._plan.hosts)} hosts, {len(self._plan)} checks")
+        return self._plan
+
+    def _store_result(
+        self, host_id: int, check_type: str, target: str, ok: bool, rtt_ms, ts, message: str, samples: int = 1
+    ) -> None:
+        rows: List[ResultTuple] = []
+        flags = 0
+        if self.storage_mode == "transitions":
+            d = self._transitions.offer(host_id, check_type, target, ok, rtt_ms, ts_to_ms(ts), message, samples)
+            if not d.persist:
+                metrics.RESULTS_SKIPPED.inc()
+                return
+            samples, flags = d.samples, d.flags
+            c = d.close
+            if c is not None:
+                closed_at = datetime.utcfromtimestamp(c.ts_ms / 1000.0)
+                rows.append((host_id, check_type, target or "", c.ok, c.rtt_ms, closed_at, c.message, c.samples, c.flags))
+        rows.append((host_id, check_type, target or "", ok, rtt_ms, ts, message, samples, flags))
+        try:
+            with metrics.DB_COMMIT_SECONDS.time(op="result"):
+                write_results(rows)
         except Exception as e:
+            metrics.DB_ERRORS.inc(op="result")
             self.status.emit(f"DB write error: {e}")
 
-    def _fail_streak(self, host_id: int, check_type: str, target: str, limit: int = 50) -> int:
-        with get_session() as session:
-            recent = list(
-                session.exec(
-                    select(CheckResult)
-                    .where(
-                        CheckResult.host_id == host_id,
-                        CheckResult.check_type == check_type,
-                        CheckResult.target == (target or ""),
-                    )
-                    .order_by(desc(CheckResult.ts))
-                    .limit(limit)
-                )
-            )
-        streak = 0
-        for r in recent:
-            if r.ok:
-                break
-            streak += 1
-        return streak
-
-    def _maybe_alert(self, host: Host, check_type: str, target: str, threshold: int) -> None:
-        host_id = int(host.id or 0)
-        key = (host_id, check_type, target or "")
-        now = datetime.utcnow()
-
-        streak = self._fail_streak(host_id, check_type, target)
-        if streak < threshold:
+    def _flush_transitions(self) -> None:
+        """Write the probes the transition filter still holds back, so stopping loses none."""
+        rows: List[ResultTuple] = [
+            (host_id, check_type, target, c.ok, c.rtt_ms, datetime.utcfromtimestamp(c.ts_ms / 1000.0), c.message, c.samples, c.flags)
+            for (host_id, check_type, target), c in self._transitions.drain()
+        ]
+        if not rows:
             return
+        try:
+            with metrics.DB_COMMIT_SECONDS.time(op="result"):
+                write_results(rows)
+        except Exception as e:
+            metrics.DB_ERRORS.inc(op="result")
+            self.status.emit(f"DB write error: {e}")
 
-        # Cooldown
-        last = self._last_alert_at.get(key)
-        if last and (now - last) < timedelta(seconds=self.cooldown_seconds):
+    def _publish(self, host_id: int, check_type: str, target: str, ok: bool, rtt_ms, message: str, samples: int = 1) -> None:
+        """`samples` > 1 when one row stands for several failed probes (a confirmed failure)."""
+        ts = datetime.utcnow()
+        key = (host_id, check_type, target)
+        self.alerting.streak(key)  # seeded from the rows before this one
+        self._store_result(host_id, check_type, target, ok, rtt_ms, ts, message, samples)
+
+        # Children of a down parent were not probed: their streak stands still
+        if ok or classify_outcome(ok, message) != Outcome.UNREACHABLE:
+            self.alerting.record(key, ok, samples)
+
+        if self.track_backlog:
+            metrics.SIGNAL_BACKLOG.inc()
+        self.result.emit(host_id, check_type, target, ok, rtt_ms, ts, message)
+
+    def _probe(self, check_type: str, fn, *args, **kwargs) -> PingResult:
+        # args[0] is the address; a send slot past the cycle deadline is a cancellation
+        if not self.limiter.acquire(args[0], deadline=kwargs.get("deadline")):
+            return PingResult(ok=False, rtt_ms=None, message=CANCELLED, cancelled=True)
+        t0 = time.perf_counter()
+        r = fn(*args, **kwargs)
+        metrics.PROBE_SECONDS.observe(time.perf_counter() - t0, check_type=check_type)
+        metrics.PROBES.inc(check_type=check_type, outcome="ok" if r.ok else "fail")
+        return r
+
+    def _attempt(self, check_type: str, hedge: int, fn, *args, **kwargs) -> PingResult:
+        """One probe, or `hedge` parallel probes of which the first success wins."""
+        if hedge <= 1:
+            return self._probe(check_type, fn, *args, **kwargs)
+        metrics.PROBES_HEDGED.inc(hedge - 1, check_type=check_type)
+        pending = {self._hedge_pool.submit(self._probe, check_type, fn, *args, **kwargs) for _ in range(hedge)}
+        failed: Optional[PingResult] = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for f in done:
+                r = f.result()
+                if r.ok:
+                    return r  # stragglers finish in the pool; their outcome no longer matters
+                failed = failed or r
+        assert failed is not None
+        return failed
+
+    def _confirmed_probe(self, h: PlanHost, check_type: str, target: str, fn, *args, **kwargs) -> Tuple[PingResult, int]:
+        """
+        Probe with hedging and failure confirmation. Returns the result and how
+        many failed probes it stands for (1 unless a failure was confirmed).
+        """
+        hedge = self.hedge_probes if h.has_tag(self.hedge_tag) else 1
+        r = self._attempt(check_type, hedge, fn, *args, **kwargs)
+        if r.ok:
+            return r, 1
+        if r.cancelled:
+            return r, 0
+
+        # Skipped past the cycle deadline too: the next cycle is due
+        if (
+            self.confirm_retries <= 0
+            or not wants_confirmation(r, self.alerting.streak((h.id, check_type, target)))
+            or time.monotonic() >= self._deadline
+        ):
+            return r, 1
+        return confirm_failure(
+            check_type,
+            r,
+            lambda: self._attempt(check_type, hedge, fn, *args, **kwargs),
+            self.confirm_retries,
+            self.confirm_spacing_ms,
+            keep_going=lambda: self._running,
+        )
+
+    def _maybe_alert(self, host: PlanHost, check_type: str, target: str) -> None:
+        with metrics.ALERT_EVAL_SECONDS.time(check_type=check_type):
+            self._maybe_alert_inner(host, check_type, target)
+
+    def _maybe_alert_inner(self, host: PlanHost, check_type: str, target: str) -> None:
+        host_id = host.id
+        now = datetime.utcnow()
+        streak = self.alerting.due((host_id, check_type, target or ""), now)
+        if streak is None:
             return
-
-        msg = f"{host.name} ({host.address}) {check_type.upper()} {target or ''} failing: streak={streak}".strip()
+        msg = alert_message(host.name, host.address, check_type, target, streak)
 
         # store alert event
         try:
-            with get_session() as session:
-                session.add(
-                    AlertEvent(
-                        ts=now,
-                        host_id=host_id,
-                        check_type=check_type,
-                        target=(target or ""),
-                        severity="CRIT",
-                        message=msg,
-                    )
-                )
-                session.commit()
+            store_alert(now, host_id, check_type, target, msg)
         except Exception as e:
+            metrics.DB_ERRORS.inc(op="alert")
             self.status.emit(f"DB alert write error: {e}")
 
-        self._last_alert_at[key] = now
+        if self.track_backlog:
+            metrics.SIGNAL_BACKLOG.inc()
         self.alert.emit(now, "CRIT", host_id, check_type, (target or ""), msg)
 
+    def _resolve(self, h: PlanHost) -> str | None:
+        """
+        Cached IP for the host, or None after reporting a "dns" failure result.
+        """
+        res = self.resolver.resolve(h.address)
+        if res.ok:
+            # A failing series is closed with one OK row, so its streak (and
+            # the one a restarted monitor seeds from the DB) starts over
+            if self.alerting.streak((h.id, "dns", "")) > 0:
+                self._publish(h.id, "dns", "", True, None, f"Resolved to {res.address}")
+            return res.address
+
+        self._publish(h.id, "dns", "", False, None, res.message)
+        self._maybe_alert(h, "dns", "")
+        return None
+
+    def _probe_deadline(self) -> Optional[float]:
+        return self._deadline if self.deadline_mode else None
+
+    def _run_ping(self, h: PlanHost, address: str) -> Optional[bool]:
+        """True/False for up/down, None if the cycle deadline cancelled the probe."""
+        host_id = h.id
+        if self._pacer is not None:
+            self._pacer.wait()
+        self._note_lateness(host_id, "ping", "")
+        pr, probes = self._confirmed_probe(
+            h, "ping", "", ping_once, address, timeout_ms=self.timeout_ms, deadline=self._probe_deadline()
+        )
+        if pr.cancelled:
+            self._starved.add(host_id)
+            return None
+        self._starved.discard(host_id)
+        self._publish(host_id, "ping", "", pr.ok, pr.rtt_ms, pr.message, samples=probes)
+
+        # Automatic ping alert
+        if not pr.ok:
+            self._maybe_alert(h, "ping", "")
+        return pr.ok
+
+    def _mark_unreachable(self, h: PlanHost, parent: PlanHost | None) -> None:
+        label = parent.name if parent else "parent"
+        metrics.PROBES_SUPPRESSED.inc()
+        self._publish(h.id, "ping", "", False, None, f"Unreachable ({label} down)")
+
+    def _run_tcp(self, h: PlanHost, check: Check, address: str) -> bool:
+        """False if the cycle deadline cancelled the probe before it learned anything."""
+        host_id = h.id
+        tgt = check.target
+        if self._pacer is not None:
+            self._pacer.wait()
+        self._note_lateness(host_id, "tcp", tgt)
+        tr, probes = self._confirmed_probe(
+            h, "tcp", tgt, tcp_check, address, int(tgt),
+            timeout_ms=min(1200, self.timeout_ms), deadline=self._probe_deadline(),
+        )
+        if tr.cancelled:
+            return False
+        self._publish(host_id, "tcp", tgt, tr.ok, tr.rtt_ms, tr.message, samples=probes)
+
+        # Automatic tcp alert
+        if not tr.ok:
+            self._maybe_alert(h, "tcp", tgt)
+        return True
+
+    def _note_lateness(self, host_id: int, check_type: str, target: str) -> None:
+        """
+        Lateness = how long past its due time (last run + interval) a check actually ran.
+        """
+        key = (host_id, check_type, target)
+        now = time.monotonic()
+        last = self._last_run.get(key)
+        if last is not None:
+            metrics.CHECK_LATENESS.observe(max(0.0, now - last - self.interval_s), check_type=check_type)
+        self._last_run[key] = now
+
+    def _tcp_order(self, tcp_checks: List[Tuple[Check, str]]) -> List[Tuple[Check, str]]:
+        # Most overdue first, so deferred checks are not starved by the ones that ran last cycle
+        def last_run(item: Tuple[Check, str]) -> float:
+            return self._last_run.get((item[0].host_id, "tcp", item[0].target), 0.0)
+
+        return sorted(tcp_checks, key=last_run)
+
     def run(self) -> None:
         self.status.emit(f"Monitor running: interval={self.interval_s}s timeout={self.timeout_ms}ms")
 
-        while self._running:
-            loop_start = time.time()
+        self._transitions = TransitionFilter(heartbeat_s=self.heartbeat_s)
+        next_due = time.monotonic()
+        overloaded = False
 
-            try:
-                with get_session() as session:
-                    hosts: List[Host] = list(session.exec(select(Host).where(Host.enabled == True)))  # noqa: E712
-            except Exception as e:
-                self.status.emit(f"DB read error: {e}")
-                hosts = []
+        while self._running:
+            loop_start = time.monotonic()
+            deadline = loop_start + self.interval_s
+            self._deadline = deadline
+            profiled = PROFILER.begin("cycle", "monitor")
+
+            plan = self._current_plan()
+            metrics.HOSTS.set(len(plan.hosts))
+
+            # Resolve new/expired names concurrently up front, bounded by the timeout
+            self.resolver.prefetch((h.address for h in plan.hosts.values()), timeout_s=self.timeout_ms / 1000)
+            self._pacer = Pacer(len(plan), self.spread_fraction * self.interval_s) if self.spread_fraction > 0 else None
+
+            # Phase 1: pings are high priority and always run, parents before children.
+            # Children of a down parent are marked unreachable instead of probed.
+            down: Set[int] = set()
+            unreachable: Set[int] = set()
+            tcp_checks: List[Tuple[Check, str]] = []
+            cancelled = 0
+            # Parents still go first; within a level, hosts whose ping the
+            # deadline cancelled last cycle go to the front so they are not starved
+            starved = self._starved
+            ping_order = sorted(plan.ping_order, key=lambda c: (plan.depth.get(c.host_id, 0), c.host_id not in starved))
+            for check in ping_order:
+                if not self._running:
+                    break
+                host_id = check.host_id
+                h = plan.hosts[host_id]
+                blocker = blocked_by(host_id, plan.parents, down | unreachable)
+                if blocker is not None:
+                    unreachable.add(host_id)
+                    self._mark_unreachable(h, plan.hosts.get(blocker))
+                    continue
+                ip = self._resolve(h)
+                if ip is None:
+                    down.add(host_id)
+                    continue
+                up = self._run_ping(h, ip)
+                if up is None:
+                    # Nothing learned: neither down (children stay probed) nor worth TCP
+                    cancelled += 1 + len(plan.tcp_by_host.get(host_id, ()))
+                    continue
+                if not up:
+                    down.add(host_id)
 
-            for h in hosts:
+                # TCP (only if ports configured)
+                for tc in plan.tcp_by_host.get(host_id, ()):
+                    tcp_checks.append((tc, ip))
+
+            # Phase 2: TCP is low priority; shed/defer it when we cannot keep up
+            shed = 0
+            deferred = 0
+            if self.deadline_mode:
+                if overloaded or time.monotonic() >= deadline:
+                    before = len(tcp_checks)
+                    tcp_checks = [c for c in tcp_checks if c[0].host_id not in down]
+                    shed = before - len(tcp_checks)
+                tcp_checks = self._tcp_order(tcp_checks)
+
+            for i, (tc, ip) in enumerate(tcp_checks):
                 if not self._running:
                     break
-                host_id = int(h.id or 0)
+                if self.deadline_mode and time.monotonic() >= deadline:
+                    deferred = len(tcp_checks) - i
+                    break
+                if not self._run_tcp(plan.hosts[tc.host_id], tc, ip):
+                    deferred = len(tcp_checks) - i
+                    break
 
-                # PING
-                pr = ping_once(h.address, timeout_ms=self.timeout_ms)
-                ts = datetime.utcnow()
-                self._store_result(host_id, "ping", "", pr.ok, pr.rtt_ms, ts, pr.message)
-                self.result.emit(host_id, "ping", "", pr.ok, pr.rtt_ms, ts, pr.message)
+            if shed:
+                metrics.CHECKS_SHED.inc(shed, reason="host_down")
+            if deferred:
+                metrics.CHECKS_SHED.inc(deferred, reason="deadline")
+            if cancelled:
+                metrics.CHECKS_SHED.inc(cancelled, reason="cancelled")
+            metrics.CHECK_BACKLOG.set(shed + deferred + cancelled)
+            PROFILER.end(profiled)
+
+            now = time.monotonic()
+            elapsed = now - loop_start
+            metrics.CYCLE_SECONDS.observe(elapsed)
+            lag = max(0.0, elapsed - self.interval_s)
+            metrics.CYCLE_LAG.set(lag)
+            overloaded = lag > 0 or deferred > 0 or cancelled > 0
+            if overloaded:
+                metrics.CYCLE_OVERRUN.inc()
+                self.status.emit(
+                    f"Monitor behind: cycle took {elapsed:.1f}s (interval {self.interval_s}s), "
+                    f"backlog={shed + deferred} (shed {shed}, deferred {deferred})"
+                )
 
-                # Automatic ping alert
-                if not pr.ok:
-                    self._maybe_alert(h, "ping", "", threshold=self.ping_fail_threshold)
+            # Fixed cadence: skip missed slots instead of drifting further behind
+            next_due += self.interval_s
+            if now > next_due:
+                missed = int((now - next_due) // self.interval_s) + 1
+                metrics.CYCLES_SKIPPED.inc(missed)
+                next_due += missed * self.interval_s
+            sleep_for = max(0.1, next_due - now) if self.deadline_mode else max(0.1, self.interval_s - elapsed)
 
-                # TCP (only if ports configured)
-                ports = _parse_ports(getattr(h, "tcp_ports", "") or "")
-                if ports:
-                    for p in ports:
-                        if not self._running:
-                            break
-                        tr = tcp_check(h.address, p, timeout_ms=min(1200, self.timeout_ms))
-                        ts2 = datetime.utcnow()
-                        tgt = str(p)
-
-                        self._store_result(host_id, "tcp", tgt, tr.ok, tr.rtt_ms, ts2, tr.message)
-                        self.result.emit(host_id, "tcp", tgt, tr.ok, tr.rtt_ms, ts2, tr.message)
-
-                        # Automatic tcp alert
-                        if not tr.ok:
-                            self._maybe_alert(h, "tcp", tgt, threshold=self.tcp_fail_threshold)
-
-            elapsed = time.time() - loop_start
-            sleep_for = max(0.1, self.interval_s - elapsed)
-
-            end_time = time.time() + sleep_for
-            while self._running and time.time() < end_time:
+            end_time = time.monotonic() + sleep_for
+            while self._running and time.monotonic() < end_time:
                 time.sleep(0.1)
 
+        self._flush_transitions()
+        self.resolver.close()
+        self._hedge_pool.shutdown(wait=False, cancel_futures=True)
         self.status.emit("Monitor stopped.")
-
@@ -1,11 +1,13 @@
 from __future__ import annotations
 
+import math
 import platform
 import subprocess
 import re
 import socket
+import time
 from dataclasses import dataclass
-from typing import Optional
+from typing import Optional, Tuple
 
 
 @dataclass
@@ -13,26 +15,82 @@ class PingResult:
     ok: bool
     rtt_ms: Optional[float]
     message: str
+    # True when the caller's deadline, not the probe's own timeout, ended it:
+    # nothing is known about the target, so it must not count as a failure
+    cancelled: bool = False
 
 
 _RTT_RE = re.compile(r"time[=<]\s*(\d+(?:\.\d+)?)\s*ms", re.IGNORECASE)
 
+# Probe deadline model (all check types):
+# - `timeout_ms` is the probe's own budget and is honoured as given;
+# - `deadline` (optional, time.monotonic() seconds) is the caller's hard stop,
+#   e.g. the end of a monitor cycle; the budget is clipped to what is left;
+# - budgets under MIN_PROBE_MS are not started, and a probe ended by the
+#   clipped budget reports `cancelled` instead of a timeout;
+# - RTTs are measured with time.perf_counter().
+MIN_PROBE_MS = 20
+CANCELLED = "Cancelled: cycle deadline"
 
-def ping_once(host: str, timeout_ms: int = 1000) -> PingResult:
-    system = platform.system().lower()
+# Process start-up allowance on top of the budget before ping is killed
+_SPAWN_SLACK_S = 0.05
 
-    if system == "windows":
-        cmd = ["ping", "-n", "1", "-w", str(timeout_ms), host]
-    else:
-        cmd = ["ping", "-c", "1", host]
+_SYSTEM = platform.system().lower()
 
+# Stand-in for the network, e.g. app.simulator.SimBackend; None = real probes.
+# A backend provides ping(host, budget_ms, clipped) and
+# tcp(host, port, budget_ms, clipped), both returning a PingResult.
+_backend = None
+
+
+def set_backend(backend) -> None:
+    """Route ping_once/tcp_check through `backend` (None restores real probes)."""
+    global _backend
+    _backend = backend
+
+
+def get_backend():
+    return _backend
+
+
+def probe_budget_ms(timeout_ms: float, deadline: Optional[float] = None) -> Tuple[float, bool]:
+    """(effective timeout in ms, True if the deadline rather than timeout_ms set it)."""
+    if deadline is None:
+        return float(timeout_ms), False
+    remaining = (deadline - time.monotonic()) * 1000.0
+    if remaining < timeout_ms:
+        return remaining, True
+    return float(timeout_ms), False
+
+
+def _ping_cmd(host: str, budget_ms: float) -> list:
+    if _SYSTEM == "windows":
+        return ["ping", "-n", "1", "-w", str(max(1, int(budget_ms))), host]
+    if _SYSTEM == "darwin":
+        # BSD ping: -W is the reply wait in ms
+        return ["ping", "-n", "-c", "1", "-W", str(max(1, int(budget_ms))), host]
+    # iputils: -W is whole seconds on older releases; the exact budget is
+    # enforced by the subprocess timeout, -W only stops ping lingering past it.
+    # -n skips the reverse lookup that can stall output for seconds.
+    return ["ping", "-n", "-c", "1", "-W", str(max(1, math.ceil(budget_ms / 1000))), host]
+
+
+def ping_once(host: str, timeout_ms: int = 1000, deadline: Optional[float] = None) -> PingResult:
+    budget, clipped = probe_budget_ms(timeout_ms, deadline)
+    if budget < MIN_PROBE_MS:
+        return PingResult(ok=False, rtt_ms=None, message=CANCELLED, cancelled=True)
+    if _backend is not None:
+        return _backend.ping(host, budget, clipped)
+
+    t0 = time.perf_counter()
     try:
         proc = subprocess.run(
-            cmd,
+            _ping_cmd(host, budget),
             capture_output=True,
             text=True,
-            timeout=max(2, timeout_ms / 1000 + 1),
+            timeout=budget / 1000 + _SPAWN_SLACK_S,
         )
+        elapsed_ms = (time.perf_counter() - t0) * 1000.0
         out = (proc.stdout or "") + "\n" + (proc.stderr or "")
         ok = proc.returncode == 0
 
@@ -43,29 +101,41 @@ def ping_once(host: str, timeout_ms: int = 1000) -> PingResult:
                 rtt = float(m.group(1))
             except ValueError:
                 rtt = None
+        if ok and rtt is None:
+            rtt = elapsed_ms  # upper bound, includes process start-up
 
         msg = "OK" if ok else "No reply"
         return PingResult(ok=ok, rtt_ms=rtt, message=msg)
 
     except subprocess.TimeoutExpired:
+        if clipped:
+            return PingResult(ok=False, rtt_ms=None, message=CANCELLED, cancelled=True)
         return PingResult(ok=False, rtt_ms=None, message="Timeout")
     except Exception as e:
         return PingResult(ok=False, rtt_ms=None, message=f"Ping error: {e}")
 
 
-def tcp_check(host: str, port: int, timeout_ms: int = 800) -> PingResult:
+def tcp_check(host: str, port: int, timeout_ms: int = 800, deadline: Optional[float] = None) -> PingResult:
     """
-    TCP connect check. RTT is approximate connect time.
+    TCP connect check. RTT is the connect time.
     """
+    budget, clipped = probe_budget_ms(timeout_ms, deadline)
+    if budget < MIN_PROBE_MS:
+        return PingResult(ok=False, rtt_ms=None, message=CANCELLED, cancelled=True)
+    if _backend is not None:
+        return _backend.tcp(host, int(port), budget, clipped)
+
     s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-    s.settimeout(max(0.2, timeout_ms / 1000))
+    s.settimeout(budget / 1000)
     try:
-        import time
-
-        t0 = time.time()
+        t0 = time.perf_counter()
         s.connect((host, int(port)))
-        rtt = (time.time() - t0) * 1000.0
+        rtt = (time.perf_counter() - t0) * 1000.0
         return PingResult(ok=True, rtt_ms=rtt, message="TCP open")
+    except socket.timeout:
+        if clipped:
+            return PingResult(ok=False, rtt_ms=None, message=CANCELLED, cancelled=True)
+        return PingResult(ok=False, rtt_ms=None, message="TCP fail: TimeoutError")
     except Exception as e:
         return PingResult(ok=False, rtt_ms=None, message=f"TCP fail: {type(e).__name__}")
     finally:
@@ -73,4 +143,3 @@ def tcp_check(host: str, port: int, timeout_ms: int = 800) -> PingResult:
             s.close()
         except Exception:
             pass
-
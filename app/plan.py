@@ -0,0 +1,138 @@
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, NamedTuple, Optional
+
+from app.models import Host
+from app.ratelimit import spread_order
+from app.topology import depth_levels, effective_parents
+
+
+def parse_ports(s: str) -> List[int]:
+    out: List[int] = []
+    for part in (s or "").split(","):
+        part = part.strip()
+        if not part:
+            continue
+        try:
+            p = int(part)
+            if 1 <= p <= 65535:
+                out.append(p)
+        except ValueError:
+            continue
+    seen = set()
+    uniq = []
+    for p in out:
+        if p not in seen:
+            uniq.append(p)
+            seen.add(p)
+    return uniq
+
+
+AGENT_TAG_PREFIX = "agent:"
+ANY_AGENT = "*"
+
+
+def agent_of(tags: str) -> Optional[str]:
+    """
+    Remote agent a host is assigned to by an "agent:<name>" tag ("agent:*" =
+    any connected agent), or None when the local monitor probes it.
+    """
+    for t in (tags or "").split(","):
+        t = t.strip()
+        if t.lower().startswith(AGENT_TAG_PREFIX):
+            return t[len(AGENT_TAG_PREFIX):].strip() or ANY_AGENT
+    return None
+
+
+PUSH_TAG = "push"
+DEFAULT_PUSH_INTERVAL_S = 60.0
+
+
+def push_interval_of(tags: str) -> Optional[float]:
+    """
+    Heartbeat period (s) of a host tagged "push" or "push:<seconds>", which
+    reports in to app/heartbeat.py instead of being probed; None otherwise.
+    """
+    for t in (tags or "").split(","):
+        name, _, value = t.strip().partition(":")
+        if name.lower() != PUSH_TAG:
+            continue
+        try:
+            return max(1.0, float(value)) if value.strip() else DEFAULT_PUSH_INTERVAL_S
+        except ValueError:
+            return DEFAULT_PUSH_INTERVAL_S
+    return None
+
+
+@dataclass(frozen=True)
+class PlanHost:
+    """Immutable snapshot of the Host fields the probe path needs."""
+
+    id: int
+    name: str
+    address: str
+    tags: str = ""
+    parent_id: Optional[int] = None
+
+    def has_tag(self, tag: str) -> bool:
+        return tag.lower() in (t.strip().lower() for t in self.tags.split(","))
+
+
+class Check(NamedTuple):
+    host_id: int
+    check_type: str  # "ping" | "tcp"
+    target: str  # "" for ping, port for tcp
+    address: str
+    interval_s: int
+
+
+@dataclass
+class CheckPlan:
+    version: int
+    interval_s: int
+    hosts: Dict[int, PlanHost] = field(default_factory=dict)
+    parents: Dict[int, Optional[int]] = field(default_factory=dict)
+    checks: List[Check] = field(default_factory=list)  # flat, parents first, ping before tcp per host
+    ping_order: List[Check] = field(default_factory=list)
+    tcp_by_host: Dict[int, List[Check]] = field(default_factory=dict)
+    depth: Dict[int, int] = field(default_factory=dict)  # host_id -> topology level
+
+    def __len__(self) -> int:
+        return len(self.checks)
+
+
+def compile_plan(hosts: Iterable[Host], interval_s: int, version: int = 0) -> CheckPlan:
+    """
+    Flatten enabled hosts into the check list the monitor iterates every cycle.
+    All parsing (ports, topology) happens here, once per host-table change.
+    """
+    snaps = [
+        PlanHost(
+            id=int(h.id),
+            name=h.name,
+            address=(h.address or "").strip(),
+            tags=h.tags or "",
+            parent_id=getattr(h, "parent_id", None),
+        )
+        for h in hosts
+        if h.id is not None and h.enabled
+    ]
+
+    plan = CheckPlan(version=version, interval_s=int(interval_s))
+    plan.hosts = {h.id: h for h in snaps}
+    plan.parents = effective_parents(snaps)
+
+    port_map = {int(h.id): parse_ports(getattr(h, "tcp_ports", "") or "") for h in hosts if h.id is not None}
+    for depth, level in enumerate(depth_levels(snaps)):
+        # Interleave subnets so a serial sweep does not queue on one /24's rate limit
+        for h in spread_order(level, key=lambda h: h.address):
+            plan.depth[h.id] = depth
+            ping = Check(h.id, "ping", "", h.address, plan.interval_s)
+            plan.ping_order.append(ping)
+            plan.checks.append(ping)
+            tcp = [Check(h.id, "tcp", str(p), h.address, plan.interval_s) for p in port_map.get(h.id, [])]
+            if tcp:
+                plan.tcp_by_host[h.id] = tcp
+                plan.checks.extend(tcp)
+    return plan
@@ -0,0 +1,288 @@
+from __future__ import annotations
+
+import cProfile
+import io
+import os
+import pstats
+import sys
+import threading
+import time
+from collections import Counter, deque
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Deque, Dict, Iterator, List, Optional, Tuple
+
+from sqlalchemy import event
+
+from app import metrics
+from app.db import data_dir, engine
+
+MODES = ("sample", "cprofile")
+SAMPLE_INTERVAL_MS = 5
+SLOW_SQL_MS = 50.0
+SLOW_SQL_KEEP = 200
+_MAX_DEPTH = 128
+_STATEMENT_CHARS = 400
+
+
+@dataclass
+class SlowQuery:
+    ts: datetime
+    ms: float
+    thread: str
+    statement: str
+
+    def line(self) -> str:
+        return f"{self.ts:%Y-%m-%d %H:%M:%S} {self.ms:8.1f} ms [{self.thread}] {self.statement}"
+
+
+def _frame_label(code) -> str:
+    # ';' separates frames in the folded format
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})".replace(";", ":")
+
+
+def _fold(frame, root: str) -> str:
+    names: List[str] = []
+    while frame is not None and len(names) < _MAX_DEPTH:
+        names.append(_frame_label(frame.f_code))
+        frame = frame.f_back
+    names.append(root)
+    return ";".join(reversed(names))
+
+
+@dataclass
+class _Session:
+    mode: str
+    budgets: Dict[str, int]
+    interval_s: float
+    slow_sql_ms: float
+    out_dir: str
+    started: datetime = field(default_factory=datetime.now)
+    sections: Counter = field(default_factory=Counter)
+    profiles: Dict[str, cProfile.Profile] = field(default_factory=dict)
+    stacks: Dict[str, Counter] = field(default_factory=dict)
+    slow: List[SlowQuery] = field(default_factory=list)
+    # thread ident -> folded root ("cycle;monitor", "ui;fleet") while inside a section
+    active: Dict[int, str] = field(default_factory=dict)
+    closed: bool = False
+
+    @property
+    def exhausted(self) -> bool:
+        return all(n <= 0 for n in self.budgets.values()) and not self.active
+
+
+class Profiler:
+    """
+    Opt-in profiling of the next N monitor cycles and M widget refreshes,
+    switched on and off at runtime (Diagnostics tab). Off, a section costs
+    one attribute check.
+
+    mode "sample": a background thread reads sys._current_frames() every
+    interval and counts the stacks of threads inside a section; written as
+    folded stacks (one "frame;frame;... count" line each), the input of
+    flamegraph.pl, speedscope and inferno.
+    mode "cprofile": deterministic per-call profile of each section,
+    written as .prof (pstats, snakeviz, flameprof) plus a text summary.
+
+    For the same window, SQLAlchemy statements slower than slow_sql_ms are
+    kept with their timings. Statements on raw sqlite3 connections
+    (maintenance, archive, migrations) are not seen.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._session: Optional[_Session] = None
+        self._sampler: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self.slow_queries: Deque[SlowQuery] = deque(maxlen=SLOW_SQL_KEEP)
+        self.last_outputs: List[str] = []
+        self.last_summary = ""
+
+    @property
+    def active(self) -> bool:
+        return self._session is not None
+
+    def remaining(self) -> Dict[str, int]:
+        s = self._session
+        return {k: max(0, v) for k, v in s.budgets.items()} if s else {}
+
+    # ---- control ----
+
+    def start(
+        self,
+        cycles: int = 3,
+        ui_calls: int = 20,
+        mode: str = "sample",
+        interval_ms: float = SAMPLE_INTERVAL_MS,
+        slow_sql_ms: float = SLOW_SQL_MS,
+        out_dir: Optional[str] = None,
+    ) -> None:
+        if mode not in MODES:
+            raise ValueError(f"unknown profiling mode {mode!r}")
+        with self._lock:
+            if self._session is not None:
+                raise RuntimeError("profiling is already running")
+            self._session = _Session(
+                mode=mode,
+                budgets={"cycle": int(cycles), "ui": int(ui_calls)},
+                interval_s=max(0.001, interval_ms / 1000.0),
+                slow_sql_ms=float(slow_sql_ms),
+                out_dir=out_dir or data_dir("profiles"),
+            )
+        event.listen(engine, "before_cursor_execute", self._before_sql)
+        event.listen(engine, "after_cursor_execute", self._after_sql)
+        if mode == "sample":
+            self._stop.clear()
+            self._sampler = threading.Thread(target=self._sample_loop, name="profiler", daemon=True)
+            self._sampler.start()
+
+    def stop(self) -> List[str]:
+        """
+        End the session and write what it captured; returns the files
+        written. A cProfile section still running in another thread can
+        only be closed from that thread, so then the files are written when
+        it ends and show up in last_outputs.
+        """
+        with self._lock:
+            s, self._session = self._session, None
+            if s is None:
+                return []
+            s.closed = True
+            deferred = s.mode == "cprofile" and bool(s.active)
+        event.remove(engine, "before_cursor_execute", self._before_sql)
+        event.remove(engine, "after_cursor_execute", self._after_sql)
+        if self._sampler is not None:
+            self._stop.set()
+            self._sampler.join(2.0)
+            self._sampler = None
+        if deferred:
+            return []
+        self.last_outputs = self._write(s)
+        return self.last_outputs
+
+    # ---- sections ----
+
+    def begin(self, scope: str, name: str) -> Optional[Tuple[_Session, str]]:
+        """Open a section if the session still wants one of this scope; pass the result to end()."""
+        s = self._session
+        if s is None:
+            return None
+        ident = threading.get_ident()
+        key = f"{scope};{name}"
+        with self._lock:
+            if s.closed or s.budgets.get(scope, 0) <= 0 or ident in s.active:
+                return None  # a nested section is already covered by the outer one
+            s.budgets[scope] -= 1
+            s.sections[key] += 1
+            s.active[ident] = key
+            prof = s.profiles.setdefault(key, cProfile.Profile()) if s.mode == "cprofile" else None
+        if prof is not None:
+            try:
+                prof.enable()
+            except ValueError:
+                pass  # another profiler already owns this thread
+        return s, key
+
+    def end(self, token: Optional[Tuple[_Session, str]]) -> None:
+        if token is None:
+            return
+        s, key = token
+        prof = s.profiles.get(key)
+        if prof is not None:
+            prof.disable()
+        with self._lock:
+            s.active.pop(threading.get_ident(), None)
+            finish = not s.closed and s.exhausted
+            write_late = s.closed and s.mode == "cprofile" and not s.active
+        if finish:
+            self.stop()
+        elif write_late:
+            self.last_outputs = self._write(s)
+
+    @contextmanager
+    def section(self, scope: str, name: str) -> Iterator[None]:
+        token = self.begin(scope, name)
+        try:
+            yield
+        finally:
+            self.end(token)
+
+    # ---- sampling ----
+
+    def _sample_loop(self) -> None:
+        while not self._stop.wait(self._session.interval_s if self._session else 0.01):
+            s = self._session
+            if s is None:
+                return
+            with self._lock:
+                active = dict(s.active)
+            if not active:
+                continue
+            frames = sys._current_frames()
+            for ident, root in active.items():
+                frame = frames.get(ident)
+                if frame is not None:
+                    s.stacks.setdefault(root.split(";", 1)[0], Counter())[_fold(frame, root)] += 1
+
+    # ---- slow SQL ----
+
+    def _before_sql(self, conn, cursor, statement, parameters, context, executemany) -> None:
+        conn.info.setdefault("profiling_t0", []).append(time.perf_counter())
+
+    def _after_sql(self, conn, cursor, statement, parameters, context, executemany) -> None:
+        starts = conn.info.get("profiling_t0")
+        if not starts:
+            return
+        ms = (time.perf_counter() - starts.pop()) * 1000.0
+        s = self._session
+        if s is None or ms < s.slow_sql_ms:
+            return
+        text = " ".join(statement.split())
+        if executemany:
+            text += f"  [executemany x{len(parameters)}]"
+        q = SlowQuery(ts=datetime.now(), ms=ms, thread=threading.current_thread().name, statement=text[:_STATEMENT_CHARS])
+        with self._lock:
+            s.slow.append(q)
+            self.slow_queries.append(q)
+        metrics.SLOW_QUERIES.inc()
+
+    # ---- output ----
+
+    def _write(self, s: _Session) -> List[str]:
+        os.makedirs(s.out_dir, exist_ok=True)
+        base = os.path.join(s.out_dir, s.started.strftime("%Y%m%d-%H%M%S"))
+        out: List[str] = []
+        if s.mode == "sample":
+            for scope, stacks in s.stacks.items():
+                path = f"{base}-{scope}.folded"
+                with open(path, "w", encoding="utf-8") as f:
+                    for stack, n in sorted(stacks.items()):
+                        f.write(f"{stack} {n}\n")
+                out.append(path)
+        else:
+            for key, prof in s.profiles.items():
+                scope, name = key.split(";", 1)
+                path = f"{base}-{scope}-{name}.prof"
+                prof.dump_stats(path)
+                text = io.StringIO()
+                pstats.Stats(prof, stream=text).sort_stats("cumulative").print_stats(40)
+                with open(path[: -len(".prof")] + ".txt", "w", encoding="utf-8") as f:
+                    f.write(f"{s.sections[key]} sections\n{text.getvalue()}")
+                out.append(path)
+        samples = sum(sum(c.values()) for c in s.stacks.values())
+        self.last_summary = (
+            f"{sum(s.sections.values())} sections"
+            + (f", {samples} samples" if s.mode == "sample" else "")
+            + f", {len(s.slow)} slow queries"
+        )
+        if s.slow:
+            path = f"{base}-slow-sql.log"
+            with open(path, "w", encoding="utf-8") as f:
+                for q in s.slow:
+                    f.write(q.line() + "\n")
+            out.append(path)
+        return out
+
+
+PROFILER = Profiler()
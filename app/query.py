@@ -0,0 +1,121 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Set, Tuple
+
+from sqlalchemy import tuple_
+from sqlmodel import Session, desc, select
+
+from app.models import CheckResult, Host, KIND_BY_NAME, Outcome
+
+Cursor = Tuple[int, int]  # (ts_ms, id) of the last row already shown
+
+STATUSES = ("", "ok", "fail")
+
+
+@dataclass
+class ResultQuery:
+    """What the Results filter bar asks for; empty fields do not filter."""
+
+    host: str = ""  # substring of host name or address
+    tag: str = ""
+    check_type: str = ""  # "", "ping", "tcp", "dns", "push"
+    status: str = ""  # "", "ok", "fail"
+    since_ms: Optional[int] = None
+    until_ms: Optional[int] = None
+    rtt_above_ms: Optional[float] = None
+
+
+@dataclass
+class CompiledQuery:
+    """
+    A ResultQuery resolved against the host table: host and tag filters
+    become a host id set, so both the SQL and the live-feed predicate
+    are plain column comparisons.
+    """
+
+    query: ResultQuery
+    host_ids: Optional[Set[int]]  # None = any host
+    kind: Optional[int]
+
+    def where(self, q):
+        qr = self.query
+        if self.host_ids is not None:
+            q = q.where(CheckResult.host_id.in_(self.host_ids))  # type: ignore[attr-defined]
+        if self.kind is not None:
+            q = q.where(CheckResult.kind == self.kind)
+        if qr.status == "ok":
+            q = q.where(CheckResult.outcome == int(Outcome.OK))
+        elif qr.status == "fail":
+            q = q.where(CheckResult.outcome != int(Outcome.OK))
+        if qr.since_ms is not None:
+            q = q.where(CheckResult.ts_ms >= qr.since_ms)
+        if qr.until_ms is not None:
+            q = q.where(CheckResult.ts_ms < qr.until_ms)
+        if qr.rtt_above_ms is not None:
+            q = q.where(CheckResult.rtt_ms > qr.rtt_above_ms)
+        return q
+
+    def matches(self, host_id: int, kind: int, outcome: int, ts_ms: int, rtt_ms: Optional[float]) -> bool:
+        """The same predicate as where(), for rows that never went through SQL."""
+        qr = self.query
+        if self.host_ids is not None and host_id not in self.host_ids:
+            return False
+        if self.kind is not None and kind != self.kind:
+            return False
+        if qr.status == "ok" and outcome != Outcome.OK:
+            return False
+        if qr.status == "fail" and outcome == Outcome.OK:
+            return False
+        if qr.since_ms is not None and ts_ms < qr.since_ms:
+            return False
+        if qr.until_ms is not None and ts_ms >= qr.until_ms:
+            return False
+        if qr.rtt_above_ms is not None and (rtt_ms is None or rtt_ms <= qr.rtt_above_ms):
+            return False
+        return True
+
+    @property
+    def empty(self) -> bool:
+        return self.host_ids is not None and not self.host_ids
+
+
+def compile_query(query: ResultQuery, hosts: Dict[int, Host]) -> CompiledQuery:
+    needle = query.host.strip().lower()
+    tag = query.tag.strip().lower()
+    ids: Optional[Set[int]] = None
+    if needle or tag:
+        ids = set()
+        for hid, h in hosts.items():
+            if needle and needle not in (h.name or "").lower() and needle not in (h.address or "").lower():
+                continue
+            if tag and tag not in [t.strip().lower() for t in (h.tags or "").split(",")]:
+                continue
+            ids.add(hid)
+    kind = int(KIND_BY_NAME[query.check_type]) if query.check_type else None
+    return CompiledQuery(query=query, host_ids=ids, kind=kind)
+
+
+def fetch_page(
+    session: Session,
+    cq: CompiledQuery,
+    after: Optional[Cursor] = None,
+    limit: int = 400,
+) -> Tuple[List[CheckResult], Optional[Cursor]]:
+    """
+    One page of matching rows, newest first. Keyset pagination: the next
+    page starts strictly below the (ts_ms, id) of the last row returned, so
+    deep pages cost the same as the first and rows inserted meanwhile never
+    shift or repeat. Returns the rows and the cursor for the next page
+    (None when there is none).
+    """
+    if cq.empty:
+        return [], None
+    q = cq.where(select(CheckResult))
+    if after is not None:
+        q = q.where(tuple_(CheckResult.ts_ms, CheckResult.id) < tuple_(*after))
+    rows = list(session.exec(q.order_by(desc(CheckResult.ts_ms), desc(CheckResult.id)).limit(limit + 1)))
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, (rows[-1].ts_ms, int(rows[-1].id))
@@ -0,0 +1,192 @@
+from __future__ import annotations
+
+import ipaddress
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Iterable, List, Optional, Tuple, TypeVar
+
+from app import metrics
+
+T = TypeVar("T")
+
+# Defaults sized for ICMP: routers and host firewalls commonly police echo
+# replies per source in the tens to low hundreds per second
+GLOBAL_RATE = 1000.0
+SUBNET_RATE = 100.0
+TARGET_RATE = 10.0
+
+MAX_KEYS = 65536  # idle (full) buckets are dropped beyond this many per scope
+
+
+def subnet_of(address: str) -> Optional[str]:
+    """The /24 (IPv4) or /64 (IPv6) an address belongs to; None for host names."""
+    try:
+        ip = ipaddress.ip_address(address)
+    except ValueError:
+        return None
+    prefix = 24 if ip.version == 4 else 64
+    return str(ipaddress.ip_network(f"{ip}/{prefix}", strict=False))
+
+
+def spread_order(items: Iterable[T], key: Callable[[T], str] = str) -> List[T]:
+    """
+    Round-robin items across subnets, keeping their order within each
+    subnet, so consecutive sends hit different networks instead of walking
+    one /24 and stalling on its bucket.
+    """
+    groups: "OrderedDict[str, List[T]]" = OrderedDict()
+    for it in items:
+        addr = key(it)
+        groups.setdefault(subnet_of(addr) or addr, []).append(it)
+    out: List[T] = []
+    lanes = [iter(g) for g in groups.values()]
+    while lanes:
+        alive = []
+        for lane in lanes:
+            nxt = next(lane, None)
+            if nxt is not None:
+                out.append(nxt)
+                alive.append(lane)
+        lanes = alive
+    return out
+
+
+class TokenBucket:
+    """
+    Token bucket that can go into debt: taking a token that is not there yet
+    reserves it, so concurrent callers queue up at 1/rate spacing instead of
+    all retrying at once.
+    """
+
+    __slots__ = ("rate", "burst", "tokens", "stamp")
+
+    def __init__(self, rate: float, burst: float, now: float):
+        self.rate = float(rate)
+        self.burst = max(1.0, float(burst))
+        self.tokens = self.burst
+        self.stamp = now
+
+    def delay(self, now: float) -> float:
+        """Seconds until a token is available (refills first)."""
+        self.tokens = min(self.burst, self.tokens + (now - self.stamp) * self.rate)
+        self.stamp = now
+        return 0.0 if self.tokens >= 1.0 else (1.0 - self.tokens) / self.rate
+
+    def take(self) -> None:
+        self.tokens -= 1.0
+
+    def give(self) -> None:
+        """Return a token taken by take()."""
+        self.tokens = min(self.burst, self.tokens + 1.0)
+
+    def idle(self, now: float) -> bool:
+        return self.tokens + (now - self.stamp) * self.rate >= self.burst
+
+
+class ProbeLimiter:
+    """
+    Caps probe sends globally, per /24 (or /64) and per target address. A
+    probe takes one token from each scope that applies, waiting for the
+    slowest; a rate of None or 0 disables that scope. Thread-safe.
+    """
+
+    def __init__(
+        self,
+        global_rate: Optional[float] = GLOBAL_RATE,
+        subnet_rate: Optional[float] = SUBNET_RATE,
+        target_rate: Optional[float] = TARGET_RATE,
+        global_burst: Optional[float] = None,
+        subnet_burst: Optional[float] = None,
+        target_burst: Optional[float] = None,
+    ):
+        # Bursts default to a tenth of a second of traffic, and at least a few
+        # probes per target so a hedged, confirmed failure is not throttled
+        self._limits: Dict[str, Tuple[float, float]] = {}
+        for scope, rate, burst, floor in (
+            ("global", global_rate, global_burst, 1.0),
+            ("subnet", subnet_rate, subnet_burst, 1.0),
+            ("target", target_rate, target_burst, 5.0),
+        ):
+            if rate:
+                self._limits[scope] = (float(rate), float(burst) if burst else max(floor, float(rate) / 10))
+        self._buckets: Dict[str, Dict[str, TokenBucket]] = {scope: {} for scope in self._limits}
+        self._lock = threading.Lock()
+
+    def _bucket(self, scope: str, key: str, now: float) -> Optional[TokenBucket]:
+        limit = self._limits.get(scope)
+        if limit is None:
+            return None
+        buckets = self._buckets[scope]
+        b = buckets.get(key)
+        if b is None:
+            if len(buckets) >= MAX_KEYS:
+                for k in [k for k, v in buckets.items() if v.idle(now)]:
+                    del buckets[k]
+            b = buckets[key] = TokenBucket(limit[0], limit[1], now)
+        return b
+
+    def acquire(self, address: str, deadline: Optional[float] = None, stop: Optional[threading.Event] = None) -> bool:
+        """
+        Wait for a send slot for `address`. Returns False, without taking
+        any tokens, if the slot would come after `deadline` (monotonic
+        seconds), or if `stop` is set while waiting (the reserved tokens
+        are given back).
+        """
+        now = time.monotonic()
+        with self._lock:
+            scoped: List[Tuple[str, TokenBucket]] = []
+            for scope, key in (("global", ""), ("subnet", subnet_of(address)), ("target", address)):
+                b = self._bucket(scope, key, now) if key is not None else None
+                if b is not None:
+                    scoped.append((scope, b))
+            wait_s, scope = max(((b.delay(now), s) for s, b in scoped), default=(0.0, ""))
+            if deadline is not None and now + wait_s > deadline:
+                metrics.PROBES_RATE_LIMITED.inc(scope=scope, action="refused")
+                return False
+            for _, b in scoped:
+                b.take()
+
+        if wait_s <= 0:
+            return True
+        metrics.PROBES_RATE_LIMITED.inc(scope=scope, action="delayed")
+        metrics.RATE_LIMIT_WAIT_SECONDS.observe(wait_s)
+        if stop is not None and stop.wait(wait_s):
+            # Aborted: the slot was never used, so later callers may have it
+            with self._lock:
+                for _, b in scoped:
+                    b.give()
+            return False
+        if stop is None:
+            time.sleep(wait_s)
+        return True
+
+
+class Pacer:
+    """
+    Spreads `count` sends evenly over `window_s`: the k-th call to wait()
+    returns no earlier than start + k * window_s / count. Calls that are
+    already late return at once, so a slow cycle is never slowed further.
+    """
+
+    def __init__(self, count: int, window_s: float, start: Optional[float] = None):
+        self.step = max(0.0, float(window_s)) / max(1, int(count))
+        self.start = time.monotonic() if start is None else start
+        self._next = 0
+        self._lock = threading.Lock()
+
+    def wait(self, stop: Optional[threading.Event] = None) -> bool:
+        """False if `stop` was set while waiting."""
+        with self._lock:
+            slot = self.start + self._next * self.step
+            self._next += 1
+        delay = slot - time.monotonic()
+        if delay <= 0:
+            return True
+        if stop is not None:
+            return not stop.wait(delay)
+        time.sleep(delay)
+        return True
+
+
+LIMITER = ProbeLimiter()
@@ -0,0 +1,131 @@
+from __future__ import annotations
+
+import ipaddress
+import socket
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional
+
+from app import metrics
+
+
+@dataclass
+class Resolution:
+    ok: bool
+    address: Optional[str]  # IPv4 literal the probes should target
+    message: str
+    expires_at: float  # time.monotonic()
+
+
+def _is_ip_literal(name: str) -> bool:
+    try:
+        ipaddress.ip_address(name)
+        return True
+    except ValueError:
+        return False
+
+
+def _lookup(name: str) -> str:
+    # Probes are IPv4 (tcp_check uses AF_INET), so resolve A records only
+    infos = socket.getaddrinfo(name, None, socket.AF_INET, socket.SOCK_STREAM)
+    if not infos:
+        raise socket.gaierror(f"no A record for {name}")
+    return infos[0][4][0]
+
+
+class Resolver:
+    """
+    Cached hostname -> IP resolution for the probe path.
+
+    The OS resolver does not expose record TTLs, so positive answers live for
+    `ttl_s` and failures for `negative_ttl_s`. Lookups run on a small thread
+    pool: `prefetch` resolves a whole cycle's worth of names concurrently, and
+    entries close to expiry are served stale while being refreshed in the
+    background, so a probe never waits on DNS once a name has been seen.
+    """
+
+    def __init__(self, ttl_s: float = 300.0, negative_ttl_s: float = 30.0, max_workers: int = 8):
+        self.ttl_s = float(ttl_s)
+        self.negative_ttl_s = float(negative_ttl_s)
+        self._cache: Dict[str, Resolution] = {}
+        self._inflight: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="resolver")
+
+    def _resolve_now(self, name: str) -> Resolution:
+        t0 = time.perf_counter()
+        try:
+            ip = _lookup(name)
+            res = Resolution(ok=True, address=ip, message="OK", expires_at=time.monotonic() + self.ttl_s)
+            metrics.DNS_LOOKUPS.inc(outcome="ok")
+        except Exception as e:
+            res = Resolution(
+                ok=False,
+                address=None,
+                message=f"DNS fail: {type(e).__name__}",
+                expires_at=time.monotonic() + self.negative_ttl_s,
+            )
+            metrics.DNS_LOOKUPS.inc(outcome="fail")
+        metrics.DNS_SECONDS.observe(time.perf_counter() - t0)
+        with self._lock:
+            self._cache[name] = res
+            self._inflight.pop(name, None)
+        return res
+
+    def _submit(self, name: str) -> Future:
+        with self._lock:
+            fut = self._inflight.get(name)
+            if fut is None:
+                fut = self._pool.submit(self._resolve_now, name)
+                self._inflight[name] = fut
+            return fut
+
+    def resolve(self, name: str) -> Resolution:
+        name = (name or "").strip()
+        if _is_ip_literal(name):
+            return Resolution(ok=True, address=name, message="OK", expires_at=float("inf"))
+
+        now = time.monotonic()
+        with self._lock:
+            cached = self._cache.get(name)
+        if cached is not None:
+            if now < cached.expires_at:
+                metrics.DNS_CACHE.inc(result="hit")
+                # Refresh-ahead for positive entries in their last 10% of life
+                if cached.ok and cached.expires_at - now < self.ttl_s * 0.1:
+                    self._submit(name)
+                return cached
+            if cached.ok:
+                # Serve stale while refreshing; a dead resolver must not stall probes
+                metrics.DNS_CACHE.inc(result="stale")
+                self._submit(name)
+                return cached
+
+        metrics.DNS_CACHE.inc(result="miss")
+        return self._submit(name).result()
+
+    def prefetch(self, names: Iterable[str], timeout_s: Optional[float] = None) -> None:
+        """Resolve every missing/expired name concurrently, waiting at most timeout_s."""
+        now = time.monotonic()
+        futs: List[Future] = []
+        for name in set(n.strip() for n in names if n):
+            if _is_ip_literal(name):
+                continue
+            with self._lock:
+                cached = self._cache.get(name)
+            if cached is None or now >= cached.expires_at:
+                futs.append(self._submit(name))
+        if futs:
+            wait(futs, timeout=timeout_s)
+
+    def invalidate(self, name: Optional[str] = None) -> None:
+        with self._lock:
+            if name is None:
+                self._cache.clear()
+            else:
+                self._cache.pop(name, None)
+
+    def close(self) -> None:
+        self._pool.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,201 @@
+from __future__ import annotations
+
+import time
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import text
+from sqlmodel import delete, func, select
+
+from app import metrics
+from app.db import get_session
+from app.models import CheckResult, FastWindow, ResultRollup, RollupWatermark, kind_name
+
+PERIODS_S = (60, 3600)
+MINUTE_RETENTION_MS = 2 * 86400 * 1000  # minute buckets are only used for short windows
+BATCH_IDS = 50_000
+
+_WATERMARK = "checkresult"
+
+# Folds a CheckResult id range into the buckets of one period. Rows are
+# appended with increasing ids, so a watermark on id picks up late rows from
+# agents (old ts_ms, new id) that a time-based watermark would miss. Every
+# probe a row stands for shares its outcome (transitions.ok_samples), so a
+# closing heartbeat row counts all of its samples as OK and a transition
+# row counts none.
+_UPSERT = """
+INSERT INTO resultrollup (host_id, kind, port, period_s, bucket_ms, probes, ok_probes, rtt_n, rtt_sum, rtt_min, rtt_max)
+SELECT host_id, kind, port, :period_s, ts_ms - ts_ms % :period_ms,
+       SUM(samples),
+       SUM(CASE WHEN outcome = 0 THEN samples ELSE 0 END),
+       COUNT(rtt_ms),
+       COALESCE(SUM(rtt_ms), 0.0),
+       MIN(rtt_ms),
+       MAX(rtt_ms)
+FROM checkresult
+WHERE id > :lo AND id <= :hi
+GROUP BY host_id, kind, port, ts_ms - ts_ms % :period_ms
+ON CONFLICT (host_id, kind, port, period_s, bucket_ms) DO UPDATE SET
+    probes = probes + excluded.probes,
+    ok_probes = ok_probes + excluded.ok_probes,
+    rtt_n = rtt_n + excluded.rtt_n,
+    rtt_sum = rtt_sum + excluded.rtt_sum,
+    rtt_min = MIN(COALESCE(rtt_min, excluded.rtt_min), COALESCE(excluded.rtt_min, rtt_min)),
+    rtt_max = MAX(COALESCE(rtt_max, excluded.rtt_max), COALESCE(excluded.rtt_max, rtt_max))
+"""
+
+
+def rollup_version() -> int:
+    """Watermark of the last fold; changes whenever rollup contents do."""
+    with get_session() as session:
+        wm = session.get(RollupWatermark, _WATERMARK)
+        return wm.last_id if wm else 0
+
+
+def update_rollups(now_ms: Optional[int] = None) -> int:
+    """
+    Fold CheckResult rows added since the last run into ResultRollup, one
+    transaction per BATCH_IDS ids, then drop expired minute buckets. Returns
+    rows folded. Each transaction first moves the watermark with a
+    compare-and-set, so concurrent runs (GUI and a headless API) never fold
+    the same range twice.
+    """
+    now_ms = int(time.time() * 1000) if now_ms is None else now_ms
+    folded = 0
+    with get_session() as session:
+        session.execute(text("INSERT OR IGNORE INTO rollupwatermark (name, last_id) VALUES (:n, 0)"), {"n": _WATERMARK})
+        session.commit()
+
+    while True:
+        with metrics.DB_COMMIT_SECONDS.time(op="rollup"), get_session() as session:
+            lo = session.exec(select(RollupWatermark.last_id).where(RollupWatermark.name == _WATERMARK)).one()
+            top = session.exec(select(func.max(CheckResult.id))).one() or 0
+            if top <= lo:
+                break
+            hi = min(top, lo + BATCH_IDS)
+            moved = session.execute(
+                text("UPDATE rollupwatermark SET last_id = :hi WHERE name = :n AND last_id = :lo"),
+                {"n": _WATERMARK, "lo": lo, "hi": hi},
+            )
+            if moved.rowcount != 1:
+                session.rollback()
+                continue
+            n = session.exec(
+                select(func.count()).select_from(CheckResult).where(CheckResult.id > lo, CheckResult.id <= hi)
+            ).one()
+            for p in PERIODS_S:
+                session.execute(text(_UPSERT), {"period_s": p, "period_ms": p * 1000, "lo": lo, "hi": hi})
+            session.commit()
+            folded += n
+    metrics.ROLLUP_ROWS.inc(folded)
+
+    with get_session() as session:
+        session.exec(
+            delete(ResultRollup).where(
+                ResultRollup.period_s == PERIODS_S[0],
+                ResultRollup.bucket_ms < now_ms - MINUTE_RETENTION_MS,
+            )
+        )
+        session.commit()
+    return folded
+
+
+def rollup_stats(since_ms: int, until_ms: int, host_id: Optional[int] = None) -> List[Dict[str, Any]]:
+    """
+    Per-series probe counts, availability and RTT summary over [since_ms,
+    until_ms), bucket-aligned. Minute buckets serve windows inside their
+    retention, hourly buckets everything else.
+    """
+    period = period_for(since_ms)
+    q = select(
+        ResultRollup.host_id,
+        ResultRollup.kind,
+        ResultRollup.port,
+        func.sum(ResultRollup.probes),
+        func.sum(ResultRollup.ok_probes),
+        func.sum(ResultRollup.rtt_n),
+        func.sum(ResultRollup.rtt_sum),
+        func.min(ResultRollup.rtt_min),
+        func.max(ResultRollup.rtt_max),
+    ).where(
+        ResultRollup.period_s == period,
+        ResultRollup.bucket_ms >= since_ms - since_ms % (period * 1000),
+        ResultRollup.bucket_ms < until_ms,
+    )
+    if host_id is not None:
+        q = q.where(ResultRollup.host_id == host_id)
+    q = q.group_by(ResultRollup.host_id, ResultRollup.kind, ResultRollup.port)
+
+    out: List[Dict[str, Any]] = []
+    with get_session() as session:
+        for hid, kind, port, probes, ok_probes, rtt_n, rtt_sum, rtt_min, rtt_max in session.exec(q):
+            out.append(
+                {
+                    "host_id": hid,
+                    "check_type": kind_name(kind),
+                    "target": str(port) if port else "",
+                    "probes": int(probes or 0),
+                    "ok_probes": int(ok_probes or 0),
+                    "availability": round(100.0 * ok_probes / probes, 3) if probes else None,
+                    "rtt_avg_ms": round(rtt_sum / rtt_n, 3) if rtt_n else None,
+                    "rtt_min_ms": rtt_min,
+                    "rtt_max_ms": rtt_max,
+                    "bucket_s": period,
+                }
+            )
+    return out
+
+
+def period_for(since_ms: int, now_ms: Optional[int] = None) -> int:
+    """Finest rollup period whose buckets still cover since_ms."""
+    now_ms = int(time.time() * 1000) if now_ms is None else now_ms
+    return PERIODS_S[0] if since_ms >= now_ms - MINUTE_RETENTION_MS else PERIODS_S[-1]
+
+
+def rollup_series(host_id: int, kind: int, port: int, period_s: int, since_ms: int, until_ms: int) -> List[ResultRollup]:
+    """Buckets of one check series in [since_ms, until_ms), ascending."""
+    with get_session() as session:
+        return list(
+            session.exec(
+                select(ResultRollup)
+                .where(
+                    ResultRollup.host_id == host_id,
+                    ResultRollup.kind == kind,
+                    ResultRollup.port == port,
+                    ResultRollup.period_s == period_s,
+                    ResultRollup.bucket_ms >= since_ms - since_ms % (period_s * 1000),
+                    ResultRollup.bucket_ms < until_ms,
+                )
+                .order_by(ResultRollup.bucket_ms)
+            )
+        )
+
+
+def fast_version() -> int:
+    """Newest FastWindow id; changes whenever the fast tier flushes."""
+    with get_session() as session:
+        return session.exec(select(func.max(FastWindow.id))).one() or 0
+
+
+def fast_windows(since_ms: int, until_ms: int, host_id: Optional[int] = None) -> List[Dict[str, Any]]:
+    """Fast-tier flush windows (app.fastprobe) ending in [since_ms, until_ms), oldest first."""
+    q = select(FastWindow).where(FastWindow.end_ms >= since_ms, FastWindow.end_ms < until_ms)
+    if host_id is not None:
+        q = q.where(FastWindow.host_id == host_id)
+    with get_session() as session:
+        return [
+            {
+                "host_id": w.host_id,
+                "check_type": kind_name(w.kind),
+                "target": str(w.port) if w.port else "",
+                "start_ms": w.start_ms,
+                "end_ms": w.end_ms,
+                "probes": w.probes,
+                "ok_probes": w.ok_probes,
+                "max_loss_run": w.max_loss_run,
+                "rtt_min_ms": w.rtt_min,
+                "rtt_avg_ms": w.rtt_avg,
+                "rtt_p95_ms": w.rtt_p95,
+                "rtt_max_ms": w.rtt_max,
+            }
+            for w in session.exec(q.order_by(FastWindow.end_ms))
+        ]
@@ -0,0 +1,353 @@
+from __future__ import annotations
+
+import gzip
+import hashlib
+import json
+import math
+import random
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, Iterator, Optional, Tuple
+
+from sqlalchemy import insert
+from sqlmodel import select
+
+from app import metrics, ping
+from app.db import get_session
+from app.models import CheckResult, Host, ts_to_ms
+from app.monitor import MonitorThread
+from app.ping import CANCELLED, PingResult
+from app.ratelimit import subnet_of
+from app.store import CATALOG
+
+SIM_TAG = "sim"
+HOSTS_PER_SUBNET = 253  # .1 is the gateway, .2-.254 hang off it
+
+
+@dataclass
+class SimProfile:
+    """
+    Behaviour of a virtual fleet. Host-level traits and up/down periods are
+    derived from a hash of (seed, address, period), so the fleet holds no
+    per-host state, any address is a valid host, and a run is reproducible
+    from its seed. Only per-probe jitter and loss draw from an RNG.
+    """
+
+    rtt_median_ms: float = 20.0
+    rtt_spread: float = 0.8  # lognormal sigma of per-host median RTT
+    jitter: float = 0.25  # lognormal sigma of per-probe RTT around the host median
+    loss: float = 0.005  # independent per-probe loss
+
+    flap_share: float = 0.02  # hosts that flap
+    flap_period_s: float = 120.0  # a flapping host re-rolls up/down this often
+    flap_down: float = 0.5  # chance a flapping host is down in a period
+
+    outage_chance: float = 0.002  # chance a whole /24 is out in a period
+    outage_period_s: float = 600.0
+
+    tcp_share: float = 0.3  # hosts populated with tcp_ports
+    tcp_ports: Tuple[int, ...] = (22, 443)
+    port_closed: float = 0.02  # chance a listed port refuses connections
+
+
+def _unit(*parts) -> float:
+    """Deterministic uniform [0, 1) from the parts."""
+    h = hashlib.blake2b("|".join(map(str, parts)).encode(), digest_size=8).digest()
+    return int.from_bytes(h, "big") / 2.0**64
+
+
+def _normal(u: float) -> float:
+    # Box-Muller with a second deterministic uniform; only used per host, once
+    v = _unit(u)
+    return math.sqrt(-2.0 * math.log(max(u, 1e-12))) * math.cos(2.0 * math.pi * v)
+
+
+@dataclass
+class _HostTraits:
+    median_ms: float
+    flaps: bool
+    subnet: str
+
+
+class VirtualFleet:
+    def __init__(self, profile: Optional[SimProfile] = None, seed: int = 1):
+        self.profile = profile or SimProfile()
+        self.seed = seed
+        self._traits: Dict[str, _HostTraits] = {}
+
+    @staticmethod
+    def address(i: int) -> str:
+        """Address of the i-th virtual host: 10.0.0.1, 10.0.0.2, ... 253 per /24."""
+        s, p = divmod(i, HOSTS_PER_SUBNET)
+        return f"10.{(s >> 8) & 255}.{s & 255}.{p + 1}"
+
+    def traits(self, address: str) -> _HostTraits:
+        t = self._traits.get(address)
+        if t is None:
+            pr = self.profile
+            median = pr.rtt_median_ms * math.exp(pr.rtt_spread * _normal(_unit(self.seed, "rtt", address)))
+            t = _HostTraits(
+                median_ms=median,
+                flaps=_unit(self.seed, "flap", address) < pr.flap_share,
+                subnet=subnet_of(address) or address,
+            )
+            self._traits[address] = t  # a racing thread computes the same value
+        return t
+
+    def is_up(self, address: str, now: Optional[float] = None) -> bool:
+        """Up/down at wall time `now`: a /24 outage takes the whole subnet down."""
+        pr = self.profile
+        now = time.time() if now is None else now
+        t = self.traits(address)
+        if pr.outage_chance > 0 and _unit(self.seed, "outage", t.subnet, int(now // pr.outage_period_s)) < pr.outage_chance:
+            return False
+        if t.flaps and _unit(self.seed, "flap", address, int(now // pr.flap_period_s)) < pr.flap_down:
+            return False
+        return True
+
+    def port_open(self, address: str, port: int) -> bool:
+        return _unit(self.seed, "port", address, port) >= self.profile.port_closed
+
+
+class SimBackend:
+    """
+    Answers ping_once/tcp_check from a VirtualFleet (install with
+    ping.set_backend or `simulated()`). Probes take their simulated time:
+    an answer sleeps rtt * time_scale, a lost or down probe the whole
+    budget * time_scale, so deadlines, hedging and shedding behave as on a
+    real network. time_scale=0 answers at once, to find the pipeline's
+    own throughput ceiling.
+    """
+
+    def __init__(self, fleet: VirtualFleet, time_scale: float = 1.0, seed: Optional[int] = None):
+        self.fleet = fleet
+        self.time_scale = max(0.0, float(time_scale))
+        self._rng = random.Random(fleet.seed if seed is None else seed)
+        self._lock = threading.Lock()
+
+    def _rtt(self, address: str) -> Optional[float]:
+        """Simulated RTT, or None if the probe is lost."""
+        pr = self.fleet.profile
+        with self._lock:
+            lost = self._rng.random() < pr.loss
+            factor = self._rng.lognormvariate(0.0, pr.jitter)
+        if lost or not self.fleet.is_up(address):
+            return None
+        return self.fleet.traits(address).median_ms * factor
+
+    def _wait(self, ms: float) -> None:
+        if self.time_scale > 0:
+            time.sleep(ms * self.time_scale / 1000.0)
+
+    def _timeout(self, budget_ms: float, clipped: bool, message: str) -> PingResult:
+        self._wait(budget_ms)
+        if clipped:
+            return PingResult(ok=False, rtt_ms=None, message=CANCELLED, cancelled=True)
+        return PingResult(ok=False, rtt_ms=None, message=message)
+
+    def ping(self, host: str, budget_ms: float, clipped: bool) -> PingResult:
+        rtt = self._rtt(host)
+        if rtt is None or rtt > budget_ms:
+            return self._timeout(budget_ms, clipped, "Timeout")
+        self._wait(rtt)
+        return PingResult(ok=True, rtt_ms=rtt, message="OK")
+
+    def tcp(self, host: str, port: int, budget_ms: float, clipped: bool) -> PingResult:
+        rtt = self._rtt(host)
+        if rtt is None or rtt > budget_ms:
+            return self._timeout(budget_ms, clipped, "TCP fail: TimeoutError")
+        self._wait(rtt)
+        if not self.fleet.port_open(host, port):
+            return PingResult(ok=False, rtt_ms=None, message="TCP fail: ConnectionRefusedError")
+        return PingResult(ok=True, rtt_ms=rtt, message="TCP open")
+
+
+class simulated:
+    """Context manager: probes go to `backend` inside the block."""
+
+    def __init__(self, backend: SimBackend):
+        self.backend = backend
+        self._prev = None
+
+    def __enter__(self) -> SimBackend:
+        self._prev = ping.get_backend()
+        ping.set_backend(self.backend)
+        return self.backend
+
+    def __exit__(self, *exc) -> None:
+        ping.set_backend(self._prev)
+
+
+def populate(fleet: VirtualFleet, count: int, tag: str = SIM_TAG) -> int:
+    """
+    Add `count` virtual hosts (addresses from VirtualFleet.address, skipping
+    ones already present). Each /24's .1 is added as the gateway and parent
+    of the rest of its subnet, so subnet outages exercise unreachable
+    suppression. Two bulk INSERTs; returns hosts added.
+    """
+    pr = fleet.profile
+    addrs = [fleet.address(i) for i in range(count)]
+
+    def row(addr: str, parent_id: Optional[int]) -> dict:
+        tcp = _unit(fleet.seed, "tcp", addr) < pr.tcp_share
+        return {
+            "name": f"sim-{addr}",
+            "address": addr,
+            "tags": f"{fleet.traits(addr).subnet},{tag}",  # first tag groups the fleet heatmap
+            "enabled": True,
+            "created_at": datetime.utcnow(),
+            "tcp_ports": ",".join(str(p) for p in pr.tcp_ports) if tcp else "",
+            "parent_id": parent_id,
+        }
+
+    with get_session() as session:
+        known = {a for a in session.exec(select(Host.address))}
+        gateways = [a for a in addrs if a.endswith(".1") and a not in known]
+        if gateways:
+            session.execute(insert(Host), [row(a, None) for a in gateways])
+        gw_ids = {
+            a: i for a, i in session.exec(select(Host.address, Host.id).where(Host.address.like("10.%.1")))  # type: ignore[attr-defined]
+        }
+        members = [a for a in addrs if not a.endswith(".1") and a not in known]
+        if members:
+            session.execute(insert(Host), [row(a, gw_ids.get(a.rsplit(".", 1)[0] + ".1")) for a in members])
+        session.commit()
+    added = len(gateways) + len(members)
+    return added
+
+
+# ---- record / replay ----
+#
+# Capture format: gzipped JSON Lines, one result per line:
+#   {"t": ts_ms, "h": host_id, "c": check_type, "g": target, "ok": 0|1, "rtt": ms|null, "m": message}
+# Lines are in ts order. Host ids refer to the DB the capture came from, so
+# replay into a copy of it (see app/backup.py) or a fleet populated the same way.
+
+
+class Recorder:
+    """
+    Appends results to a capture file; connect on_result to
+    MonitorThread.result (`sentineldesk --record`, `simulate record --live`).
+    """
+
+    def __init__(self, path: str):
+        self._f = gzip.open(path, "wt", encoding="utf-8")
+        self._lock = threading.Lock()
+        self.rows = 0
+
+    def on_result(self, host_id: int, check_type: str, target: str, ok: bool, rtt_ms, ts, message: str) -> None:
+        self.write(ts_to_ms(ts), host_id, check_type, target, ok, rtt_ms, message)
+
+    def write(self, ts_ms: int, host_id: int, check_type: str, target: str, ok: bool, rtt_ms, message: str) -> None:
+        line = json.dumps(
+            {"t": ts_ms, "h": host_id, "c": check_type, "g": target, "ok": int(ok), "rtt": rtt_ms, "m": message},
+            separators=(",", ":"),
+        )
+        with self._lock:
+            self._f.write(line + "\n")
+            self.rows += 1
+
+    def close(self) -> None:
+        with self._lock:
+            self._f.close()
+
+
+def record_history(path: str, since_ms: int, until_ms: int, batch: int = 5000) -> int:
+    """Write stored results with since_ms <= ts_ms < until_ms to a capture file; returns rows."""
+    rec = Recorder(path)
+    try:
+        with get_session() as session:
+            q = (
+                select(CheckResult)
+                .where(CheckResult.ts_ms >= since_ms, CheckResult.ts_ms < until_ms)
+                .order_by(CheckResult.ts_ms, CheckResult.id)
+                .execution_options(yield_per=batch)
+            )
+            for r in session.exec(q):
+                rtt = None if r.rtt_ms is None else float(r.rtt_ms)
+                rec.write(r.ts_ms, r.host_id, r.check_type, r.target, r.ok, rtt, CATALOG.text(r.msg_id))
+    finally:
+        rec.close()
+    return rec.rows
+
+
+def read_capture(path: str) -> Iterator[Tuple[int, int, str, str, bool, Optional[float], str]]:
+    """(ts_ms, host_id, check_type, target, ok, rtt_ms, message) per captured result."""
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                d = json.loads(line)
+                yield d["t"], d["h"], d["c"], d.get("g", ""), bool(d["ok"]), d.get("rtt"), d.get("m", "")
+
+
+class ReplayMonitor(MonitorThread):
+    """
+    A MonitorThread whose results come from a capture instead of probes.
+    Each row goes through _publish (storage mode, DB write, result signal)
+    and alert evaluation exactly as a live result would, restamped to now.
+    The capture's own spacing is kept, compressed by `speed`; speed <= 0
+    replays as fast as the pipeline accepts, which gives its ceiling.
+    Progress (rows/s achieved and lag behind the capture clock) is
+    reported through `status` once a second.
+    """
+
+    def __init__(self, path: str, speed: float = 1.0, loop: bool = False, parent=None):
+        super().__init__(parent=parent)
+        self.path = path
+        self.speed = float(speed)
+        self.loop = loop
+        self.rows = 0
+
+    def _replay_once(self) -> None:
+        plan = self._current_plan()
+        start = time.monotonic()
+        t0: Optional[int] = None
+        last_report = start
+        done_at_report = self.rows
+        for ts_ms, host_id, check_type, target, ok, rtt_ms, message in read_capture(self.path):
+            if not self._running:
+                return
+            if t0 is None:
+                t0 = ts_ms
+            if self.speed > 0:
+                due = start + (ts_ms - t0) / 1000.0 / self.speed
+                delay = due - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+                metrics.REPLAY_LAG.set(max(0.0, -delay))
+
+            self._publish(host_id, check_type, target, ok, rtt_ms, message)
+            h = plan.hosts.get(host_id)
+            if not ok and h is not None:
+                self._maybe_alert(h, check_type, target)
+            self.rows += 1
+            metrics.REPLAY_ROWS.inc()
+
+            now = time.monotonic()
+            if now - last_report >= 1.0:
+                rate = (self.rows - done_at_report) / (now - last_report)
+                behind = ""
+                if self.speed > 0 and t0 is not None:
+                    behind = f", {max(0.0, now - start - (ts_ms - t0) / 1000.0 / self.speed):.1f}s behind capture"
+                self.status.emit(f"Replay: {self.rows} rows, {rate:.0f} rows/s{behind}")
+                last_report, done_at_report = now, self.rows
+
+    def run(self) -> None:
+        self.status.emit(f"Replaying {self.path} at {'max' if self.speed <= 0 else f'{self.speed:g}x'} speed")
+        t = time.monotonic()
+        try:
+            while self._running:
+                self._replay_once()
+                if not self.loop:
+                    break
+        except (OSError, ValueError, KeyError) as e:
+            self.status.emit(f"Replay failed: {e}")
+            return
+        finally:
+            # Nothing is probed, but the base class built these; release them as MonitorThread.run does
+            self.resolver.close()
+            self._hedge_pool.shutdown(wait=False, cancel_futures=True)
+        elapsed = max(1e-9, time.monotonic() - t)
+        self.status.emit(f"Replay finished: {self.rows} rows in {elapsed:.1f}s ({self.rows / elapsed:.0f} rows/s)")
@@ -0,0 +1,278 @@
+from __future__ import annotations
+
+import threading
+from collections import deque
+from dataclasses import asdict, dataclass, field
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+from sqlmodel import desc, func, select
+
+from app.db import get_session, hosts_version
+from app.models import AlertEvent, CheckResult, Host, Outcome, ts_to_ms
+from app.store import CATALOG
+
+SeriesKey = Tuple[str, str]  # (check_type, target)
+
+
+@dataclass
+class SeriesStatus:
+    host_id: int
+    check_type: str
+    target: str
+    ok: bool
+    outcome: str
+    rtt_ms: Optional[float]
+    message: str
+    ts_ms: int  # last stored result
+    since_ms: int  # first result with the current outcome
+    fail_streak: int  # probes since the last OK
+
+
+@dataclass
+class HostInfo:
+    id: int
+    name: str
+    address: str
+    tags: str
+    enabled: bool
+
+
+@dataclass
+class _Pulled:
+    """One sync's worth of rows, read from SQLite before taking the store lock."""
+
+    rows: List[CheckResult] = field(default_factory=list)
+    alerts: List[AlertEvent] = field(default_factory=list)
+    messages: Dict[int, str] = field(default_factory=dict)
+    hosts: Optional[Dict[int, HostInfo]] = None
+    hosts_version: int = 0
+    seeded: bool = False
+
+
+def _outcome_name(v: int) -> str:
+    try:
+        return Outcome(v).name.lower()
+    except ValueError:
+        return str(v)
+
+
+def host_state(enabled: bool, checks: List[Dict[str, Any]]) -> str:
+    """Roll a host's series up to up/degraded/down/unreachable/unknown/disabled."""
+    if not enabled:
+        return "disabled"
+    if not checks:
+        return "unknown"
+    if all(c["ok"] for c in checks):
+        return "up"
+    for c in checks:
+        if c["check_type"] == "ping" and c["outcome"] == "unreachable":
+            return "unreachable"
+    if any(c["check_type"] in ("ping", "dns", "push") and not c["ok"] for c in checks):
+        return "down"
+    return "degraded"
+
+
+class StatusStore:
+    """
+    In-memory fleet state for readers that must not hit SQLite per request
+    (the HTTP API, the heatmap): latest status per check series, plus ring
+    buffers of recent results and alerts.
+
+    `sync()` tails CheckResult and AlertEvent by id, so rows written by any
+    process (GUI monitor, collector) are picked up with one indexed range
+    read. Every change bumps `version`; the ring buffers carry their own
+    monotonically increasing `seq` so clients can poll incrementally.
+
+    SQLite is only read outside `_lock`; the lock guards the in-memory swap,
+    so readers on an event loop never wait on the database.
+    """
+
+    def __init__(self, recent_results: int = 1000, recent_alerts: int = 300):
+        self._lock = threading.RLock()
+        self._sync_lock = threading.Lock()  # one sync at a time; owns the id cursors below
+        self.series: Dict[int, Dict[SeriesKey, SeriesStatus]] = {}  # host_id -> series
+        self.hosts: Dict[int, HostInfo] = {}
+        self.results: Deque[Tuple[int, Dict[str, Any]]] = deque(maxlen=recent_results)
+        self.alerts: Deque[Tuple[int, Dict[str, Any]]] = deque(maxlen=recent_alerts)
+        self.version = 0
+        self.hosts_version = 0
+        self._last_result_id: Optional[int] = None
+        self._last_alert_id: Optional[int] = None
+        self._seen_hosts_version = -1
+        self._touched: Dict[int, int] = {}  # host_id -> version its series last changed in
+
+    # ---- ingest ----
+
+    def _apply(self, r: CheckResult, message: str) -> None:
+        key = (r.check_type, r.target)
+        host_series = self.series.setdefault(r.host_id, {})
+        cur = host_series.get(key)
+        if cur is not None and r.ts_ms < cur.ts_ms:
+            return  # late row from a buffering agent; it is history, not state
+        ok = r.outcome == Outcome.OK
+        self._touched[r.host_id] = self.version + 1  # sync() bumps version once per batch
+        if r.check_type == "ping" and r.outcome != Outcome.UNREACHABLE:
+            # A probed ping means the name resolved; DNS rows are only written on failure and recovery
+            host_series.pop(("dns", ""), None)
+        if cur is None or _outcome_name(r.outcome) != cur.outcome:
+            since = r.ts_ms
+            streak = 0 if ok else r.samples
+        else:
+            since = cur.since_ms
+            streak = 0 if ok else cur.fail_streak + r.samples
+        host_series[key] = SeriesStatus(
+            host_id=r.host_id,
+            check_type=r.check_type,
+            target=r.target,
+            ok=ok,
+            outcome=_outcome_name(r.outcome),
+            rtt_ms=r.rtt_ms,
+            message=message,
+            ts_ms=r.ts_ms,
+            since_ms=since,
+            fail_streak=streak,
+        )
+        self.results.append(
+            (
+                int(r.id),
+                {
+                    "seq": int(r.id),
+                    "ts_ms": r.ts_ms,
+                    "host_id": r.host_id,
+                    "check_type": r.check_type,
+                    "target": r.target,
+                    "ok": ok,
+                    "outcome": _outcome_name(r.outcome),
+                    "rtt_ms": r.rtt_ms,
+                    "message": message,
+                },
+            )
+        )
+
+    def _apply_alert(self, e: AlertEvent) -> None:
+        self.alerts.append(
+            (
+                int(e.id),
+                {
+                    "seq": int(e.id),
+                    "ts_ms": ts_to_ms(e.ts),
+                    "host_id": e.host_id,
+                    "check_type": e.check_type,
+                    "target": e.target or "",
+                    "severity": e.severity,
+                    "message": e.message,
+                },
+            )
+        )
+
+    def _read(self, hosts_changed: bool, max_rows: int) -> _Pulled:
+        """Everything sync() needs from SQLite; runs without holding _lock."""
+        pulled = _Pulled()
+        with get_session() as session:
+            if self._last_result_id is None:
+                # Seed: latest row per series plus the recent tail, once at start
+                latest_ids = select(func.max(CheckResult.id)).group_by(CheckResult.host_id, CheckResult.kind, CheckResult.port)
+                latest = session.exec(select(CheckResult).where(CheckResult.id.in_(latest_ids))).all()  # type: ignore[attr-defined]
+                tail = session.exec(select(CheckResult).order_by(desc(CheckResult.id)).limit(self.results.maxlen)).all()
+                pulled.rows = sorted({int(r.id): r for r in list(latest) + list(tail)}.values(), key=lambda r: r.id)
+                alerts = session.exec(select(AlertEvent).order_by(desc(AlertEvent.id)).limit(self.alerts.maxlen)).all()
+                pulled.alerts = list(reversed(alerts))
+                hosts_changed = pulled.seeded = True
+            else:
+                pulled.rows = list(
+                    session.exec(
+                        select(CheckResult)
+                        .where(CheckResult.id > self._last_result_id)
+                        .order_by(CheckResult.id)
+                        .limit(max_rows)
+                    )
+                )
+                pulled.alerts = list(
+                    session.exec(select(AlertEvent).where(AlertEvent.id > self._last_alert_id).order_by(AlertEvent.id))
+                )
+
+            version = hosts_version()
+            if hosts_changed or self._seen_hosts_version != version:
+                pulled.hosts_version = version
+                pulled.hosts = {
+                    int(h.id): HostInfo(id=int(h.id), name=h.name, address=h.address, tags=h.tags or "", enabled=h.enabled)
+                    for h in session.exec(select(Host))
+                }
+        pulled.messages = {m: CATALOG.text(m) for m in {r.msg_id for r in pulled.rows}}
+        return pulled
+
+    def sync(self, hosts_changed: bool = False, max_rows: int = 20_000) -> bool:
+        """Pull rows added since the last call. Returns True if anything changed."""
+        with self._sync_lock:
+            pulled = self._read(hosts_changed, max_rows)
+            with self._lock:
+                for r in pulled.rows:
+                    self._apply(r, pulled.messages[r.msg_id])
+                for e in pulled.alerts:
+                    self._apply_alert(e)
+                changed = pulled.seeded or bool(pulled.rows or pulled.alerts)
+                if pulled.rows:
+                    self._last_result_id = int(pulled.rows[-1].id)
+                elif pulled.seeded:
+                    self._last_result_id = 0
+                if pulled.alerts:
+                    self._last_alert_id = int(pulled.alerts[-1].id)
+                elif pulled.seeded:
+                    self._last_alert_id = 0
+
+                if pulled.hosts is not None:
+                    self._seen_hosts_version = pulled.hosts_version
+                    self.hosts = pulled.hosts
+                    # Deleted hosts take their series with them
+                    self.series = {hid: v for hid, v in self.series.items() if hid in self.hosts}
+                    self.hosts_version += 1
+                    changed = True
+
+                if changed:
+                    self.version += 1
+                return changed
+
+    # ---- read views (return plain data, safe to serialize) ----
+
+    def host_status(self, host_id: int) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            h = self.hosts.get(host_id)
+            if h is None:
+                return None
+            checks = [asdict(s) for _, s in sorted(self.series.get(host_id, {}).items())]
+        return {**asdict(h), "state": host_state(h.enabled, checks), "checks": checks}
+
+    def series_of(self, host_id: int) -> Dict[SeriesKey, SeriesStatus]:
+        with self._lock:
+            return dict(self.series.get(host_id, {}))
+
+    def changed_hosts(self, since_version: int) -> Tuple[int, List[int]]:
+        """(current version, hosts whose series changed after since_version)."""
+        with self._lock:
+            return self.version, [hid for hid, v in self._touched.items() if v > since_version]
+
+    def fleet(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            ids = sorted(self.hosts)
+        return [s for s in (self.host_status(i) for i in ids) if s is not None]
+
+    def recent_results(self, after_seq: int = 0, limit: int = 200) -> List[Dict[str, Any]]:
+        with self._lock:
+            rows = [r for seq, r in self.results if seq > after_seq]
+        return rows[-limit:][::-1]
+
+    def recent_alerts(self, after_seq: int = 0, limit: int = 100) -> List[Dict[str, Any]]:
+        with self._lock:
+            rows = [a for seq, a in self.alerts if seq > after_seq]
+        return rows[-limit:][::-1]
+
+    def latest_result_seq(self) -> int:
+        with self._lock:
+            return self.results[-1][0] if self.results else 0
+
+    def latest_alert_seq(self) -> int:
+        with self._lock:
+            return self.alerts[-1][0] if self.alerts else 0
+
+
+STATUS = StatusStore()
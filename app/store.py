@@ -0,0 +1,146 @@
+from __future__ import annotations
+
+import threading
+from datetime import datetime
+from typing import Dict, Iterable, Optional, Tuple
+
+from sqlalchemy import event, text
+from sqlmodel import Session, select
+
+from app.db import get_session
+from app.models import CheckResult, KIND_BY_NAME, CheckKind, MessageCode, classify_outcome, ts_to_ms
+
+# (host_id, check_type, target, ok, rtt_ms, ts, message) — same shape as MonitorThread.result
+ResultTuple = Tuple[int, str, str, bool, Optional[float], datetime, str]
+
+# Session.info key: codes this session inserted, cached once it commits
+_PENDING_CODES = "message_codes"
+
+
+class MessageCatalog:
+    """
+    In-process cache of the MessageCode dictionary. The set of distinct
+    messages is small (a few per check type), so both directions fit in memory.
+    """
+
+    def __init__(self):
+        self._by_text: Dict[str, int] = {}
+        self._by_id: Dict[int, str] = {0: ""}
+        self._lock = threading.Lock()
+
+    def code_for(self, session: Session, message: str) -> int:
+        """
+        Code for message, inserting it into the dictionary table as part of
+        the session's transaction if new. INSERT OR IGNORE then SELECT, so a
+        row another session or process added meanwhile is reused instead of
+        failing the UNIQUE constraint (and the caller's whole batch). New
+        codes are only cached once the session commits.
+        """
+        if not message:
+            return 0
+        with self._lock:
+            code = self._by_text.get(message)
+        if code is not None:
+            return code
+        pending: Dict[str, int] = session.info.setdefault(_PENDING_CODES, {})
+        code = pending.get(message)
+        if code is None:
+            session.execute(text("INSERT OR IGNORE INTO messagecode (text) VALUES (:t)"), {"t": message})
+            code = int(session.execute(text("SELECT id FROM messagecode WHERE text = :t"), {"t": message}).scalar_one())
+            pending[message] = code
+        return code
+
+    def _committed(self, session: Session) -> None:
+        codes = session.info.pop(_PENDING_CODES, None)
+        if not codes:
+            return
+        with self._lock:
+            for message, code in codes.items():
+                self._by_text[message] = code
+                self._by_id[code] = message
+
+    def text(self, code: int) -> str:
+        with self._lock:
+            t = self._by_id.get(int(code or 0))
+        if t is not None:
+            return t
+        with get_session() as session:
+            known = [(int(mc.id), mc.text) for mc in session.exec(select(MessageCode))]
+        with self._lock:
+            for i, message in known:
+                self._by_text[message] = i
+                self._by_id[i] = message
+            return self._by_id.get(int(code), f"#{code}")
+
+    def forget(self) -> None:
+        """Drop cached codes (e.g. after the database was replaced)."""
+        with self._lock:
+            self._by_text.clear()
+            self._by_id = {0: ""}
+
+
+CATALOG = MessageCatalog()
+
+
+@event.listens_for(Session, "after_commit")
+def _cache_committed_codes(session: Session) -> None:
+    CATALOG._committed(session)
+
+
+@event.listens_for(Session, "after_rollback")
+def _drop_uncommitted_codes(session: Session) -> None:
+    session.info.pop(_PENDING_CODES, None)
+
+
+def encode_result(
+    session: Session,
+    host_id: int,
+    check_type: str,
+    target: str,
+    ok: bool,
+    rtt_ms,
+    ts: datetime,
+    message: str,
+    samples: int = 1,
+    flags: int = 0,
+) -> CheckResult:
+    kind = KIND_BY_NAME.get(check_type, CheckKind.PING)
+    return CheckResult(
+        host_id=int(host_id),
+        ts_ms=ts_to_ms(ts),
+        kind=int(kind),
+        port=int(target) if target and target.isdigit() else 0,
+        outcome=int(classify_outcome(ok, message)),
+        rtt_ms=None if rtt_ms is None else float(rtt_ms),
+        msg_id=CATALOG.code_for(session, message),
+        samples=int(samples),
+        flags=int(flags),
+    )
+
+
+def write_results(rows: Iterable[ResultTuple]) -> int:
+    """
+    Encode and insert result tuples in a single transaction. Tuples may carry
+    two extra trailing fields (samples, flags). Returns rows written.
+    """
+    n = 0
+    with get_session() as session:
+        for row in rows:
+            session.add(encode_result(session, *row))
+            n += 1
+        session.commit()
+    return n
+
+
+def write_result(
+    host_id: int,
+    check_type: str,
+    target: str,
+    ok: bool,
+    rtt_ms,
+    ts: datetime,
+    message: str,
+    samples: int = 1,
+    flags: int = 0,
+) -> None:
+    write_results([(host_id, check_type, target, ok, rtt_ms, ts, message, samples, flags)])
@@ -0,0 +1,82 @@
+from __future__ import annotations
+
+from typing import Dict, Iterable, List, Optional, Protocol, Set
+
+
+class _HasParent(Protocol):
+    id: Optional[int]
+    parent_id: Optional[int]
+
+
+def effective_parents(hosts: Iterable[_HasParent]) -> Dict[int, Optional[int]]:
+    """
+    host_id -> parent_id, with parents that are unknown (deleted/disabled),
+    self-references and cycles dropped so every host resolves to a root.
+    """
+    raw: Dict[int, Optional[int]] = {}
+    for h in hosts:
+        if h.id is None:
+            continue
+        raw[int(h.id)] = getattr(h, "parent_id", None)
+
+    parents: Dict[int, Optional[int]] = {}
+    for hid, pid in raw.items():
+        if pid is None or pid == hid or pid not in raw:
+            parents[hid] = None
+        else:
+            parents[hid] = int(pid)
+
+    # Break cycles: walk each chain; the host that closes a loop becomes a root
+    for hid in list(parents):
+        seen: Set[int] = set()
+        cur: Optional[int] = hid
+        while cur is not None:
+            if cur in seen:
+                parents[cur] = None
+                break
+            seen.add(cur)
+            cur = parents.get(cur)
+    return parents
+
+
+def depth_levels(hosts: List[_HasParent]) -> List[List[_HasParent]]:
+    """
+    Group hosts into probe levels: level 0 has no (usable) parent, level n+1
+    hosts hang off level n. Probing level by level guarantees a parent's
+    state is known before any of its children are considered.
+    """
+    parents = effective_parents(hosts)
+    depth: Dict[int, int] = {}
+
+    def _depth(hid: int) -> int:
+        chain: List[int] = []
+        cur: Optional[int] = hid
+        while cur is not None and cur not in depth:
+            chain.append(cur)
+            cur = parents.get(cur)
+        d = depth[cur] if cur is not None else -1
+        for c in reversed(chain):
+            d += 1
+            depth[c] = d
+        return depth[hid]
+
+    levels: List[List[_HasParent]] = []
+    for h in hosts:
+        if h.id is None:
+            continue
+        d = _depth(int(h.id))
+        while len(levels) <= d:
+            levels.append([])
+        levels[d].append(h)
+    return levels
+
+
+def blocked_by(host_id: int, parents: Dict[int, Optional[int]], unreachable: Set[int]) -> Optional[int]:
+    """
+    The parent if it is down/unreachable this cycle, else None. Because levels
+    are probed in order, `unreachable` already carries the state of the whole chain.
+    """
+    pid = parents.get(host_id)
+    if pid is not None and pid in unreachable:
+        return pid
+    return None
@@ -0,0 +1,130 @@
+from __future__ import annotations
+
+import bisect
+from dataclasses import dataclass
+from typing import Collection, Dict, List, Optional, Sequence, Tuple
+
+from app.models import Outcome, ResultFlag, classify_outcome
+
+# Upper bounds (ms) of the RTT bands; a move between bands counts as a transition
+DEFAULT_RTT_BANDS_MS: Tuple[float, ...] = (10.0, 50.0, 200.0, 1000.0)
+
+
+def rtt_band(rtt_ms: Optional[float], bands: Sequence[float] = DEFAULT_RTT_BANDS_MS) -> int:
+    if rtt_ms is None:
+        return -1
+    return bisect.bisect_left(bands, rtt_ms)
+
+
+@dataclass
+class _SeriesState:
+    outcome: int
+    band: int
+    last_write_ms: int
+    pending: int  # probes seen since the last persisted row, all in the current state
+    # The latest of those probes, for the row that closes the state
+    ok: bool = True
+    rtt_ms: Optional[float] = None
+    ts_ms: int = 0
+    message: str = ""
+
+
+@dataclass
+class Closing:
+    """Row for the probes of a state that ended before they got one."""
+
+    ok: bool
+    rtt_ms: Optional[float]
+    ts_ms: int
+    message: str
+    samples: int
+    flags: int = int(ResultFlag.HEARTBEAT)
+
+
+@dataclass
+class Decision:
+    persist: bool
+    samples: int = 1  # probes this row stands for; all of them had its outcome
+    flags: int = 0
+    close: Optional[Closing] = None  # written just before this row, in the same transaction
+
+
+def ok_samples(outcome: int, samples: int) -> int:
+    """
+    How many of the probes a row stands for were OK. Every row's samples
+    share its outcome in both storage modes, since a transition is preceded
+    by a row closing the old state. rollup._UPSERT applies the same rule in SQL.
+    """
+    return samples if outcome == Outcome.OK else 0
+
+
+class TransitionFilter:
+    """
+    Decides which results are worth a row in "transitions" storage mode:
+    the first result of a series, any outcome change (up->down, Timeout->No
+    reply, ...), an RTT band change while up, and a heartbeat row every
+    `heartbeat_s` so the timeline stays anchored during long steady periods.
+
+    Probes skipped since the previous row are accounted in the `samples`
+    of a later row with the same state: the next heartbeat, or on a
+    transition a closing row (Decision.close) stamped with the last probe
+    of the old state. A transition row itself only counts its own probes.
+    """
+
+    def __init__(self, heartbeat_s: int = 300, rtt_bands_ms: Sequence[float] = DEFAULT_RTT_BANDS_MS):
+        self.heartbeat_ms = max(1, int(heartbeat_s)) * 1000
+        self.rtt_bands_ms = tuple(rtt_bands_ms)
+        self._state: Dict[Tuple[int, str, str], _SeriesState] = {}
+
+    def offer(
+        self, host_id: int, check_type: str, target: str, ok: bool, rtt_ms, ts_ms: int, message: str, samples: int = 1
+    ) -> Decision:
+        key = (host_id, check_type, target or "")
+        outcome = int(classify_outcome(ok, message))
+        band = rtt_band(rtt_ms, self.rtt_bands_ms) if ok else -1
+
+        st = self._state.get(key)
+        if st is None:
+            self._state[key] = _SeriesState(outcome=outcome, band=band, last_write_ms=ts_ms, pending=0)
+            return Decision(persist=True, samples=samples)
+
+        close: Optional[Closing] = None
+        if outcome != st.outcome or band != st.band:
+            if st.pending:
+                close = Closing(ok=st.ok, rtt_ms=st.rtt_ms, ts_ms=st.ts_ms, message=st.message, samples=st.pending)
+            flags = 0
+        elif ts_ms - st.last_write_ms >= self.heartbeat_ms:
+            samples += st.pending
+            flags = int(ResultFlag.HEARTBEAT)
+        else:
+            st.pending += samples
+            st.ok, st.rtt_ms, st.ts_ms, st.message = ok, rtt_ms, ts_ms, message
+            return Decision(persist=False)
+
+        st.outcome = outcome
+        st.band = band
+        st.last_write_ms = ts_ms
+        st.pending = 0
+        return Decision(persist=True, samples=samples, flags=flags, close=close)
+
+    def forget(self, host_id: int) -> None:
+        for key in [k for k in self._state if k[0] == host_id]:
+            del self._state[key]
+
+    def retain(self, host_ids: Collection[int]) -> None:
+        """Drop the series of every host not in host_ids (deleted or disabled)."""
+        for key in [k for k in self._state if k[0] not in host_ids]:
+            del self._state[key]
+
+    def drain(self) -> List[Tuple[Tuple[int, str, str], Closing]]:
+        """
+        Closing rows for every series still holding back probes, e.g. on
+        shutdown; the series then carry on as if those rows were written.
+        """
+        out: List[Tuple[Tuple[int, str, str], Closing]] = []
+        for key, st in self._state.items():
+            if st.pending:
+                out.append((key, Closing(ok=st.ok, rtt_ms=st.rtt_ms, ts_ms=st.ts_ms, message=st.message, samples=st.pending)))
+                st.last_write_ms = st.ts_ms
+                st.pending = 0
+        return out
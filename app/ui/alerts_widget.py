@@ -8,8 +8,11 @@ from PySide6.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout, QLabel, QPushBu
 
 from sqlmodel import select, desc
 
+from app import metrics
+from app.profiling import PROFILER
 from app.db import get_session
 from app.models import AlertEvent, Host
+from app.ui.export_dialog import ExportDialog
 
 
 @dataclass
@@ -89,10 +92,13 @@ class AlertsWidget(QWidget):
 
         self.btn_refresh = QPushButton("Refresh")
         self.btn_refresh.clicked.connect(self.refresh)
+        self.btn_export = QPushButton("Export…")
+        self.btn_export.clicked.connect(self.export)
 
         top = QHBoxLayout()
         top.addWidget(QLabel("Alerts"))
         top.addStretch(1)
+        top.addWidget(self.btn_export)
         top.addWidget(self.btn_refresh)
 
         layout = QVBoxLayout(self)
@@ -101,7 +107,14 @@ class AlertsWidget(QWidget):
 
         self.refresh()
 
+    def export(self) -> None:
+        ExportDialog("alerts", self).exec()
+
     def refresh(self) -> None:
+        with PROFILER.section("ui", "alerts"), metrics.UI_REFRESH_SECONDS.time(widget="alerts"):
+            self._refresh()
+
+    def _refresh(self) -> None:
         with get_session() as session:
             evts = list(session.exec(select(AlertEvent).order_by(desc(AlertEvent.ts)).limit(300)))
             hosts = {h.id: h for h in session.exec(select(Host))}
@@ -123,6 +136,7 @@ class AlertsWidget(QWidget):
         self.model.set_rows(rows)
 
     def on_alert(self, ts, severity: str, host_id: int, check_type: str, target: str, message: str) -> None:
+        metrics.SIGNAL_BACKLOG.dec()
         host_label = f"#{host_id}"
         try:
             with get_session() as session:
@@ -0,0 +1,204 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Any, List
+
+from PySide6.QtCore import QAbstractTableModel, QModelIndex, Qt, QTimer
+from PySide6.QtWidgets import QComboBox, QWidget, QVBoxLayout, QHBoxLayout, QLabel, QPushButton, QSpinBox, QTableView
+
+from app import metrics
+from app.profiling import MODES, PROFILER, SLOW_SQL_MS
+
+
+@dataclass
+class MetricRow:
+    name: str
+    labels: str
+    kind: str
+    value: str
+    detail: str
+
+
+def _labels_str(key) -> str:
+    return ", ".join(f"{k}={v}" for k, v in key)
+
+
+def _ms(v) -> str:
+    if v is None:
+        return "-"
+    if v == float("inf"):
+        return "inf"
+    return f"{v * 1000:.1f}ms"
+
+
+def collect_rows(registry: metrics.MetricsRegistry = metrics.REGISTRY) -> List[MetricRow]:
+    rows: List[MetricRow] = []
+    for m in registry.metrics():
+        if isinstance(m, metrics.Histogram):
+            for key in m.label_sets():
+                labels = dict(key)
+                count, total = m.snapshot(**labels)
+                avg = (total / count) if count else None
+                rows.append(
+                    MetricRow(
+                        name=m.name,
+                        labels=_labels_str(key),
+                        kind=m.kind,
+                        value=str(count),
+                        detail=f"avg {_ms(avg)}  p50 ≤{_ms(m.quantile(0.5, **labels))}  "
+                        f"p95 ≤{_ms(m.quantile(0.95, **labels))}",
+                    )
+                )
+        else:
+            for _, key, value in m.samples():  # type: ignore[attr-defined]
+                rows.append(
+                    MetricRow(
+                        name=m.name,
+                        labels=_labels_str(key),
+                        kind=m.kind,
+                        value=f"{value:g}",
+                        detail=m.help,
+                    )
+                )
+    return rows
+
+
+class MetricsModel(QAbstractTableModel):
+    COLS = ["Metric", "Labels", "Type", "Value / Count", "Detail"]
+
+    def __init__(self):
+        super().__init__()
+        self.rows: List[MetricRow] = []
+
+    def rowCount(self, parent: QModelIndex = QModelIndex()) -> int:
+        return len(self.rows)
+
+    def columnCount(self, parent: QModelIndex = QModelIndex()) -> int:
+        return len(self.COLS)
+
+    def headerData(self, section: int, orientation: Qt.Orientation, role: int = Qt.DisplayRole) -> Any:
+        if role != Qt.DisplayRole:
+            return None
+        return self.COLS[section] if orientation == Qt.Horizontal else section + 1
+
+    def data(self, index: QModelIndex, role: int = Qt.DisplayRole) -> Any:
+        if not index.isValid():
+            return None
+        r = self.rows[index.row()]
+        c = index.column()
+
+        if role == Qt.DisplayRole:
+            if c == 0:
+                return r.name
+            if c == 1:
+                return r.labels
+            if c == 2:
+                return r.kind
+            if c == 3:
+                return r.value
+            if c == 4:
+                return r.detail
+        return None
+
+    def set_rows(self, rows: List[MetricRow]) -> None:
+        self.beginResetModel()
+        self.rows = rows
+        self.endResetModel()
+
+
+class DiagnosticsWidget(QWidget):
+    def __init__(self, endpoint: str = ""):
+        super().__init__()
+
+        self.model = MetricsModel()
+        self.view = QTableView()
+        self.view.setModel(self.model)
+        self.view.setAlternatingRowColors(True)
+        self.view.horizontalHeader().setStretchLastSection(True)
+
+        self.lbl_endpoint = QLabel(f"Prometheus: {endpoint}" if endpoint else "Prometheus export disabled")
+        self.lbl_endpoint.setTextInteractionFlags(Qt.TextSelectableByMouse)
+
+        self.btn_refresh = QPushButton("Refresh")
+        self.btn_refresh.clicked.connect(self.refresh)
+
+        top = QHBoxLayout()
+        top.addWidget(QLabel("Diagnostics"))
+        top.addStretch(1)
+        top.addWidget(self.lbl_endpoint)
+        top.addWidget(self.btn_refresh)
+
+        # Profiling: the next N monitor cycles / widget refreshes, plus slow SQL meanwhile
+        self.cmb_mode = QComboBox()
+        self.cmb_mode.addItems(list(MODES))
+        self.spin_cycles = QSpinBox()
+        self.spin_cycles.setRange(0, 100)
+        self.spin_cycles.setValue(3)
+        self.spin_ui = QSpinBox()
+        self.spin_ui.setRange(0, 1000)
+        self.spin_ui.setValue(20)
+        self.spin_sql = QSpinBox()
+        self.spin_sql.setRange(1, 60000)
+        self.spin_sql.setValue(int(SLOW_SQL_MS))
+        self.spin_sql.setSuffix(" ms")
+        self.btn_profile = QPushButton("Start profiling")
+        self.btn_profile.clicked.connect(self.toggle_profiling)
+        self.lbl_profile = QLabel("")
+        self.lbl_profile.setTextInteractionFlags(Qt.TextSelectableByMouse)
+
+        prof = QHBoxLayout()
+        prof.addWidget(QLabel("Profile"))
+        prof.addWidget(self.cmb_mode)
+        prof.addWidget(QLabel("cycles"))
+        prof.addWidget(self.spin_cycles)
+        prof.addWidget(QLabel("UI refreshes"))
+        prof.addWidget(self.spin_ui)
+        prof.addWidget(QLabel("slow SQL ≥"))
+        prof.addWidget(self.spin_sql)
+        prof.addWidget(self.btn_profile)
+        prof.addWidget(self.lbl_profile, 1)
+
+        layout = QVBoxLayout(self)
+        layout.addLayout(top)
+        layout.addLayout(prof)
+        layout.addWidget(self.view)
+
+        # Cheap: only walks the in-memory registry
+        self.timer = QTimer(self)
+        self.timer.setInterval(2000)
+        self.timer.timeout.connect(self.refresh)
+        self.timer.start()
+
+        self.refresh()
+
+    def toggle_profiling(self) -> None:
+        if PROFILER.active:
+            PROFILER.stop()
+        elif self.spin_cycles.value() or self.spin_ui.value():
+            PROFILER.start(
+                cycles=self.spin_cycles.value(),
+                ui_calls=self.spin_ui.value(),
+                mode=self.cmb_mode.currentText(),
+                slow_sql_ms=self.spin_sql.value(),
+            )
+        self.update_profiling()
+
+    def update_profiling(self) -> None:
+        active = PROFILER.active
+        self.btn_profile.setText("Stop profiling" if active else "Start profiling")
+        for w in (self.cmb_mode, self.spin_cycles, self.spin_ui, self.spin_sql):
+            w.setEnabled(not active)
+        if active:
+            left = PROFILER.remaining()
+            self.lbl_profile.setText(f"running: {left.get('cycle', 0)} cycles, {left.get('ui', 0)} refreshes left")
+        elif PROFILER.last_summary:
+            written = ", ".join(PROFILER.last_outputs) or "nothing to write"
+            self.lbl_profile.setText(f"{PROFILER.last_summary}: {written}")
+        slow = list(PROFILER.slow_queries)[-10:]
+        self.lbl_profile.setToolTip("\n".join(q.line() for q in slow) if slow else "")
+
+    def refresh(self) -> None:
+        if not self.isVisible() and self.model.rows:
+            return
+        self.update_profiling()
+        self.model.set_rows(collect_rows())
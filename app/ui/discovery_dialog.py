@@ -0,0 +1,244 @@
+from __future__ import annotations
+
+import threading
+from dataclasses import dataclass
+from typing import Any, List, Optional
+
+from PySide6.QtCore import QAbstractTableModel, QModelIndex, Qt, QThread, Signal
+from PySide6.QtWidgets import (
+    QDialog,
+    QFormLayout,
+    QHBoxLayout,
+    QLabel,
+    QLineEdit,
+    QMessageBox,
+    QProgressBar,
+    QPushButton,
+    QSpinBox,
+    QTableView,
+    QVBoxLayout,
+)
+
+from app.discovery import DiscoveredHost, bulk_insert_hosts, expand_targets, sweep
+from app.plan import parse_ports
+
+
+class DiscoveryThread(QThread):
+    found = Signal(object)  # DiscoveredHost
+    progress = Signal(int, int)  # done, total
+    finished_sweep = Signal(str)
+
+    def __init__(self, cidr: str, ports: List[int], concurrency: int, rate_per_s: int, timeout_ms: int, parent=None):
+        super().__init__(parent)
+        self.cidr = cidr
+        self.ports = ports
+        self.concurrency = concurrency
+        self.rate_per_s = rate_per_s
+        self.timeout_ms = timeout_ms
+        self._stop = threading.Event()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def run(self) -> None:
+        try:
+            for d in sweep(
+                self.cidr,
+                self.ports,
+                concurrency=self.concurrency,
+                rate_per_s=self.rate_per_s,
+                timeout_ms=self.timeout_ms,
+                stop=self._stop,
+                on_progress=self.progress.emit,
+            ):
+                self.found.emit(d)
+        except Exception as e:
+            self.finished_sweep.emit(f"Sweep error: {e}")
+            return
+        self.finished_sweep.emit("Stopped." if self._stop.is_set() else "Sweep complete.")
+
+
+@dataclass
+class FoundRow:
+    address: str
+    ping: str
+    rtt: Optional[float]
+    ports: str
+
+
+class FoundModel(QAbstractTableModel):
+    COLS = ["Address", "Ping", "RTT (ms)", "Open ports"]
+
+    def __init__(self):
+        super().__init__()
+        self.rows: List[FoundRow] = []
+        self.found: List[DiscoveredHost] = []
+
+    def rowCount(self, parent: QModelIndex = QModelIndex()) -> int:
+        return len(self.rows)
+
+    def columnCount(self, parent: QModelIndex = QModelIndex()) -> int:
+        return len(self.COLS)
+
+    def headerData(self, section: int, orientation: Qt.Orientation, role: int = Qt.DisplayRole) -> Any:
+        if role != Qt.DisplayRole:
+            return None
+        return self.COLS[section] if orientation == Qt.Horizontal else section + 1
+
+    def data(self, index: QModelIndex, role: int = Qt.DisplayRole) -> Any:
+        if not index.isValid():
+            return None
+        r = self.rows[index.row()]
+        c = index.column()
+
+        if role == Qt.DisplayRole:
+            if c == 0:
+                return r.address
+            if c == 1:
+                return r.ping
+            if c == 2:
+                return "" if r.rtt is None else f"{r.rtt:.1f}"
+            if c == 3:
+                return r.ports
+        return None
+
+    def append(self, d: DiscoveredHost) -> None:
+        n = len(self.rows)
+        self.beginInsertRows(QModelIndex(), n, n)
+        self.found.append(d)
+        self.rows.append(
+            FoundRow(
+                address=d.address,
+                ping="YES" if d.ping_ok else "NO",
+                rtt=d.rtt_ms,
+                ports=",".join(str(p) for p in d.open_ports),
+            )
+        )
+        self.endInsertRows()
+
+    def clear(self) -> None:
+        self.beginResetModel()
+        self.rows = []
+        self.found = []
+        self.endResetModel()
+
+
+class DiscoveryDialog(QDialog):
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Discover hosts")
+        self.resize(760, 560)
+        self.thread: Optional[DiscoveryThread] = None
+        self.added = 0
+
+        self.cidr = QLineEdit("192.168.1.0/24")
+        self.ports = QLineEdit("22,80,443,3389")
+        self.ports.setPlaceholderText("TCP ports to probe (comma), blank for ICMP only")
+        self.tags = QLineEdit("discovered")
+
+        self.concurrency = QSpinBox()
+        self.concurrency.setRange(1, 2048)
+        self.concurrency.setValue(256)
+        self.rate = QSpinBox()
+        self.rate.setRange(1, 20000)
+        self.rate.setValue(500)
+        self.rate.setSuffix(" probes/s")
+        self.timeout = QSpinBox()
+        self.timeout.setRange(50, 5000)
+        self.timeout.setValue(500)
+        self.timeout.setSuffix(" ms")
+
+        form = QFormLayout()
+        form.addRow("CIDR", self.cidr)
+        form.addRow("TCP Ports (comma)", self.ports)
+        form.addRow("Tags for new hosts", self.tags)
+        form.addRow("Concurrency", self.concurrency)
+        form.addRow("Rate limit", self.rate)
+        form.addRow("Timeout", self.timeout)
+
+        self.model = FoundModel()
+        self.view = QTableView()
+        self.view.setModel(self.model)
+        self.view.setAlternatingRowColors(True)
+        self.view.horizontalHeader().setStretchLastSection(True)
+
+        self.progress = QProgressBar()
+        self.lbl_status = QLabel("")
+
+        self.btn_start = QPushButton("Start")
+        self.btn_stop = QPushButton("Stop")
+        self.btn_add = QPushButton("Add found hosts")
+        self.btn_close = QPushButton("Close")
+        self.btn_stop.setEnabled(False)
+        self.btn_add.setEnabled(False)
+
+        self.btn_start.clicked.connect(self.start)
+        self.btn_stop.clicked.connect(self.stop)
+        self.btn_add.clicked.connect(self.add_found)
+        self.btn_close.clicked.connect(self.close)
+
+        buttons = QHBoxLayout()
+        buttons.addWidget(self.btn_start)
+        buttons.addWidget(self.btn_stop)
+        buttons.addStretch(1)
+        buttons.addWidget(self.btn_add)
+        buttons.addWidget(self.btn_close)
+
+        layout = QVBoxLayout(self)
+        layout.addLayout(form)
+        layout.addWidget(self.progress)
+        layout.addWidget(self.lbl_status)
+        layout.addWidget(self.view)
+        layout.addLayout(buttons)
+
+    def start(self) -> None:
+        cidr = self.cidr.text().strip()
+        try:
+            total = len(expand_targets(cidr))
+        except ValueError as e:
+            QMessageBox.warning(self, "Validation", str(e))
+            return
+
+        self.model.clear()
+        self.progress.setRange(0, total)
+        self.progress.setValue(0)
+        self.lbl_status.setText(f"Sweeping {total} addresses…")
+
+        self.thread = DiscoveryThread(
+            cidr,
+            parse_ports(self.ports.text()),
+            concurrency=self.concurrency.value(),
+            rate_per_s=self.rate.value(),
+            timeout_ms=self.timeout.value(),
+            parent=self,
+        )
+        self.thread.found.connect(self.model.append)
+        self.thread.progress.connect(lambda done, _total: self.progress.setValue(done))
+        self.thread.finished_sweep.connect(self._on_finished)
+        self.thread.start()
+
+        self.btn_start.setEnabled(False)
+        self.btn_stop.setEnabled(True)
+        self.btn_add.setEnabled(False)
+
+    def stop(self) -> None:
+        if self.thread:
+            self.thread.stop()
+
+    def _on_finished(self, message: str) -> None:
+        self.lbl_status.setText(f"{message} {len(self.model.found)} live hosts.")
+        self.btn_start.setEnabled(True)
+        self.btn_stop.setEnabled(False)
+        self.btn_add.setEnabled(bool(self.model.found))
+
+    def add_found(self) -> None:
+        n = bulk_insert_hosts(self.model.found, tags=self.tags.text().strip())
+        self.added += n
+        self.lbl_status.setText(f"Added {n} hosts ({len(self.model.found) - n} already known).")
+        self.btn_add.setEnabled(False)
+
+    def closeEvent(self, event):
+        if self.thread and self.thread.isRunning():
+            self.thread.stop()
+            self.thread.wait(5000)
+        event.accept()
@@ -0,0 +1,131 @@
+from __future__ import annotations
+
+from datetime import datetime, timezone
+from typing import Optional
+
+from PySide6.QtCore import QDateTime, QTimeZone
+from PySide6.QtWidgets import (
+    QCheckBox,
+    QComboBox,
+    QDateTimeEdit,
+    QDialog,
+    QFileDialog,
+    QFormLayout,
+    QHBoxLayout,
+    QLabel,
+    QLineEdit,
+    QMessageBox,
+    QPushButton,
+    QVBoxLayout,
+)
+
+from app.export import ExportFilter, export
+from app.ui.tasks import TaskThread
+
+_SUFFIX = {"csv": "CSV (*.csv)", "jsonl": "JSON Lines (*.jsonl)", "parquet": "Parquet (*.parquet)"}
+
+
+def _qdt_ms(w: QDateTimeEdit) -> int:
+    return int(w.dateTime().toMSecsSinceEpoch())
+
+
+class ExportDialog(QDialog):
+    def __init__(self, what: str = "results", parent=None):
+        super().__init__(parent)
+        self.what = what
+        self.setWindowTitle(f"Export {what}")
+        self.resize(480, 300)
+        self.task: Optional[TaskThread] = None
+
+        self.format = QComboBox()
+        self.format.addItems(list(_SUFFIX))
+        self.hosts = QLineEdit()
+        self.hosts.setPlaceholderText("names or addresses (comma), blank for all")
+        self.tag = QLineEdit()
+        self.check_type = QComboBox()
+        self.check_type.addItems(["all", "ping", "tcp", "dns", "push"])
+
+        now = QDateTime.currentDateTimeUtc()
+        self.use_range = QCheckBox("Limit time range (UTC)")
+        self.since = QDateTimeEdit(now.addDays(-7))
+        self.until = QDateTimeEdit(now)
+        for w in (self.since, self.until):
+            w.setTimeZone(QTimeZone.utc())
+            w.setDisplayFormat("yyyy-MM-dd HH:mm")
+            w.setCalendarPopup(True)
+            w.setEnabled(False)
+        self.use_range.toggled.connect(self.since.setEnabled)
+        self.use_range.toggled.connect(self.until.setEnabled)
+
+        form = QFormLayout()
+        form.addRow("Format", self.format)
+        form.addRow("Hosts", self.hosts)
+        form.addRow("Tag", self.tag)
+        form.addRow("Type", self.check_type)
+        form.addRow(self.use_range)
+        form.addRow("Since", self.since)
+        form.addRow("Until", self.until)
+
+        self.lbl_status = QLabel("")
+        self.btn_export = QPushButton("Export…")
+        self.btn_close = QPushButton("Close")
+        self.btn_export.clicked.connect(self.start)
+        self.btn_close.clicked.connect(self.close)
+
+        buttons = QHBoxLayout()
+        buttons.addStretch(1)
+        buttons.addWidget(self.btn_export)
+        buttons.addWidget(self.btn_close)
+
+        layout = QVBoxLayout(self)
+        layout.addLayout(form)
+        layout.addWidget(self.lbl_status)
+        layout.addLayout(buttons)
+
+        if what == "alerts":
+            self.check_type.removeItem(self.check_type.findText("dns"))
+
+    def _filter(self) -> ExportFilter:
+        ct = self.check_type.currentText()
+        flt = ExportFilter(
+            hosts=[h.strip() for h in self.hosts.text().split(",") if h.strip()],
+            tag=self.tag.text().strip(),
+            check_type="" if ct == "all" else ct,
+        )
+        if self.use_range.isChecked():
+            flt.since_ms = _qdt_ms(self.since)
+            flt.until_ms = _qdt_ms(self.until)
+        return flt
+
+    def start(self) -> None:
+        if self.task and self.task.isRunning():
+            return
+        flt = self._filter()
+        if flt.since_ms is not None and flt.until_ms is not None and flt.since_ms >= flt.until_ms:
+            QMessageBox.warning(self, "Validation", "Since must be before Until.")
+            return
+
+        fmt = self.format.currentText()
+        stamp = datetime.now(timezone.utc).strftime("%Y%m%d-%H%M")
+        path, _ = QFileDialog.getSaveFileName(self, "Export to", f"{self.what}-{stamp}.{fmt}", _SUFFIX[fmt])
+        if not path:
+            return
+
+        def job() -> str:
+            n = export(self.what, fmt, path, flt)
+            return f"Exported {n} {self.what} to {path}"
+
+        self.btn_export.setEnabled(False)
+        self.lbl_status.setText("Exporting…")
+        self.task = TaskThread(job, "Export", parent=self)
+        self.task.done.connect(self._done)
+        self.task.start()
+
+    def _done(self, msg: str) -> None:
+        self.btn_export.setEnabled(True)
+        self.lbl_status.setText(msg)
+
+    def closeEvent(self, event):
+        if self.task and self.task.isRunning():
+            self.task.wait()
+        event.accept()
@@ -0,0 +1,320 @@
+from __future__ import annotations
+
+from bisect import bisect_left, bisect_right
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+from PySide6.QtCore import QEvent, QPoint, QRect, Qt, QTimer, Signal
+from PySide6.QtGui import QColor, QPainter, QPaintEvent
+from PySide6.QtWidgets import QHBoxLayout, QLabel, QScrollArea, QToolTip, QVBoxLayout, QWidget
+
+from app import metrics
+from app.profiling import PROFILER
+from app.plan import push_interval_of
+from app.status import STATUS, StatusStore
+from app.ui.host_detail_dialog import HostDetailDialog
+
+CellKey = Tuple[int, str, str]  # (host_id, check_type, target)
+
+CELL = 12
+GAP = 2
+MARGIN = 8
+HEADER_H = 20
+UNTAGGED = "(untagged)"
+
+# Above this many changed cells one full repaint is cheaper than a huge update region
+FULL_REPAINT_CELLS = 2000
+
+STATE_COLORS: Dict[str, QColor] = {
+    "ok": QColor(70, 170, 95),
+    "fail": QColor(215, 70, 70),
+    "timeout": QColor(235, 100, 60),
+    "error": QColor(230, 180, 60),
+    "dns_fail": QColor(240, 140, 40),
+    "unreachable": QColor(140, 100, 210),
+    "unknown": QColor(80, 80, 90),
+    "disabled": QColor(45, 45, 50),
+}
+_BACKGROUND = QColor(22, 22, 26)
+_HEADER_TEXT = QColor(200, 200, 210)
+
+
+def _group_of(tags: str) -> str:
+    first = (tags or "").split(",")[0].strip()
+    return first or UNTAGGED
+
+
+class FleetHeatmap(QWidget):
+    """
+    One painted cell per host check (ping or heartbeat, then each TCP port), grouped
+    under the host's first tag and wrapped to the widget width.
+
+    Fed from a StatusStore: each tick asks the store which hosts changed
+    since the last tick, re-derives only their cells and invalidates only
+    the rectangles whose state moved, and paintEvent walks just the rows
+    intersecting the exposed region. A steady fleet costs one dict scan
+    per tick and no painting at all.
+    """
+
+    host_activated = Signal(int)
+
+    def __init__(self, store: StatusStore = STATUS, parent=None):
+        super().__init__(parent)
+        self.store = store
+        self.setMouseTracking(True)
+        self.setAttribute(Qt.WA_OpaquePaintEvent)
+
+        self._hosts_version = -1
+        self._version = 0
+        self._keys: Dict[int, List[CellKey]] = {}  # host_id -> its cells, in layout order
+        self._state: Dict[CellKey, str] = {}
+        self._groups: List[Tuple[str, List[int]]] = []
+
+        # Layout: cell rects, plus rows sorted by y for region and hit lookups
+        self._rects: Dict[CellKey, QRect] = {}
+        self._row_ys: List[int] = []
+        self._rows: List[List[CellKey]] = []
+        self._headers: List[Tuple[int, str]] = []
+        self._cols = 0
+
+    # ---- state ----
+
+    def _host_cells(self, host_id: int) -> Dict[CellKey, str]:
+        series = self.store.series_of(host_id)
+        info = self.store.hosts.get(host_id)
+        # The host-level cell: its heartbeat for push hosts, else its ping
+        liveness = "push" if info is not None and push_interval_of(info.tags) is not None else "ping"
+        cells: Dict[CellKey, str] = {(host_id, liveness, ""): "unknown"}
+        for (check_type, target), s in sorted(series.items()):
+            if check_type != "dns":
+                cells[(host_id, check_type, target)] = "ok" if s.ok else s.outcome
+        dns = series.get(("dns", ""))
+        if dns is not None and not dns.ok:
+            cells[(host_id, "ping", "")] = "dns_fail"  # no address, so nothing was probed
+        if info is not None and not info.enabled:
+            cells = {k: "disabled" for k in cells}
+        return cells
+
+    def rebuild(self) -> None:
+        """Re-read every host and lay the grid out again (host list changed)."""
+        self._hosts_version = self.store.hosts_version
+        self._version = self.store.version
+        groups: Dict[str, List[int]] = {}
+        for info in sorted(self.store.hosts.values(), key=lambda h: (h.name.lower(), h.id)):
+            groups.setdefault(_group_of(info.tags), []).append(info.id)
+        self._groups = sorted(groups.items(), key=lambda g: (g[0] == UNTAGGED, g[0].lower()))
+
+        self._keys.clear()
+        self._state.clear()
+        for _, ids in self._groups:
+            for hid in ids:
+                cells = self._host_cells(hid)
+                self._keys[hid] = list(cells)
+                self._state.update(cells)
+        self._relayout()
+        self.update()
+
+    def refresh(self) -> List[CellKey]:
+        """Apply store changes since the last call; returns the cells that changed."""
+        if self.store.hosts_version != self._hosts_version:
+            self.rebuild()
+            return list(self._state)
+
+        self._version, changed_hosts = self.store.changed_hosts(self._version)
+        dirty: List[CellKey] = []
+        relayout = False
+        for hid in changed_hosts:
+            if hid not in self._keys:
+                continue  # host added since the last reload; the next hosts_version picks it up
+            cells = self._host_cells(hid)
+            keys = list(cells)
+            if keys != self._keys[hid]:
+                for k in self._keys[hid]:
+                    self._state.pop(k, None)
+                self._keys[hid] = keys
+                relayout = True
+            for k, st in cells.items():
+                if self._state.get(k) != st:
+                    self._state[k] = st
+                    dirty.append(k)
+
+        if relayout:
+            self._relayout()
+            self.update()
+        elif len(dirty) > FULL_REPAINT_CELLS:
+            self.update()
+        else:
+            for k in dirty:
+                self.update(self._rects[k])
+        return dirty
+
+    @property
+    def built(self) -> bool:
+        return self._hosts_version >= 0
+
+    @property
+    def host_count(self) -> int:
+        return len(self._keys)
+
+    def counts(self) -> Counter:
+        return Counter(self._state.values())
+
+    # ---- layout ----
+
+    def _relayout(self) -> None:
+        step = CELL + GAP
+        self._cols = cols = max(1, (self.width() - 2 * MARGIN + GAP) // step)
+        self._rects.clear()
+        self._row_ys.clear()
+        self._rows.clear()
+        self._headers.clear()
+
+        y = MARGIN
+        for tag, ids in self._groups:
+            self._headers.append((y, f"{tag}  ({len(ids)} hosts)"))
+            y += HEADER_H
+            row: List[CellKey] = []
+            for hid in ids:
+                for key in self._keys.get(hid, ()):
+                    if len(row) == cols:
+                        self._row_ys.append(y)
+                        self._rows.append(row)
+                        row = []
+                        y += step
+                    self._rects[key] = QRect(MARGIN + len(row) * step, y, CELL, CELL)
+                    row.append(key)
+            if row:
+                self._row_ys.append(y)
+                self._rows.append(row)
+                y += step
+            y += 2 * GAP
+        self.setMinimumHeight(y + MARGIN)
+
+    def resizeEvent(self, event) -> None:
+        super().resizeEvent(event)
+        if max(1, (self.width() - 2 * MARGIN + GAP) // (CELL + GAP)) != self._cols:
+            self._relayout()
+            self.update()
+
+    # ---- painting ----
+
+    def paintEvent(self, event: QPaintEvent) -> None:
+        area = event.rect()
+        p = QPainter(self)
+        p.fillRect(area, _BACKGROUND)
+
+        p.setPen(_HEADER_TEXT)
+        for y, text in self._headers:
+            if area.top() <= y + HEADER_H and y <= area.bottom():
+                p.drawText(QRect(MARGIN, y, self.width() - 2 * MARGIN, HEADER_H), Qt.AlignLeft | Qt.AlignVCenter, text)
+
+        first = bisect_left(self._row_ys, area.top() - CELL)
+        last = bisect_right(self._row_ys, area.bottom())
+        unknown = STATE_COLORS["unknown"]
+        for row in self._rows[first:last]:
+            for key in row:
+                rect = self._rects[key]
+                if rect.intersects(area):
+                    p.fillRect(rect, STATE_COLORS.get(self._state.get(key, "unknown"), unknown))
+        p.end()
+
+    # ---- interaction ----
+
+    def cell_at(self, pos: QPoint) -> Optional[CellKey]:
+        i = bisect_right(self._row_ys, pos.y()) - 1
+        if i < 0 or pos.y() >= self._row_ys[i] + CELL:
+            return None
+        col, off = divmod(pos.x() - MARGIN, CELL + GAP)
+        if pos.x() < MARGIN or off >= CELL or col >= len(self._rows[i]):
+            return None
+        return self._rows[i][col]
+
+    def event(self, e) -> bool:
+        if e.type() == QEvent.ToolTip:
+            key = self.cell_at(e.pos())
+            if key is None:
+                QToolTip.hideText()
+            else:
+                QToolTip.showText(e.globalPos(), self._tooltip(key), self)
+            return True
+        return super().event(e)
+
+    def _tooltip(self, key: CellKey) -> str:
+        host_id, check_type, target = key
+        info = self.store.hosts.get(host_id)
+        name = f"{info.name} ({info.address})" if info else f"#{host_id}"
+        s = self.store.series_of(host_id).get((check_type, target))
+        check = f"{check_type}:{target}" if target else check_type
+        lines = [name, f"{check}: {self._state.get(key, 'unknown')}"]
+        if s is not None:
+            if s.rtt_ms is not None:
+                lines.append(f"RTT {s.rtt_ms:.1f} ms")
+            if not s.ok:
+                lines.append(s.message)
+        return "\n".join(lines)
+
+    def mouseDoubleClickEvent(self, e) -> None:
+        key = self.cell_at(e.pos())
+        if key is not None:
+            self.host_activated.emit(key[0])
+
+
+class FleetWidget(QWidget):
+    def __init__(self, store: StatusStore = STATUS, refresh_ms: int = 1000):
+        super().__init__()
+        self.store = store
+
+        self.heatmap = FleetHeatmap(store)
+        self.heatmap.host_activated.connect(self.open_details)
+        scroll = QScrollArea()
+        scroll.setWidgetResizable(True)
+        scroll.setWidget(self.heatmap)
+
+        self.lbl_summary = QLabel("")
+        top = QHBoxLayout()
+        top.addWidget(QLabel("Fleet"))
+        top.addStretch(1)
+        top.addWidget(self.lbl_summary)
+
+        legend = QHBoxLayout()
+        for state, color in STATE_COLORS.items():
+            swatch = QLabel()
+            swatch.setFixedSize(CELL, CELL)
+            swatch.setStyleSheet(f"background-color: {color.name()};")
+            legend.addWidget(swatch)
+            legend.addWidget(QLabel(state.replace("_", " ")))
+            legend.addSpacing(8)
+        legend.addStretch(1)
+
+        layout = QVBoxLayout(self)
+        layout.addLayout(top)
+        layout.addLayout(legend)
+        layout.addWidget(scroll)
+
+        self.timer = QTimer(self)
+        self.timer.setInterval(refresh_ms)
+        self.timer.timeout.connect(self.refresh)
+        self.timer.start()
+
+        self.refresh()
+
+    def refresh(self) -> None:
+        # Hidden: skip; changes accumulate in the store and are applied on the next visible tick
+        if not self.isVisible() and self.heatmap.built:
+            return
+        with PROFILER.section("ui", "fleet"), metrics.UI_REFRESH_SECONDS.time(widget="fleet"):
+            try:
+                self.store.sync()
+            except Exception:
+                metrics.DB_ERRORS.inc(op="fleet")
+                return
+            self.heatmap.refresh()
+            c = self.heatmap.counts()
+            failing = sum(n for st, n in c.items() if st not in ("ok", "unknown", "disabled"))
+            self.lbl_summary.setText(
+                f"{self.heatmap.host_count} hosts, {sum(c.values())} checks: "
+                f"{c['ok']} ok, {failing} failing, {c['unknown']} unknown"
+            )
+
+    def open_details(self, host_id: int) -> None:
+        HostDetailDialog(host_id, parent=self).exec()
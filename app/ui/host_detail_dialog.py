@@ -1,11 +1,15 @@
 from __future__ import annotations
 
+import time
 from dataclasses import dataclass
-from typing import Any, List, Optional
+from typing import Any, List, Optional, Tuple
 
-from PySide6.QtCore import QAbstractTableModel, QModelIndex, Qt
+from PySide6.QtCharts import QChart, QChartView, QDateTimeAxis, QLineSeries, QValueAxis
+from PySide6.QtCore import QAbstractTableModel, QDateTime, QModelIndex, QPointF, Qt
+from PySide6.QtGui import QColor, QPainter
 from PySide6.QtWidgets import (
     QDialog,
+    QSplitter,
     QVBoxLayout,
     QHBoxLayout,
     QLabel,
@@ -18,7 +22,36 @@ from PySide6.QtWidgets import (
 from sqlmodel import select, desc
 
 from app.db import get_session
-from app.models import Host, CheckResult
+from app.history import RAW_SPAN_MS, availability, current_fail_streak, load_rows, rtt_history, timeline
+from app.models import Host, CheckResult, KIND_BY_NAME, fmt_ts_ms, kind_name
+from app.plan import parse_ports, push_interval_of
+from app.rollup import update_rollups
+from app.store import CATALOG
+from app.ui.tasks import TaskThread
+
+
+UPTIME_WINDOW_MS = 24 * 3600 * 1000
+
+CHART_RANGES_MS = {
+    "1h": 3600 * 1000,
+    "6h": 6 * 3600 * 1000,
+    "24h": 24 * 3600 * 1000,
+    "7d": 7 * 86400 * 1000,
+    "30d": 30 * 86400 * 1000,
+    "90d": 90 * 86400 * 1000,
+}
+CHART_MAX_POINTS = 1500
+
+
+def _fmt_duration(ms: int) -> str:
+    s = ms // 1000
+    if s < 60:
+        return f"{s}s"
+    if s < 3600:
+        return f"{s // 60}m {s % 60:02d}s"
+    if s < 86400:
+        return f"{s // 3600}h {s % 3600 // 60:02d}m"
+    return f"{s // 86400}d {s % 86400 // 3600:02d}h"
 
 
 @dataclass
@@ -29,10 +62,12 @@ class Row:
     ok: bool
     rtt: Optional[float]
     message: str
+    duration: str = ""
+    samples: int = 1
 
 
 class HostResultsModel(QAbstractTableModel):
-    COLS = ["Time (UTC)", "Type", "Target", "OK", "RTT (ms)", "Message"]
+    COLS = ["Since (UTC)", "Type", "Target", "OK", "RTT (ms)", "Duration", "Probes", "Message"]
 
     def __init__(self):
         super().__init__()
@@ -67,6 +102,10 @@ class HostResultsModel(QAbstractTableModel):
             if c == 4:
                 return "" if r.rtt is None else f"{r.rtt:.1f}"
             if c == 5:
+                return r.duration
+            if c == 6:
+                return str(r.samples)
+            if c == 7:
                 return r.message
         return None
 
@@ -76,21 +115,78 @@ class HostResultsModel(QAbstractTableModel):
         self.endResetModel()
 
 
+class RttChart(QChartView):
+    """RTT line (left axis) and availability (right axis, %) over time."""
+
+    def __init__(self, parent=None):
+        chart = QChart()
+        chart.legend().setAlignment(Qt.AlignBottom)
+        chart.setBackgroundBrush(QColor(22, 22, 26))
+        chart.legend().setLabelColor(QColor(230, 230, 235))
+        super().__init__(chart, parent)
+        self.setRenderHint(QPainter.Antialiasing)
+
+        self.rtt = QLineSeries()
+        self.rtt.setName("RTT (ms)")
+        self.avail = QLineSeries()
+        self.avail.setName("Availability (%)")
+        self.avail.setColor(QColor(70, 170, 95))
+        chart.addSeries(self.rtt)
+        chart.addSeries(self.avail)
+
+        self.x = QDateTimeAxis()
+        self.x.setTitleText("Local time")
+        self.x.setTitleBrush(QColor(200, 200, 210))
+        self.y_rtt = QValueAxis()
+        self.y_rtt.setLabelFormat("%.0f")
+        self.y_avail = QValueAxis()
+        self.y_avail.setRange(0, 100)
+        self.y_avail.setLabelFormat("%.0f")
+        for axis, side in ((self.x, Qt.AlignBottom), (self.y_rtt, Qt.AlignLeft), (self.y_avail, Qt.AlignRight)):
+            axis.setLabelsColor(QColor(200, 200, 210))
+            chart.addAxis(axis, side)
+        for series, y in ((self.rtt, self.y_rtt), (self.avail, self.y_avail)):
+            series.attachAxis(self.x)
+            series.attachAxis(y)
+
+    def set_data(self, rtt: List[Tuple[float, float]], avail: List[Tuple[float, float]], since_ms: int, until_ms: int) -> None:
+        # replace() swaps all points in one call; append() per point repaints per point
+        self.rtt.replace([QPointF(x, y) for x, y in rtt])
+        self.avail.replace([QPointF(x, y) for x, y in avail])
+        span = until_ms - since_ms
+        self.x.setFormat("HH:mm" if span <= 86400 * 1000 else "MM-dd HH:mm")
+        self.x.setRange(QDateTime.fromMSecsSinceEpoch(since_ms), QDateTime.fromMSecsSinceEpoch(until_ms))
+        top = max((y for _, y in rtt), default=1.0)
+        self.y_rtt.setRange(0, top * 1.1 or 1.0)
+
+
 class HostDetailDialog(QDialog):
     def __init__(self, host_id: int, parent=None):
         super().__init__(parent)
         self.host_id = int(host_id)
         self.setWindowTitle(f"Host Details #{self.host_id}")
-        self.resize(900, 600)
+        self._chart_task: Optional[TaskThread] = None
+        self._chart_stale = False
+        self.resize(1000, 750)
 
         self.lbl_title = QLabel("")
         self.lbl_stats = QLabel("")
         self.lbl_stats.setTextInteractionFlags(Qt.TextSelectableByMouse)
 
         self.filter_type = QComboBox()
-        self.filter_type.addItems(["all", "ping", "tcp"])
+        self.filter_type.addItems(["all", "ping", "tcp", "dns", "push"])
         self.filter_type.currentTextChanged.connect(self.refresh)
 
+        self.chart_series = QComboBox()
+        self.chart_series.currentIndexChanged.connect(self.refresh_chart)
+        self.chart_range = QComboBox()
+        self.chart_range.addItems(list(CHART_RANGES_MS))
+        self.chart_range.setCurrentText("24h")
+        self.chart_range.currentTextChanged.connect(self.refresh_chart)
+        self.lbl_chart = QLabel("")
+        self.chart = RttChart()
+        self.chart.setMinimumHeight(220)
+
         self.model = HostResultsModel()
         self.view = QTableView()
         self.view.setModel(self.model)
@@ -107,14 +203,89 @@ class HostDetailDialog(QDialog):
         top.addWidget(self.filter_type)
         top.addWidget(self.btn_refresh)
 
+        chart_bar = QHBoxLayout()
+        chart_bar.addWidget(QLabel("Chart:"))
+        chart_bar.addWidget(self.chart_series)
+        chart_bar.addWidget(QLabel("Range:"))
+        chart_bar.addWidget(self.chart_range)
+        chart_bar.addStretch(1)
+        chart_bar.addWidget(self.lbl_chart)
+
+        chart_box = QWidget()
+        chart_layout = QVBoxLayout(chart_box)
+        chart_layout.setContentsMargins(0, 0, 0, 0)
+        chart_layout.addLayout(chart_bar)
+        chart_layout.addWidget(self.chart)
+
+        split = QSplitter(Qt.Vertical)
+        split.addWidget(chart_box)
+        split.addWidget(self.view)
+
         layout = QVBoxLayout(self)
         layout.addLayout(top)
         layout.addWidget(self.lbl_stats)
-        layout.addWidget(self.view)
+        layout.addWidget(split)
 
         self.refresh()
 
+    def _set_chart_choices(self, host: Host) -> None:
+        liveness = "push" if push_interval_of(host.tags) is not None else "ping"
+        choices = [(liveness, int(KIND_BY_NAME[liveness]), 0)]
+        choices += [(f"tcp:{p}", int(KIND_BY_NAME["tcp"]), p) for p in parse_ports(getattr(host, "tcp_ports", "") or "")]
+        current = self.chart_series.currentText()
+        self.chart_series.blockSignals(True)
+        self.chart_series.clear()
+        for label, kind, port in choices:
+            self.chart_series.addItem(label, (kind, port))
+        i = self.chart_series.findText(current)
+        self.chart_series.setCurrentIndex(max(0, i))
+        self.chart_series.blockSignals(False)
+
+    def refresh_chart(self) -> None:
+        choice = self.chart_series.currentData()
+        if choice is None:
+            return
+        if self._chart_task and self._chart_task.isRunning():
+            self._chart_stale = True  # redrawn with the newest choice once this one lands
+            return
+        self._chart_stale = False
+        kind, port = choice
+        until_ms = int(time.time() * 1000)
+        since_ms = until_ms - CHART_RANGES_MS[self.chart_range.currentText()]
+        loaded = {}
+
+        def job() -> str:
+            if until_ms - since_ms > RAW_SPAN_MS:
+                update_rollups()  # incremental; picks up rows since the API's last fold
+            with get_session() as session:
+                loaded["hist"] = rtt_history(
+                    session, self.host_id, kind, port, since_ms, until_ms, max_points=CHART_MAX_POINTS
+                )
+            return ""
+
+        def show(msg: str) -> None:
+            task.wait()  # done is its last act; lets a stale choice start the next one
+            hist = loaded.get("hist")
+            if hist is None:
+                self.lbl_chart.setText(msg)
+            else:
+                self.chart.set_data(hist.rtt, hist.availability, since_ms, until_ms)
+                self.lbl_chart.setText(f"{hist.tier} data: {hist.source_points} → {len(hist.rtt)} points")
+            if self._chart_stale:
+                self.refresh_chart()
+
+        task = self._chart_task = TaskThread(job, "Chart", parent=self)
+        task.done.connect(show)
+        task.start()
+
+    def done(self, result: int) -> None:
+        if self._chart_task:
+            self._chart_task.wait(5000)
+        super().done(result)
+
     def refresh(self) -> None:
+        now_ms = int(time.time() * 1000)
+        since_ms = now_ms - UPTIME_WINDOW_MS
         with get_session() as session:
             host = session.get(Host, self.host_id)
             if not host:
@@ -123,41 +294,46 @@ class HostDetailDialog(QDialog):
                 return
 
             self.lbl_title.setText(f"{host.name}  —  {host.address}   [tags: {host.tags}]")
+            self._set_chart_choices(host)
 
-            q = select(CheckResult).where(CheckResult.host_id == self.host_id)
+            kind = None
             t = self.filter_type.currentText()
             if t != "all":
-                q = q.where(CheckResult.check_type == t)
-            q = q.order_by(desc(CheckResult.ts)).limit(300)
+                kind = int(KIND_BY_NAME[t])
 
-            results = list(session.exec(q))
+            # Uptime is time-weighted over a fixed window, so it reads the same
+            # whether every probe or only state transitions were stored.
+            window = load_rows(session, self.host_id, since_ms, now_ms + 1, kind=kind)
 
-            # Summary stats: fail streak across all types (or filtered type)
-            streak = 0
-            for r in results:
-                if r.ok:
-                    break
-                streak += 1
+            q = select(CheckResult).where(CheckResult.host_id == self.host_id)
+            if kind is not None:
+                q = q.where(CheckResult.kind == kind)
+            recent = list(session.exec(q.order_by(desc(CheckResult.ts_ms)).limit(300)))
 
-            total = len(results)
-            ok_count = sum(1 for r in results if r.ok)
-            uptime = (ok_count / total * 100.0) if total else 0.0
+        segments = timeline(window, now_ms)
+        uptime = availability(segments, since_ms, now_ms)
+        streak = current_fail_streak(recent)
+        probes = sum(seg.samples for seg in segments if seg.end_ms > since_ms)
 
+        uptime_s = "n/a" if uptime is None else f"{uptime:.2f}%"
         self.lbl_stats.setText(
-            f"Last {total} checks | Uptime: {uptime:.1f}% | Current fail streak: {streak} | TCP ports: {getattr(host,'tcp_ports','')}"
+            f"Uptime 24h: {uptime_s} ({probes} probes) | Current fail streak: {streak} | "
+            f"TCP ports: {getattr(host,'tcp_ports','')}"
         )
 
         rows: List[Row] = []
-        for r in results:
+        for seg in reversed(timeline(list(reversed(recent)), now_ms)):
             rows.append(
                 Row(
-                    ts=r.ts.strftime("%Y-%m-%d %H:%M:%S"),
-                    check_type=r.check_type,
-                    target=r.target or "",
-                    ok=bool(r.ok),
-                    rtt=r.rtt_ms,
-                    message=r.message,
+                    ts=fmt_ts_ms(seg.start_ms),
+                    check_type=kind_name(seg.kind),
+                    target=str(seg.port) if seg.port else "",
+                    ok=seg.ok,
+                    rtt=seg.rtt_ms,
+                    message=CATALOG.text(seg.msg_id),
+                    duration=_fmt_duration(seg.duration_ms),
+                    samples=seg.samples,
                 )
             )
         self.model.set_rows(rows)
-
+        self.refresh_chart()
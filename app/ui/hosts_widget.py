@@ -1,8 +1,9 @@
 from __future__ import annotations
 
-from typing import Any, List, Optional
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
 
-from PySide6.QtCore import QAbstractTableModel, QModelIndex, Qt, QSortFilterProxyModel, Signal
+from PySide6.QtCore import QAbstractTableModel, QModelIndex, Qt, QSortFilterProxyModel, QTimer, Signal
+from PySide6.QtGui import QColor
 from PySide6.QtWidgets import (
     QWidget,
     QVBoxLayout,
@@ -16,33 +17,55 @@ from PySide6.QtWidgets import (
     QDialogButtonBox,
     QMessageBox,
     QTableView,
+    QComboBox,
 )
 
 from sqlmodel import select
+from app import metrics
+from app.profiling import PROFILER
 from app.db import get_session
-from app.models import Host
+from app.models import Host, classify_outcome
+from app.status import STATUS, host_state
 from app.ui.host_detail_dialog import HostDetailDialog
+from app.ui.discovery_dialog import DiscoveryDialog
+
+LIVE_FLUSH_MS = 250
 
 
 class HostDialog(QDialog):
-    def __init__(self, parent=None, host: Host | None = None):
+    def __init__(self, parent=None, host: Host | None = None, hosts: List[Host] | None = None):
         super().__init__(parent)
         self.setWindowTitle("Host")
         self._host = host
 
         self.name = QLineEdit(host.name if host else "")
         self.addr = QLineEdit(host.address if host else "")
+        self.tags = QLineEdit(host.tags if host else "")
         self.tcp_ports = QLineEdit(getattr(host, "tcp_ports", "") if host else "")
         self.tcp_ports.setPlaceholderText("e.g. 3389,445,5985 (leave blank to disable TCP checks)")
 
         self.enabled = QCheckBox("Enabled")
         self.enabled.setChecked(host.enabled if host else True)
 
+        # Upstream dependency (gateway/switch); a host cannot be its own parent
+        self.parent_host = QComboBox()
+        self.parent_host.addItem("(none)", None)
+        for h in hosts or []:
+            if host is not None and h.id == host.id:
+                continue
+            self.parent_host.addItem(f"{h.name} ({h.address})", h.id)
+        current = getattr(host, "parent_id", None) if host else None
+        if current is not None:
+            i = self.parent_host.findData(current)
+            if i >= 0:
+                self.parent_host.setCurrentIndex(i)
+
         form = QFormLayout()
         form.addRow("Name", self.name)
         form.addRow("Address", self.addr)
         form.addRow("Tags (comma)", self.tags)
         form.addRow("TCP Ports (comma)", self.tcp_ports)
+        form.addRow("Parent (upstream)", self.parent_host)
         form.addRow("", self.enabled)
 
         buttons = QDialogButtonBox(QDialogButtonBox.Ok | QDialogButtonBox.Cancel)
@@ -53,22 +76,57 @@ class HostDialog(QDialog):
         layout.addLayout(form)
         layout.addWidget(buttons)
 
-    def get_data(self) -> tuple[str, str, str, str, bool]:
+    def get_data(self) -> tuple[str, str, str, str, bool, Optional[int]]:
         return (
             self.name.text().strip(),
             self.addr.text().strip(),
             self.tags.text().strip(),
             self.tcp_ports.text().strip(),
             self.enabled.isChecked(),
+            self.parent_host.currentData(),
         )
 
 
+# Host fields shown in the table; a change in any of them repaints the row
+_HOST_FIELDS = ("name", "address", "tags", "tcp_ports", "enabled", "parent_id")
+
+_STATE_COLORS = {
+    "up": QColor(170, 255, 170),
+    "degraded": QColor(255, 215, 140),
+    "down": QColor(255, 170, 170),
+    "unreachable": QColor(200, 170, 255),
+}
+
+
+def _runs(rows: Iterable[int]) -> List[Tuple[int, int]]:
+    """Sorted row numbers -> contiguous (first, last) ranges."""
+    out: List[Tuple[int, int]] = []
+    for r in sorted(rows):
+        if out and r == out[-1][1] + 1:
+            out[-1] = (out[-1][0], r)
+        else:
+            out.append((r, r))
+    return out
+
+
 class HostsModel(QAbstractTableModel):
-    COLS = ["ID", "Name", "Address", "Tags", "TCP Ports", "Enabled"]
+    COLS = ["ID", "Name", "Address", "Tags", "TCP Ports", "Enabled", "Parent", "Status", "RTT (ms)"]
+    STATUS_COL = 7
 
     def __init__(self):
         super().__init__()
         self.hosts: List[Host] = []
+        self._row: Dict[int, int] = {}  # host id -> row
+
+        # Live status pushed by the monitor: per host, the last result per
+        # (check_type, target), rolled up the same way the status store does
+        self._checks: Dict[int, Dict[Tuple[str, str], Dict[str, Any]]] = {}
+        self._live: Dict[int, Tuple[str, Optional[float]]] = {}  # host id -> (state, ping rtt)
+        self._dirty: Set[int] = set()
+        self._flush_timer = QTimer(self)
+        self._flush_timer.setSingleShot(True)
+        self._flush_timer.setInterval(LIVE_FLUSH_MS)
+        self._flush_timer.timeout.connect(self._flush_live)
 
     def rowCount(self, parent: QModelIndex = QModelIndex()) -> int:
         return len(self.hosts)
@@ -102,13 +160,116 @@ class HostsModel(QAbstractTableModel):
                 return getattr(h, "tcp_ports", "22,80,443")
             if col == 5:
                 return "Yes" if h.enabled else "No"
+            if col == 6:
+                pid = getattr(h, "parent_id", None)
+                return "" if pid is None else str(pid)
+            if col == 7:
+                return self._state_of(h)
+            if col == 8:
+                rtt = self._live.get(int(h.id), ("", None))[1] if h.enabled else None
+                return "" if rtt is None else f"{rtt:.1f}"
+
+        if role == Qt.ForegroundRole and col == self.STATUS_COL:
+            return _STATE_COLORS.get(self._state_of(h))
 
         return None
 
+    def _state_of(self, h: Host) -> str:
+        if not h.enabled:
+            return "disabled"
+        return self._live.get(int(h.id), ("unknown", None))[0]
+
     def set_hosts(self, hosts: List[Host]) -> None:
-        self.beginResetModel()
-        self.hosts = hosts
-        self.endResetModel()
+        """
+        Apply a fresh host list as a keyed diff: rows are removed, inserted
+        or repainted individually, so selection, scroll position and the
+        proxy's sort/filter state survive a refresh.
+        """
+        incoming = {int(h.id): h for h in hosts if h.id is not None}
+
+        gone = [row for hid, row in self._row.items() if hid not in incoming]
+        for first, last in reversed(_runs(gone)):
+            self.beginRemoveRows(QModelIndex(), first, last)
+            del self.hosts[first:last + 1]
+            self.endRemoveRows()
+        if gone:
+            self._row = {int(h.id): i for i, h in enumerate(self.hosts)}
+            self._checks = {hid: v for hid, v in self._checks.items() if hid in incoming}
+            self._live = {hid: v for hid, v in self._live.items() if hid in incoming}
+
+        changed: List[int] = []
+        for row, old in enumerate(self.hosts):
+            new = incoming[int(old.id)]
+            if any(getattr(old, f, None) != getattr(new, f, None) for f in _HOST_FIELDS):
+                changed.append(row)
+            self.hosts[row] = new  # fresh instance either way; the old session is closed
+        last_col = len(self.COLS) - 1
+        for first, last in _runs(changed):
+            self.dataChanged.emit(self.index(first, 0), self.index(last, last_col))
+
+        added = [h for hid, h in incoming.items() if hid not in self._row]
+        if added:
+            start = len(self.hosts)
+            self.beginInsertRows(QModelIndex(), start, start + len(added) - 1)
+            self.hosts.extend(added)
+            for i, h in enumerate(added, start):
+                self._row[int(h.id)] = i
+            self.endInsertRows()
+
+    def without_live(self) -> List[int]:
+        return [hid for hid in self._row if hid not in self._live]
+
+    def seed_live(self, statuses: Iterable[Dict[str, Any]]) -> None:
+        """Initial status from StatusStore.host_status() dicts, for hosts no result has reached yet."""
+        for hs in statuses:
+            hid = int(hs["id"])
+            if hid in self._live:
+                continue  # already pushed by the monitor; that is newer
+            self._checks[hid] = {(c["check_type"], c["target"]): c for c in hs["checks"]}
+            self._update_live(hid)
+
+    def on_result(self, host_id: int, check_type: str, target: str, ok: bool, rtt_ms, message: str) -> None:
+        """Record one monitor result; repaints are batched every LIVE_FLUSH_MS."""
+        checks = self._checks.setdefault(int(host_id), {})
+        outcome = classify_outcome(bool(ok), message).name.lower()
+        if check_type == "ping" and outcome != "unreachable":
+            checks.pop(("dns", ""), None)  # a probed ping means the name resolved
+        checks[(check_type, target or "")] = {
+            "check_type": check_type,
+            "ok": bool(ok),
+            "outcome": outcome,
+            "rtt_ms": rtt_ms,
+        }
+        self._update_live(int(host_id))
+
+    def on_fast_state(self, host_id: int, check_type: str, target: str, up: bool) -> None:
+        """
+        A fast-tier up/down flip (app.fastprobe). It only changes the state of
+        the series; RTT stays the monitor's, and its next result takes over.
+        """
+        checks = self._checks.setdefault(int(host_id), {})
+        key = (check_type, target or "")
+        cur = checks.get(key, {"check_type": check_type, "rtt_ms": None})
+        checks[key] = {**cur, "ok": bool(up), "outcome": "ok" if up else "fail"}
+        self._update_live(int(host_id))
+
+    def _update_live(self, host_id: int) -> None:
+        checks = self._checks.get(host_id, {})
+        ping = checks.get(("ping", ""))
+        live = (host_state(True, list(checks.values())), ping["rtt_ms"] if ping else None)
+        if self._live.get(host_id) == live:
+            return
+        self._live[host_id] = live
+        if host_id in self._row:
+            self._dirty.add(host_id)
+            if not self._flush_timer.isActive():
+                self._flush_timer.start()
+
+    def _flush_live(self) -> None:
+        rows = [self._row[hid] for hid in self._dirty if hid in self._row]
+        self._dirty.clear()
+        for first, last in _runs(rows):
+            self.dataChanged.emit(self.index(first, self.STATUS_COL), self.index(last, len(self.COLS) - 1))
 
     def get_host_at(self, row: int) -> Optional[Host]:
         if 0 <= row < len(self.hosts):
@@ -164,11 +325,13 @@ class HostsWidget(QWidget):
         self.btn_add = QPushButton("Add")
         self.btn_edit = QPushButton("Edit")
         self.btn_del = QPushButton("Delete")
+        self.btn_discover = QPushButton("Discover…")
         self.btn_refresh = QPushButton("Refresh")
 
         self.btn_add.clicked.connect(self.add_host)
         self.btn_edit.clicked.connect(self.edit_host)
         self.btn_del.clicked.connect(self.delete_host)
+        self.btn_discover.clicked.connect(self.discover_hosts)
         self.btn_refresh.clicked.connect(self.refresh)
 
         top = QHBoxLayout()
@@ -177,6 +340,7 @@ class HostsWidget(QWidget):
         top.addWidget(self.btn_add)
         top.addWidget(self.btn_edit)
         top.addWidget(self.btn_del)
+        top.addWidget(self.btn_discover)
         top.addWidget(self.btn_refresh)
 
         layout = QVBoxLayout(self)
@@ -187,11 +351,21 @@ class HostsWidget(QWidget):
         self.refresh()
 
     def refresh(self) -> None:
-        with get_session() as session:
-            hosts = list(session.exec(select(Host)))
-        self.model.set_hosts(hosts)
+        with PROFILER.section("ui", "hosts"), metrics.UI_REFRESH_SECONDS.time(widget="hosts"):
+            with get_session() as session:
+                hosts = list(session.exec(select(Host)))
+            self.model.set_hosts(hosts)
+            missing = self.model.without_live()
+            if missing and STATUS.version:
+                self.model.seed_live(hs for hs in map(STATUS.host_status, missing) if hs is not None)
         self.hosts_changed.emit()
 
+    def on_result(self, host_id: int, check_type: str, target: str, ok: bool, rtt_ms, ts, message: str) -> None:
+        self.model.on_result(host_id, check_type, target, ok, rtt_ms, message)
+
+    def on_fast_state(self, host_id: int, check_type: str, target: str, up: bool) -> None:
+        self.model.on_fast_state(host_id, check_type, target, up)
+
     def _selected_host(self) -> Host | None:
         idxs = self.view.selectionModel().selectedRows()
         if not idxs:
@@ -208,32 +382,40 @@ class HostsWidget(QWidget):
         dlg.exec()
 
     def add_host(self) -> None:
-        dlg = HostDialog(self)
+        dlg = HostDialog(self, hosts=self.model.hosts)
         if dlg.exec() != QDialog.Accepted:
             return
 
-        name, addr, tags, tcp_ports, enabled = dlg.get_data()
+        name, addr, tags, tcp_ports, enabled, parent_id = dlg.get_data()
         if not name or not addr:
             QMessageBox.warning(self, "Validation", "Name and Address are required.")
             return
 
         with get_session() as session:
-            session.add(Host(name=name, address=addr, tags=tags, tcp_ports=tcp_ports, enabled=enabled))
+            session.add(
+                Host(name=name, address=addr, tags=tags, tcp_ports=tcp_ports, enabled=enabled, parent_id=parent_id)
+            )
             session.commit()
 
         self.refresh()
 
+    def discover_hosts(self) -> None:
+        dlg = DiscoveryDialog(self)
+        dlg.exec()
+        if dlg.added:
+            self.refresh()
+
     def edit_host(self) -> None:
         host = self._selected_host()
         if not host or host.id is None:
             QMessageBox.information(self, "Edit", "Select a host row first.")
             return
 
-        dlg = HostDialog(self, host=host)
+        dlg = HostDialog(self, host=host, hosts=self.model.hosts)
         if dlg.exec() != QDialog.Accepted:
             return
 
-        name, addr, tags, tcp_ports, enabled = dlg.get_data()
+        name, addr, tags, tcp_ports, enabled, parent_id = dlg.get_data()
         if not name or not addr:
             QMessageBox.warning(self, "Validation", "Name and Address are required.")
             return
@@ -248,6 +430,7 @@ class HostsWidget(QWidget):
             h2.tags = tags
             h2.tcp_ports = tcp_ports
             h2.enabled = enabled
+            h2.parent_id = parent_id
             session.add(h2)
             session.commit()
 
@@ -265,6 +448,10 @@ class HostsWidget(QWidget):
         with get_session() as session:
             h2 = session.get(Host, host.id)
             if h2:
+                # Re-root children so they are probed directly again
+                for child in session.exec(select(Host).where(Host.parent_id == h2.id)):
+                    child.parent_id = None
+                    session.add(child)
                 session.delete(h2)
                 session.commit()
 
@@ -1,5 +1,8 @@
 from __future__ import annotations
 
+import time
+
+from PySide6.QtCore import QTimer
 from PySide6.QtWidgets import (
     QMainWindow,
     QWidget,
@@ -9,13 +12,31 @@ from PySide6.QtWidgets import (
 )
 
 from app.ui.hosts_widget import HostsWidget
+from app.ui.fleet_heatmap import FleetWidget
 from app.ui.results_widget import ResultsWidget
 from app.ui.alerts_widget import AlertsWidget
+from app.ui.diagnostics_widget import DiagnosticsWidget
+from app.ui.tasks import TaskThread
+from app.api import ApiServer
+from app.archive import archive_older_than
+from app.backup import create_backup, list_backups
+from app.metrics import MetricsServer
+from app.fastprobe import FastProber
+from app.heartbeat import HEARTBEAT_PORT, HeartbeatThread
+from app.maintenance import MaintenanceThread
 from app.monitor import MonitorThread
+from app.rollup import update_rollups
+from app.wire import parse_endpoint
+
+METRICS_PORT = 9464
+API_PORT = 9465
+ARCHIVE_AFTER_DAYS = 30
+ARCHIVE_EVERY_MS = 3600 * 1000
+BACKUP_EVERY_MS = 6 * 3600 * 1000
 
 
 class MainWindow(QMainWindow):
-    def __init__(self):
+    def __init__(self, monitor: MonitorThread | None = None, heartbeat_listen: str = "", heartbeat_token: str = ""):
         super().__init__()
         self.setWindowTitle("SentinelDesk")
         self.resize(1200, 750)
@@ -23,12 +44,35 @@ class MainWindow(QMainWindow):
         self.tabs = QTabWidget()
 
         self.hosts = HostsWidget()
+        self.fleet = FleetWidget()
         self.results = ResultsWidget()
         self.alerts = AlertsWidget()
 
+        # Prometheus export is best-effort: a busy port must not stop the app
+        self.metrics_server = None
+        endpoint = ""
+        try:
+            self.metrics_server = MetricsServer(port=METRICS_PORT)
+            self.metrics_server.start()
+            host, port = self.metrics_server.address
+            endpoint = f"http://{host}:{port}/metrics"
+        except OSError:
+            self.metrics_server = None
+        self.diagnostics = DiagnosticsWidget(endpoint=endpoint)
+
+        # Read-only JSON API for wallboards/scripts; also best-effort
+        self.api_server = None
+        try:
+            self.api_server = ApiServer(port=API_PORT)
+            self.api_server.start()
+        except OSError:
+            self.api_server = None
+
         self.tabs.addTab(self.hosts, "Hosts")
+        self.tabs.addTab(self.fleet, "Fleet")
         self.tabs.addTab(self.results, "Results")
         self.tabs.addTab(self.alerts, "Alerts")
+        self.tabs.addTab(self.diagnostics, "Diagnostics")
 
         root = QWidget()
         layout = QVBoxLayout(root)
@@ -38,19 +82,109 @@ class MainWindow(QMainWindow):
         self.setStatusBar(QStatusBar())
         self.statusBar().showMessage("Ready.")
 
-        self.monitor = MonitorThread(interval_s=10, timeout_ms=1000, parent=self)
+        # A ReplayMonitor (app/simulator.py) stands in for the probing monitor when given
+        self.monitor = monitor or MonitorThread(interval_s=10, timeout_ms=1000)
+        self.monitor.setParent(self)
         self.monitor.result.connect(self.results.on_new_result)
+        self.monitor.result.connect(self.hosts.on_result)
         self.monitor.alert.connect(self.alerts.on_alert)
         self.monitor.status.connect(self.statusBar().showMessage)
+        self.monitor.track_backlog = True  # results/alerts widgets drain SIGNAL_BACKLOG
 
         self.hosts.hosts_changed.connect(self.results.refresh)
+        self.hosts.hosts_changed.connect(self.monitor.invalidate_plan)
 
         self.monitor.start()
 
+        # Sub-second tier for hosts tagged "fast"; idle when there are none
+        self.fast = FastProber(parent=self)
+        self.fast.alert.connect(self.alerts.on_alert)
+        self.fast.state_changed.connect(self.hosts.on_fast_state)
+        self.fast.status.connect(self.statusBar().showMessage)
+        self.fast.track_backlog = True
+        self.hosts.hosts_changed.connect(self.fast.invalidate)
+        if self.api_server:
+            self.api_server.fast_samples = self.fast.samples
+        self.fast.start()
+
+        # Hosts tagged "push" report in over UDP/TCP instead of being probed; best-effort like the servers above
+        # Loopback unless configured; HeartbeatListener refuses other addresses without a token
+        hb_host, hb_port = parse_endpoint(heartbeat_listen, default_port=HEARTBEAT_PORT)
+        self.heartbeats = HeartbeatThread(host=hb_host, port=hb_port, token=heartbeat_token, parent=self)
+        self.heartbeats.result.connect(self.results.on_new_result)
+        self.heartbeats.result.connect(self.hosts.on_result)
+        self.heartbeats.alert.connect(self.alerts.on_alert)
+        self.heartbeats.status.connect(self.statusBar().showMessage)
+        self.heartbeats.track_backlog = True
+        self.heartbeats.start()
+
+        # Move whole days older than ARCHIVE_AFTER_DAYS out of the live DB
+        self._archive_task: TaskThread | None = None
+        self.archive_timer = QTimer(self)
+        self.archive_timer.setInterval(ARCHIVE_EVERY_MS)
+        self.archive_timer.timeout.connect(self.archive_history)
+        self.archive_timer.start()
+        QTimer.singleShot(60_000, self.archive_history)
+
+        # Online snapshot into backups/ next to the DB, rotated to backup.KEEP
+        self._backup_task: TaskThread | None = None
+        self.backup_timer = QTimer(self)
+        self.backup_timer.setInterval(BACKUP_EVERY_MS)
+        self.backup_timer.timeout.connect(self.backup_database)
+        self.backup_timer.start()
+        QTimer.singleShot(120_000, self.backup_database)
+
+        # Checkpoints, incremental vacuum and planner stats, only while nothing is writing
+        self.maintenance = MaintenanceThread(parent=self)
+        self.maintenance.status.connect(self.statusBar().showMessage)
+        self.maintenance.start()
+
+    def archive_history(self) -> None:
+        if self._archive_task and self._archive_task.isRunning():
+            return
+
+        def job() -> str:
+            update_rollups()  # rows leaving the live table must already be in the rollups
+            st = archive_older_than(ARCHIVE_AFTER_DAYS)
+            return f"Archived {st.rows} results from {st.days} days." if st.rows else ""
+
+        self._archive_task = TaskThread(job, "Archive", parent=self)
+        self._archive_task.done.connect(lambda msg: msg and self.statusBar().showMessage(msg))
+        self._archive_task.start()
+
+    def backup_database(self) -> None:
+        if self._backup_task and self._backup_task.isRunning():
+            return
+
+        def job() -> str:
+            existing = list_backups()
+            # Restarting the app must not take a snapshot each time
+            if existing and time.time() * 1000 - existing[-1].taken_ms < BACKUP_EVERY_MS:
+                return ""
+            info = create_backup()
+            return f"Backed up the database to {info.name} ({info.bytes / 1048576:.1f} MB)."
+
+        self._backup_task = TaskThread(job, "Backup", parent=self)
+        self._backup_task.done.connect(lambda msg: msg and self.statusBar().showMessage(msg))
+        self._backup_task.start()
+
     def closeEvent(self, event):
         try:
             self.monitor.stop()
             self.monitor.wait(2000)
+            self.fast.stop()
+            self.fast.wait(2000)
+            self.maintenance.stop()
+            self.maintenance.wait(2000)
+            self.heartbeats.stop()
+            self.heartbeats.wait(2000)
+            if self._archive_task:
+                self._archive_task.wait(5000)
+            if self._backup_task:
+                self._backup_task.wait(5000)
+            if self.metrics_server:
+                self.metrics_server.stop()
+            if self.api_server:
+                self.api_server.stop()
         finally:
             event.accept()
-
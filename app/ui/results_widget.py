@@ -1,9 +1,10 @@
 from __future__ import annotations
 
+import time
 from dataclasses import dataclass
-from typing import Any, Optional, List
+from typing import Any, Dict, Optional, List
 
-from PySide6.QtCore import QAbstractTableModel, QModelIndex, Qt
+from PySide6.QtCore import QAbstractTableModel, QModelIndex, Qt, QThread, QTimer, Signal
 from PySide6.QtGui import QColor
 from PySide6.QtWidgets import (
     QWidget,
@@ -12,12 +13,25 @@ from PySide6.QtWidgets import (
     QPushButton,
     QLabel,
     QTableView,
+    QLineEdit,
+    QComboBox,
+    QDoubleSpinBox,
 )
 
-from sqlmodel import select, desc
+from sqlmodel import select
 
+from app import metrics
+from app.profiling import PROFILER
 from app.db import get_session
-from app.models import Host, CheckResult
+from app.models import Host, KIND_BY_NAME, classify_outcome, fmt_ts_ms, ts_to_ms
+from app.query import STATUSES, CompiledQuery, Cursor, ResultQuery, compile_query, fetch_page
+from app.store import CATALOG
+from app.ui.export_dialog import ExportDialog
+
+PAGE_ROWS = 400
+LIVE_MAX_ROWS = 800
+DEBOUNCE_MS = 300
+RANGES_MS = {"any time": None, "15m": 15 * 60_000, "1h": 3600_000, "24h": 86400_000, "7d": 7 * 86400_000, "30d": 30 * 86400_000}
 
 
 @dataclass
@@ -30,6 +44,8 @@ class ResultRow:
     ok: bool
     rtt: Optional[float]
     message: str
+    ts_ms: int = 0
+    id: int = 0  # 0 for live rows not read back from the DB
 
 
 class ResultsModel(QAbstractTableModel):
@@ -87,6 +103,14 @@ class ResultsModel(QAbstractTableModel):
         self.rows = rows
         self.endResetModel()
 
+    def append_rows(self, rows: List[ResultRow]) -> None:
+        if not rows:
+            return
+        start = len(self.rows)
+        self.beginInsertRows(QModelIndex(), start, start + len(rows) - 1)
+        self.rows.extend(rows)
+        self.endInsertRows()
+
     def prepend_row(self, row: ResultRow, max_rows: int = 800) -> None:
         self.beginInsertRows(QModelIndex(), 0, 0)
         self.rows.insert(0, row)
@@ -101,6 +125,45 @@ class ResultsModel(QAbstractTableModel):
             self.endRemoveRows()
 
 
+class QueryThread(QThread):
+    """Compiles and runs one results query off the UI thread."""
+
+    # (generation, compiled query, rows, next cursor, append)
+    finished_page = Signal(int, object, object, object, bool)
+
+    def __init__(self, generation: int, query: ResultQuery, after: Optional[Cursor], append: bool, parent=None):
+        super().__init__(parent)
+        self.generation = generation
+        self.query = query
+        self.after = after
+        self.append = append
+
+    def run(self) -> None:
+        with PROFILER.section("ui", "results_query"), metrics.UI_REFRESH_SECONDS.time(widget="results_query"), get_session() as session:
+            hosts: Dict[int, Host] = {int(h.id): h for h in session.exec(select(Host))}
+            cq = compile_query(self.query, hosts)
+            results, cursor = fetch_page(session, cq, self.after, PAGE_ROWS)
+
+        rows: List[ResultRow] = []
+        for r in results:
+            h = hosts.get(r.host_id)
+            rows.append(
+                ResultRow(
+                    ts_str=fmt_ts_ms(r.ts_ms),
+                    host_name=h.name if h else f"#{r.host_id}",
+                    host_addr=h.address if h else "?",
+                    check_type=r.check_type,
+                    target=r.target,
+                    ok=r.ok,
+                    rtt=r.rtt_ms,
+                    message=CATALOG.text(r.msg_id),
+                    ts_ms=r.ts_ms,
+                    id=int(r.id),
+                )
+            )
+        self.finished_page.emit(self.generation, cq, rows, cursor, self.append)
+
+
 class ResultsWidget(QWidget):
     def __init__(self):
         super().__init__()
@@ -113,49 +176,124 @@ class ResultsWidget(QWidget):
         self.view.setSelectionMode(QTableView.SingleSelection)
         self.view.horizontalHeader().setStretchLastSection(True)
 
+        # Filter bar: every edit restarts the debounce timer; the query runs once typing pauses
+        self.f_host = QLineEdit()
+        self.f_host.setPlaceholderText("host name/address")
+        self.f_tag = QLineEdit()
+        self.f_tag.setPlaceholderText("tag")
+        self.f_type = QComboBox()
+        self.f_type.addItems(["any type", "ping", "tcp", "dns", "push"])
+        self.f_status = QComboBox()
+        self.f_status.addItems(["any status", *STATUSES[1:]])
+        self.f_range = QComboBox()
+        self.f_range.addItems(list(RANGES_MS))
+        self.f_rtt = QDoubleSpinBox()
+        self.f_rtt.setRange(0, 100_000)
+        self.f_rtt.setDecimals(1)
+        self.f_rtt.setSuffix(" ms")
+        self.f_rtt.setSpecialValueText("RTT > off")
+
+        self.debounce = QTimer(self)
+        self.debounce.setSingleShot(True)
+        self.debounce.setInterval(DEBOUNCE_MS)
+        self.debounce.timeout.connect(self.refresh)
+        for w in (self.f_host, self.f_tag):
+            w.textChanged.connect(self.debounce.start)
+        for c in (self.f_type, self.f_status, self.f_range):
+            c.currentIndexChanged.connect(self.debounce.start)
+        self.f_rtt.valueChanged.connect(self.debounce.start)
+
+        self.lbl_info = QLabel("")
+        self.btn_more = QPushButton("Load more")
+        self.btn_more.clicked.connect(self.load_more)
+        self.btn_more.setEnabled(False)
         self.btn_refresh = QPushButton("Refresh")
         self.btn_refresh.clicked.connect(self.refresh)
+        self.btn_export = QPushButton("Export…")
+        self.btn_export.clicked.connect(self.export)
 
         top = QHBoxLayout()
         top.addWidget(QLabel("Latest Results"))
         top.addStretch(1)
+        top.addWidget(self.btn_export)
         top.addWidget(self.btn_refresh)
 
+        filters = QHBoxLayout()
+        for w in (self.f_host, self.f_tag, self.f_type, self.f_status, self.f_range, self.f_rtt):
+            filters.addWidget(w)
+
+        bottom = QHBoxLayout()
+        bottom.addWidget(self.lbl_info)
+        bottom.addStretch(1)
+        bottom.addWidget(self.btn_more)
+
         layout = QVBoxLayout(self)
         layout.addLayout(top)
+        layout.addLayout(filters)
         layout.addWidget(self.view)
+        layout.addLayout(bottom)
 
-        self.refresh()
-
-    def refresh(self) -> None:
-        N = 400
-        with get_session() as session:
-            results = list(session.exec(select(CheckResult).order_by(desc(CheckResult.ts)).limit(N)))
-            hosts = list(session.exec(select(Host)))
-            host_map = {h.id: h for h in hosts}
+        self._generation = 0
+        self._threads: List[QueryThread] = []
+        self._compiled: Optional[CompiledQuery] = None
+        self._cursor: Optional[Cursor] = None
+        self._max_rows = LIVE_MAX_ROWS  # grows with pages loaded, so the live feed never trims them away
 
-        rows: List[ResultRow] = []
-        for r in results:
-            h = host_map.get(r.host_id)
-            host_name = h.name if h else f"#{r.host_id}"
-            host_addr = h.address if h else "?"
+        self.refresh()
 
-            rows.append(
-                ResultRow(
-                    ts_str=r.ts.strftime("%Y-%m-%d %H:%M:%S"),
-                    host_name=host_name,
-                    host_addr=host_addr,
-                    check_type=getattr(r, "check_type", "ping"),
-                    target=getattr(r, "target", "") or "",
-                    ok=bool(r.ok),
-                    rtt=r.rtt_ms,
-                    message=r.message,
-                )
-            )
+    def export(self) -> None:
+        ExportDialog("results", self).exec()
+
+    def current_query(self) -> ResultQuery:
+        span = RANGES_MS[self.f_range.currentText()]
+        return ResultQuery(
+            host=self.f_host.text(),
+            tag=self.f_tag.text(),
+            check_type=self.f_type.currentText() if self.f_type.currentIndex() > 0 else "",
+            status=self.f_status.currentText() if self.f_status.currentIndex() > 0 else "",
+            since_ms=int(time.time() * 1000) - span if span else None,
+            rtt_above_ms=self.f_rtt.value() or None,
+        )
 
-        self.model.set_rows(rows)
+    def refresh(self) -> None:
+        self.debounce.stop()
+        self._start_query(self.current_query(), None, append=False)
+
+    def load_more(self) -> None:
+        if self._compiled is not None and self._cursor is not None:
+            self._start_query(self._compiled.query, self._cursor, append=True)
+
+    def _start_query(self, query: ResultQuery, after: Optional[Cursor], append: bool) -> None:
+        # Newer queries supersede older ones; a stale result that lands late is dropped
+        self._generation += 1
+        self.lbl_info.setText("Querying…")
+        t = QueryThread(self._generation, query, after, append, parent=self)
+        t.finished_page.connect(self._on_page)
+        t.finished.connect(lambda: self._threads.remove(t))
+        self._threads.append(t)
+        t.start()
+
+    def _on_page(self, generation: int, cq: CompiledQuery, rows: List[ResultRow], cursor: Optional[Cursor], append: bool) -> None:
+        if generation != self._generation:
+            return
+        self._compiled = cq
+        self._cursor = cursor
+        if append:
+            self.model.append_rows(rows)
+        else:
+            self.model.set_rows(rows)
+        self._max_rows = max(LIVE_MAX_ROWS, len(self.model.rows))
+        self.btn_more.setEnabled(cursor is not None)
+        self.lbl_info.setText(f"{len(self.model.rows)} rows" + (" (more available)" if cursor else ""))
 
     def on_new_result(self, host_id: int, check_type: str, target: str, ok: bool, rtt_ms, ts, message: str) -> None:
+        metrics.SIGNAL_BACKLOG.dec()
+        ts_ms = ts_to_ms(ts)
+        if self._compiled is not None and not self._compiled.matches(
+            int(host_id), int(KIND_BY_NAME[check_type]), int(classify_outcome(bool(ok), message)), ts_ms, rtt_ms
+        ):
+            return
+
         host_name = f"#{host_id}"
         host_addr = "?"
 
@@ -178,7 +316,12 @@ class ResultsWidget(QWidget):
                 ok=bool(ok),
                 rtt=None if rtt_ms is None else float(rtt_ms),
                 message=message,
+                ts_ms=ts_ms,
             ),
-            max_rows=800,
+            max_rows=self._max_rows,
         )
-
+        if self._compiled is not None and len(self.model.rows) == self._max_rows:
+            # Rows trimmed off the bottom are still reachable: the next page starts below the last row shown
+            last = self.model.rows[-1]
+            self._cursor = (last.ts_ms, last.id)
+            self.btn_more.setEnabled(True)
@@ -0,0 +1,26 @@
+from __future__ import annotations
+
+from typing import Callable
+
+from PySide6.QtCore import QThread, Signal
+
+
+class TaskThread(QThread):
+    """
+    Runs one blocking job (archiving, exports, ...) off the UI thread and
+    reports its summary line, or the error, through `done`.
+    """
+
+    done = Signal(str)
+
+    def __init__(self, fn: Callable[[], str], label: str, parent=None):
+        super().__init__(parent)
+        self.fn = fn
+        self.label = label
+
+    def run(self) -> None:
+        try:
+            msg = self.fn()
+        except Exception as e:
+            msg = f"{self.label} failed: {e}"
+        self.done.emit(msg)
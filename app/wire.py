@@ -0,0 +1,64 @@
+from __future__ import annotations
+
+import asyncio
+import ipaddress
+import json
+import struct
+import zlib
+from typing import Any, Dict
+
+# Agent <-> collector framing: u32 big-endian body length, then a zlib-compressed
+# UTF-8 JSON object with a "type" field. Result rows are positional lists
+# (host_id, check_type, target, ok, rtt_ms, ts_ms, message, samples), which
+# compress well. Version 2 added samples: failures the agent confirmed by re-probing.
+PROTOCOL_VERSION = 2
+DEFAULT_PORT = 9470
+MAX_FRAME = 32 * 1024 * 1024  # compressed
+MAX_BODY = 64 * 1024 * 1024  # decompressed; a zlib bomb stops here
+
+_LEN = struct.Struct(">I")
+
+Message = Dict[str, Any]
+
+
+def encode(msg: Message) -> bytes:
+    body = zlib.compress(json.dumps(msg, separators=(",", ":")).encode("utf-8"), 6)
+    return _LEN.pack(len(body)) + body
+
+
+async def read_msg(reader: asyncio.StreamReader) -> Message:
+    """Next frame; raises asyncio.IncompleteReadError when the peer closes."""
+    (n,) = _LEN.unpack(await reader.readexactly(_LEN.size))
+    if n > MAX_FRAME:
+        raise ValueError(f"frame too large: {n} bytes")
+    d = zlib.decompressobj()
+    body = d.decompress(await reader.readexactly(n), MAX_BODY)
+    if d.unconsumed_tail:
+        raise ValueError(f"frame inflates past {MAX_BODY} bytes")
+    msg = json.loads(body)
+    if not isinstance(msg, dict) or "type" not in msg:
+        raise ValueError("malformed frame")
+    return msg
+
+
+async def send_msg(writer: asyncio.StreamWriter, msg: Message) -> None:
+    writer.write(encode(msg))
+    await writer.drain()
+
+
+def parse_endpoint(text: str, default_host: str = "127.0.0.1", default_port: int = DEFAULT_PORT):
+    """"host:port", "host" or ":port" -> (host, port)."""
+    host, sep, port = (text or "").rpartition(":")
+    if not sep:
+        return (text or default_host), default_port
+    return (host or default_host), int(port)
+
+
+def is_loopback(host: str) -> bool:
+    """True for "localhost" and loopback addresses; names and wildcards ("", 0.0.0.0, ::) are not."""
+    if host.lower() == "localhost":
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
@@ -0,0 +1,62 @@
+from __future__ import annotations
+
+import os
+import shutil
+import tempfile
+from datetime import datetime
+
+import pytest
+
+# DB_PATH is relative and the engine resolves it once, at import: import app
+# from a scratch directory and run every test there, so no test touches a real database.
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+WORKDIR = tempfile.mkdtemp(prefix="sentineldesk-tests-")
+_cwd = os.getcwd()
+os.chdir(WORKDIR)
+try:
+    from app.db import DB_PATH, engine, get_session, init_db
+    from app.models import Host
+    from app.store import CATALOG
+finally:
+    os.chdir(_cwd)
+
+
+def _clean_workdir() -> None:
+    # The database, plus archive/, backups/ and profiles/: app.db.data_dir()
+    # resolves those next to DB_PATH at call time, i.e. inside WORKDIR here
+    engine.dispose()
+    for name in os.listdir(WORKDIR):
+        path = os.path.join(WORKDIR, name)
+        if os.path.isdir(path):
+            shutil.rmtree(path)
+        else:
+            os.remove(path)
+
+
+def pytest_sessionfinish(session, exitstatus) -> None:
+    engine.dispose()
+    shutil.rmtree(WORKDIR, ignore_errors=True)
+
+
+@pytest.fixture(autouse=True)
+def db(monkeypatch):
+    """A fresh sentineldesk.db for every test."""
+    monkeypatch.chdir(WORKDIR)
+    _clean_workdir()
+    CATALOG.forget()
+    init_db()
+    yield os.path.abspath(DB_PATH)
+    _clean_workdir()
+    CATALOG.forget()
+
+
+def add_host(name: str = "h1", address: str = "10.0.0.1", tags: str = "", **kw) -> int:
+    with get_session() as session:
+        h = Host(name=name, address=address, tags=tags, **kw)
+        session.add(h)
+        session.commit()
+        return int(h.id)
+
+
+def ts(ms: int) -> datetime:
+    return datetime.utcfromtimestamp(ms / 1000.0)
@@ -0,0 +1,54 @@
+from __future__ import annotations
+
+from app import metrics
+from app.alerting import confirm_failure, wants_confirmation
+from app.ping import CANCELLED, PingResult
+
+FAIL = PingResult(ok=False, rtt_ms=None, message="Timeout")
+OK = PingResult(ok=True, rtt_ms=1.0, message="OK")
+
+
+def _reprobe(*results: PingResult):
+    it = iter(results)
+    calls = []
+
+    def reprobe() -> PingResult:
+        calls.append(1)
+        return next(it)
+
+    return reprobe, calls
+
+
+def test_only_the_healthy_to_failing_edge_is_confirmed():
+    assert wants_confirmation(FAIL, streak=0)
+    assert not wants_confirmation(FAIL, streak=2)  # already failing
+    assert not wants_confirmation(OK, streak=0)
+    assert not wants_confirmation(PingResult(ok=False, rtt_ms=None, message=CANCELLED, cancelled=True), streak=0)
+    assert not wants_confirmation(PingResult(ok=False, rtt_ms=None, message="Ping error: boom"), streak=0)
+
+
+def test_confirmed_failure_counts_every_probe():
+    reprobe, calls = _reprobe(FAIL, FAIL)
+    confirmed = metrics.PROBES_CONFIRM.value(check_type="ping", verdict="confirmed")
+    r, probes = confirm_failure("ping", FAIL, reprobe, retries=2, spacing_ms=0)
+    assert not r.ok and probes == 3 and len(calls) == 2
+    assert metrics.PROBES_CONFIRM.value(check_type="ping", verdict="confirmed") == confirmed + 1
+
+
+def test_one_success_makes_the_loss_transient():
+    reprobe, calls = _reprobe(OK, FAIL)
+    transient = metrics.PROBES_CONFIRM.value(check_type="tcp", verdict="transient")
+    r, probes = confirm_failure("tcp", FAIL, reprobe, retries=2, spacing_ms=0)
+    assert r.ok and probes == 1 and len(calls) == 1
+    assert metrics.PROBES_CONFIRM.value(check_type="tcp", verdict="transient") == transient + 1
+
+
+def test_confirmation_stops_when_cancelled_or_stopped():
+    cancelled = PingResult(ok=False, rtt_ms=None, message=CANCELLED, cancelled=True)
+    reprobe, calls = _reprobe(FAIL, cancelled, FAIL)
+    r, probes = confirm_failure("ping", FAIL, reprobe, retries=3, spacing_ms=0)
+    assert r.message == "Timeout" and probes == 2 and len(calls) == 2
+
+    reprobe, calls = _reprobe(FAIL)
+    r, probes = confirm_failure("ping", FAIL, reprobe, retries=3, spacing_ms=0, keep_going=lambda: False)
+    assert probes == 1 and calls == []
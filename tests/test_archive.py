@@ -0,0 +1,102 @@
+from __future__ import annotations
+
+import os
+
+from sqlmodel import func, select
+
+from app import archive
+from app.archive import DAY_MS, ArchiveDay, ArchiveReader, archive_older_than, day_path, day_start_ms
+from app.db import get_session
+from app.models import CheckKind, CheckResult
+from app.store import write_results
+from conftest import ts
+
+NOW = 1_700_000_000_000
+OLD_DAY = day_start_ms(NOW) - 40 * DAY_MS
+
+
+def _seed(n_per_host: int = 5):
+    rows = []
+    for hid in (2, 1):
+        for i in range(n_per_host):
+            t = OLD_DAY + i * 3_600_000
+            rows.append((hid, "ping", "", i % 2 == 0, 1.5 if i % 2 == 0 else None, ts(t), "" if i % 2 == 0 else "Timeout"))
+            rows.append((hid, "tcp", "443", True, 3.0, ts(t + 1), "", 2, 0))
+    rows.append((1, "ping", "", True, 1.0, ts(NOW - 1000), ""))  # recent: stays live
+    write_results(rows)
+
+
+def _live_rows() -> int:
+    with get_session() as session:
+        return session.exec(select(func.count()).select_from(CheckResult)).one()
+
+
+def test_archive_moves_old_days_and_round_trips(tmp_path):
+    _seed()
+    with get_session() as session:
+        before = {r.id: r for r in session.exec(select(CheckResult).where(CheckResult.ts_ms < NOW - DAY_MS))}
+
+    st = archive_older_than(30, archive_dir=str(tmp_path), now_ms=NOW)
+    assert (st.days, st.rows) == (1, 20)
+    assert _live_rows() == 1
+
+    with ArchiveDay(day_path(OLD_DAY, str(tmp_path))) as day:
+        assert day.rows == 20
+        host_ids = list(day.columns["host_id"])
+        assert host_ids == sorted(host_ids)
+        for r in day.all_rows():
+            live = before[r.id]
+            assert (r.host_id, r.ts_ms, r.kind, r.port, r.outcome, r.msg_id, r.samples, r.flags) == (
+                live.host_id, live.ts_ms, live.kind, live.port, live.outcome, live.msg_id, live.samples, live.flags
+            )
+            assert r.rtt_ms == live.rtt_ms
+
+
+def test_rerun_merges_without_duplicates(tmp_path):
+    _seed()
+    archive_older_than(30, archive_dir=str(tmp_path), now_ms=NOW)
+    # Rows of an already archived day arrive late (a buffering agent)
+    write_results([(1, "ping", "", False, None, ts(OLD_DAY + 5), "Timeout")])
+    st = archive_older_than(30, archive_dir=str(tmp_path), now_ms=NOW)
+    assert st.rows == 21
+    with ArchiveDay(day_path(OLD_DAY, str(tmp_path))) as day:
+        ids = list(day.columns["id"])
+    assert len(ids) == len(set(ids)) == 21
+
+
+def test_small_chunks_and_delete_batches_give_the_same_file(tmp_path, monkeypatch):
+    monkeypatch.setattr(archive, "CHUNK_ROWS", 3)
+    monkeypatch.setattr(archive, "DELETE_BATCH", 4)
+    monkeypatch.setattr(archive, "DELETE_PAUSE_S", 0.0)
+    _seed()
+    st = archive_older_than(30, archive_dir=str(tmp_path), now_ms=NOW)
+    assert (st.days, st.rows) == (1, 20)
+    assert _live_rows() == 1
+    write_results([(1, "ping", "", False, None, ts(OLD_DAY + 5), "Timeout")])
+    assert archive_older_than(30, archive_dir=str(tmp_path), now_ms=NOW).rows == 21
+    with ArchiveDay(day_path(OLD_DAY, str(tmp_path))) as day:
+        keys = [(r.host_id, r.ts_ms, r.id) for r in day.all_rows()]
+    assert keys == sorted(keys) and len({k[2] for k in keys}) == 21
+    assert os.listdir(tmp_path) == [os.path.basename(day_path(OLD_DAY, str(tmp_path)))]  # no spools or .tmp left
+
+
+def test_scan_narrows_by_host_time_and_kind(tmp_path):
+    _seed()
+    archive_older_than(30, archive_dir=str(tmp_path), now_ms=NOW)
+    reader = ArchiveReader(str(tmp_path))
+
+    rows = list(reader.scan(1, OLD_DAY, OLD_DAY + DAY_MS))
+    assert len(rows) == 10 and {r.host_id for r in rows} == {1}
+    assert [r.ts_ms for r in rows] == sorted(r.ts_ms for r in rows)
+
+    window = list(reader.scan(1, OLD_DAY + 3_600_000, OLD_DAY + 3 * 3_600_000, kind=int(CheckKind.TCP)))
+    assert [r.ts_ms for r in window] == [OLD_DAY + 3_600_001, OLD_DAY + 2 * 3_600_000 + 1]
+    assert all(r.samples == 2 for r in window)
+
+    assert list(reader.scan(3, OLD_DAY, OLD_DAY + DAY_MS)) == []
+    assert reader.day_files(NOW - DAY_MS, NOW) == []
+
+
+def test_nothing_to_archive(tmp_path):
+    assert archive_older_than(30, archive_dir=str(tmp_path), now_ms=NOW).rows == 0
+    assert os.listdir(tmp_path) == []
@@ -0,0 +1,56 @@
+from __future__ import annotations
+
+import gzip
+import os
+import sqlite3
+
+import pytest
+
+from app.backup import create_backup, list_backups, restore_backup, rotate, verify_backup
+from conftest import add_host
+
+
+def _host_names(path: str):
+    con = sqlite3.connect(path)
+    try:
+        return [r[0] for r in con.execute("SELECT name FROM host ORDER BY id")]
+    finally:
+        con.close()
+
+
+def test_snapshot_is_verified_and_restorable(db, tmp_path):
+    add_host("before")
+    info = create_backup(db, str(tmp_path), keep=None)
+    assert verify_backup(info.path) == "ok"
+    assert [b.path for b in list_backups(str(tmp_path))] == [info.path]
+    assert not [n for n in os.listdir(tmp_path) if n.endswith(".tmp")]
+
+    add_host("after")
+    moved = restore_backup(info.path, db)
+    assert _host_names(db) == ["before"]
+    assert _host_names(moved) == ["before", "after"]
+
+
+def test_broken_snapshots_are_refused(db, tmp_path):
+    bad = tmp_path / "sentineldesk-20240101T000000Z.db.gz"
+    with gzip.open(bad, "wb") as g:
+        g.write(b"not a database")
+    assert verify_backup(str(bad)) != "ok"
+    truncated = tmp_path / "sentineldesk-20240102T000000Z.db.gz"
+    truncated.write_bytes(gzip.compress(b"x" * 1000)[:20])
+    assert verify_backup(str(truncated)).startswith("unreadable archive")
+    with pytest.raises(RuntimeError):
+        restore_backup(str(bad), db)
+
+
+def test_rotate_keeps_the_newest(tmp_path):
+    for day in range(1, 6):
+        (tmp_path / f"sentineldesk-202401{day:02d}T000000Z.db.gz").write_bytes(b"")
+    (tmp_path / "unrelated.db.gz").write_bytes(b"")
+    removed = rotate(str(tmp_path), keep=2)
+    assert len(removed) == 3
+    assert [b.name for b in list_backups(str(tmp_path))] == [
+        "sentineldesk-20240104T000000Z.db.gz",
+        "sentineldesk-20240105T000000Z.db.gz",
+    ]
+    assert (tmp_path / "unrelated.db.gz").exists()
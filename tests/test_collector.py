@@ -0,0 +1,139 @@
+from __future__ import annotations
+
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+from sqlmodel import select
+
+from app.agent import Agent
+from app.collector import Collector, _row_tuple, shard_hosts
+from app.db import get_session
+from app.models import AlertEvent, CheckResult
+from app.ping import PingResult
+from app.wire import PROTOCOL_VERSION, read_msg, send_msg
+
+from conftest import add_host
+
+
+def _row(host_id, ok, ts_ms, message="", samples=1):
+    return _row_tuple([host_id, "ping", "", ok, 1.0 if ok else None, ts_ms, message, samples])
+
+
+def _alerts():
+    with get_session() as session:
+        return list(session.exec(select(AlertEvent)))
+
+
+def test_shard_hosts_pins_and_spreads():
+    hosts = [(1, "a", "", "agent:*", "", None), (2, "b", "", "agent:*", "", None),
+             (3, "c", "", "agent:x", "", None), (4, "d", "", "", "", None), (5, "e", "", "agent:gone", "", None)]
+    shards = shard_hosts(hosts, ["y", "x"])
+    assert [h[0] for h in shards["x"]] == [2, 3]
+    assert [h[0] for h in shards["y"]] == [1]
+    assert shard_hosts(hosts, []) == {}
+
+
+def test_collector_alerts_on_agent_failures():
+    hid = add_host("edge", "10.1.1.1", tags="agent:*")
+    c = Collector()
+    c._labels = {hid: ("edge", "10.1.1.1")}
+
+    c._write_batch([_row(hid, True, 1000), _row(hid, False, 2000, "timeout")])
+    assert _alerts() == []
+    # a confirmed failure stands for several probes and reaches the threshold
+    c._write_batch([_row(hid, False, 3000, "timeout", samples=2)])
+    alerts = _alerts()
+    assert len(alerts) == 1 and "edge (10.1.1.1) PING" in alerts[0].message and "streak=3" in alerts[0].message
+
+    c._write_batch([_row(hid, False, 4000, "timeout")])
+    assert len(_alerts()) == 1  # cooldown
+    c.alerting._last_alert_at[(hid, "ping", "")] -= timedelta(seconds=c.alerting.cooldown_seconds + 1)
+    c._write_batch([_row(hid, False, 5000, "timeout")])
+    assert len(_alerts()) == 2
+
+
+def test_collector_streak_survives_restart_and_skips_unreachable():
+    hid = add_host("edge", tags="agent:*")
+    Collector()._write_batch([_row(hid, False, 1000, "timeout", samples=2)])
+    c = Collector()
+    c._write_batch([_row(hid, False, 2000, "unreachable (parent down)")])
+    assert _alerts() == []
+    c._write_batch([_row(hid, False, 3000, "timeout")])
+    assert len(_alerts()) == 1
+
+
+def test_non_loopback_bind_needs_a_token():
+    with pytest.raises(ValueError):
+        Collector(host="0.0.0.0")
+    Collector(host="0.0.0.0", token="s3cret")
+    Collector(host="127.0.0.1")
+
+
+def test_agent_session_is_acked_and_resends_are_idempotent():
+    hid = add_host("edge", tags="agent:*")
+    local = add_host("local", "10.0.0.9")
+    rows = [[hid, "ping", "", False, None, 1000 * i, "timeout", 1] for i in range(1, 4)]
+    rows.append([local, "ping", "", False, None, 4000, "timeout", 1])  # not in the agent's shard: dropped
+
+    async def go():
+        c = Collector(port=0, token="s3cret", reload_s=60)
+        server = asyncio.create_task(c.serve())
+        while c._server is None:
+            await asyncio.sleep(0.01)
+        host, port = c.address
+
+        reader, writer = await asyncio.open_connection(host, port)
+        await send_msg(writer, {"type": "hello", "agent": "a1", "boot": "b", "protocol": PROTOCOL_VERSION, "token": "nope"})
+        refused = await read_msg(reader)
+        writer.close()
+
+        reader, writer = await asyncio.open_connection(host, port)
+        await send_msg(writer, {"type": "hello", "agent": "a1", "boot": "b", "protocol": PROTOCOL_VERSION, "token": "s3cret"})
+        assert (await read_msg(reader))["type"] == "welcome"
+        plan = await read_msg(reader)
+        acks = []
+        for _ in range(2):  # the second send is a resend after a lost ack
+            await send_msg(writer, {"type": "results", "seq": 1, "boot": "b", "rows": rows})
+            acks.append(await read_msg(reader))
+        writer.close()
+        c.stop()
+        await server
+        return refused, plan, acks
+
+    refused, plan, acks = asyncio.run(go())
+    assert refused == {"type": "error", "message": "bad token"}
+    assert [h["id"] for h in plan["hosts"]] == [hid]
+    assert acks == [{"type": "ack", "seq": 1}] * 2
+    with get_session() as session:
+        assert [r.host_id for r in session.exec(select(CheckResult))] == [hid] * 3
+    assert len(_alerts()) == 1
+
+
+def test_agent_confirms_fresh_failures():
+    a = Agent("a1")
+    a.confirm_spacing_ms = 0
+    fail = PingResult(ok=False, rtt_ms=None, message="timeout")
+    deadline = float("inf")
+
+    r, probes = a._confirmed((1, "ping", ""), fail, deadline, lambda: PingResult(ok=True, rtt_ms=2.0, message="ok"))
+    assert r.ok and probes == 1
+
+    r, probes = a._confirmed((1, "ping", ""), fail, deadline, lambda: fail)
+    assert not r.ok and probes == 3
+    a._emit(1, "ping", "", False, None, "timeout", samples=probes)
+    # an already failing series is not re-probed
+    r, probes = a._confirmed((1, "ping", ""), fail, deadline, lambda: PingResult(ok=True, rtt_ms=2.0, message="ok"))
+    assert not r.ok and probes == 1
+    assert a._buffer[0][-1] == 3
+    a._pool.shutdown()
+    a.resolver.close()
+
+
+def test_cli_agent_and_backup_do_not_need_the_database():
+    from app.cli import build_parser
+
+    p = build_parser()
+    assert p.parse_args(["agent", "--name", "a1"]).needs_db is False
+    assert p.parse_args(["backup", "list"]).needs_db is False
+    assert getattr(p.parse_args(["collector"]), "needs_db", True) is True
@@ -0,0 +1,50 @@
+from __future__ import annotations
+
+import sqlite3
+
+from sqlmodel import select
+
+from app.db import DB_PATH, get_session, hosts_version
+from app.models import Host
+from conftest import add_host
+
+
+def test_hosts_version_moves_on_every_host_write():
+    v0 = hosts_version()
+    hid = add_host()
+    v1 = hosts_version()
+    assert v1 > v0
+
+    with get_session() as session:
+        h = session.exec(select(Host).where(Host.id == hid)).one()
+        h.tags = "critical"
+        session.add(h)
+        session.commit()
+    v2 = hosts_version()
+    assert v2 > v1
+
+    with get_session() as session:
+        session.delete(session.get(Host, hid))
+        session.commit()
+    assert hosts_version() > v2
+
+
+def test_hosts_version_sees_writes_from_other_connections():
+    # Stands in for another process: a plain sqlite3 connection, no app code involved
+    v0 = hosts_version()
+    con = sqlite3.connect(DB_PATH)
+    try:
+        con.execute("INSERT INTO host (name, address, tags, enabled, created_at, tcp_ports) VALUES ('x', '10.0.0.9', '', 1, '2024-01-01', '')")
+        con.commit()
+    finally:
+        con.close()
+    assert hosts_version() == v0 + 1
+
+
+def test_hosts_version_survives_init_on_existing_file():
+    from app.db import init_db
+
+    add_host()
+    v = hosts_version()
+    init_db()
+    assert hosts_version() == v
@@ -0,0 +1,25 @@
+from __future__ import annotations
+
+import math
+
+from app.downsample import lttb
+
+
+def test_lttb_keeps_endpoints_and_threshold():
+    points = [(float(x), math.sin(x / 10.0)) for x in range(1000)]
+    out = lttb(points, 100)
+    assert len(out) == 100
+    assert out[0] == points[0] and out[-1] == points[-1]
+    assert [p[0] for p in out] == sorted(p[0] for p in out)
+
+
+def test_lttb_keeps_a_spike():
+    points = [(float(x), 1.0) for x in range(500)]
+    points[237] = (237.0, 900.0)
+    assert (237.0, 900.0) in lttb(points, 20)
+
+
+def test_lttb_passes_short_series_through():
+    points = [(0.0, 1.0), (1.0, 2.0), (2.0, 3.0)]
+    assert lttb(points, 10) == points
+    assert lttb(points, 2) == points
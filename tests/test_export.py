@@ -0,0 +1,92 @@
+from __future__ import annotations
+
+import csv
+import json
+
+import pytest
+
+from app.archive import DAY_MS, archive_older_than
+from app.db import get_session
+from app.export import ALERT_COLUMNS, RESULT_COLUMNS, ExportFilter, export
+from app.models import AlertEvent
+from app.store import write_results
+from conftest import add_host, ts
+
+NOW = 1_700_000_000_000
+
+
+@pytest.fixture
+def archive_dir(tmp_path):
+    return str(tmp_path / "archive")
+
+
+@pytest.fixture
+def fleet(archive_dir):
+    a = add_host("a", "10.0.0.1", tags="core,lab")
+    b = add_host("b", "10.0.0.2", tags="lab")
+    write_results(
+        [
+            (a, "ping", "", True, 1.0, ts(NOW - 40 * DAY_MS), ""),  # archived below
+            (a, "ping", "", True, 1.2, ts(NOW - 2000), ""),
+            (a, "tcp", "22", False, None, ts(NOW - 1500), "Timeout", 3, 0),
+            (b, "ping", "", False, None, ts(NOW - 1000), "No reply"),
+        ]
+    )
+    archive_older_than(30, archive_dir=archive_dir, now_ms=NOW)
+    with get_session() as session:
+        session.add(AlertEvent(ts=ts(NOW - 900), host_id=b, check_type="ping", message="b down"))
+        session.commit()
+    return a, b
+
+
+def test_csv_streams_archive_then_live(tmp_path, archive_dir, fleet):
+    path = tmp_path / "r.csv"
+    assert export("results", "csv", str(path), archive_dir=archive_dir) == 4
+    with open(path, newline="") as f:
+        rows = list(csv.DictReader(f))
+    assert list(rows[0]) == list(RESULT_COLUMNS)
+    assert [r["ts_ms"] for r in rows] == sorted((r["ts_ms"] for r in rows), key=int)
+    tcp = next(r for r in rows if r["check_type"] == "tcp")
+    assert (tcp["host"], tcp["target"], tcp["ok"], tcp["outcome"], tcp["message"], tcp["samples"]) == (
+        "a", "22", "False", "timeout", "Timeout", "3"
+    )
+
+
+def test_jsonl_filters(tmp_path, archive_dir, fleet):
+    path = tmp_path / "r.jsonl"
+    flt = ExportFilter(tag="core", check_type="ping", since_ms=NOW - DAY_MS)
+    n = export("results", "jsonl", str(path), flt, archive_dir=archive_dir)
+    rows = [json.loads(line) for line in path.read_text().splitlines()]
+    assert n == len(rows) == 1
+    assert (rows[0]["host"], rows[0]["rtt_ms"], rows[0]["ok"]) == ("a", 1.2, True)
+
+    assert export("results", "jsonl", str(path), ExportFilter(hosts=["10.0.0.2"]), archive_dir=archive_dir) == 1
+    assert export("results", "jsonl", str(path), ExportFilter(tag="nope"), archive_dir=archive_dir) == 0
+    assert export("results", "jsonl", str(path), ExportFilter(until_ms=NOW - DAY_MS), archive_dir=archive_dir) == 1  # the archived row
+
+
+def test_alerts(tmp_path, fleet):
+    path = tmp_path / "a.csv"
+    assert export("alerts", "csv", str(path)) == 1
+    with open(path, newline="") as f:
+        rows = list(csv.DictReader(f))
+    assert list(rows[0]) == list(ALERT_COLUMNS)
+    assert (rows[0]["host"], rows[0]["message"]) == ("b", "b down")
+
+
+def test_parquet(tmp_path, archive_dir, fleet):
+    pq = pytest.importorskip("pyarrow.parquet")
+    path = tmp_path / "r.parquet"
+    assert export("results", "parquet", str(path), archive_dir=archive_dir) == 4
+    table = pq.read_table(path)
+    assert table.column_names == list(RESULT_COLUMNS)
+    assert table.num_rows == 4
+
+
+def test_rejects_bad_arguments(tmp_path):
+    with pytest.raises(ValueError):
+        export("bogus", "csv", str(tmp_path / "x"))
+    with pytest.raises(ValueError):
+        export("results", "xml", str(tmp_path / "x"))
+    with pytest.raises(ValueError):
+        export("results", "parquet", "-")
@@ -0,0 +1,77 @@
+from __future__ import annotations
+
+import json
+import time
+import urllib.error
+import urllib.request
+
+from app.api import ApiServer
+from app.db import get_session
+from app.fastprobe import FastSeries, Sample
+from app.rollup import fast_version, fast_windows
+from app.status import StatusStore
+from conftest import add_host
+
+
+def test_series_flips_after_consecutive_losses_and_drains_a_window():
+    s = FastSeries((1, "ping", ""), ring_size=10, down_after=3)
+    flips = [s.add(Sample(i, ok, rtt)) for i, (ok, rtt) in enumerate(
+        [(True, 4.0), (True, 2.0), (False, None), (False, None), (False, None), (False, None), (True, 3.0)]
+    )]
+    assert flips == [True, None, None, None, False, None, True]
+
+    w = s.drain(now_ms=10_000)
+    assert (w.probes, w.ok_probes, w.max_loss_run) == (7, 3, 4)
+    assert (w.rtt_min, w.rtt_max, w.rtt_p95) == (2.0, 4.0, 4.0)
+    assert len(s.ring) == 7 and s.drain(now_ms=20_000) is None
+
+
+def test_windows_are_served_by_the_api_with_live_samples():
+    hid = add_host()
+    now = int(time.time() * 1000)
+    s = FastSeries((hid, "ping", ""), ring_size=10, down_after=3)
+    for ok in (True, False, True):
+        s.add(Sample(now, ok, 1.0 if ok else None))
+    with get_session() as session:
+        session.add(s.drain(now))
+        session.commit()
+    assert fast_version() == 1
+    assert [(w["probes"], w["ok_probes"]) for w in fast_windows(now - 60_000, now + 1, hid)] == [(3, 2)]
+
+    api = ApiServer(port=0, store=StatusStore(), sync_s=0.2)
+    api.start()
+    try:
+        base = "http://%s:%d/api/v1" % api.address
+        for _ in range(100):
+            if api._fast_version:
+                break
+            time.sleep(0.05)
+        with urllib.request.urlopen(f"{base}/fast?window=1h&host={hid}", timeout=5) as resp:
+            assert json.loads(resp.read())["windows"][0]["max_loss_run"] == 1
+        try:
+            urllib.request.urlopen(f"{base}/hosts/{hid}/samples", timeout=5)
+            raise AssertionError("samples without a fast tier")
+        except urllib.error.HTTPError as e:
+            assert e.code == 404
+
+        api.fast_samples = lambda host_id, check, target: list(s.ring) if (host_id, check, target) == (hid, "ping", "") else []
+        with urllib.request.urlopen(f"{base}/hosts/{hid}/samples?check=ping", timeout=5) as resp:
+            assert [ok for _, ok, _ in json.loads(resp.read())["samples"]] == [True, False, True]
+    finally:
+        api.stop()
+
+
+def test_fast_state_flips_the_hosts_view_and_keeps_the_monitor_rtt():
+    from PySide6.QtWidgets import QApplication
+
+    from app.ui.hosts_widget import HostsModel
+
+    app = QApplication.instance() or QApplication([])
+    model = HostsModel()
+    model.on_result(1, "ping", "", True, 2.5, "OK")
+    assert model._live[1] == ("up", 2.5)
+    model.on_fast_state(1, "ping", "", False)
+    assert model._live[1] == ("down", 2.5)
+    model.on_fast_state(1, "ping", "", True)
+    assert model._live[1] == ("up", 2.5)
+    assert app is not None
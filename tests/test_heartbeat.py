@@ -0,0 +1,96 @@
+from __future__ import annotations
+
+import asyncio
+import time
+
+import pytest
+from sqlmodel import select
+
+from app.db import get_session
+from app.heartbeat import HeartbeatListener, HeartbeatThread, TimerWheel, parse_heartbeat, send_heartbeat
+from app.models import AlertEvent, CheckResult
+from conftest import add_host
+
+
+def test_timer_wheel_expires_in_order_and_across_revolutions():
+    w = TimerWheel(tick_s=1.0, slots=8, now=0.0)
+    w.schedule("a", 3.0)
+    w.schedule("b", 5.0)
+    w.schedule("far", 20.0)  # shares a bucket with nearer deadlines
+    w.schedule("gone", 4.0)
+    w.cancel("gone")
+    assert w.advance(2.9) == []
+    assert w.advance(3.0) == ["a"]
+    w.schedule("b", 7.0)  # rescheduled beat
+    assert w.advance(6.0) == []
+    assert w.advance(13.0) == ["b"]
+    assert "far" in w and w.advance(19.0) == []
+    assert w.advance(100.0) == ["far"] and len(w) == 0
+
+
+def test_parse_heartbeat():
+    assert parse_heartbeat("host=web-01 TOKEN=s3cret") == {"host": "web-01", "token": "s3cret"}
+    assert parse_heartbeat("") == {}
+    with pytest.raises(ValueError):
+        parse_heartbeat("web-01")
+
+
+def test_non_loopback_bind_needs_a_token():
+    with pytest.raises(ValueError):
+        HeartbeatListener(host="0.0.0.0")
+    HeartbeatListener(host="0.0.0.0", token="s3cret")
+    HeartbeatListener(host="127.0.0.1")
+    t = HeartbeatThread(host="0.0.0.0", port=0)
+    statuses = []
+    t.status.connect(statuses.append)
+    t.run()
+    t.stop()
+    assert t.listener is None and "without a token" in statuses[0]
+
+
+def test_beats_need_the_token_and_expiry_alerts():
+    hid = add_host("web-01", "10.0.0.9", tags="push:10")
+    lst = HeartbeatListener(token="s3cret")
+    lst._apply_hosts(lst._load_hosts())
+    assert not lst.beat("host=web-01")
+    assert not lst.beat("host=web-01 token=wrong")
+    assert not lst.beat("host=nobody token=s3cret")
+    assert lst.beat("token=s3cret", peer_ip="10.0.0.9")
+    assert lst.counts() == {"up": 1, "down": 0, "pending": 0}
+
+    lv = lst._live[hid]
+    assert lst.expire(now=time.monotonic() + lv.interval_s * lst.grace + 2) == 1
+    lst._write(lst._results, lst._alerts)
+    with get_session() as session:
+        assert [r.ok for r in session.exec(select(CheckResult).order_by(CheckResult.id))] == [True, False]
+        (alert,) = session.exec(select(AlertEvent)).all()
+    assert alert.check_type == "push" and "web-01" in alert.message
+
+
+def test_listener_serves_udp_and_tcp():
+    hid = add_host("web-01", tags="push")
+
+    async def go():
+        lst = HeartbeatListener(port=0, reload_s=60)
+        task = asyncio.create_task(lst.serve())
+        while lst._udp is None or not lst._live:
+            await asyncio.sleep(0.01)
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, send_heartbeat, lst.address, "web-01", "", True)
+        for _ in range(100):
+            if lst._live[hid].beats:
+                break
+            await asyncio.sleep(0.01)
+        await loop.run_in_executor(None, send_heartbeat, lst.address, "#%d" % hid)
+        for _ in range(100):
+            if lst._live[hid].beats == 2:
+                break
+            await asyncio.sleep(0.01)
+        lst.stop()
+        await task
+        return lst._live[hid]
+
+    lv = asyncio.run(go())
+    assert lv.beats == 2 and lv.up is True
+    with get_session() as session:
+        assert [(r.check_type, r.ok) for r in session.exec(select(CheckResult))] == [("push", True)]
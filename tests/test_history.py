@@ -0,0 +1,62 @@
+from __future__ import annotations
+
+from app.db import get_session
+from app.history import availability, current_fail_streak, load_rows, rtt_history, timeline
+from app.models import CheckKind
+from app.monitor import MonitorThread
+from app.rollup import update_rollups
+from app.store import write_results
+from app.transitions import TransitionFilter
+from conftest import add_host, ts
+
+T0 = 1_700_000_000_000 - 1_700_000_000_000 % 3_600_000
+STEP = 10_000
+
+
+def _store_transitions(hid: int, probes) -> None:
+    m = MonitorThread()
+    m.storage_mode = "transitions"
+    m._transitions = TransitionFilter(heartbeat_s=3600)
+    for i, ok in enumerate(probes):
+        m._store_result(hid, "ping", "", ok, 2.0 if ok else None, ts(T0 + i * STEP), "OK" if ok else "Timeout")
+
+
+def test_timeline_and_raw_availability_agree_with_rollups():
+    hid = add_host()
+    _store_transitions(hid, [True] * 29 + [False])
+    until = T0 + 30 * STEP
+
+    with get_session() as session:
+        rows = load_rows(session, hid, T0, until)
+        segments = timeline(rows, now_ms=until)
+        raw = rtt_history(session, hid, CheckKind.PING, 0, T0, until, now_ms=until)
+
+    assert [(s.ok, s.samples, s.start_ms, s.end_ms) for s in segments] == [
+        (True, 29, T0, T0 + 29 * STEP),
+        (False, 1, T0 + 29 * STEP, until),
+    ]
+    ok = sum(s.samples for s in segments if s.ok)
+    probes = sum(s.samples for s in segments)
+    assert (ok, probes) == (29, 30)
+    assert raw.tier == "raw"
+    # every availability slot holds only probes of one state
+    assert sorted({v for _, v in raw.availability}) == [0.0, 100.0]
+
+    update_rollups(now_ms=until)
+    with get_session() as session:
+        hourly = rtt_history(session, hid, CheckKind.PING, 0, T0 - 7 * 3600_000, until + 3600_000, now_ms=until + 3 * 86400_000)
+    assert hourly.tier == "1h"
+    assert [round(v, 3) for _, v in hourly.availability] == [round(100 * 29 / 30, 3)]
+
+
+def test_timeline_in_all_mode_and_fail_streak():
+    hid = add_host()
+    outcomes = [True, True, False, False, True, False]
+    write_results([(hid, "ping", "", ok, 1.0 if ok else None, ts(T0 + i * STEP), "OK" if ok else "Timeout") for i, ok in enumerate(outcomes)])
+    until = T0 + len(outcomes) * STEP
+    with get_session() as session:
+        rows = load_rows(session, hid, T0, until)
+    segments = timeline(rows, now_ms=until)
+    assert [(s.ok, s.samples) for s in segments] == [(True, 2), (False, 2), (True, 1), (False, 1)]
+    assert availability(segments, T0, until) == 50.0
+    assert current_fail_streak(list(reversed(rows))) == 1
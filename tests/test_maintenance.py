@@ -0,0 +1,63 @@
+from __future__ import annotations
+
+import os
+import sqlite3
+
+from app.maintenance import (
+    AUTO_VACUUM_INCREMENTAL,
+    FREELIST_MIN_PAGES,
+    MaintenanceReport,
+    MaintenanceThread,
+    _pragma,
+    connect,
+    run_all,
+)
+
+
+def _legacy_db(path: str) -> None:
+    con = sqlite3.connect(path)
+    con.execute("CREATE TABLE t (x BLOB)")
+    con.executemany("INSERT INTO t VALUES (?)", [(os.urandom(4000),) for _ in range(FREELIST_MIN_PAGES + 200)])
+    con.commit()
+    con.execute("DELETE FROM t")
+    con.commit()
+    con.close()
+
+
+def test_background_thread_never_rewrites_a_legacy_file(tmp_path):
+    path = str(tmp_path / "legacy.db")
+    _legacy_db(path)
+    size = os.path.getsize(path)
+    t = MaintenanceThread(path=path)
+    hints = []
+    t.status.connect(hints.append)
+    con = connect(path)
+    try:
+        rep = MaintenanceReport()
+        t._tick(con, rep)
+        assert not rep.migrated and _pragma(con, "auto_vacuum") == 0
+        assert "maintenance --migrate" in hints[0]
+    finally:
+        con.close()
+    assert os.path.getsize(path) == size
+
+
+def test_cli_migration_switches_and_reclaims(tmp_path):
+    path = str(tmp_path / "legacy.db")
+    _legacy_db(path)
+    rep = run_all(path, migrate=True)
+    assert rep.migrated and rep.optimized
+    con = connect(path)
+    try:
+        assert _pragma(con, "auto_vacuum") == AUTO_VACUUM_INCREMENTAL
+        assert _pragma(con, "freelist_count") == 0
+    finally:
+        con.close()
+
+
+def test_new_databases_use_incremental_vacuum(db):
+    con = connect(db)
+    try:
+        assert _pragma(con, "auto_vacuum") == AUTO_VACUUM_INCREMENTAL
+    finally:
+        con.close()
@@ -0,0 +1,187 @@
+from __future__ import annotations
+
+import threading
+import time
+
+import pytest
+from sqlmodel import select
+
+from app import metrics, monitor as monitor_mod
+from app.alerting import fail_streak
+from app.db import get_session
+from app.models import AlertEvent
+from app.monitor import MonitorThread
+from app.ping import PingResult
+from app.plan import PlanHost
+from app.ratelimit import ProbeLimiter
+from app.resolver import Resolution
+from conftest import add_host
+
+
+@pytest.fixture
+def monitor():
+    m = MonitorThread()
+    m.limiter = ProbeLimiter(global_rate=None, subnet_rate=None, target_rate=None)
+    m.spread_fraction = 0.0
+    m.confirm_retries = 0
+    yield m
+    m.resolver.close()
+    m._hedge_pool.shutdown()
+
+
+def _ok(*a, **kw) -> PingResult:
+    return PingResult(ok=True, rtt_ms=1.0, message="OK")
+
+
+def _alerts() -> int:
+    with get_session() as session:
+        return len(session.exec(select(AlertEvent)).all())
+
+
+def test_dns_blips_between_successes_never_alert(monitor, monkeypatch):
+    hid = add_host("db", "db.example")
+    h = PlanHost(id=hid, name="db", address="db.example")
+    answers = iter([False, True] * 4)
+
+    def resolve(name):
+        if next(answers):
+            return Resolution(ok=True, address="10.0.0.9", message="OK", expires_at=0.0)
+        return Resolution(ok=False, address=None, message="DNS fail: gaierror", expires_at=0.0)
+
+    monkeypatch.setattr(monitor.resolver, "resolve", resolve)
+    assert [monitor._resolve(h) for _ in range(8)] == [None, "10.0.0.9"] * 4
+    assert monitor.alerting.streak((hid, "dns", "")) == 0
+    assert fail_streak(hid, "dns", "") == 0  # what a restarted monitor would seed
+    assert _alerts() == 0
+
+
+def test_first_failure_of_a_new_series_counts_once(monitor):
+    hid = add_host()
+    monitor._publish(hid, "ping", "", False, None, "Timeout")
+    assert monitor.alerting.streak((hid, "ping", "")) == 1
+    monitor._publish(hid, "tcp", "22", False, None, "Timeout", samples=3)
+    assert monitor.alerting.streak((hid, "tcp", "22")) == 3
+
+
+def test_unreachable_rows_leave_the_streak_alone(monitor):
+    parent = PlanHost(id=add_host("gw", "10.0.0.1"), name="gw", address="10.0.0.1")
+    hid = add_host("child", "10.0.0.2")
+    child = PlanHost(id=hid, name="child", address="10.0.0.2", parent_id=parent.id)
+
+    monitor._publish(hid, "ping", "", False, None, "Timeout")
+    for _ in range(5):
+        monitor._mark_unreachable(child, parent)
+    assert monitor.alerting.streak((hid, "ping", "")) == 1
+    assert fail_streak(hid, "ping", "") == 1
+
+    monitor._publish(hid, "ping", "", False, None, "Timeout")
+    monitor._maybe_alert(child, "ping", "")
+    assert _alerts() == 0  # 2 probed failures, below the threshold of 3
+
+
+def test_signal_backlog_counts_only_signals_a_ui_drains(monitor):
+    hid = add_host()
+    before = metrics.SIGNAL_BACKLOG.value()
+    monitor._publish(hid, "ping", "", True, 1.0, "OK")  # headless: nothing would ever decrement it
+    assert metrics.SIGNAL_BACKLOG.value() == before
+    monitor.track_backlog = True
+    monitor._publish(hid, "ping", "", True, 1.0, "OK")
+    assert metrics.SIGNAL_BACKLOG.value() == before + 1
+    metrics.SIGNAL_BACKLOG.dec()
+
+
+def test_a_cycle_records_every_stage(monitor, monkeypatch):
+    add_host(tcp_ports="22")
+
+    def tcp(address, port, timeout_ms, deadline=None):
+        monitor.stop()  # the last check of the cycle; the loop ends after it
+        return _ok()
+
+    monkeypatch.setattr(monitor_mod, "ping_once", _ok)
+    monkeypatch.setattr(monitor_mod, "tcp_check", tcp)
+    stages = [
+        (metrics.CYCLE_SECONDS, {}),
+        (metrics.PLAN_COMPILE_SECONDS, {}),
+        (metrics.PROBE_SECONDS, {"check_type": "ping"}),
+        (metrics.PROBE_SECONDS, {"check_type": "tcp"}),
+        (metrics.DB_COMMIT_SECONDS, {"op": "result"}),
+    ]
+    before = [hist.snapshot(**labels)[0] for hist, labels in stages]
+    monitor.run()
+    after = [hist.snapshot(**labels)[0] for hist, labels in stages]
+    assert after[:4] == [n + 1 for n in before[:4]]
+    assert after[4] == before[4] + 2  # ping and tcp rows
+
+
+def test_overrun_sheds_tcp_and_skips_the_missed_slot(monitor, monkeypatch):
+    monitor.interval_s = 1
+    add_host("up", "10.0.0.1", tcp_ports="80")
+    add_host("slow", "10.0.0.2", tcp_ports="22")
+
+    def ping(address, timeout_ms, deadline=None):
+        if address == "10.0.0.2":
+            time.sleep(1.1)  # runs the cycle past its deadline
+            return PingResult(ok=False, rtt_ms=None, message="Timeout")
+        return _ok()
+
+    tcp = []
+    monkeypatch.setattr(monitor_mod, "ping_once", ping)
+    monkeypatch.setattr(monitor_mod, "tcp_check", lambda address, port, **kw: tcp.append(port) or _ok())
+    monitor.status.connect(lambda msg: msg.startswith("Monitor behind") and monitor.stop())
+
+    shed = metrics.CHECKS_SHED.value(reason="host_down")
+    deferred = metrics.CHECKS_SHED.value(reason="deadline")
+    skipped = metrics.CYCLES_SKIPPED.value()
+    overruns = metrics.CYCLE_OVERRUN.value()
+    monitor.run()
+    assert tcp == []  # the down host's port is shed, the up host's deferred
+    assert metrics.CHECKS_SHED.value(reason="host_down") == shed + 1
+    assert metrics.CHECKS_SHED.value(reason="deadline") == deferred + 1
+    assert metrics.CHECK_BACKLOG.value() == 2
+    assert metrics.CYCLE_OVERRUN.value() == overruns + 1
+    assert metrics.CYCLES_SKIPPED.value() == skipped + 1
+
+
+def test_children_of_a_down_parent_are_not_probed(monitor, monkeypatch):
+    gw = add_host("gw", "10.0.0.1")
+    child = add_host("child", "10.0.0.2", parent_id=gw, tcp_ports="22")
+    probed = []
+    rows = []
+
+    def ping(address, timeout_ms, deadline=None):
+        probed.append(address)
+        return PingResult(ok=False, rtt_ms=None, message="Timeout")
+
+    def result(host_id, check_type, target, ok, rtt_ms, ts, message):
+        rows.append((host_id, check_type, message))
+        if host_id == child:
+            monitor.stop()
+
+    monkeypatch.setattr(monitor_mod, "ping_once", ping)
+    monkeypatch.setattr(monitor_mod, "tcp_check", lambda *a, **kw: probed.append(a) or _ok())
+    monitor.result.connect(result)
+    suppressed = metrics.PROBES_SUPPRESSED.value()
+    monitor.run()
+    assert probed == ["10.0.0.1"]
+    assert rows == [(gw, "ping", "Timeout"), (child, "ping", "Unreachable (gw down)")]
+    assert metrics.PROBES_SUPPRESSED.value() == suppressed + 1
+
+
+def test_hedged_attempt_returns_the_first_success(monitor):
+    calls = []
+    lock = threading.Lock()
+
+    def probe(address, timeout_ms, deadline=None):
+        with lock:
+            calls.append(address)
+            first = len(calls) == 1
+        if first:
+            return PingResult(ok=False, rtt_ms=None, message="Timeout")
+        return _ok()
+
+    hedged = metrics.PROBES_HEDGED.value(check_type="ping")
+    r = monitor._attempt("ping", 2, probe, "10.0.0.1", timeout_ms=500)
+    assert r.ok and len(calls) == 2
+    assert metrics.PROBES_HEDGED.value(check_type="ping") == hedged + 1
+    assert monitor._attempt("ping", 1, probe, "10.0.0.1", timeout_ms=500).ok
+    assert metrics.PROBES_HEDGED.value(check_type="ping") == hedged + 1
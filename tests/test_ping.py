@@ -0,0 +1,77 @@
+from __future__ import annotations
+
+import time
+
+import pytest
+
+from app import ping
+from app.ping import CANCELLED, PingResult, ping_once, probe_budget_ms, tcp_check
+
+
+class _Recorder:
+    def __init__(self):
+        self.calls = []
+
+    def ping(self, host, budget_ms, clipped):
+        self.calls.append((host, budget_ms, clipped))
+        return PingResult(ok=True, rtt_ms=1.0, message="OK")
+
+    def tcp(self, host, port, budget_ms, clipped):
+        self.calls.append((host, budget_ms, clipped))
+        return PingResult(ok=True, rtt_ms=1.0, message="OK")
+
+
+@pytest.fixture
+def backend(monkeypatch):
+    rec = _Recorder()
+    monkeypatch.setattr(ping, "_backend", rec)
+    return rec
+
+
+def test_probe_budget_is_clipped_to_the_deadline():
+    assert probe_budget_ms(800) == (800.0, False)
+    assert probe_budget_ms(800, deadline=time.monotonic() + 10) == (800.0, False)
+    budget, clipped = probe_budget_ms(800, deadline=time.monotonic() + 0.3)
+    assert clipped and 250 < budget <= 300
+    budget, clipped = probe_budget_ms(800, deadline=time.monotonic() - 1)
+    assert clipped and budget < 0
+
+
+@pytest.mark.parametrize(
+    "system, budget_ms, wait",
+    [
+        ("linux", 1500, "2"),  # iputils -W is whole seconds: rounded up, never 0
+        ("linux", 1000, "1"),
+        ("linux", 200, "1"),
+        ("darwin", 1500.7, "1500"),
+        ("darwin", 0.4, "1"),
+    ],
+)
+def test_ping_cmd_wait_flag(monkeypatch, system, budget_ms, wait):
+    monkeypatch.setattr(ping, "_SYSTEM", system)
+    cmd = ping._ping_cmd("10.0.0.1", budget_ms)
+    assert cmd[cmd.index("-W") + 1] == wait and cmd[-1] == "10.0.0.1"
+
+
+def test_ping_cmd_windows_waits_in_ms(monkeypatch):
+    monkeypatch.setattr(ping, "_SYSTEM", "windows")
+    assert ping._ping_cmd("10.0.0.1", 350.9) == ["ping", "-n", "1", "-w", "350", "10.0.0.1"]
+
+
+def test_probes_get_the_clipped_budget(backend):
+    assert ping_once("10.0.0.1", timeout_ms=1000).ok
+    assert ping_once("10.0.0.1", timeout_ms=1000, deadline=time.monotonic() + 0.2).ok
+    assert tcp_check("10.0.0.1", 22, timeout_ms=1000, deadline=time.monotonic() + 0.2).ok
+    (_, full, c0), (_, ping_budget, c1), (_, tcp_budget, c2) = backend.calls
+    assert full == 1000 and not c0
+    assert c1 and 150 < ping_budget <= 200
+    assert c2 and 150 < tcp_budget <= 200
+
+
+def test_too_little_budget_cancels_without_probing(backend):
+    for r in (
+        ping_once("10.0.0.1", timeout_ms=1000, deadline=time.monotonic() + 0.005),
+        tcp_check("10.0.0.1", 22, timeout_ms=1000, deadline=time.monotonic() - 1),
+    ):
+        assert r.cancelled and not r.ok and r.message == CANCELLED
+    assert backend.calls == []
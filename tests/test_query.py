@@ -0,0 +1,81 @@
+from __future__ import annotations
+
+from sqlmodel import select
+
+from app.db import get_session
+from app.models import CheckKind, Host, Outcome
+from app.query import ResultQuery, compile_query, fetch_page
+from app.store import write_results
+from conftest import add_host, ts
+
+T0 = 1_700_000_000_000
+
+
+def _hosts():
+    with get_session() as session:
+        return {int(h.id): h for h in session.exec(select(Host))}
+
+
+def _seed():
+    web = add_host("web-1", "10.0.0.1", tags="prod,web")
+    db = add_host("db-1", "10.0.0.2", tags="prod")
+    rows = []
+    for i in range(10):
+        rows.append((web, "ping", "", i % 3 != 0, 5.0 * i, ts(T0 + i * 1000), "OK" if i % 3 else "Timeout"))
+        rows.append((db, "tcp", "5432", True, 1.0, ts(T0 + i * 1000), "TCP open"))
+    write_results(rows)
+    return web, db
+
+
+def test_keyset_pages_cover_every_row_once_newest_first():
+    _seed()
+    cq = compile_query(ResultQuery(), _hosts())
+    seen, cursor, pages = [], None, 0
+    with get_session() as session:
+        while True:
+            rows, cursor = fetch_page(session, cq, after=cursor, limit=7)
+            seen += [(r.ts_ms, int(r.id)) for r in rows]
+            pages += 1
+            if cursor is None:
+                break
+        rows, nxt = fetch_page(session, cq, limit=7)
+    assert pages == 3 and len(seen) == 20 and len(set(seen)) == 20
+    assert seen == sorted(seen, reverse=True)
+    assert nxt == seen[6]
+
+
+def test_new_rows_do_not_shift_pages():
+    web, _ = _seed()
+    cq = compile_query(ResultQuery(), _hosts())
+    with get_session() as session:
+        first, cursor = fetch_page(session, cq, limit=5)
+    write_results([(web, "ping", "", True, 1.0, ts(T0 + 60_000), "OK")])
+    with get_session() as session:
+        second, _ = fetch_page(session, cq, after=cursor, limit=5)
+    assert {int(r.id) for r in first}.isdisjoint(int(r.id) for r in second)
+    assert max(r.ts_ms for r in second) <= min(r.ts_ms for r in first)
+
+
+def test_filters_match_sql_and_live_predicate():
+    web, db = _seed()
+    hosts = _hosts()
+    cq = compile_query(ResultQuery(tag="web", check_type="ping", status="fail"), hosts)
+    assert cq.host_ids == {web} and cq.kind == CheckKind.PING
+    with get_session() as session:
+        rows, cursor = fetch_page(session, cq)
+        everything, _ = fetch_page(session, compile_query(ResultQuery(), hosts), limit=100)
+    assert cursor is None and [r.ts_ms for r in rows] == [T0 + 9000, T0 + 6000, T0 + 3000, T0]
+    assert {int(r.id) for r in rows} == {
+        int(r.id) for r in everything if cq.matches(r.host_id, r.kind, r.outcome, r.ts_ms, r.rtt_ms)
+    }
+
+    slow = compile_query(ResultQuery(host="10.0.0", rtt_above_ms=20, since_ms=T0, until_ms=T0 + 8000), hosts)
+    assert slow.host_ids == {web, db}
+    with get_session() as session:
+        rows, _ = fetch_page(session, slow)
+    assert [(r.host_id, r.rtt_ms) for r in rows] == [(web, 35.0), (web, 30.0), (web, 25.0)]
+    assert not slow.matches(web, CheckKind.PING, Outcome.TIMEOUT, T0 + 1000, None)
+
+    nobody = compile_query(ResultQuery(host="nope"), hosts)
+    with get_session() as session:
+        assert nobody.empty and fetch_page(session, nobody) == ([], None)
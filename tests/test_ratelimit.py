@@ -0,0 +1,83 @@
+from __future__ import annotations
+
+import threading
+import time
+
+from app import discovery, ratelimit
+from app.ping import PingResult
+from app.ratelimit import Pacer, ProbeLimiter, TokenBucket, spread_order, subnet_of
+
+
+def test_subnet_of():
+    assert subnet_of("10.0.0.7") == "10.0.0.0/24"
+    assert subnet_of("2001:db8::1") == "2001:db8::/64"
+    assert subnet_of("router.lan") is None
+
+
+def test_spread_order_round_robins_subnets():
+    addrs = ["10.0.0.1", "10.0.0.2", "10.0.0.3", "10.0.1.1", "gw.lan", "10.0.1.2"]
+    assert spread_order(addrs) == ["10.0.0.1", "10.0.1.1", "gw.lan", "10.0.0.2", "10.0.1.2", "10.0.0.3"]
+
+
+def test_token_bucket_goes_into_debt():
+    b = TokenBucket(rate=10, burst=2, now=0.0)
+    for _ in range(2):
+        assert b.delay(0.0) == 0.0
+        b.take()
+    assert b.delay(0.0) == 0.1
+    b.take()  # reserved: the next caller queues behind it
+    assert abs(b.delay(0.0) - 0.2) < 1e-9
+    assert not b.idle(0.25) and b.idle(0.5)
+
+
+def test_limiter_refuses_slots_past_the_deadline_without_taking_tokens():
+    lim = ProbeLimiter(global_rate=None, subnet_rate=None, target_rate=2, target_burst=1)
+    assert lim.acquire("10.0.0.1", deadline=time.monotonic() + 0.05)
+    assert not lim.acquire("10.0.0.1", deadline=time.monotonic() + 0.1)
+    assert lim.acquire("10.0.0.2", deadline=time.monotonic() + 0.05)  # other targets are unaffected
+    t0 = time.monotonic()
+    assert lim.acquire("10.0.0.1", deadline=t0 + 1.0)
+    assert 0.3 < time.monotonic() - t0 < 0.8
+
+
+def test_limiter_subnet_scope_and_stop():
+    lim = ProbeLimiter(global_rate=None, subnet_rate=1, subnet_burst=1, target_rate=None)
+    assert lim.acquire("10.0.0.1")
+    stop = threading.Event()
+    stop.set()
+    assert not lim.acquire("10.0.0.2", stop=stop)  # same /24, would wait ~1 s
+    assert lim.acquire("10.0.1.1", deadline=time.monotonic() + 0.05)
+
+
+def test_aborted_wait_gives_its_tokens_back():
+    lim = ProbeLimiter(global_rate=None, subnet_rate=None, target_rate=1, target_burst=1)
+    assert lim.acquire("10.0.0.1")
+    stop = threading.Event()
+    stop.set()
+    assert not lim.acquire("10.0.0.1", stop=stop)
+    # Had the aborted call kept its reservation, this slot would be ~2 s out
+    assert lim.acquire("10.0.0.1", deadline=time.monotonic() + 1.5)
+
+
+def test_sweep_shares_the_monitor_limiter(monkeypatch):
+    slots = []
+    monkeypatch.setattr(ratelimit.LIMITER, "acquire", lambda address, **kw: slots.append(address) or True)
+    monkeypatch.setattr(discovery, "ping_once", lambda address, timeout_ms: PingResult(ok=True, rtt_ms=1.0, message="OK"))
+    monkeypatch.setattr(discovery, "tcp_check", lambda address, port, timeout_ms: PingResult(ok=False, rtt_ms=None, message="closed"))
+    found = list(discovery.sweep("10.9.9.0/30", ports=[22], concurrency=1))
+    assert sorted(d.address for d in found) == ["10.9.9.1", "10.9.9.2"]
+    assert sorted(slots) == ["10.9.9.1", "10.9.9.1", "10.9.9.2", "10.9.9.2"]  # ping + port each
+
+
+def test_pacer_spreads_calls_over_the_window():
+    start = time.monotonic()
+    p = Pacer(count=4, window_s=0.2, start=start)
+    stamps = []
+    for _ in range(4):
+        assert p.wait()
+        stamps.append(time.monotonic() - start)
+    assert stamps[0] < 0.04 and 0.14 <= stamps[3] < 0.3
+    late = Pacer(count=2, window_s=10, start=start - 100)
+    t0 = time.monotonic()
+    late.wait(), late.wait()
+    assert time.monotonic() - t0 < 0.05
@@ -0,0 +1,82 @@
+from __future__ import annotations
+
+import socket
+import time
+
+import pytest
+
+from app import metrics, resolver
+from app.resolver import Resolver
+
+
+@pytest.fixture
+def lookups(monkeypatch):
+    calls = []
+    answers = {}
+
+    def lookup(name):
+        calls.append(name)
+        ip = answers.get(name)
+        if ip is None:
+            raise socket.gaierror("no such host")
+        return ip
+
+    monkeypatch.setattr(resolver, "_lookup", lookup)
+    lookup.calls = calls
+    lookup.answers = answers
+    return lookup
+
+
+@pytest.fixture
+def res():
+    r = Resolver(ttl_s=0.3, negative_ttl_s=0.1)
+    yield r
+    r.close()
+
+
+def test_ip_literals_skip_the_resolver(res, lookups):
+    assert res.resolve("10.0.0.1").address == "10.0.0.1"
+    assert lookups.calls == []
+
+
+def test_answers_are_cached_for_the_ttl(res, lookups):
+    lookups.answers["db.lan"] = "10.0.0.9"
+    hits = metrics.DNS_CACHE.value(result="hit")
+    assert res.resolve("db.lan").address == "10.0.0.9"
+    assert res.resolve("db.lan").address == "10.0.0.9"
+    assert lookups.calls == ["db.lan"]
+    assert metrics.DNS_CACHE.value(result="hit") == hits + 1
+
+    # Expired: served stale once while a background lookup refreshes it
+    lookups.answers["db.lan"] = "10.0.0.10"
+    time.sleep(0.35)
+    stale = metrics.DNS_CACHE.value(result="stale")
+    assert res.resolve("db.lan").address == "10.0.0.9"
+    assert metrics.DNS_CACHE.value(result="stale") == stale + 1
+    t0 = time.monotonic()
+    while res.resolve("db.lan").address != "10.0.0.10":
+        assert time.monotonic() - t0 < 1.0
+        time.sleep(0.01)
+    assert lookups.calls == ["db.lan", "db.lan"]
+
+
+def test_failures_are_cached_for_the_negative_ttl(res, lookups):
+    first = res.resolve("gone.lan")
+    assert not first.ok and first.message == "DNS fail: gaierror"
+    assert not res.resolve("gone.lan").ok
+    assert lookups.calls == ["gone.lan"]
+
+    # A failed entry is never served stale: once expired the next call looks up again
+    lookups.answers["gone.lan"] = "10.0.0.7"
+    time.sleep(0.15)
+    assert res.resolve("gone.lan").address == "10.0.0.7"
+    assert lookups.calls == ["gone.lan", "gone.lan"]
+
+
+def test_prefetch_resolves_missing_names_once(res, lookups):
+    lookups.answers.update({"a.lan": "10.0.0.1", "b.lan": "10.0.0.2"})
+    res.prefetch(["a.lan", "b.lan", "a.lan", "10.0.0.3"], timeout_s=1.0)
+    assert sorted(lookups.calls) == ["a.lan", "b.lan"]
+    res.prefetch(["a.lan", "b.lan"], timeout_s=1.0)
+    assert res.resolve("b.lan").address == "10.0.0.2"
+    assert len(lookups.calls) == 2
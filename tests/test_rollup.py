@@ -0,0 +1,38 @@
+from __future__ import annotations
+
+from app.monitor import MonitorThread
+from app.rollup import rollup_series, rollup_stats, update_rollups
+from app.store import write_results
+from app.transitions import TransitionFilter
+from conftest import add_host, ts
+
+T0 = 1_700_000_000_000 - 1_700_000_000_000 % 3_600_000  # hour-aligned
+STEP = 10_000
+
+
+def test_transitions_mode_rollup_counts_each_probe_once():
+    hid = add_host()
+    m = MonitorThread()
+    m.storage_mode = "transitions"
+    m._transitions = TransitionFilter(heartbeat_s=3600)
+    for i in range(29):
+        m._store_result(hid, "ping", "", True, 2.0, ts(T0 + i * STEP), "OK")
+    m._store_result(hid, "ping", "", False, None, ts(T0 + 29 * STEP), "Timeout")
+
+    assert update_rollups(now_ms=T0) == 3
+    (stats,) = rollup_stats(T0, T0 + 3_600_000)
+    assert (stats["probes"], stats["ok_probes"]) == (30, 29)
+    assert stats["availability"] == 96.667
+
+
+def test_rollup_folds_incrementally_and_late_rows():
+    hid = add_host()
+    write_results([(hid, "ping", "", True, 1.0, ts(T0), "OK"), (hid, "ping", "", True, 3.0, ts(T0 + STEP), "OK")])
+    assert update_rollups(now_ms=T0) == 2
+    assert update_rollups(now_ms=T0) == 0
+    # A late agent row (older ts, newer id) still lands in its bucket
+    write_results([(hid, "ping", "", False, None, ts(T0 + 5), "Timeout", 3, 0)])
+    assert update_rollups(now_ms=T0) == 1
+
+    (hour,) = rollup_series(hid, 0, 0, 3600, T0, T0 + 3_600_000)
+    assert (hour.probes, hour.ok_probes, hour.rtt_n, hour.rtt_min, hour.rtt_max) == (5, 2, 2, 1.0, 3.0)
@@ -0,0 +1,33 @@
+from __future__ import annotations
+
+import gzip
+
+from app.simulator import Recorder, ReplayMonitor, read_capture
+from conftest import ts
+
+T0 = 1_700_000_000_000
+
+
+def test_recorder_captures_live_results(tmp_path):
+    path = str(tmp_path / "live.jsonl.gz")
+    rec = Recorder(path)
+    rec.on_result(1, "ping", "", True, 2.5, ts(T0), "OK")
+    rec.on_result(1, "tcp", "443", False, None, ts(T0 + 1000), "TCP fail: timeout")
+    rec.close()
+    assert list(read_capture(path)) == [
+        (T0, 1, "ping", "", True, 2.5, "OK"),
+        (T0 + 1000, 1, "tcp", "443", False, None, "TCP fail: timeout"),
+    ]
+
+
+def test_replay_releases_its_executors(tmp_path):
+    empty = tmp_path / "empty.jsonl.gz"
+    with gzip.open(empty, "wt") as f:
+        f.write("\n")
+    for path in (str(empty), str(tmp_path / "missing.jsonl.gz")):
+        mon = ReplayMonitor(path, speed=0)
+        statuses = []
+        mon.status.connect(statuses.append)
+        mon.run()
+        assert mon._hedge_pool._shutdown and mon.resolver._pool._shutdown
+        assert statuses[-1].startswith("Replay finished" if path == str(empty) else "Replay failed")
@@ -0,0 +1,81 @@
+from __future__ import annotations
+
+import json
+import threading
+import time
+import urllib.request
+
+import app.api
+import app.status
+from app.api import ApiServer
+from app.status import StatusStore
+from app.store import write_results
+from conftest import add_host, ts
+
+T0 = 1_700_000_000_000
+
+
+def test_sync_tracks_series_and_reads_the_db_outside_the_lock(monkeypatch):
+    hid = add_host()
+    write_results([(hid, "ping", "", True, 1.0, ts(T0), "OK")])
+    store = StatusStore()
+    opened = []
+    real = app.status.get_session
+
+    def get_session():
+        opened.append(store._lock._is_owned())
+        return real()
+
+    monkeypatch.setattr(app.status, "get_session", get_session)
+    assert store.sync()
+    assert store.hosts[hid].name == "h1"
+    write_results([(hid, "ping", "", False, None, ts(T0 + 1000), "Timeout", 3, 0)])
+    assert store.sync()
+    assert not store.sync()
+
+    s = store.series_of(hid)[("ping", "")]
+    assert (s.ok, s.outcome, s.message, s.fail_streak, s.since_ms) == (False, "timeout", "Timeout", 3, T0 + 1000)
+    assert [r["ok"] for r in store.recent_results()] == [False, True]
+    assert opened and not any(opened)
+
+
+def _get(base: str, path: str, etag: str = ""):
+    req = urllib.request.Request(base + path, headers={"If-None-Match": etag} if etag else {})
+    try:
+        with urllib.request.urlopen(req, timeout=5) as resp:
+            return resp.status, resp.headers.get("ETag"), json.loads(resp.read() or b"null")
+    except urllib.error.HTTPError as e:
+        return e.code, e.headers.get("ETag"), None
+
+
+def test_api_serves_status_and_renders_stats_off_the_loop(monkeypatch):
+    hid = add_host()
+    now = int(time.time() * 1000)
+    write_results([(hid, "ping", "", True, 1.0, ts(now - 5000), "OK"), (hid, "ping", "", False, None, ts(now - 1000), "Timeout")])
+    threads = []
+    real = app.api.rollup_stats
+
+    def rollup_stats(*a, **kw):
+        threads.append(threading.current_thread().name)
+        return real(*a, **kw)
+
+    monkeypatch.setattr(app.api, "rollup_stats", rollup_stats)
+    api = ApiServer(port=0, store=StatusStore(), sync_s=0.2)
+    api.start()
+    try:
+        base = "http://%s:%d" % api.address
+        for _ in range(100):
+            if api.store.version and api._rollup_version:
+                break
+            time.sleep(0.05)
+
+        status, etag, body = _get(base, "/api/v1/status")
+        assert status == 200 and body["hosts"][0]["state"] == "down"
+        assert _get(base, "/api/v1/status", etag)[0] == 304
+        assert _get(base, "/api/v1/hosts/999")[0] == 404
+
+        status, _, body = _get(base, "/api/v1/stats?window=1h")
+        assert status == 200 and body["checks"][0]["availability"] == 50.0
+        assert threads and "api-http" not in threads
+    finally:
+        api.stop()
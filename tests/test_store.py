@@ -0,0 +1,61 @@
+from __future__ import annotations
+
+import sqlite3
+from datetime import datetime
+
+from sqlmodel import select
+
+from app.db import DB_PATH, get_session
+from app.models import CheckResult, MessageCode
+from app.store import CATALOG, write_result, write_results
+
+
+def _codes():
+    with get_session() as session:
+        return {mc.text: int(mc.id) for mc in session.exec(select(MessageCode))}
+
+
+def test_message_round_trip():
+    now = datetime.utcnow()
+    write_results([(1, "ping", "", False, None, now, "Timeout"), (1, "tcp", "22", False, None, now, "Timeout")])
+    with get_session() as session:
+        rows = session.exec(select(CheckResult)).all()
+    assert len({r.msg_id for r in rows}) == 1
+    assert CATALOG.text(rows[0].msg_id) == "Timeout"
+    assert CATALOG.text(0) == ""
+
+
+def test_rolled_back_code_is_not_cached():
+    with get_session() as session:
+        code = CATALOG.code_for(session, "never committed")
+        assert code > 0
+        session.rollback()
+    assert "never committed" not in _codes()
+    assert CATALOG.text(code) == f"#{code}"
+
+    # The next writer inserts the text afresh and gets a real row
+    write_result(1, "ping", "", False, None, datetime.utcnow(), "never committed")
+    codes = _codes()
+    with get_session() as session:
+        r = session.exec(select(CheckResult)).one()
+    assert r.msg_id == codes["never committed"]
+    assert CATALOG.text(r.msg_id) == "never committed"
+
+
+def test_code_inserted_by_another_process_is_reused():
+    with get_session() as session:
+        assert CATALOG.code_for(session, "Ping error: x") > 0  # cached only after commit
+        session.rollback()
+
+    # Another process adds the same text between our cache miss and our insert
+    con = sqlite3.connect(DB_PATH)
+    try:
+        con.execute("INSERT INTO messagecode (text) VALUES ('Ping error: x')")
+        con.commit()
+    finally:
+        con.close()
+
+    write_results([(1, "ping", "", False, None, datetime.utcnow(), "Ping error: x")])
+    with get_session() as session:
+        r = session.exec(select(CheckResult)).one()
+    assert r.msg_id == _codes()["Ping error: x"]
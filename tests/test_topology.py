@@ -0,0 +1,30 @@
+from __future__ import annotations
+
+from app.plan import PlanHost
+from app.topology import blocked_by, depth_levels, effective_parents
+
+
+def _h(hid, parent_id=None) -> PlanHost:
+    return PlanHost(id=hid, name=f"h{hid}", address=f"10.0.0.{hid}", parent_id=parent_id)
+
+
+def test_effective_parents_drops_unknown_parents_and_cycles():
+    parents = effective_parents([_h(1), _h(2, 1), _h(3, 99), _h(4, 4), _h(5, 6), _h(6, 5)])
+    assert parents[1] is None and parents[2] == 1
+    assert parents[3] is None and parents[4] is None
+    assert [parents[5], parents[6]].count(None) == 1  # the loop is broken once
+
+
+def test_depth_levels_put_parents_first():
+    hosts = [_h(3, 2), _h(2, 1), _h(1), _h(4)]
+    assert [[h.id for h in level] for level in depth_levels(hosts)] == [[1, 4], [2], [3]]
+
+
+def test_blocked_by_follows_the_down_set():
+    parents = {1: None, 2: 1, 3: 2}
+    assert blocked_by(1, parents, {1}) is None
+    assert blocked_by(2, parents, set()) is None
+    assert blocked_by(2, parents, {1}) == 1
+    # 3 is blocked through 2 only once 2 itself was marked unreachable
+    assert blocked_by(3, parents, {1}) is None
+    assert blocked_by(3, parents, {1, 2}) == 2
@@ -0,0 +1,118 @@
+from __future__ import annotations
+
+from sqlmodel import select
+
+from app.alerting import fail_streak
+from app.db import get_session
+from app.models import CheckResult, Host, ResultFlag
+from app.monitor import MonitorThread
+from app.status import StatusStore
+from app.transitions import TransitionFilter, ok_samples
+from conftest import add_host, ts
+
+T0 = 1_700_000_000_000
+STEP = 10_000
+
+
+def _offer_all(f: TransitionFilter, probes):
+    rows = []
+    for i, (ok, rtt, msg) in enumerate(probes):
+        t = T0 + i * STEP
+        d = f.offer(1, "ping", "", ok, rtt, t, msg)
+        if d.close is not None:
+            c = d.close
+            rows.append((c.ok, c.ts_ms, c.samples, c.flags))
+        if d.persist:
+            rows.append((ok, t, d.samples, d.flags))
+    return rows
+
+
+def test_transition_closes_the_old_state_with_its_own_row():
+    f = TransitionFilter(heartbeat_s=3600)
+    rows = _offer_all(f, [(True, 1.0, "OK")] * 29 + [(False, None, "Timeout")])
+    assert rows == [
+        (True, T0, 1, 0),
+        (True, T0 + 28 * STEP, 28, int(ResultFlag.HEARTBEAT)),  # stamped with the last OK probe
+        (False, T0 + 29 * STEP, 1, 0),
+    ]
+    assert sum(n for ok, _, n, _ in rows if ok) == 29
+    assert sum(n for _, _, n, _ in rows) == 30
+
+
+def test_transition_right_after_a_row_needs_no_closing_row():
+    f = TransitionFilter(heartbeat_s=3600)
+    rows = _offer_all(f, [(True, 1.0, "OK"), (False, None, "Timeout"), (True, 1.0, "OK")])
+    assert [(ok, n) for ok, _, n, _ in rows] == [(True, 1), (False, 1), (True, 1)]
+
+
+def test_heartbeat_row_carries_the_skipped_probes():
+    f = TransitionFilter(heartbeat_s=60)
+    rows = _offer_all(f, [(True, 1.0, "OK")] * 8)  # heartbeat due at the 7th probe (60 s)
+    assert [(n, flags) for _, _, n, flags in rows] == [(1, 0), (6, int(ResultFlag.HEARTBEAT))]
+
+
+def test_rtt_band_change_closes_the_old_band():
+    f = TransitionFilter(heartbeat_s=3600)
+    rows = _offer_all(f, [(True, 1.0, "OK")] * 5 + [(True, 300.0, "OK")])
+    assert [(t, n) for _, t, n, _ in rows] == [(T0, 1), (T0 + 4 * STEP, 4), (T0 + 5 * STEP, 1)]
+
+
+def test_availability_and_streaks_across_a_transition():
+    hid = add_host()
+    m = MonitorThread()
+    m.storage_mode = "transitions"
+    m._transitions = TransitionFilter(heartbeat_s=3600)
+    for i in range(29):
+        m._store_result(hid, "ping", "", True, 2.0, ts(T0 + i * STEP), "OK")
+    m._store_result(hid, "ping", "", False, None, ts(T0 + 29 * STEP), "Timeout")
+
+    with get_session() as session:
+        rows = session.exec(select(CheckResult).order_by(CheckResult.ts_ms)).all()
+    assert [(r.ok, r.samples) for r in rows] == [(True, 1), (True, 28), (False, 1)]
+    probes = sum(r.samples for r in rows)
+    ok = sum(ok_samples(r.outcome, r.samples) for r in rows)
+    assert (ok, probes) == (29, 30)
+
+    # A restarted monitor and the status store both see one failed probe, not 29
+    assert fail_streak(hid, "ping", "") == 1
+    store = StatusStore()
+    store.sync()
+    assert store.series_of(hid)[("ping", "")].fail_streak == 1
+    m._hedge_pool.shutdown()
+
+
+def test_drain_closes_pending_probes_once():
+    f = TransitionFilter(heartbeat_s=3600)
+    _offer_all(f, [(True, 1.0, "OK")] * 4)
+    assert [(k, c.samples, c.ts_ms) for k, c in f.drain()] == [((1, "ping", ""), 3, T0 + 3 * STEP)]
+    assert f.drain() == []
+
+
+def test_stopping_monitor_writes_held_back_probes():
+    hid = add_host()
+    m = MonitorThread(storage_mode="transitions", heartbeat_s=3600)
+    m._transitions = TransitionFilter(heartbeat_s=m.heartbeat_s)
+    for i in range(5):
+        m._store_result(hid, "ping", "", True, 2.0, ts(T0 + i * STEP), "OK")
+    m._flush_transitions()
+
+    with get_session() as session:
+        rows = session.exec(select(CheckResult).order_by(CheckResult.ts_ms)).all()
+    assert [(r.samples, r.flags) for r in rows] == [(1, 0), (4, int(ResultFlag.HEARTBEAT))]
+    m._hedge_pool.shutdown()
+    m.resolver.close()
+
+
+def test_plan_rebuild_prunes_removed_hosts():
+    keep, gone = add_host("a", "10.0.0.1"), add_host("b", "10.0.0.2")
+    m = MonitorThread(storage_mode="transitions")
+    for hid in (keep, gone):
+        m._store_result(hid, "ping", "", True, 2.0, ts(T0), "OK")
+    with get_session() as session:
+        session.delete(session.get(Host, gone))
+        session.commit()
+    m.invalidate_plan()
+    m._current_plan()
+    assert {k[0] for k in m._transitions._state} == {keep}
+    m._hedge_pool.shutdown()
+    m.resolver.close()
@@ -0,0 +1,69 @@
+from __future__ import annotations
+
+import asyncio
+import zlib
+
+import pytest
+
+from app import wire
+from app.wire import _LEN, MAX_FRAME, encode, is_loopback, parse_endpoint, read_msg
+
+
+def _reader(data: bytes, eof: bool = True) -> asyncio.StreamReader:
+    r = asyncio.StreamReader()
+    r.feed_data(data)
+    if eof:
+        r.feed_eof()
+    return r
+
+
+def test_frames_round_trip():
+    msgs = [{"type": "hello", "agent": "a1"}, {"type": "results", "seq": 3, "rows": [[1, "ping", "", True, 0.5, 1, "", 1]]}]
+
+    async def go():
+        reader = _reader(b"".join(encode(m) for m in msgs))
+        out = [await read_msg(reader), await read_msg(reader)]
+        with pytest.raises(asyncio.IncompleteReadError):
+            await read_msg(reader)
+        return out
+
+    assert asyncio.run(go()) == msgs
+
+
+def test_rejects_oversized_and_malformed_frames():
+    async def read(data: bytes):
+        return await read_msg(_reader(data))
+
+    with pytest.raises(ValueError):
+        asyncio.run(read(_LEN.pack(MAX_FRAME + 1)))
+    body = zlib.compress(b"[1, 2]")
+    with pytest.raises(ValueError):
+        asyncio.run(read(_LEN.pack(len(body)) + body))
+    body = zlib.compress(b'{"no": "type"}')
+    with pytest.raises(ValueError):
+        asyncio.run(read(_LEN.pack(len(body)) + body))
+
+
+def test_rejects_frames_that_inflate_past_the_cap(monkeypatch):
+    monkeypatch.setattr(wire, "MAX_BODY", 1024)
+    small, big = encode({"type": "x", "pad": "a" * 900}), encode({"type": "x", "pad": "a" * 100_000})
+    assert len(big) < 1024  # compresses well under the cap; inflates far past it
+
+    async def read(data: bytes):
+        return await read_msg(_reader(data))
+
+    assert asyncio.run(read(small))["type"] == "x"
+    with pytest.raises(ValueError, match="inflates"):
+        asyncio.run(read(big))
+
+
+def test_is_loopback():
+    assert all(map(is_loopback, ["127.0.0.1", "::1", "localhost", "127.1.2.3"]))
+    assert not any(map(is_loopback, ["", "0.0.0.0", "::", "10.0.0.5", "monitor.lan"]))
+
+
+def test_parse_endpoint():
+    assert parse_endpoint("10.0.0.5:9000") == ("10.0.0.5", 9000)
+    assert parse_endpoint(":9000") == ("127.0.0.1", 9000)
+    assert parse_endpoint("collector.lan") == ("collector.lan", 9470)
+    assert parse_endpoint("", default_port=1) == ("127.0.0.1", 1)